@@ -0,0 +1,78 @@
+"""
+Database Migration: Add CANCELLED to generation_jobs.status
+
+Cancelling a generation job now stores JobStatus.CANCELLED. The status column is a
+MySQL ENUM of the JobStatus member names, so the new member has to be added to the
+column definition of existing databases (new databases get it from create_all()).
+
+Run this script with: python migrations/add_cancelled_job_status.py
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine, text
+import logging
+
+from migrations.alter_business_type_to_varchar import get_database_url
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def run_migration(args=None):
+    """Add every JobStatus member to the generation_jobs.status ENUM."""
+    from src.database.models import JobStatus
+
+    engine = create_engine(get_database_url(args), echo=False)
+    enum_definition = "ENUM({})".format(','.join(f"'{status.name}'" for status in JobStatus))
+
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(text("""
+                SELECT COLUMN_TYPE
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME = 'generation_jobs'
+                AND COLUMN_NAME = 'status'
+            """))
+            row = result.fetchone()
+            if not row:
+                logger.error("Column generation_jobs.status not found")
+                return False
+
+            current_type = str(row[0])
+            logger.info(f"generation_jobs.status: Current type = {current_type}")
+            if "'CANCELLED'" in current_type.upper():
+                logger.info("✓ generation_jobs.status already contains CANCELLED - skipping")
+                return True
+
+            conn.execute(text(f"ALTER TABLE generation_jobs MODIFY COLUMN status {enum_definition} NOT NULL"))
+            conn.commit()
+            logger.info(f"✓ generation_jobs.status changed to {enum_definition}")
+            return True
+
+    except Exception as e:
+        logger.error(f"✗ Error migrating generation_jobs.status: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add CANCELLED to generation_jobs.status')
+    parser.add_argument('--host', default=None,
+                        help='Database host and port (default: 172.17.0.1:8474 for Docker, or from .env file)')
+    parser.add_argument('--user', default='tsp', help='Database user (default: tsp)')
+    parser.add_argument('--password', default='2222', help='Database password (default: 2222)')
+    parser.add_argument('--database', default='testcase_gen', help='Database name (default: testcase_gen)')
+
+    args = parser.parse_args()
+    sys.exit(0 if run_migration(args) else 1)
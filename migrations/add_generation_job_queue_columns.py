@@ -0,0 +1,109 @@
+"""
+Database Migration: Add durable job queue columns to generation_jobs
+
+Generation jobs are no longer run through FastAPI BackgroundTasks. They are stored in
+generation_jobs with their arguments and claimed by generation workers that hold a
+renewable lease:
+
+- job_payload: job arguments (JSON)
+- worker_id: worker currently holding the job
+- lease_expires_at: the job can be re-claimed after this time (crashed worker)
+- heartbeat_at: last lease renewal
+- attempts: number of times the job was claimed
+- priority: fair-share scheduling class (interactive / bulk)
+- started_at: when the current attempt was claimed (job durations feed queue time estimates)
+- parent_job_id: bulk generation job a per-business-type child job belongs to
+
+Run this script with: python migrations/add_generation_job_queue_columns.py
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine, text
+import logging
+
+from migrations.alter_business_type_to_varchar import get_database_url
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    ('job_payload', 'TEXT NULL'),
+    ('worker_id', 'VARCHAR(100) NULL'),
+    ('lease_expires_at', 'DATETIME NULL'),
+    ('heartbeat_at', 'DATETIME NULL'),
+    ('attempts', 'INT NULL DEFAULT 0'),
+    ('priority', 'VARCHAR(20) NULL'),
+    ('started_at', 'DATETIME NULL'),
+    ('parent_job_id', 'VARCHAR(36) NULL'),
+]
+
+INDEXES = [
+    ('ix_generation_jobs_worker_id', 'worker_id'),
+    ('ix_generation_jobs_lease_expires_at', 'lease_expires_at'),
+    ('ix_generation_jobs_priority', 'priority'),
+    ('ix_generation_jobs_parent_job_id', 'parent_job_id'),
+]
+
+
+def run_migration(args=None):
+    """Add the missing queue columns and indexes to generation_jobs."""
+    engine = create_engine(get_database_url(args), echo=False)
+
+    try:
+        with engine.connect() as conn:
+            existing_columns = {row[0] for row in conn.execute(text("""
+                SELECT COLUMN_NAME
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME = 'generation_jobs'
+            """))}
+            existing_indexes = {row[0] for row in conn.execute(text("""
+                SELECT INDEX_NAME
+                FROM INFORMATION_SCHEMA.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME = 'generation_jobs'
+            """))}
+
+            for column_name, definition in COLUMNS:
+                if column_name in existing_columns:
+                    logger.info(f"✓ generation_jobs.{column_name} already exists - skipping")
+                    continue
+                conn.execute(text(f"ALTER TABLE generation_jobs ADD COLUMN {column_name} {definition}"))
+                logger.info(f"✓ Added generation_jobs.{column_name}")
+
+            for index_name, column_name in INDEXES:
+                if index_name in existing_indexes:
+                    logger.info(f"✓ Index {index_name} already exists - skipping")
+                    continue
+                conn.execute(text(f"CREATE INDEX {index_name} ON generation_jobs ({column_name})"))
+                logger.info(f"✓ Created index {index_name}")
+
+            conn.commit()
+            return True
+
+    except Exception as e:
+        logger.error(f"✗ Error migrating generation_jobs: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add durable job queue columns to generation_jobs')
+    parser.add_argument('--host', default=None,
+                        help='Database host and port (default: 172.17.0.1:8474 for Docker, or from .env file)')
+    parser.add_argument('--user', default='tsp', help='Database user (default: tsp)')
+    parser.add_argument('--password', default='2222', help='Database password (default: 2222)')
+    parser.add_argument('--database', default='testcase_gen', help='Database name (default: testcase_gen)')
+
+    args = parser.parse_args()
+    sys.exit(0 if run_migration(args) else 1)
@@ -9,6 +9,7 @@ import logging
 
 from .dependencies import get_db
 from ..services.business_service import BusinessService, PromptCombinationService
+from ..utils.prompt_cache import invalidate_prompt_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -76,7 +77,9 @@ async def create_business_type(
     try:
         # Direct database session from dependency injection
             business_service = BusinessService(db)
-            return business_service.create_business_type(business_type_data)
+            created = business_service.create_business_type(business_type_data)
+            invalidate_prompt_cache(business_types=[business_type_data.code])
+            return created
     except HTTPException as he:
         # Re-raise HTTPExceptions without modification
         logger.error(f"HTTP error creating business type: {he.detail}")
@@ -99,7 +102,9 @@ async def update_business_type(
     try:
         # Direct database session from dependency injection
             business_service = BusinessService(db)
-            return business_service.update_business_type(id, business_type_data)
+            updated = business_service.update_business_type(id, business_type_data)
+            invalidate_prompt_cache(business_config_ids=[id])
+            return updated
     except Exception as e:
         logger.error(f"Error updating business type {id}: {str(e)}")
         raise HTTPException(
@@ -118,6 +123,7 @@ async def delete_business_type(
         # Direct database session from dependency injection
             business_service = BusinessService(db)
             business_service.delete_business_type(id)
+            invalidate_prompt_cache(business_config_ids=[id])
             return UnifiedTestCaseDeleteResponse(message="Business type deleted successfully")
     except Exception as e:
         logger.error(f"Error deleting business type {id}: {str(e)}")
@@ -137,7 +143,9 @@ async def activate_business_type(
     try:
         # Direct database session from dependency injection
             business_service = BusinessService(db)
-            return business_service.activate_business_type(id, activation_data)
+            activated = business_service.activate_business_type(id, activation_data)
+            invalidate_prompt_cache(business_config_ids=[id])
+            return activated
     except Exception as e:
         logger.error(f"Error activating business type {id}: {str(e)}")
         raise HTTPException(
@@ -238,7 +246,9 @@ async def update_prompt_combination(
     try:
         # Direct database session from dependency injection
         combination_service = PromptCombinationService(db)
-        return combination_service.update_prompt_combination(combination_id, combination_data)
+        updated = combination_service.update_prompt_combination(combination_id, combination_data)
+        invalidate_prompt_cache(combination_ids=[combination_id])
+        return updated
     except Exception as e:
         logger.error(f"Error updating prompt combination {combination_id}: {str(e)}")
         raise HTTPException(
@@ -257,6 +267,7 @@ async def delete_prompt_combination(
         # Direct database session from dependency injection
             combination_service = PromptCombinationService(db)
             combination_service.delete_prompt_combination(combination_id)
+            invalidate_prompt_cache(combination_ids=[combination_id])
             return UnifiedTestCaseDeleteResponse(message="Prompt combination deleted successfully")
     except Exception as e:
         logger.error(f"Error deleting prompt combination {combination_id}: {str(e)}")
@@ -6,6 +6,7 @@ Provides API endpoints for accessing dynamic configuration data
 including business types, prompt types, and prompt statuses.
 """
 
+import asyncio
 import logging
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
@@ -302,6 +303,109 @@ async def refresh_configuration_cache():
     return MessageResponse(message="配置缓存刷新成功")
 
 
+@router.get("/llm-cache/stats", response_model=Dict[str, Any])
+async def get_llm_cache_stats():
+    """
+    Get LLM response cache counters.
+
+    Returns:
+        Hit/miss counters and disk usage, or enabled=False when the cache is off
+    """
+    from ..llm.response_cache import get_response_cache
+
+    cache = get_response_cache(Config())
+    if cache is None:
+        return {"enabled": False}
+    return await asyncio.to_thread(cache.stats)
+
+
+@router.post("/llm-cache/clear", response_model=MessageResponse)
+async def clear_llm_cache():
+    """
+    Remove all cached LLM responses.
+
+    Returns:
+        Success message
+    """
+    from ..llm.response_cache import get_response_cache
+
+    cache = get_response_cache(Config())
+    if cache is None:
+        return MessageResponse(message="LLM响应缓存未启用")
+    removed = await asyncio.to_thread(cache.clear)
+    return MessageResponse(message=f"已清除 {removed} 条LLM响应缓存")
+
+
+@router.get("/llm-router/stats", response_model=Dict[str, Any])
+async def get_llm_router_stats():
+    """
+    Get health of the LLM endpoint pool.
+
+    Returns:
+        Rolling latency, error rate and circuit state per endpoint
+    """
+    from ..llm.router import get_llm_router
+
+    return get_llm_router(Config()).stats()
+
+
+@router.get("/llm-hedging/stats", response_model=Dict[str, Any])
+async def get_llm_hedging_stats():
+    """
+    Get hedged request counters.
+
+    Returns:
+        Hedge rate, wins, wasted tokens and current hedge delays, or enabled=False when hedging is off
+    """
+    from ..llm.hedging import get_hedge_tracker
+
+    tracker = get_hedge_tracker(Config())
+    if tracker is None:
+        return {"enabled": False}
+    return tracker.stats()
+
+
+@router.get("/llm-rate-limiter/stats", response_model=Dict[str, Any])
+async def get_llm_rate_limiter_stats():
+    """
+    Get LLM rate limiter bucket levels and queue depth.
+
+    Returns:
+        Bucket levels, queue depth and counters, or enabled=False when no limit is configured
+    """
+    from ..llm.rate_limiter import get_rate_limiter
+
+    limiter = get_rate_limiter(Config())
+    if limiter is None:
+        return {"enabled": False}
+    return limiter.stats()
+
+
+@router.get("/generation-queue/stats", response_model=Dict[str, Any])
+async def get_generation_queue_stats():
+    """
+    Get durable generation job queue counts and the in-process worker pool state.
+
+    Returns:
+        Queued/running/lease-expired job counts, plus worker pool stats when workers run in-process
+    """
+    from ..services.generation_worker import get_generation_worker_pool
+    from ..services.job_queue import create_job_queue
+    from .dependencies import get_database_manager
+
+    config = Config()
+    queue = create_job_queue(config, get_database_manager())
+    try:
+        stats = await asyncio.to_thread(queue.stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取生成队列状态失败: {str(e)}")
+
+    worker_pool = get_generation_worker_pool(config)
+    stats["worker_mode"] = config.generation_worker_mode
+    stats["workers"] = worker_pool.stats() if worker_pool else None
+    return stats
+
+
 @router.get("/validate/business-type/{business_type}", response_model=ValidationResponse)
 async def validate_business_type(business_type: str):
     """
@@ -357,6 +357,47 @@ setup_error_handler(app)
 # Setup validation middleware (max 10MB request size)
 setup_validation(app, max_request_size=10*1024*1024)
 
+
+@app.on_event("startup")
+async def start_generation_workers():
+    """Run the generation worker pool in the API process unless workers run externally."""
+    from ..services.generation_worker import get_generation_worker_pool
+    from .dependencies import get_database_manager
+
+    worker_pool = get_generation_worker_pool(config, get_database_manager())
+    if worker_pool:
+        app.state.generation_worker_task = asyncio.create_task(worker_pool.run())
+
+
+@app.on_event("startup")
+async def warm_prompt_cache():
+    """Assemble the two-stage prompts of every active business type when the prompt cache is enabled."""
+    if not config.prompt_cache_enabled:
+        return
+    from ..utils.database_prompt_builder import DatabasePromptBuilder
+
+    try:
+        warmed = await asyncio.to_thread(DatabasePromptBuilder(config).warm_prompt_cache)
+        logger.info(f"提示词缓存预热完成: {warmed} 个条目")
+    except Exception as e:
+        logger.warning(f"提示词缓存预热失败: {e}")
+
+
+@app.on_event("shutdown")
+async def stop_generation_workers():
+    """Stop the in-process worker pool; its running jobs go back to the queue."""
+    worker_task = getattr(app.state, 'generation_worker_task', None)
+    if worker_task:
+        worker_task.cancel()
+        await asyncio.gather(worker_task, return_exceptions=True)
+
+
+@app.on_event("shutdown")
+async def close_llm_connection_pool():
+    """Close the pooled async HTTP connections used by LLM clients."""
+    from ..llm.llm_client import close_shared_async_http_client
+    await close_shared_async_http_client()
+
 # Configuration
 config = Config()
 
@@ -669,6 +710,8 @@ async def get_task_status(task_id: str):
             task_type_display = "测试点生成"
         elif job.generation_mode == "test_cases_only":
             task_type_display = "测试用例生成"
+        elif job.generation_mode == "points_then_cases":
+            task_type_display = "测试点和测试用例流水线生成"
 
         return TaskStatusResponse(
             task_id=task_id,
@@ -1273,6 +1316,8 @@ async def list_tasks(project_id: Optional[int] = None, db = Depends(get_db)):
             task_type_display = "测试点生成"
         elif job.generation_mode == "test_cases_only":
             task_type_display = "测试用例生成"
+        elif job.generation_mode == "points_then_cases":
+            task_type_display = "测试点和测试用例流水线生成"
 
         tasks.append({
             "task_id": job.id,
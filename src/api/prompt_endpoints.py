@@ -4,7 +4,6 @@ API endpoints for prompt management system.
 """
 
 import json
-import re
 import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime
@@ -47,7 +46,10 @@ from ..models.prompt import (
     PromptTemplateUpdate
 )
 from ..utils.config import Config
+from ..llm.token_budget import TokenCounter
 from ..utils.database_prompt_builder import DatabasePromptBuilder
+from ..utils.prompt_cache import invalidate_prompt_cache
+from ..utils.prompt_template import compile_template
 from .dependencies import get_db
 
 # Create router
@@ -428,6 +430,7 @@ async def update_prompt(
     # Update timestamp
     prompt.updated_at = datetime.now()
     db.commit()
+    invalidate_prompt_cache(prompt_ids=[prompt_id])
 
     # Create version history if content changed
     if "content" in update_data and old_content != prompt.content:
@@ -498,6 +501,7 @@ async def delete_prompt(prompt_id: int, db: Session = Depends(get_db)):
 
     db.delete(prompt)
     db.commit()
+    invalidate_prompt_cache(prompt_ids=[prompt_id])
     return {"message": "提示词删除成功"}
 
 
@@ -644,15 +648,15 @@ async def preview_prompt(request: PromptPreviewRequest, db: Session = Depends(ge
     # Render content with variables
     rendered_content = request.content
     if request.variables:
-        for key, value in request.variables.items():
-            placeholder = f"{{{{ {key} }}}}"
-            if placeholder in rendered_content:
-                rendered_content = rendered_content.replace(placeholder, str(value))
-            else:
+        template = compile_template(request.content)
+        for key in request.variables:
+            if not template.occurrences(key):
                 validation_warnings.append(f"Variable '{key}' not found in prompt content")
+        rendered_content = template.render(request.variables)
 
-    # Estimate token count (rough approximation: ~4 characters per token)
-    estimated_tokens = max(1, len(rendered_content) // 4)
+    # Count tokens with the model tokenizer (falls back to an estimate without tiktoken)
+    token_counter = TokenCounter(Config().model)
+    estimated_tokens = max(1, token_counter.count(rendered_content))
 
     # Build preview metadata
     preview_metadata = {
@@ -662,6 +666,7 @@ async def preview_prompt(request: PromptPreviewRequest, db: Session = Depends(ge
         "business_type": request.business_type,
         "prompt_type": request.type,
         "generation_stage": request.generation_stage,
+        "tokenizer": token_counter.name,
         "preview_timestamp": datetime.now().isoformat()
     }
 
@@ -696,7 +701,7 @@ async def validate_prompt(prompt_id: int, db: Session = Depends(get_db)):
         warnings.append("Prompt content is very long, consider breaking it down")
 
     # Check for template variables
-    variables = re.findall(r'\{\{(\w+)\}\}', prompt.content)
+    variables = list(compile_template(prompt.content).variables)
     if variables:
         suggestions.append(f"Found {len(variables)} template variables: {', '.join(variables)}")
 
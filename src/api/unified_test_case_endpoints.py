@@ -8,6 +8,7 @@ from typing import Optional, List, Dict, Any, Tuple
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func, desc, asc
+import asyncio
 import json
 import uuid
 import logging
@@ -24,6 +25,7 @@ from ..models.unified_test_case import (
     UnifiedTestCaseListResponse, UnifiedTestCaseFilter, UnifiedTestCaseStatistics,
     UnifiedTestCaseBatchOperation, UnifiedTestCaseBatchResponse,
     UnifiedTestCaseGenerationRequest, UnifiedTestCaseGenerationResponse,
+    BulkGenerationRequest, BulkGenerationRetryRequest,
     UnifiedTestCaseStage as SchemaUnifiedTestCaseStage, UnifiedTestCaseDeleteResponse
 )
 
@@ -32,6 +34,13 @@ from ..utils.business_type_validator import validate_business_type_or_400
 # TestPointGenerator removed - using unified generation system
 from ..core.test_case_generator import TestCaseGenerator
 from ..services.sync_transaction_manager import SyncTransactionManager
+from ..services.bulk_generation import BulkGenerationService
+from ..services.generation_coalescer import generation_coalescer
+from ..services.generation_cancellation import cancellation_registry
+from ..services.generation_checkpoints import JobCheckpoints, STAGE_ITEMS, STAGE_WRITTEN
+from ..services.generation_pipeline import PointsToCasesPipeline
+from ..services.generation_worker import get_generation_worker_pool
+from ..services.job_queue import GenerationJobQueue, create_job_queue
 from ..utils.config import Config
 
 # Import the enhanced data validator and repairer
@@ -1039,13 +1048,16 @@ async def get_unified_test_case_statistics(
 @router.post("/generate", response_model=UnifiedTestCaseGenerationResponse)
 async def generate_unified(
     request: UnifiedTestCaseGenerationRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
     Unified generation endpoint supporting both test points and test cases generation.
     - test_points_only: Generate test points for a business type
     - test_cases_only: Generate test cases from existing test points
+    - points_then_cases: Generate test points and their test cases in one pipelined job
+
+    The job is stored in the durable job queue (generation_jobs) and executed by a
+    generation worker pool, in this process or in separate worker processes.
     """
     try:
         from datetime import datetime
@@ -1094,38 +1106,64 @@ async def generate_unified(
         # Generate task ID
         task_id = str(uuid.uuid4())
 
-        # Create generation job
-        job = GenerationJob(
-            id=task_id,
-            business_type=request.business_type.upper(),
-            status=JobStatus.PENDING,
-            project_id=request.project_id,
-            generation_mode=request.generation_mode,  # 添加generation_mode字段
-            created_at=datetime.now()
-        )
-        db.add(job)
-        db.commit()
+        # 相同请求正在运行时合并到已有任务，除非显式要求新建
+        coalesce_key = None
+        if not request.force_new:
+            coalesce_key = generation_coalescer.make_key(
+                request.business_type, request.project_id, request.generation_mode,
+                request.test_point_ids, request.additional_context
+            )
+            running_job = _find_coalescable_job(db, coalesce_key, task_id, request)
+            if running_job:
+                return {
+                    "generation_job_id": running_job.id,
+                    "status": running_job.status.value,
+                    "test_points_generated": running_job.test_points_generated or 0,
+                    "test_cases_generated": running_job.test_cases_generated or 0,
+                    "unified_test_cases": None,
+                    "generation_time": None,
+                    "message": f"相同的生成任务正在进行，已合并到任务: {running_job.id}"
+                }
 
-        # Start background task based on generation mode
+        # Background job arguments, stored with the job for the worker that claims it
+        job_kwargs = {
+            "business_type": request.business_type.upper(),
+            "project_id": request.project_id,
+            "additional_context": request.additional_context,
+            "use_cache": not request.bypass_cache,
+            "coalesce_key": coalesce_key
+        }
         if request.generation_mode == "test_points_only":
-            background_tasks.add_task(
-                _generate_test_points_background_unified,
-                task_id=task_id,
-                business_type=request.business_type.upper(),
-                project_id=request.project_id,
-                additional_context=request.additional_context
-            )
             message = f"测试点生成任务已创建: {task_id}"
+        elif request.generation_mode == "points_then_cases":
+            message = f"测试点和测试用例流水线生成任务已创建: {task_id}"
         else:  # test_cases_only
-            background_tasks.add_task(
-                _generate_test_cases_background_unified,
-                task_id=task_id,
+            job_kwargs["test_point_ids"] = request.test_point_ids
+            message = f"测试用例生成任务已创建: {task_id}"
+
+        try:
+            # Create generation job (enqueued as PENDING)
+            job = GenerationJob(
+                id=task_id,
                 business_type=request.business_type.upper(),
+                status=JobStatus.PENDING,
                 project_id=request.project_id,
-                test_point_ids=request.test_point_ids,
-                additional_context=request.additional_context
+                generation_mode=request.generation_mode,  # 添加generation_mode字段
+                job_payload=GenerationJobQueue.build_payload(**job_kwargs),
+                priority=request.priority,
+                created_at=datetime.now()
             )
-            message = f"测试用例生成任务已创建: {task_id}"
+            db.add(job)
+            db.commit()
+        except Exception:
+            if coalesce_key:
+                generation_coalescer.release(coalesce_key, task_id)
+            raise
+
+        # Wake up the in-process worker pool instead of waiting for its next poll
+        worker_pool = get_generation_worker_pool(Config())
+        if worker_pool:
+            worker_pool.notify()
 
         return {
             "generation_job_id": task_id,
@@ -1143,19 +1181,279 @@ async def generate_unified(
 
 
 
+def _find_coalescable_job(db, coalesce_key: str, task_id: str, request: UnifiedTestCaseGenerationRequest):
+    """
+    查找可合并的进行中任务（PENDING或RUNNING）。
+
+    合并表只在本进程内有效：inprocess模式下任务由本进程的worker执行并在结束时释放请求键，
+    未找到可合并任务时把task_id登记为该请求键的运行任务；external模式下任务在其他进程中结束，
+    本进程无法释放请求键，因此不登记，改为按任务参数中保存的请求键查找进行中的任务。
+
+    Returns:
+        可合并的任务，没有时返回None
+    """
+    from ..database.models import GenerationJob, JobStatus
+
+    active_statuses = (JobStatus.PENDING, JobStatus.RUNNING)
+    if Config().generation_worker_mode != 'inprocess':
+        candidates = db.query(GenerationJob).filter(
+            GenerationJob.business_type == request.business_type.upper(),
+            GenerationJob.project_id == request.project_id,
+            GenerationJob.generation_mode == request.generation_mode,
+            GenerationJob.status.in_(active_statuses)
+        ).order_by(GenerationJob.created_at).all()
+        for job in candidates:
+            if json.loads(job.job_payload or "{}").get("coalesce_key") == coalesce_key:
+                logger.info(f"合并重复生成请求到进行中的任务: {job.id}")
+                return job
+        return None
+
+    running_task_id, attached = generation_coalescer.attach_or_register(coalesce_key, task_id)
+    if not attached:
+        return None
+    running_job = db.query(GenerationJob).filter(GenerationJob.id == running_task_id).first()
+    if running_job and running_job.status in active_statuses:
+        return running_job
+    # 登记的任务已结束或不存在，改为登记新任务
+    generation_coalescer.release(coalesce_key, running_task_id)
+    generation_coalescer.attach_or_register(coalesce_key, task_id)
+    return None
+
+
+async def _run_coalesced_job(coalesce_key: Optional[str], job_func, **kwargs):
+    """
+    运行后台生成任务。
+
+    任务在独立的asyncio任务中运行并登记到取消登记表，取消时只中止该任务；
+    结束（完成、失败或取消）后释放请求合并键。
+    """
+    task_id = kwargs['task_id']
+    job = asyncio.ensure_future(job_func(**kwargs))
+    cancellation_registry.register(task_id, job)
+    try:
+        await job
+    except asyncio.CancelledError:
+        if not cancellation_registry.is_cancelled(task_id):
+            raise
+        logger.info(f"生成任务已取消，未保存结果: {task_id}")
+    finally:
+        cancellation_registry.unregister(task_id)
+        if coalesce_key:
+            generation_coalescer.release(coalesce_key, task_id)
+
+
+@router.post("/generate/bulk", response_model=Dict[str, Any])
+async def generate_bulk_unified(request: BulkGenerationRequest):
+    """
+    Project-wide bulk generation across all active business types.
+
+    A parent job is created together with one queued child job per business type.
+    Children run on the generation workers (at most GENERATION_BULK_CONCURRENCY of them
+    at a time) and the parent task_id reports the aggregate progress, also over the
+    websocket of the parent task.
+    """
+    try:
+        from .dependencies import get_database_manager
+
+        bulk_service = BulkGenerationService(get_database_manager())
+        try:
+            created = await asyncio.to_thread(
+                bulk_service.create_bulk_job,
+                project_id=request.project_id,
+                generation_mode=request.generation_mode,
+                business_types=request.business_types,
+                additional_context=request.additional_context,
+                use_cache=not request.bypass_cache
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        worker_pool = get_generation_worker_pool(Config())
+        if worker_pool:
+            worker_pool.notify()
+
+        return {
+            "task_id": created["task_id"],
+            "status": "pending",
+            "children": created["children"],
+            "message": f"批量生成任务已创建: {len(created['children'])} 个业务类型"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"创建批量生成任务失败: {str(e)}")
+
+
+@router.get("/generate/bulk/status/{task_id}", response_model=Dict[str, Any])
+async def get_bulk_generation_status(task_id: str):
+    """Get the aggregate progress of a bulk generation job (done/failed/running per business type)."""
+    try:
+        from .dependencies import get_database_manager
+
+        bulk_service = BulkGenerationService(get_database_manager())
+        progress = await asyncio.to_thread(bulk_service.progress, task_id)
+        if progress is None:
+            raise HTTPException(status_code=404, detail="批量任务未找到")
+        return progress
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取批量任务状态失败: {str(e)}")
+
+
+@router.post("/generate/bulk/{task_id}/retry", response_model=Dict[str, Any])
+async def retry_bulk_generation(task_id: str, request: Optional[BulkGenerationRetryRequest] = None):
+    """Re-queue the failed (or cancelled) business types of a bulk generation job."""
+    try:
+        from .dependencies import get_database_manager
+
+        bulk_service = BulkGenerationService(get_database_manager())
+        if await asyncio.to_thread(bulk_service.progress, task_id) is None:
+            raise HTTPException(status_code=404, detail="批量任务未找到")
+
+        business_types = request.business_types if request else None
+        retried = await asyncio.to_thread(bulk_service.retry_failed, task_id, business_types)
+        if retried:
+            worker_pool = get_generation_worker_pool(Config())
+            if worker_pool:
+                worker_pool.notify()
+
+        return {
+            "task_id": task_id,
+            "retried_jobs": retried,
+            "message": f"已重新排队 {len(retried)} 个业务类型"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"重试批量任务失败: {str(e)}")
+
+
+@router.post("/generate/cancel/{task_id}", response_model=Dict[str, Any])
+async def cancel_generation_unified(task_id: str, db: Session = Depends(get_db)):
+    """
+    Cancel a pending or running generation task.
+
+    The job is marked as cancelled and its running coroutine is aborted: the in-flight
+    LLM request is dropped and no results are written.
+    """
+    try:
+        from ..database.models import JobStatus
+        from ..websocket.notifier import notifier
+
+        job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="任务未找到")
+        if job.status not in (JobStatus.PENDING, JobStatus.RUNNING):
+            raise HTTPException(status_code=409, detail=f"任务已结束，无法取消: {job.status.value}")
+
+        job.status = JobStatus.CANCELLED
+        job.completed_at = datetime.now()
+        db.commit()
+
+        aborted = cancellation_registry.cancel(task_id)
+        if BulkGenerationService.is_bulk_job(job):
+            # Cancelling a bulk job cancels its unfinished per-business-type jobs
+            from .dependencies import get_database_manager
+            bulk_service = BulkGenerationService(get_database_manager())
+            for child_id in await asyncio.to_thread(bulk_service.cancel_children, task_id):
+                aborted = cancellation_registry.cancel(child_id) or aborted
+            await asyncio.to_thread(bulk_service.refresh_parent, task_id)
+        try:
+            await notifier.notify_task_cancelled(task_id)
+        except Exception as e:
+            logger.warning(f"推送任务取消通知失败 (task {task_id}): {e}")
+
+        return {
+            "task_id": task_id,
+            "status": JobStatus.CANCELLED.value,
+            "aborted_running_task": aborted,
+            "message": "任务已取消"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"取消任务失败: {str(e)}")
+
+
+@router.post("/generate/resume/{task_id}", response_model=Dict[str, Any])
+async def resume_generation_unified(task_id: str, db: Session = Depends(get_db)):
+    """
+    Resume a failed or cancelled generation task from its checkpoints.
+
+    The task is queued again under the same task_id; steps with a checkpoint (resolved
+    prompts, raw LLM responses, extracted items, written results) are not repeated, so
+    only the unfinished test case batches call the LLM again. Resuming a bulk task
+    re-queues its failed business types.
+    """
+    try:
+        from ..database.models import JobStatus
+        from .dependencies import get_database_manager
+
+        job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="任务未找到")
+        if job.status not in (JobStatus.FAILED, JobStatus.CANCELLED):
+            raise HTTPException(status_code=409, detail=f"只能恢复失败或已取消的任务: {job.status.value}")
+
+        if BulkGenerationService.is_bulk_job(job):
+            bulk_service = BulkGenerationService(get_database_manager())
+            resumed = await asyncio.to_thread(bulk_service.retry_failed, task_id)
+            checkpoint_summary = None
+        else:
+            if job.job_payload is None:
+                raise HTTPException(status_code=400, detail="任务缺少执行参数，无法恢复")
+            job.status = JobStatus.PENDING
+            job.error_message = None
+            job.completed_at = None
+            job.worker_id = None
+            job.lease_expires_at = None
+            job.attempts = 0
+            # Clear a cancel flag left from cancelling the job while it was queued
+            cancellation_registry.reset(task_id)
+            db.commit()
+            resumed = [task_id]
+            checkpoint_summary = await asyncio.to_thread(
+                JobCheckpoints(get_database_manager(), task_id).summary
+            )
+
+        worker_pool = get_generation_worker_pool(Config())
+        if worker_pool:
+            worker_pool.notify()
+
+        return {
+            "task_id": task_id,
+            "status": JobStatus.PENDING.value if resumed else job.status.value,
+            "resumed_jobs": resumed,
+            "checkpoints": checkpoint_summary,
+            "message": "任务已重新排队，将从检查点继续" if resumed else "没有需要恢复的子任务"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"恢复任务失败: {str(e)}")
+
+
 @router.get("/generate/status/{task_id}", response_model=Dict[str, Any])
 async def get_generation_status_unified(task_id: str, db: Session = Depends(get_db)):
     """
     Get the status of a generation task.
+
+    Queued tasks include an admission estimate (queue position and expected start).
     """
     try:
-        from ..database.models import GenerationJob
+        from ..database.models import GenerationJob, JobStatus
 
         job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
         if not job:
             raise HTTPException(status_code=404, detail="任务未找到")
 
-        return {
+        status = {
             "task_id": task_id,
             "status": job.status.value,
             "business_type": _get_business_type_value(job.business_type),
@@ -1166,6 +1464,18 @@ async def get_generation_status_unified(task_id: str, db: Session = Depends(get_
             "completed_at": job.completed_at.isoformat() if job.completed_at else None
         }
 
+        # Queued jobs report their position and estimated start from the fair-share scheduler
+        if job.status == JobStatus.PENDING:
+            from .dependencies import get_database_manager
+            queue = create_job_queue(Config(), get_database_manager())
+            try:
+                status["admission"] = await asyncio.to_thread(queue.admission_estimate, task_id)
+            except Exception as e:
+                logger.warning(f"估算任务开始时间失败 (task {task_id}): {e}")
+                status["admission"] = None
+
+        return status
+
     except HTTPException:
         raise
     except Exception as e:
@@ -1211,7 +1521,7 @@ async def _generate_test_points_sync_unified(
 
         # Generate test points using unified generation service
         logger.info(f"Calling generation service for task {task_id}")
-        generation_response = generator_service.generate_test_points(
+        generation_response = await generator_service.agenerate_test_points(
             business_type=business_type,
             additional_context=additional_context or {},
             save_to_database=False,
@@ -1510,11 +1820,166 @@ def _batch_check_existing_ids(test_case_ids: List[str], business_type: str, proj
 # BACKGROUND TASK FUNCTIONS
 # ========================================
 
+def _save_generated_test_point(
+    db,
+    point_data: Dict[str, Any],
+    index: int,
+    business_type: str,
+    project_id: int,
+    task_id: str
+) -> Dict[str, Any]:
+    """
+    Add one generated test point to the unified table, skipping duplicates by name.
+
+    Returns:
+        Processing record with original/final IDs and the row id; action is
+        'skipped_duplicate' when a test point with the same name already exists
+        (names are unique per business type, the row may belong to another project).
+    """
+    # Extract basic data from test point
+    original_id = point_data.get('test_case_id') or point_data.get('id') or f'TP{str(index+1).zfill(3)}'
+    title = point_data.get('title', point_data.get('name', f'测试点 {index+1}'))
+    description = point_data.get('description', '')
+
+    # Ensure ID uniqueness
+    unique_id = _ensure_unique_test_case_id(original_id, business_type, project_id, db)
+
+    # Track ID conflicts
+    if unique_id != original_id:
+        logger.info(f"测试点ID冲突处理: {original_id} -> {unique_id}")
+
+    # Check for duplicate test case by business_type and name
+    existing_test_point = db.query(UnifiedTestCase).filter(
+        UnifiedTestCase.business_type == business_type,
+        UnifiedTestCase.name == title
+    ).first()
+
+    if existing_test_point:
+        logger.info(f"跳过重复的测试点: {title} (ID: {existing_test_point.id})")
+        # Still record in processing results for tracking
+        return {
+            'id': existing_test_point.id,
+            'original_id': original_id,
+            'final_id': existing_test_point.test_case_id,
+            'was_conflicted': unique_id != original_id,
+            'name': title,
+            'action': 'skipped_duplicate'
+        }
+
+    # Create test point record with clean data
+    test_point = UnifiedTestCase(
+        project_id=project_id,
+        business_type=business_type,
+        test_case_id=unique_id,
+        name=title,
+        description=description,
+        status=UnifiedTestCaseStatus.DRAFT,
+        priority='medium',
+        # Test points don't have execution details
+        preconditions=None,
+        steps=None,
+        entity_order=float(index + 1),
+        generation_job_id=task_id
+    )
+
+    db.add(test_point)
+    db.flush()
+
+    return {
+        'id': test_point.id,
+        'original_id': original_id,
+        'final_id': unique_id,
+        'was_conflicted': unique_id != original_id,
+        'name': title
+    }
+
+
+def _build_stream_item_handler(
+    task_id: str,
+    stage: str,
+    business_type: str,
+    project_id: int,
+    persist_items: bool = False
+):
+    """
+    Build the on_item callback used by streaming generation.
+
+    Every completed item is pushed to websocket subscribers of the task; test
+    points can additionally be saved right away (the final save pass skips
+    them as duplicates by name).
+    """
+    from ..websocket.notifier import notifier
+    from .dependencies import get_database_manager
+
+    db_manager = get_database_manager()
+
+    def persist_test_point(item: Dict[str, Any], index: int):
+        with db_manager.get_session() as db:
+            _save_generated_test_point(db, item, index, business_type, project_id, task_id)
+            db.commit()
+
+    async def on_item(key: str, index: int, item: Dict[str, Any]):
+        try:
+            await notifier.notify_item_generated(task_id, stage, index, item)
+        except Exception as e:
+            logger.warning(f"推送流式生成元素失败 (task {task_id}, index {index}): {e}")
+
+        if persist_items and key == 'test_points':
+            try:
+                await asyncio.to_thread(persist_test_point, item, index)
+            except Exception as e:
+                logger.warning(f"流式保存测试点失败 (task {task_id}, index {index}): {e}")
+
+    return on_item
+
+
+def _convert_test_point_to_case(test_point: UnifiedTestCase, case_data: Dict[str, Any]) -> None:
+    """Convert a test point to a test case by adding the generated execution details."""
+    test_point.steps = _serialize_json_field(case_data.get('steps', []))
+    test_point.preconditions = _serialize_json_field(case_data.get('preconditions', []))
+    test_point.module = case_data.get('module', '')
+    test_point.functional_module = case_data.get('functional_module', '')
+    test_point.functional_domain = case_data.get('functional_domain', '')
+
+    # Enhanced remarks handling - preserve validation info
+    existing_remarks = test_point.remarks or ''
+    validation_remarks = case_data.get('remarks', '')
+    if validation_remarks and '[自动修复]' in validation_remarks:
+        # Add validation info to remarks
+        combined_remarks = f"{existing_remarks} | {validation_remarks}" if existing_remarks else validation_remarks
+        test_point.remarks = combined_remarks
+    else:
+        test_point.remarks = existing_remarks or validation_remarks or ''
+
+
+def _complete_job_from_checkpoint(db_manager, checkpoints: JobCheckpoints, result_data: Dict[str, Any]):
+    """
+    Mark a generation job as completed with its written results and drop its checkpoints.
+
+    Also used when a resumed job finds a 'written' checkpoint: the results were saved by
+    the previous run, which stopped before marking the job as completed.
+    """
+    from ..database.models import JobStatus
+
+    with db_manager.get_session() as db:
+        job = db.query(GenerationJob).filter(GenerationJob.id == checkpoints.task_id).first()
+        if job:
+            job.status = JobStatus.COMPLETED
+            job.completed_at = datetime.now()
+            job.result_data = json.dumps(result_data, ensure_ascii=False)
+            db.commit()
+    try:
+        checkpoints.clear()
+    except Exception as e:
+        logger.warning(f"清理检查点失败 (task {checkpoints.task_id}): {e}")
+
+
 async def _generate_test_points_background_unified(
     task_id: str,
     business_type: str,
     project_id: int,
-    additional_context: Optional[str] = None
+    additional_context: Optional[str] = None,
+    use_cache: bool = True
 ):
     """Background task for generating test points in unified system."""
     logger.info(f"🚀 BACKGROUND TASK STARTING: test_points generation for {business_type}, task_id: {task_id}")
@@ -1523,7 +1988,7 @@ async def _generate_test_points_background_unified(
     from ..database.models import GenerationJob, JobStatus, UnifiedTestCase
     from datetime import datetime
     import json
-    from .dependencies import get_database_manager, get_unified_generation_service
+    from .dependencies import get_database_manager, get_unified_generation_service, get_config
 
     # Import AI logger for test_points generation
     try:
@@ -1535,6 +2000,16 @@ async def _generate_test_points_background_unified(
     # Get shared instances to avoid resource duplication
     db_manager = get_database_manager()
     generator_service = get_unified_generation_service()
+    config = get_config()
+    checkpoints = JobCheckpoints(db_manager, task_id)
+
+    # 流式模式下，每个测试点生成完成即推送（并可选立即保存）
+    on_item = None
+    if config.llm_streaming_enabled:
+        on_item = _build_stream_item_handler(
+            task_id, 'test_point', business_type, project_id,
+            persist_items=config.llm_stream_persist_items
+        )
 
     # Initialize AI logger for test_points generation
     ai_logger = None
@@ -1550,6 +2025,7 @@ async def _generate_test_points_background_unified(
 
     # Update job status to running using dedicated database session
     try:
+        cancellation_registry.raise_if_cancelled(task_id)
         with db_manager.get_session() as db:
             job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
             if job:
@@ -1558,28 +2034,51 @@ async def _generate_test_points_background_unified(
                 job.step_description = "开始生成测试点..."
                 db.commit()
 
-        # Generate test points using unified generation service
-        logger.info(f"Starting test points generation for business_type: {business_type}, project_id: {project_id}")
-        generation_response = generator_service.generate_test_points(
-            business_type=business_type,
-            additional_context=additional_context or {},
-            save_to_database=False,
-            project_id=project_id,
-            task_id=task_id,
-            ai_logger=ai_logger
-        )
+        # A previous run already wrote the results: only the completion mark is missing
+        written = await checkpoints.aload(STAGE_WRITTEN)
+        if written is not None:
+            logger.info(f"Test points of task {task_id} already written, completing from checkpoint")
+            await asyncio.to_thread(_complete_job_from_checkpoint, db_manager, checkpoints, written)
+            try:
+                ai_logger.finalize_session(success=True)
+            except Exception as log_error:
+                logger.error(f"Failed to finalize AI logging session: {log_error}")
+            return
+
+        test_points_list = await checkpoints.aload(STAGE_ITEMS)
+        if test_points_list is not None:
+            logger.info(f"Resuming task {task_id} with {len(test_points_list)} checkpointed test points")
+        else:
+            # Generate test points using unified generation service
+            logger.info(f"Starting test points generation for business_type: {business_type}, project_id: {project_id}")
+            generation_response = await generator_service.agenerate_test_points(
+                business_type=business_type,
+                additional_context=additional_context or {},
+                save_to_database=False,
+                project_id=project_id,
+                task_id=task_id,
+                ai_logger=ai_logger,
+                on_item=on_item,
+                use_cache=use_cache,
+                checkpoints=checkpoints,
+                complete_job=False  # completed below, after the test points are saved
+            )
 
-        # Check if generation was successful and extract test points
-        if not generation_response.success:
-            raise RuntimeError(f"测试点生成失败: {generation_response.message}")
+            # Check if generation was successful and extract test points
+            if not generation_response.success:
+                raise RuntimeError(f"测试点生成失败: {generation_response.message}")
 
-        # Extract test points list directly from GenerationResponse.result.generated_items
-        generation_result = generation_response.result
-        if not generation_result or not generation_result.generated_items:
-            raise RuntimeError("测试点生成结果为空")
+            # Extract test points list directly from GenerationResponse.result.generated_items
+            generation_result = generation_response.result
+            if not generation_result or not generation_result.generated_items:
+                raise RuntimeError("测试点生成结果为空")
 
-        test_points_list = generation_result.generated_items
-        logger.info(f"Successfully obtained {len(test_points_list)} test points from generation service")
+            test_points_list = generation_result.generated_items
+            logger.info(f"Successfully obtained {len(test_points_list)} test points from generation service")
+            await checkpoints.asave(STAGE_ITEMS, test_points_list)
+
+        # 写库前确认任务未被取消
+        cancellation_registry.raise_if_cancelled(task_id)
 
         # Save test points to unified table with simplified logic
         test_point_count = 0
@@ -1590,96 +2089,51 @@ async def _generate_test_points_background_unified(
             # Process each test point with simplified logic
             for i, point_data in enumerate(test_points_list):
                 try:
-                    # Extract basic data from test point
-                    original_id = point_data.get('test_case_id') or point_data.get('id') or f'TP{str(i+1).zfill(3)}'
-                    title = point_data.get('title', point_data.get('name', f'测试点 {i+1}'))
-                    description = point_data.get('description', '')
-
-                    # Ensure ID uniqueness
-                    unique_id = _ensure_unique_test_case_id(original_id, business_type, project_id, db)
-
-                    # Track ID conflicts
-                    if unique_id != original_id:
+                    record = _save_generated_test_point(db, point_data, i, business_type, project_id, task_id)
+                    processed_test_points.append(record)
+                    if record['was_conflicted']:
                         id_conflict_count += 1
-                        logger.info(f"测试点ID冲突处理: {original_id} -> {unique_id}")
-
-                    # Check for duplicate test case by business_type and name
-                    existing_test_point = db.query(UnifiedTestCase).filter(
-                        UnifiedTestCase.business_type == business_type,
-                        UnifiedTestCase.name == title
-                    ).first()
-
-                    if existing_test_point:
-                        logger.info(f"跳过重复的测试点: {title} (ID: {existing_test_point.id})")
-                        # Still record in processing results for tracking
-                        processed_test_points.append({
-                            'original_id': original_id,
-                            'final_id': existing_test_point.test_case_id,
-                            'was_conflicted': unique_id != original_id,
-                            'name': title,
-                            'action': 'skipped_duplicate'
-                        })
-                        continue  # Skip to next test point
-
-                    # Create test point record with clean data
-                    test_point = UnifiedTestCase(
-                        project_id=project_id,
-                        business_type=business_type,
-                        test_case_id=unique_id,
-                        name=title,
-                        description=description,
-                        status='draft',
-                        priority='medium',
-                        # Test points don't have execution details
-                        preconditions=None,
-                        steps=None,
-                        entity_order=float(i + 1),
-                        generation_job_id=task_id
-                    )
-
-                    db.add(test_point)
-                    test_point_count += 1
-
-                    # Record processing result
-                    processed_test_points.append({
-                        'original_id': original_id,
-                        'final_id': unique_id,
-                        'was_conflicted': unique_id != original_id,
-                        'name': title
-                    })
+                    if record.get('action') != 'skipped_duplicate':
+                        test_point_count += 1
 
                 except Exception as e:
                     logger.error(f"处理测试点时出错 (索引 {i}): {str(e)}")
                     continue  # Continue processing other test points
 
+            result_data = {
+                "test_points_generated": test_point_count,
+                "project_id": project_id,
+                "id_conflicts_resolved": id_conflict_count,
+                "processing_details": {
+                    "total_processed": len(test_points_list),
+                    "successful": test_point_count,
+                    "conflicts_resolved": id_conflict_count
+                }
+            }
+            # Record the write in the same transaction so a resumed job never writes twice
+            checkpoints.save(STAGE_WRITTEN, result_data, db=db)
+
             # Commit all changes
             db.commit()
             logger.info(f"测试点生成完成，成功保存 {test_point_count} 个测试点")
 
         # Update job status to completed
-        with db_manager.get_session() as db:
-            job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
-            if job:
-                job.status = JobStatus.COMPLETED
-                job.completed_at = datetime.now()
-                job.result_data = json.dumps({
-                    "test_points_generated": test_point_count,
-                    "project_id": project_id,
-                    "id_conflicts_resolved": id_conflict_count,
-                    "processing_details": {
-                        "total_processed": len(test_points_list),
-                        "successful": test_point_count,
-                        "conflicts_resolved": id_conflict_count
-                    }
-                }, ensure_ascii=False)
-                db.commit()
+        await asyncio.to_thread(_complete_job_from_checkpoint, db_manager, checkpoints, result_data)
 
-                # Finalize AI logging with success
-                try:
-                    ai_logger.finalize_session(success=True)
-                except Exception as log_error:
-                    logger.error(f"Failed to finalize AI logging session: {log_error}")
+        # Finalize AI logging with success
+        try:
+            ai_logger.finalize_session(success=True)
+        except Exception as log_error:
+            logger.error(f"Failed to finalize AI logging session: {log_error}")
 
+    except asyncio.CancelledError:
+        logger.info(f"Background task {task_id} cancelled, skipping result persistence")
+        if ai_logger:
+            try:
+                ai_logger.finalize_session(success=False, error_message="任务已取消")
+            except Exception as log_error:
+                logger.error(f"Failed to finalize AI logging session: {log_error}")
+        raise
     except Exception as e:
         # Enhanced error logging with full traceback
         logger.error(f"Background task {task_id} failed with error: {str(e)}", exc_info=True)
@@ -1717,7 +2171,8 @@ async def _generate_test_cases_background_unified(
     business_type: str,
     project_id: int,
     test_point_ids: Optional[List[int]],
-    additional_context: Optional[str] = None
+    additional_context: Optional[str] = None,
+    use_cache: bool = True
 ):
     """Background task for generating test cases from test points in unified system."""
     logger.info(f"🚀 BACKGROUND TASK STARTING: test_cases generation for {business_type}, task_id: {task_id}")
@@ -1726,12 +2181,18 @@ async def _generate_test_cases_background_unified(
     from ..database.models import GenerationJob, JobStatus
     from datetime import datetime
     import json
-    from .dependencies import get_database_manager, get_test_case_generator
+    from .dependencies import get_database_manager, get_test_case_generator, get_config
     from ..utils.ai_logger import AILoggerManager
 
     # Get shared instances to avoid resource duplication
     db_manager = get_database_manager()
     generator = get_test_case_generator()
+    checkpoints = JobCheckpoints(db_manager, task_id)
+
+    # 流式模式下，每个测试用例生成完成即推送；保存仍由下方的智能匹配统一完成
+    on_item = None
+    if get_config().llm_streaming_enabled:
+        on_item = _build_stream_item_handler(task_id, 'test_case', business_type, project_id)
 
     # Create AI logger for this task
     ai_logger = AILoggerManager.create_logger(task_id, business_type, project_id)
@@ -1741,6 +2202,7 @@ async def _generate_test_cases_background_unified(
 
     # Update job status to running using dedicated database session
     try:
+        cancellation_registry.raise_if_cancelled(task_id)
         with db_manager.get_session() as db:
             job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
             if job:
@@ -1749,6 +2211,17 @@ async def _generate_test_cases_background_unified(
                 job.step_description = "开始基于测试点生成测试用例..."
                 db.commit()
 
+        # A previous run already converted the test points: only the completion mark is missing
+        written = await checkpoints.aload(STAGE_WRITTEN)
+        if written is not None:
+            logger.info(f"Test cases of task {task_id} already written, completing from checkpoint")
+            await asyncio.to_thread(_complete_job_from_checkpoint, db_manager, checkpoints, written)
+            try:
+                ai_logger.finalize_session(success=True)
+            except Exception as log_error:
+                logger.error(f"Failed to finalize AI logging session: {log_error}")
+            return
+
         # Get test points
         with db_manager.get_session() as db:
             test_points = db.query(UnifiedTestCase).filter(
@@ -1785,21 +2258,61 @@ async def _generate_test_cases_background_unified(
             "test_point_ids": test_point_ids
         })
 
+        # 按批次报告进度：每完成一个批次更新任务进度（10% ~ 80%）
+        def update_batch_progress(completed: int, total: int, batch_index: int, cases_count: int):
+            with db_manager.get_session() as db:
+                job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
+                if job:
+                    job.total_steps = total
+                    job.current_step = completed
+                    job.progress = 10 + int(70 * completed / total)
+                    job.step_description = f"已完成 {completed}/{total} 批测试用例生成（第{batch_index + 1}批 {cases_count} 个）"
+                    db.commit()
+
+        async def on_batch_complete(completed: int, total: int, batch_index: int, cases_count: int):
+            try:
+                await asyncio.to_thread(update_batch_progress, completed, total, batch_index, cases_count)
+            except Exception as e:
+                logger.warning(f"更新批次进度失败 (task {task_id}): {e}")
+
+        cancellation_registry.raise_if_cancelled(task_id)
+
         # Generate test cases from test points
         # Fix: Pass test_point_ids to enable template variable resolution
-        test_cases_data = generator.generate_test_cases_from_external_points(
+        # 测试点较多时分批并发生成，合并结果后由下方的智能匹配步骤按 test_point_id 写库
+        # （部分批次失败时按位置写库会把用例写到错误的测试点上）
+        test_cases_data = await generator.agenerate_test_cases_in_batches(
             business_type=business_type,
             test_points_data=test_points_data,
             additional_context=additional_context or {},
-            save_to_db=True,
+            save_to_db=False,
             project_id=project_id,
             test_point_ids=test_point_ids,
-            ai_logger=ai_logger
+            ai_logger=ai_logger,
+            on_item=on_item,
+            on_batch_complete=on_batch_complete,
+            use_cache=use_cache,
+            checkpoints=checkpoints
         )
 
         if not test_cases_data:
             raise RuntimeError("基于测试点的测试用例生成失败")
 
+        cancellation_registry.raise_if_cancelled(task_id)
+
+        # 记录每批提示词的token预算到任务元数据
+        token_budgets = test_cases_data.get('generation_metadata', {}).get('token_budgets') \
+            if isinstance(test_cases_data, dict) else None
+        if token_budgets:
+            def save_token_budgets():
+                from ..database.operations import DatabaseOperations
+                with db_manager.get_session() as db:
+                    DatabaseOperations(db).merge_job_metadata(task_id, {'token_budgets': token_budgets})
+            try:
+                await asyncio.to_thread(save_token_budgets)
+            except Exception as e:
+                logger.warning(f"记录token预算失败 (task {task_id}): {e}")
+
         # Enhanced data validation and repair
         validator = DataValidatorRepairer()
 
@@ -1816,6 +2329,9 @@ async def _generate_test_cases_background_unified(
         logger.info(f"Test case validation complete: {validation_summary['total_cases_processed']} cases, "
                    f"success rate: {validation_summary['success_rate']:.1f}%")
 
+        # 写库前确认任务未被取消
+        cancellation_registry.raise_if_cancelled(task_id)
+
         # Save test cases to unified table with enhanced error handling
         test_case_count = 0
         failed_cases = 0
@@ -1938,21 +2454,7 @@ async def _generate_test_cases_background_unified(
 
                     # Convert test point to test case by adding execution details
                     # Use validated and repaired data
-                    test_point.steps = _serialize_json_field(case_data.get('steps', []))
-                    test_point.preconditions = _serialize_json_field(case_data.get('preconditions', []))
-                    test_point.module = case_data.get('module', '')
-                    test_point.functional_module = case_data.get('functional_module', '')
-                    test_point.functional_domain = case_data.get('functional_domain', '')
-
-                    # Enhanced remarks handling - preserve validation info
-                    existing_remarks = test_point.remarks or ''
-                    validation_remarks = case_data.get('remarks', '')
-                    if validation_remarks and '[自动修复]' in validation_remarks:
-                        # Add validation info to remarks
-                        combined_remarks = f"{existing_remarks} | {validation_remarks}" if existing_remarks else validation_remarks
-                        test_point.remarks = combined_remarks
-                    else:
-                        test_point.remarks = existing_remarks or validation_remarks or ''
+                    _convert_test_point_to_case(test_point, case_data)
 
                     test_case_count += 1
                     logger.info(f"✅ 成功转换测试点为测试用例: {test_point.test_case_id}")
@@ -1967,6 +2469,19 @@ async def _generate_test_cases_background_unified(
                 failed_cases += len(unmatched_test_cases)
                 logger.warning(f"⚠️  跳过 {len(unmatched_test_cases)} 个未匹配的测试用例，不会创建新的测试用例记录")
 
+            result_data = {
+                "test_cases_generated": test_case_count,
+                "test_points_used": len(test_points),
+                "failed_cases": failed_cases,
+                "processing_details": {
+                    "total_test_cases": len(test_cases_list),
+                    "successful": test_case_count,
+                    "failed": failed_cases
+                }
+            }
+            # Record the write in the same transaction so a resumed job never writes twice
+            checkpoints.save(STAGE_WRITTEN, result_data, db=db)
+
             db.commit()
 
             # 记录处理结果
@@ -1974,23 +2489,15 @@ async def _generate_test_cases_background_unified(
                 logger.info(f"测试用例生成完成，成功转换 {test_case_count} 个测试用例，失败 {failed_cases} 个")
 
         # Update job completion with detailed processing results
-        with db_manager.get_session() as db:
-            job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
-            if job:
-                job.status = JobStatus.COMPLETED
-                job.completed_at = datetime.now()
-                job.result_data = json.dumps({
-                    "test_cases_generated": test_case_count,
-                    "test_points_used": len(test_points),
-                    "failed_cases": failed_cases,
-                    "processing_details": {
-                        "total_test_cases": len(test_cases_list),
-                        "successful": test_case_count,
-                        "failed": failed_cases
-                    }
-                }, ensure_ascii=False)
-                db.commit()
+        await asyncio.to_thread(_complete_job_from_checkpoint, db_manager, checkpoints, result_data)
 
+    except asyncio.CancelledError:
+        logger.info(f"Background test case generation task {task_id} cancelled, skipping result persistence")
+        try:
+            ai_logger.finalize_session(success=False, error_message="任务已取消")
+        except Exception as log_error:
+            logger.error(f"Failed to finalize AI logging session: {log_error}")
+        raise
     except Exception as e:
         # Enhanced error logging with full traceback
         logger.error(f"Background test case generation task {task_id} failed with error: {str(e)}", exc_info=True)
@@ -2020,6 +2527,229 @@ async def _generate_test_cases_background_unified(
 
 
 
+async def _generate_points_then_cases_background_unified(
+    task_id: str,
+    business_type: str,
+    project_id: int,
+    additional_context: Optional[str] = None,
+    use_cache: bool = True
+):
+    """
+    Background task for the pipelined points_then_cases mode.
+
+    Test points are always generated with streaming. Each parsed test point is saved at
+    once and handed to a PointsToCasesPipeline, which starts test case generation for
+    every full batch while stage 1 is still producing later test points.
+    """
+    logger.info(f"🚀 BACKGROUND TASK STARTING: points_then_cases pipeline for {business_type}, task_id: {task_id}")
+
+    from ..database.models import JobStatus
+    from .dependencies import get_database_manager, get_unified_generation_service, get_test_case_generator, get_config
+    from ..utils.ai_logger import AILoggerManager
+    from ..websocket.notifier import notifier
+
+    db_manager = get_database_manager()
+    generator_service = get_unified_generation_service()
+    generator = get_test_case_generator()
+    config = get_config()
+    checkpoints = JobCheckpoints(db_manager, task_id)
+    ai_logger = AILoggerManager.create_logger(task_id, business_type, project_id)
+    start_time = time.time()
+    counts = {"test_points_generated": 0, "test_cases_generated": 0, "failed_cases": 0, "completed_batches": 0,
+              "streamed_points": 0}
+
+    def update_step(description: str):
+        with db_manager.get_session() as db:
+            job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
+            if job:
+                job.step_description = description
+                job.test_points_generated = counts["test_points_generated"]
+                job.test_cases_generated = counts["test_cases_generated"]
+                db.commit()
+
+    def save_point(item: Dict[str, Any], index: int) -> Optional[Dict[str, Any]]:
+        """Save one test point; returns it for stage 2 unless it already has a test case."""
+        with db_manager.get_session() as db:
+            record = _save_generated_test_point(db, item, index, business_type, project_id, task_id)
+            db.commit()
+            if record.get('action') != 'skipped_duplicate':
+                counts["test_points_generated"] += 1
+            test_point = db.query(UnifiedTestCase).filter(
+                UnifiedTestCase.id == record['id'],
+                UnifiedTestCase.project_id == project_id
+            ).first()
+            if not test_point or test_point.steps is not None:
+                return None
+            return {
+                "id": test_point.id,
+                "test_case_id": test_point.test_case_id,
+                "title": test_point.name,
+                "description": test_point.description,
+                "priority": test_point.priority
+            }
+
+    def apply_cases(batch: List[Dict[str, Any]], result: Dict[str, Any]) -> Tuple[int, int]:
+        """Convert the batch's test points with the generated cases (by test_point_id, then by position)."""
+        validated_cases = JSONExtractor.extract_test_cases_from_json(result, validate_and_repair=True)
+        converted = failed = 0
+        with db_manager.get_session() as db:
+            test_points = {tp.id: tp for tp in db.query(UnifiedTestCase).filter(
+                UnifiedTestCase.id.in_([tp['id'] for tp in batch])
+            ).all()}
+            matched = set()
+            for i, case_data in enumerate(validated_cases):
+                test_point = test_points.get(case_data.get('test_point_id') or case_data.get('id'))
+                if test_point is None and i < len(batch):
+                    test_point = test_points.get(batch[i]['id'])
+                if test_point is None or test_point.id in matched:
+                    failed += 1
+                    continue
+                matched.add(test_point.id)
+                _convert_test_point_to_case(test_point, case_data)
+                converted += 1
+            db.commit()
+        return converted, failed
+
+    async def run_batch(batch_index: int, batch: List[Dict[str, Any]]) -> Optional[int]:
+        cancellation_registry.raise_if_cancelled(task_id)
+        batch_ids = [tp['id'] for tp in batch]
+        result = await generator.agenerate_test_cases_from_external_points(
+            business_type, {'test_points': batch}, additional_context or {}, False,
+            project_id, batch_ids, ai_logger, None, use_cache
+        )
+        if not result:
+            logger.error(f"流水线第 {batch_index + 1} 批测试用例生成失败 (task {task_id})")
+            return None
+        cases = result.get('test_cases', [])
+        if isinstance(cases, list):
+            generator._assign_batch_test_point_ids(cases, batch_ids)
+
+        # 写库前确认任务未被取消
+        cancellation_registry.raise_if_cancelled(task_id)
+        converted, failed = await asyncio.to_thread(apply_cases, batch, result)
+        counts["test_cases_generated"] += converted
+        counts["failed_cases"] += failed
+        counts["completed_batches"] += 1
+        try:
+            await asyncio.to_thread(
+                update_step,
+                f"已生成 {counts['test_points_generated']} 个测试点，完成 {counts['completed_batches']} 批测试用例"
+            )
+        except Exception as e:
+            logger.warning(f"更新流水线进度失败 (task {task_id}): {e}")
+        return converted
+
+    pipeline = PointsToCasesPipeline(
+        run_batch,
+        batch_size=config.test_case_batch_size,
+        concurrency=config.test_case_batch_concurrency
+    )
+
+    async def on_item(key: str, index: int, item: Dict[str, Any]):
+        try:
+            await notifier.notify_item_generated(task_id, 'test_point', index, item)
+        except Exception as e:
+            logger.warning(f"推送流式生成元素失败 (task {task_id}, index {index}): {e}")
+        try:
+            test_point = await asyncio.to_thread(save_point, item, index)
+        except Exception as e:
+            logger.warning(f"流式保存测试点失败 (task {task_id}, index {index}): {e}")
+            return
+        counts["streamed_points"] += 1
+        if test_point:
+            pipeline.add(test_point)
+
+    try:
+        cancellation_registry.raise_if_cancelled(task_id)
+        with db_manager.get_session() as db:
+            job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
+            if job:
+                job.status = JobStatus.RUNNING
+                job.current_step = 1
+                job.step_description = "开始流水线生成测试点和测试用例..."
+                db.commit()
+
+        generation_response = await generator_service.agenerate_test_points(
+            business_type=business_type,
+            additional_context=additional_context or {},
+            save_to_database=False,
+            project_id=project_id,
+            task_id=task_id,
+            ai_logger=ai_logger,
+            on_item=on_item,
+            use_cache=use_cache,
+            checkpoints=checkpoints,
+            complete_job=False  # the job stays RUNNING (and keeps its lease) until stage 2 finishes
+        )
+        if not generation_response.success:
+            raise RuntimeError(f"测试点生成失败: {generation_response.message}")
+        generation_result = generation_response.result
+        if not generation_result or not generation_result.generated_items:
+            raise RuntimeError("测试点生成结果为空")
+
+        # 流式回调未覆盖全部测试点时（如使用检查点中的响应，或部分测试点保存失败）在此补充保存并提交；
+        # 已保存的测试点按名称去重，不会重复写入
+        if counts["streamed_points"] < len(generation_result.generated_items):
+            for index, item in enumerate(generation_result.generated_items):
+                test_point = await asyncio.to_thread(save_point, item, index)
+                if test_point:
+                    pipeline.add(test_point)
+        stage1_seconds = round(time.time() - start_time, 2)
+        logger.info(f"流水线第一阶段完成 (task {task_id}): {len(generation_result.generated_items)} 个测试点，"
+                    f"耗时 {stage1_seconds}s，已提交 {pipeline.batch_count} 批")
+
+        results = await pipeline.finish()
+        failed_batches = [index for index, result in enumerate(results) if result is None]
+        if results and len(failed_batches) == len(results):
+            raise RuntimeError("流水线所有批次测试用例生成均失败")
+
+        result_data = {
+            "test_points_generated": counts["test_points_generated"],
+            "test_cases_generated": counts["test_cases_generated"],
+            "failed_cases": counts["failed_cases"],
+            "project_id": project_id,
+            "pipeline": {
+                "batch_count": len(results),
+                "failed_batches": failed_batches,
+                "stage1_seconds": stage1_seconds,
+                "first_batch_started_seconds": pipeline.first_batch_seconds,
+                "total_seconds": round(time.time() - start_time, 2)
+            }
+        }
+        await asyncio.to_thread(_complete_job_from_checkpoint, db_manager, checkpoints, result_data)
+        try:
+            ai_logger.finalize_session(success=True)
+        except Exception as log_error:
+            logger.error(f"Failed to finalize AI logging session: {log_error}")
+
+    except asyncio.CancelledError:
+        logger.info(f"Pipeline task {task_id} cancelled, skipping result persistence")
+        try:
+            ai_logger.finalize_session(success=False, error_message="任务已取消")
+        except Exception as log_error:
+            logger.error(f"Failed to finalize AI logging session: {log_error}")
+        raise
+    except Exception as e:
+        logger.error(f"Pipeline task {task_id} failed with error: {str(e)}", exc_info=True)
+        try:
+            ai_logger.finalize_session(success=False, error_message=f"{str(e)} (Type: {type(e).__name__})")
+        except Exception as log_error:
+            logger.error(f"Failed to finalize AI logging session: {log_error}")
+
+        try:
+            with db_manager.get_session() as db:
+                job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
+                if job:
+                    job.status = JobStatus.FAILED
+                    job.error_message = f"{str(e)} (Type: {type(e).__name__})"[:2000]
+                    db.commit()
+        except Exception as inner_e:
+            logger.error(f"Failed to update job status with error: {str(inner_e)}", exc_info=True)
+            raise
+    finally:
+        await pipeline.aclose()
+
+
 # 辅助函数
 def _parse_json_field(field_value: Optional[str]) -> Optional[Any]:
     """解析JSON字段"""
@@ -9,6 +9,8 @@ import logging
 from typing import Optional, Dict, Any, List, Tuple
 from enum import Enum
 
+from .json_scanner import load_json_candidate
+
 logger = logging.getLogger(__name__)
 
 
@@ -180,29 +182,10 @@ class EnhancedJSONValidator:
         except json.JSONDecodeError:
             pass
 
-        # Method 2: Look for JSON code blocks
-        patterns = [
-            (r'```json\s*(\{.*?\})\s*```', 'code_block'),
-            (r'```\s*(\{.*?\})\s*```', 'generic_code_block'),
-            (r'```JSON\s*(\{.*?\})\s*```', 'uppercase_code_block'),
-        ]
-
-        for pattern, method in patterns:
-            match = re.search(pattern, response_text, re.DOTALL | re.IGNORECASE)
-            if match:
-                return match.group(1), method
-
-        # Method 3: Look for JSON objects in the text
-        json_patterns = [
-            (r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', 'nested_object'),
-            (r'\{.*?\}', 'simple_object'),
-        ]
-
-        for pattern, method in json_patterns:
-            matches = re.findall(pattern, response_text, re.DOTALL)
-            if matches:
-                # Return the largest match
-                return max(matches, key=len), method
+        # Method 2: Locate the outermost object (prose, code fences) with a single linear scan
+        _, candidate, complete = load_json_candidate(response_text)
+        if candidate:
+            return candidate, 'scanned_object' if complete else 'truncated_object'
 
         return None, None
 
@@ -0,0 +1,177 @@
+"""
+Incremental JSON array parser for streaming LLM responses.
+
+在流式响应逐块到达时识别 "test_points" / "test_cases" 等数组中已经闭合的
+元素对象，使每个测试点或测试用例在生成完成后即可被推送或保存，而无需等待整个响应。
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ITEM_KEYS = ('test_points', 'test_cases')
+
+
+class IncrementalJSONArrayParser:
+    """
+    Single-pass parser that emits completed objects of named JSON arrays.
+
+    The parser keeps the whole text received so far (available as ``text``)
+    but scans every character exactly once, so feeding N chunks costs
+    O(total length). Text outside the JSON document (markdown fences,
+    explanations) is ignored.
+    """
+
+    def __init__(self, item_keys: Iterable[str] = DEFAULT_ITEM_KEYS):
+        """
+        Initialize the parser.
+
+        Args:
+            item_keys (Iterable[str]): Keys of the arrays whose elements should be emitted
+        """
+        self.item_keys = set(item_keys)
+        self._chunks: List[str] = []
+        self._text_cache: Optional[str] = None
+
+        # Scanner state
+        self._stack: List[str] = []
+        self._array_keys: List[Optional[str]] = []  # key of each open '['
+        self._in_string = False
+        self._escape = False
+        self._string_parts: List[str] = []
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+
+        # Item currently being collected
+        self._item_key: Optional[str] = None
+        self._item_parts: List[str] = []
+        self._item_depth = 0
+        self._item_position = 0
+
+        self.item_counts: Dict[str, int] = {}
+        # Per array key: elements started, positions of decoded elements, positions that could not be decoded
+        self.item_positions: Dict[str, int] = {}
+        self.recovered_positions: Dict[str, List[int]] = {}
+        self.lost_positions: Dict[str, List[int]] = {}
+
+    @property
+    def text(self) -> str:
+        """Get all text received so far."""
+        if self._text_cache is None:
+            self._text_cache = ''.join(self._chunks)
+        return self._text_cache
+
+    @property
+    def open_item(self) -> Optional[Tuple[str, int]]:
+        """Get (array key, position) of the element still being received, if any."""
+        if self._item_key is None:
+            return None
+        return self._item_key, self._item_position
+
+    @property
+    def unclosed(self) -> bool:
+        """Whether the JSON document has unclosed objects or arrays (e.g. a truncated response)."""
+        return bool(self._stack)
+
+    def feed(self, chunk: str) -> List[Tuple[str, int, Dict[str, Any]]]:
+        """
+        Feed the next chunk of the response.
+
+        Args:
+            chunk (str): Newly received text
+
+        Returns:
+            List[Tuple[str, int, Dict[str, Any]]]: (array key, index, item) for every
+                element object completed by this chunk
+        """
+        if not chunk:
+            return []
+
+        self._chunks.append(chunk)
+        self._text_cache = None
+        completed = []
+
+        # Offsets inside this chunk where the open string / item began
+        string_start = 0
+        item_start = 0
+
+        for offset, char in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._string_parts.append(chunk[string_start:offset])
+                    self._last_string = ''.join(self._string_parts)
+                    self._string_parts = []
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+                    string_start = offset + 1
+            elif char == ':':
+                if self._stack and self._stack[-1] == '{':
+                    self._pending_key = self._last_string
+            elif char == '{':
+                if (self._item_key is None and self._stack and self._stack[-1] == '['
+                        and self._array_keys[-1] in self.item_keys):
+                    self._item_key = self._array_keys[-1]
+                    self._item_parts = []
+                    self._item_depth = len(self._stack) + 1
+                    self._item_position = self.item_positions.get(self._item_key, 0)
+                    self.item_positions[self._item_key] = self._item_position + 1
+                    item_start = offset
+                self._stack.append('{')
+                self._pending_key = None
+            elif char == '[':
+                key = self._pending_key if self._stack and self._stack[-1] == '{' else None
+                self._stack.append('[')
+                self._array_keys.append(key)
+                self._pending_key = None
+            elif char in '}]':
+                if not self._stack:
+                    continue
+                if char == '}' and self._item_key is not None and len(self._stack) == self._item_depth:
+                    self._item_parts.append(chunk[item_start:offset + 1])
+                    item = self._decode_item(''.join(self._item_parts))
+                    if item is not None:
+                        index = self.item_counts.get(self._item_key, 0)
+                        self.item_counts[self._item_key] = index + 1
+                        self.recovered_positions.setdefault(self._item_key, []).append(self._item_position)
+                        completed.append((self._item_key, index, item))
+                    else:
+                        self.lost_positions.setdefault(self._item_key, []).append(self._item_position)
+                    self._item_key = None
+                    self._item_parts = []
+                opened = self._stack.pop()
+                if opened == '[':
+                    self._array_keys.pop()
+                self._pending_key = None
+            elif char == ',':
+                self._pending_key = None
+
+        # Carry unfinished string / item over to the next chunk
+        if self._in_string:
+            self._string_parts.append(chunk[string_start:])
+        if self._item_key is not None:
+            self._item_parts.append(chunk[item_start:])
+
+        return completed
+
+    def _decode_item(self, item_text: str) -> Optional[Dict[str, Any]]:
+        """Decode a completed element object (tolerating trailing commas), skipping malformed ones."""
+        try:
+            item = json.loads(item_text)
+        except json.JSONDecodeError as e:
+            try:
+                item = json.loads(re.sub(r',(\s*[}\]])', r'\1', item_text))
+            except json.JSONDecodeError:
+                logger.warning(f"流式解析跳过无法解码的元素: {str(e)[:80]}")
+                return None
+        return item if isinstance(item, dict) else None
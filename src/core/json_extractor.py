@@ -7,7 +7,10 @@ import os
 import re
 import time
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterable, List
+
+from .incremental_json_parser import IncrementalJSONArrayParser, DEFAULT_ITEM_KEYS
+from .json_scanner import load_json_candidate
 
 logger = logging.getLogger(__name__)
 
@@ -52,49 +55,102 @@ class JSONExtractor:
             extraction_time = time.time() - start_time
             print(f"[OK] Direct JSON parsing successful | Time: {extraction_time:.3f}s")
             return JSONExtractor._validate_result(result, extraction_time)
-
         except json.JSONDecodeError as e:
             print(f"[WARN] Direct parsing failed: {str(e)[:50]}...")
 
-            # Attempt JSON repair before trying other methods
-            repaired_json = JSONExtractor._attempt_json_repair(response_text, e)
-            if repaired_json:
-                try:
-                    result = json.loads(repaired_json)
-                    extraction_time = time.time() - start_time
-                    print(f"[REPAIR] JSON repair successful | Time: {extraction_time:.3f}s")
-                    return JSONExtractor._validate_result(result, extraction_time)
-                except json.JSONDecodeError:
-                    print("[REPAIR] Repaired JSON still invalid, trying fallback methods")
-
-        # Fallback: Look for JSON code block
-        json_match = re.search(r'```json\s*(\{.*?\})\s*```', response_text, re.DOTALL)
-        if json_match:
-            try:
-                json_content = json_match.group(1)
-                result = json.loads(json_content)
-                extraction_time = time.time() - start_time
-                print(f"[OK] Code block parsing successful | Time: {extraction_time:.3f}s")
-                return JSONExtractor._validate_result(result, extraction_time)
-            except json.JSONDecodeError:
-                pass
-
-        # Fallback: Look for any JSON object
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
+        # Locate the outermost JSON object (prose, code fences) with a single linear scan
+        result, candidate, complete = load_json_candidate(response_text)
+        if result is not None:
+            extraction_time = time.time() - start_time
+            print(f"[OK] Scanned object parsing successful | Time: {extraction_time:.3f}s")
+            return JSONExtractor._validate_result(result, extraction_time)
+
+        parse_error = None
+        if candidate:
             try:
-                json_content = json_match.group(0)
-                result = json.loads(json_content)
-                extraction_time = time.time() - start_time
-                print(f"[OK] Object parsing successful | Time: {extraction_time:.3f}s")
-                return JSONExtractor._validate_result(result, extraction_time)
-            except json.JSONDecodeError:
-                pass
+                json.loads(candidate)
+            except json.JSONDecodeError as e:
+                print(f"[WARN] Scanned object parsing failed (complete={complete}): {str(e)[:50]}...")
+                parse_error = e
+
+        # A closed but malformed object is repaired first (e.g. trailing commas)
+        if parse_error is not None and complete:
+            result = JSONExtractor._parse_repaired(candidate, parse_error, start_time)
+            if result is not None:
+                return result
+
+        # Fallback: salvage every complete element of the test_points / test_cases arrays
+        salvaged = JSONExtractor.salvage_array_items(response_text)
+        if salvaged:
+            extraction_time = time.time() - start_time
+            print(f"[SALVAGE] Partial items recovered | Lost: {salvaged['salvage']['lost_indices']} | Time: {extraction_time:.3f}s")
+            return salvaged
+
+        # A truncated object without recoverable items: try closing it
+        if parse_error is not None and not complete:
+            return JSONExtractor._parse_repaired(candidate, parse_error, start_time)
 
         # All extraction attempts failed
-        extraction_time = time.time() - start_time
         return None
 
+    @staticmethod
+    def _parse_repaired(candidate: str, parse_error: json.JSONDecodeError,
+                        start_time: float) -> Optional[Dict[str, Any]]:
+        """Repair and parse a JSON candidate, returning None when it cannot be repaired."""
+        repaired_json = JSONExtractor._attempt_json_repair(candidate, parse_error)
+        if not repaired_json:
+            return None
+        try:
+            result = json.loads(repaired_json)
+        except json.JSONDecodeError:
+            print("[REPAIR] Repaired JSON still invalid")
+            return None
+        extraction_time = time.time() - start_time
+        print(f"[REPAIR] JSON repair successful | Time: {extraction_time:.3f}s")
+        return JSONExtractor._validate_result(result, extraction_time)
+
+    @staticmethod
+    def salvage_array_items(response_text: str,
+                            item_keys: Iterable[str] = DEFAULT_ITEM_KEYS) -> Optional[Dict[str, Any]]:
+        """
+        Recover every complete element of the item arrays from a truncated or malformed response.
+
+        单次扫描响应文本（与流式解析使用同一个增量解析器），收集 test_points / test_cases
+        数组中可以解码的元素；无法解码的元素和被截断的最后一个元素按在数组中的位置记入
+        lost_indices，调用方可以只重新生成这些元素。
+
+        Args:
+            response_text (str): Raw response text from LLM
+            item_keys (Iterable[str]): Array keys whose elements should be recovered
+
+        Returns:
+            Optional[Dict[str, Any]]: {key: [items], "salvage": {"positions", "lost_indices", "truncated"}},
+                or None when no element could be recovered
+        """
+        if not response_text:
+            return None
+        parser = IncrementalJSONArrayParser(item_keys)
+        items = parser.feed(response_text)
+        if not items:
+            return None
+
+        result: Dict[str, Any] = {}
+        for key, _, item in items:
+            result.setdefault(key, []).append(item)
+        lost = {key: list(positions) for key, positions in parser.lost_positions.items()}
+        if parser.open_item:
+            key, position = parser.open_item
+            lost.setdefault(key, []).append(position)
+        result['salvage'] = {
+            'positions': {key: list(positions) for key, positions in parser.recovered_positions.items()},
+            'lost_indices': lost,
+            'truncated': parser.unclosed
+        }
+        logger.warning(f"[SALVAGE] 从不完整的响应中恢复元素: "
+                       f"{ {key: len(values) for key, values in result.items() if key != 'salvage'} } | "
+                       f"丢失位置: {lost} | 截断: {parser.unclosed}")
+        return result
+
     @staticmethod
     def _attempt_json_repair(response_text: str, original_error: json.JSONDecodeError) -> Optional[str]:
         """
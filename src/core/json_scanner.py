@@ -0,0 +1,160 @@
+"""
+Single-pass JSON candidate scanner for LLM responses.
+
+LLM响应中的JSON前后可能带有说明文字和 ```json 代码块标记。扫描器对响应只扫描一遍，
+跟踪字符串/转义状态和括号深度，找出最外层的JSON对象区间，交给一次 json.loads；
+不使用 `\\{.*\\}` 之类需要回溯的正则，最坏情况也是 O(n)。
+"""
+
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_FENCE = '```'
+# 对象内部需要处理的字符；字符串内容（展开写法，无歧义回溯）
+_STRUCTURAL = re.compile(r'[{}\[\]"`]')
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_JSON_FENCE = re.compile(r'```(?:json)?', re.IGNORECASE)
+
+
+class JSONCandidate:
+    """A top-level JSON object found in a response."""
+
+    __slots__ = ('start', 'end', 'complete')
+
+    def __init__(self, start: int, end: int, complete: bool):
+        self.start = start
+        self.end = end
+        self.complete = complete
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+    def text(self, source: str) -> str:
+        """Get the candidate text from the scanned source."""
+        return source[self.start:self.end]
+
+    def __repr__(self) -> str:
+        return f"JSONCandidate(start={self.start}, end={self.end}, complete={self.complete})"
+
+
+def scan_json_candidates(text: str) -> List[JSONCandidate]:
+    """
+    Find the outermost JSON objects of a response in one pass.
+
+    字符串内的括号和转义引号不影响深度；对象外部的说明文字被忽略。对象尚未闭合时
+    遇到代码块标记（JSON字符串之外不会出现）说明前面是未配对的说明文字中的括号，
+    从标记处重新开始扫描。文本结束时仍未闭合的对象作为不完整候选返回（响应被截断）。
+
+    扫描按结构字符跳跃（单字符集合的正则 search，不会回溯），字符串内容和说明文字
+    由C实现的查找跳过，每个字符至多被检查一次。
+
+    Args:
+        text (str): Raw response text
+
+    Returns:
+        List[JSONCandidate]: Candidates in order of appearance
+    """
+    candidates: List[JSONCandidate] = []
+    depth = 0
+    start = -1
+    index = 0
+    length = len(text)
+
+    while index < length:
+        if depth == 0:
+            # 对象外部：直接跳到下一个 '{'
+            start = text.find('{', index)
+            if start < 0:
+                break
+            depth = 1
+            index = start + 1
+            continue
+
+        match = _STRUCTURAL.search(text, index)
+        if match is None:
+            break
+        char = match.group()
+        index = match.end()
+        if char == '"':
+            # 跳过字符串内容直到未转义的结束引号；未闭合的字符串延续到文本末尾
+            match = _STRING_BODY.match(text, index)
+            index = match.end() if match else length
+        elif char == '{' or char == '[':
+            depth += 1
+        elif char == '}' or char == ']':
+            depth -= 1
+            if depth == 0:
+                candidates.append(JSONCandidate(start, index, True))
+        elif text.startswith(_FENCE, index - 1):
+            # 未闭合对象中出现代码块标记：之前的 '{' 来自说明文字，丢弃并重新开始
+            depth = 0
+            index += len(_FENCE) - 1
+
+    if depth > 0:
+        candidates.append(JSONCandidate(start, length, False))
+    return candidates
+
+
+def find_json_candidate(text: str) -> Tuple[Optional[str], bool]:
+    """
+    Get the most likely JSON document of a response.
+
+    优先选择最长的完整对象（说明文字中零散的 `{...}` 通常很短）；没有完整对象时返回
+    最后一个未闭合的对象，供修复/部分恢复使用。
+
+    Args:
+        text (str): Raw response text
+
+    Returns:
+        Tuple[Optional[str], bool]: (candidate text or None, whether it is a complete object)
+    """
+    if not text:
+        return None, False
+    candidates = scan_json_candidates(text)
+    complete = [candidate for candidate in candidates if candidate.complete]
+    if complete:
+        best = max(complete, key=lambda candidate: candidate.length)
+        return best.text(text), True
+    if candidates:
+        return candidates[-1].text(text), False
+    return None, False
+
+
+def load_json_candidate(text: str) -> Tuple[Optional[Any], Optional[str], bool]:
+    """
+    Locate and parse the JSON object of a response.
+
+    常见情况下JSON就是代码块（或首个 '{'）到最后一个 '}' 之间的内容，先对这一区间做一次
+    json.loads；失败时（说明文字中有括号、截断、多个对象）再用 scan_json_candidates
+    定位候选并解析一次。
+
+    Args:
+        text (str): Raw response text
+
+    Returns:
+        Tuple[Optional[Any], Optional[str], bool]: (parsed data or None, candidate text, whether
+            the candidate is a complete object)
+    """
+    if not text:
+        return None, None, False
+
+    fence = _JSON_FENCE.search(text)
+    first = text.find('{', fence.end() if fence else 0)
+    last = text.rfind('}')
+    span = None
+    if 0 <= first < last:
+        span = text[first:last + 1]
+        try:
+            return json.loads(span), span, True
+        except ValueError:
+            pass
+
+    candidate, complete = find_json_candidate(text)
+    if candidate is None or candidate == span:
+        return None, candidate, complete
+    try:
+        return json.loads(candidate), candidate, complete
+    except ValueError:
+        return None, candidate, complete
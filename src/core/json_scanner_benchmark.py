@@ -0,0 +1,138 @@
+"""
+Micro-benchmark: regex based JSON location vs the single-pass scanner.
+
+用法:
+    python -m src.core.json_scanner_benchmark [响应目录或文件 ...] [--repeat N]
+
+默认读取 AI 日志记录的原始响应（output/ai_generation_logs/*/responses/*_ai_response_raw.txt）；
+没有记录时使用合成的 30–80 KB 响应（代码块、说明文字前缀、截断、无JSON的垃圾文本、
+只有未闭合括号的文本）。对每个响应分别计时原来的正则路径（JSONExtractor 与
+EnhancedJSONValidator 的提取步骤）和扫描器路径；same 列表示两条路径的解析结果是否一致。
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from typing import Callable, List, Optional, Tuple
+
+from .json_scanner import load_json_candidate
+
+RECORDED_RESPONSES = 'output/ai_generation_logs/*/responses/*_ai_response_raw.txt'
+
+
+def legacy_extract(text: str) -> Optional[dict]:
+    """The extraction steps used before the scanner (JSONExtractor + EnhancedJSONValidator patterns)."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    for pattern in (r'```json\s*(\{.*?\})\s*```', r'```\s*(\{.*?\})\s*```'):
+        match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+        if match:
+            try:
+                return json.loads(match.group(1))
+            except ValueError:
+                pass
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except ValueError:
+            pass
+    for pattern in (r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', r'\{.*?\}'):
+        matches = re.findall(pattern, text, re.DOTALL)
+        if matches:
+            try:
+                return json.loads(max(matches, key=len))
+            except ValueError:
+                pass
+    return None
+
+
+def scanner_extract(text: str) -> Optional[dict]:
+    """Direct parse, then the scanner path (bounding span parse, scan only when that fails)."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    data, _, _ = load_json_candidate(text)
+    return data
+
+
+def synthetic_responses() -> List[Tuple[str, str]]:
+    """Build representative 30–60 KB responses when no recorded ones are available."""
+    cases = [{
+        "test_case_id": f"TC{i:03d}",
+        "name": f"验证场景{i}：远程控制指令下发后车辆状态同步 {{ID}}",
+        "preconditions": ["车辆在线", "用户已登录", "账号已绑定车辆"],
+        "steps": [f"步骤{j}：发送指令并检查返回 \"code\": 0" for j in range(6)],
+        "expected_result": ["返回成功", "车辆状态在10秒内更新"]
+    } for i in range(80)]
+    body = json.dumps({"test_cases": cases}, ensure_ascii=False, indent=2)
+    prose = "以下是根据需求生成的测试用例，覆盖正常流程、异常流程和边界条件（例如 {参数} 为空）。\n"
+    return [
+        ('fenced', f"```json\n{body}\n```"),
+        ('prose_prefix', f"{prose * 3}```json\n{body}\n```\n以上共 {len(cases)} 条。"),
+        ('truncated', f"```json\n{body[:len(body) * 2 // 3]}"),
+        ('garbage', (prose + "{ 未闭合的说明 " + "字段 a:b, c:d } " * 3) * 300),
+        ('unbalanced_braces', "模型输出了代码片段而不是JSON：\n" + "if (ready) { 未闭合的代码片段 " * 2000),
+    ]
+
+
+def recorded_responses(paths: List[str]) -> List[Tuple[str, str]]:
+    """Load recorded raw responses from files or directories."""
+    files: List[str] = []
+    for path in paths or [RECORDED_RESPONSES]:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '**', '*.txt'), recursive=True)))
+        else:
+            files.extend(sorted(glob.glob(path)))
+    responses = []
+    for file_path in files:
+        with open(file_path, encoding='utf-8', errors='replace') as handle:
+            responses.append((os.path.basename(file_path), handle.read()))
+    return responses
+
+
+def time_call(func: Callable[[str], object], text: str, repeat: int) -> float:
+    """Best time of repeat calls in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', help='recorded response files or directories')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per response (best is reported)')
+    args = parser.parse_args(argv)
+
+    responses = recorded_responses(args.paths)
+    source = 'recorded'
+    if not responses:
+        responses = synthetic_responses()
+        source = 'synthetic'
+
+    print(f"{source} responses: {len(responses)}, repeat: {args.repeat}")
+    print(f"{'response':<40} {'KB':>7} {'regex ms':>10} {'scanner ms':>11} {'speedup':>8} {'same':>5}")
+    total_legacy = total_scanner = 0.0
+    for name, text in responses:
+        legacy_ms = time_call(legacy_extract, text, args.repeat)
+        scanner_ms = time_call(scanner_extract, text, args.repeat)
+        total_legacy += legacy_ms
+        total_scanner += scanner_ms
+        same = legacy_extract(text) == scanner_extract(text)
+        print(f"{name[:40]:<40} {len(text.encode('utf-8')) / 1024:>7.1f} {legacy_ms:>10.3f} "
+              f"{scanner_ms:>11.3f} {legacy_ms / max(scanner_ms, 1e-9):>7.1f}x {str(same):>5}")
+    print(f"{'total':<40} {'':>7} {total_legacy:>10.3f} {total_scanner:>11.3f} "
+          f"{total_legacy / max(total_scanner, 1e-9):>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,43 +3,62 @@
 Core test case generation functionality.
 """
 
+import asyncio
+import inspect
 import logging
 import json
 import time
-from typing import Optional, Dict, Any, Tuple, List
+from typing import Optional, Dict, Any, Tuple, List, Callable
 
 logger = logging.getLogger(__name__)
 
 from ..llm.llm_client import LLMClient
+from ..llm.structured_output import TEST_CASES
 from ..utils.config import Config
 from ..utils.file_handler import load_text_file, save_json_file, ensure_directory_exists
 from ..utils.database_prompt_builder import DatabasePromptBuilder
 from ..core.json_extractor import JSONExtractor
+from ..exceptions.generation import TokenBudgetError
 from ..core.enhanced_json_validator import EnhancedJSONValidator, ValidationSeverity
 from ..core.excel_converter import ExcelConverter
 from ..database.database import DatabaseManager
 from ..database.operations import DatabaseOperations
 from ..database.models import BusinessType, Project, UnifiedTestCase, KnowledgeEntity, KnowledgeRelation, TestCaseEntity, EntityType, BusinessTypeConfig
+from ..services.generation_checkpoints import (
+    JobCheckpoints, STAGE_BATCHES, STAGE_ITEMS, STAGE_LLM_RESPONSE, STAGE_PROMPTS
+)
+
+
+async def _maybe_await(result):
+    """Await result if it is awaitable (callbacks may be sync or async)."""
+    if inspect.isawaitable(result):
+        return await result
+    return result
 
 
 class TestCaseGenerator:
     """Main class for generating test cases using LLMs."""
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, llm_client: Optional[LLMClient] = None,
+                 prompt_builder: Optional[DatabasePromptBuilder] = None,
+                 db_manager: Optional[DatabaseManager] = None):
         """
         Initialize the test case generator.
 
         Args:
             config (Config): Configuration object
+            llm_client (Optional[LLMClient]): LLM client, created from config when omitted
+            prompt_builder (Optional[DatabasePromptBuilder]): Prompt builder, created from config when omitted
+            db_manager (Optional[DatabaseManager]): Database manager, created from config when omitted
         """
         self.config = config
-        self.llm_client = LLMClient(config)
+        self.llm_client = llm_client or LLMClient(config)
         self.json_extractor = JSONExtractor()
         self.enhanced_validator = EnhancedJSONValidator()
         self.excel_converter = ExcelConverter()
         # Use DatabasePromptBuilder for dynamic business type support
-        self.prompt_builder = DatabasePromptBuilder(config)
-        self.db_manager = DatabaseManager(config)
+        self.prompt_builder = prompt_builder or DatabasePromptBuilder(config)
+        self.db_manager = db_manager or DatabaseManager(config)
 
         # TestPointGenerator removed - using unified test case generation system
 
@@ -279,111 +298,24 @@ class TestCaseGenerator:
             Optional[Dict[str, Any]]: Generated test cases JSON or None if failed
         """
         try:
-            # Validate business type using new dynamic system
-            if not self.validate_business_type(business_type):
-                raise ValueError(f"Invalid or inactive business type: {business_type}")
-
-            # Get both system and user prompts from prompt combination
-            # Fix: Handle both string and dictionary types for additional_context
-            if isinstance(additional_context, dict):
-                context_with_points = additional_context.copy()
-            else:
-                # If additional_context is a string, wrap it in a dictionary
-                context_with_points = {'user_input': additional_context} if additional_context else {}
-            context_with_points['test_points_data'] = test_points_data
-
-            system_prompt, user_prompt = self.prompt_builder.get_two_stage_prompts(
-                business_type, 'test_case'
-            )
-            if system_prompt is None or user_prompt is None:
-                raise RuntimeError(f"无法为 {business_type} 获取测试用例生成提示词组合")
-
-            # Apply template variables to both system and user prompts
-            # Fix: Include test_point_ids for template variable resolution
-            resolved_system_prompt = self.prompt_builder._apply_template_variables(
-                content=system_prompt,
-                additional_context=additional_context,
-                business_type=business_type,
-                project_id=project_id,
-                endpoint_params={
-                    'test_point_ids': test_point_ids,  # ✅ Add test_point_ids for template resolution
-                    'test_points_data': test_points_data,  # Keep existing data structure
-                    'additional_context': additional_context,
-                    'generation_stage': 'test_case',
-                    'project_id': project_id
-                }
-            )
-
-            user_prompt = self.prompt_builder._apply_template_variables(
-                content=user_prompt,
-                additional_context=additional_context,
-                business_type=business_type,
-                project_id=project_id,
-                endpoint_params={
-                    'test_point_ids': test_point_ids,  # ✅ Add test_point_ids for template resolution
-                    'test_points_data': test_points_data,  # Keep existing data structure
-                    'additional_context': additional_context,
-                    'generation_stage': 'test_case',
-                    'project_id': project_id
-                }
+            system_prompt, resolved_system_prompt, user_prompt, token_budget = self._prepare_external_points_prompts(
+                business_type, test_points_data, additional_context, project_id, test_point_ids, ai_logger
             )
 
-            logger.info(f"开始从测试点生成测试用例 | 业务类型: {business_type} | "
-                       f"测试点数量: {len(test_points_data.get('test_points', []))}")
-
-            # 记录模板变量替换结果到AI日志
-            if ai_logger:
-                try:
-                    ai_logger.log_resolved_prompts(resolved_system_prompt, user_prompt)
-                    ai_logger.log_template_replacement_info(
-                        system_prompt, resolved_system_prompt,
-                        user_prompt, user_prompt
-                    )
-                except Exception as log_error:
-                    logger.warning(f"Failed to log resolved prompts for test case generation: {log_error}")
-
             # Generate test cases using LLM
             response = self.llm_client.generate_test_cases(
                 system_prompt,
                 user_prompt,
                 ai_logger=ai_logger,
                 resolved_system_prompt=resolved_system_prompt,
-                resolved_requirements_prompt=user_prompt
+                resolved_requirements_prompt=user_prompt,
+                output_schema=TEST_CASES
             )
-            if response is None:
-                # Enhanced error handling for template variable issues
-                logger.error(f"LLM call failed for business_type: {business_type}")
-                logger.error(f"Template variables status: test_point_ids={test_point_ids}, template_resolution_completed=True")
-                logger.error(f"Prompt length: system={len(system_prompt)}, user={len(user_prompt)}")
-                logger.error(f"LLM client info: {self.llm_client.get_model_info()}")
-                raise RuntimeError(f"LLM call failed for {business_type} - check template variable resolution and LLM connectivity")
-
-            # Extract JSON from response
-            json_result = self.json_extractor.extract_json_from_response(response)
-            if json_result is None:
-                logger.error("测试用例JSON提取失败")
-                self._analyze_failed_response(response)
-                raise RuntimeError("JSON extraction failed - no valid JSON found in LLM response")
-
-            # Validate JSON structure
-            if not self.json_extractor.validate_json_structure(json_result):
-                logger.error("测试用例JSON结构验证失败")
-                raise RuntimeError("Test cases JSON structure validation failed")
-
-            # Add metadata
-            test_cases = json_result.get('test_cases', [])
-            test_cases_count = len(test_cases) if isinstance(test_cases, list) else 0
-
-            json_result['generation_metadata'] = {
-                'business_type': business_type,
-                'generation_stage': 'test_case',
-                'source_test_points_count': len(test_points_data.get('test_points', [])),
-                'generated_test_cases_count': test_cases_count,
-                'timestamp': time.time()
-            }
 
-            logger.info(f"从测试点生成测试用例成功 | 业务类型: {business_type} | "
-                       f"测试用例数量: {test_cases_count}")
+            json_result = self._finalize_external_points_response(
+                response, business_type, test_points_data, system_prompt, user_prompt, test_point_ids,
+                token_budget=token_budget
+            )
 
             # Save to database if requested
             if save_to_db:
@@ -395,6 +327,583 @@ class TestCaseGenerator:
             logger.error(f"Error generating test cases from external points for {business_type}: {str(e)}")
             return None
 
+    async def agenerate_test_cases_from_external_points(self, business_type: str,
+                                                      test_points_data: Dict[str, Any],
+                                                      additional_context: Optional[Dict[str, Any]] = None,
+                                                      save_to_db: bool = False,
+                                                      project_id: Optional[int] = None,
+                                                      test_point_ids: Optional[List[int]] = None,
+                                                      ai_logger=None,
+                                                      on_item: Optional[Callable] = None,
+                                                      use_cache: bool = True,
+                                                      checkpoints: Optional[JobCheckpoints] = None,
+                                                      batch_index: int = 0) -> Optional[Dict[str, Any]]:
+        """
+        Asynchronous version of generate_test_cases_from_external_points.
+
+        LLM调用使用异步客户端；提示词组装和数据库保存涉及同步数据库访问，
+        放到线程池中执行，避免阻塞事件循环。
+
+        Args:
+            business_type (str): Business type (e.g., RCC, RFD, ZAB, ZBA)
+            test_points_data (Dict[str, Any]): Test points data from external source
+            additional_context (Optional[Dict[str, Any]]): Additional context for generation
+            save_to_db (bool): Whether to save test cases to database
+            project_id (Optional[int]): Project ID for database saving
+            on_item (Optional[Callable]): 若提供则使用流式生成，每个测试用例完成时回调 on_item(key, index, item)
+            use_cache (bool): Whether the LLM response cache may be used
+            checkpoints (Optional[JobCheckpoints]): 提供时保存/复用该批次的提示词和LLM原始响应检查点
+            batch_index (int): Batch index the checkpoints are stored under
+
+        Returns:
+            Optional[Dict[str, Any]]: Generated test cases JSON or None if failed
+        """
+        try:
+            prompts = await checkpoints.aload(STAGE_PROMPTS, batch_index) if checkpoints else None
+            if prompts:
+                system_prompt, resolved_system_prompt, user_prompt, token_budget = prompts
+            else:
+                system_prompt, resolved_system_prompt, user_prompt, token_budget = await asyncio.to_thread(
+                    self._prepare_external_points_prompts,
+                    business_type, test_points_data, additional_context, project_id, test_point_ids, ai_logger
+                )
+                if checkpoints:
+                    await checkpoints.asave(
+                        STAGE_PROMPTS, [system_prompt, resolved_system_prompt, user_prompt, token_budget], batch_index
+                    )
+
+            response = await checkpoints.aload(STAGE_LLM_RESPONSE, batch_index) if checkpoints else None
+            if response is not None:
+                logger.info(f"使用检查点中的LLM响应，跳过第 {batch_index + 1} 批测试用例生成调用")
+            else:
+                if on_item is not None:
+                    response = await self.llm_client.astream_test_cases(
+                        system_prompt,
+                        user_prompt,
+                        on_item=on_item,
+                        item_keys=('test_cases',),
+                        ai_logger=ai_logger,
+                        resolved_system_prompt=resolved_system_prompt,
+                        resolved_requirements_prompt=user_prompt,
+                        use_cache=use_cache,
+                        output_schema=TEST_CASES
+                    )
+                else:
+                    response = await self.llm_client.agenerate_test_cases(
+                        system_prompt,
+                        user_prompt,
+                        ai_logger=ai_logger,
+                        resolved_system_prompt=resolved_system_prompt,
+                        resolved_requirements_prompt=user_prompt,
+                        use_cache=use_cache,
+                        output_schema=TEST_CASES
+                    )
+                # Streamed and non-streamed responses are both checkpointed
+                if checkpoints and response:
+                    await checkpoints.asave(STAGE_LLM_RESPONSE, response, batch_index)
+
+            json_result = self._finalize_external_points_response(
+                response, business_type, test_points_data, system_prompt, user_prompt, test_point_ids,
+                token_budget=token_budget
+            )
+
+            if save_to_db:
+                await asyncio.to_thread(
+                    self.save_to_database, json_result, business_type, project_id, test_point_ids, ai_logger
+                )
+
+            return json_result
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error generating test cases from external points for {business_type}: {str(e)}")
+            return None
+
+    async def agenerate_test_cases_in_batches(self, business_type: str,
+                                              test_points_data: Dict[str, Any],
+                                              additional_context: Optional[Dict[str, Any]] = None,
+                                              save_to_db: bool = False,
+                                              project_id: Optional[int] = None,
+                                              test_point_ids: Optional[List[int]] = None,
+                                              ai_logger=None,
+                                              on_item: Optional[Callable] = None,
+                                              on_batch_complete: Optional[Callable] = None,
+                                              use_cache: bool = True,
+                                              checkpoints: Optional[JobCheckpoints] = None) -> Optional[Dict[str, Any]]:
+        """
+        Generate test cases from test points in token-budgeted batches.
+
+        测试点按预估输出token拆分为多个批次，各批次在并发上限内同时调用LLM，
+        结果合并为与 agenerate_test_cases_from_external_points 相同的结构，供后续
+        智能匹配/保存步骤使用。单个批次失败不影响其它批次。
+
+        Args:
+            business_type (str): Business type (e.g., RCC, RFD, ZAB, ZBA)
+            test_points_data (Dict[str, Any]): Test points data, each point carrying its database "id"
+            additional_context (Optional[Dict[str, Any]]): Additional context for generation
+            save_to_db (bool): Whether to save merged test cases to database
+            project_id (Optional[int]): Project ID for database saving
+            test_point_ids (Optional[List[int]]): Requested test point IDs
+            ai_logger: AI logger instance for logging
+            on_item (Optional[Callable]): Streaming callback, see agenerate_test_cases_from_external_points
+            on_batch_complete (Optional[Callable]): Called as on_batch_complete(completed, total, batch_index, cases_count)
+            use_cache (bool): Whether the LLM response cache may be used
+            checkpoints (Optional[JobCheckpoints]): 提供时按批次保存检查点：任务重新执行时沿用上次的
+                批次划分，已有提取结果的批次不再调用LLM，只重新生成失败的批次
+
+        Returns:
+            Optional[Dict[str, Any]]: Merged test cases JSON or None if every batch failed
+        """
+        test_points = test_points_data.get('test_points', [])
+        batches = self.split_test_point_batches(
+            test_points,
+            max_batch_size=self.config.test_case_batch_size,
+            token_budget=self.config.test_case_batch_token_budget
+        )
+        if checkpoints:
+            batches = await self._aresume_batch_plan(checkpoints, test_points, batches)
+
+        if len(batches) <= 1:
+            # 单批次时保持原有调用方式（包括模板变量解析使用的 test_point_ids）
+            result = await checkpoints.aload(STAGE_ITEMS) if checkpoints else None
+            if result is not None:
+                logger.info(f"使用检查点中的测试用例，跳过生成 | 业务类型: {business_type}")
+                if save_to_db:
+                    await asyncio.to_thread(
+                        self.save_to_database, result, business_type, project_id, test_point_ids, ai_logger
+                    )
+            else:
+                result = await self.agenerate_test_cases_from_external_points(
+                    business_type, test_points_data, additional_context, False,
+                    project_id, test_point_ids, ai_logger, on_item, use_cache,
+                    checkpoints=checkpoints
+                )
+                result = await self._aregenerate_lost_cases(
+                    business_type, result, test_points, additional_context, project_id, ai_logger, use_cache
+                )
+                if checkpoints and result:
+                    await checkpoints.asave(STAGE_ITEMS, result)
+                if save_to_db and result:
+                    await asyncio.to_thread(
+                        self.save_to_database, result, business_type, project_id, test_point_ids, ai_logger
+                    )
+            if on_batch_complete:
+                await _maybe_await(on_batch_complete(1, 1, 0, len(result.get('test_cases', [])) if result else 0))
+            return result
+
+        logger.info(f"分批生成测试用例 | 业务类型: {business_type} | 测试点数量: {len(test_points)} | "
+                    f"批次数: {len(batches)} | 并发上限: {self.config.test_case_batch_concurrency}")
+
+        semaphore = asyncio.Semaphore(max(1, self.config.test_case_batch_concurrency))
+        completed = 0
+        offsets = [sum(len(b) for b in batches[:i]) for i in range(len(batches))]
+
+        async def run_batch(batch_index: int, batch: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            nonlocal completed
+            batch_ids = [tp['id'] for tp in batch if tp.get('id') is not None]
+
+            batch_on_item = None
+            if on_item is not None:
+                offset = offsets[batch_index]
+
+                async def batch_on_item(key, index, item):
+                    await _maybe_await(on_item(key, offset + index, item))
+
+            result = await checkpoints.aload(STAGE_ITEMS, batch_index) if checkpoints else None
+            if result is not None:
+                logger.info(f"第 {batch_index + 1}/{len(batches)} 批测试用例使用检查点，跳过生成")
+            else:
+                async with semaphore:
+                    logger.info(f"开始生成第 {batch_index + 1}/{len(batches)} 批测试用例 | 测试点数量: {len(batch)}")
+                    result = await self.agenerate_test_cases_from_external_points(
+                        business_type, {'test_points': batch}, additional_context, False,
+                        project_id, batch_ids or None, ai_logger, batch_on_item, use_cache,
+                        checkpoints=checkpoints, batch_index=batch_index
+                    )
+                    result = await self._aregenerate_lost_cases(
+                        business_type, result, batch, additional_context, project_id, ai_logger, use_cache
+                    )
+
+            cases = result.get('test_cases', []) if result else []
+            if isinstance(cases, list):
+                self._assign_batch_test_point_ids(cases, batch_ids)
+            if checkpoints and result:
+                await checkpoints.asave(STAGE_ITEMS, result, batch_index)
+
+            completed += 1
+            if result is None:
+                logger.error(f"第 {batch_index + 1}/{len(batches)} 批测试用例生成失败")
+            if on_batch_complete:
+                await _maybe_await(on_batch_complete(completed, len(batches), batch_index, len(cases)))
+            return result
+
+        results = await asyncio.gather(*[run_batch(i, batch) for i, batch in enumerate(batches)])
+
+        merged_cases = []
+        failed_batches = []
+        token_budgets = []
+        for batch_index, result in enumerate(results):
+            if not result:
+                failed_batches.append(batch_index)
+                continue
+            cases = result.get('test_cases', [])
+            if isinstance(cases, list):
+                merged_cases.extend(cases)
+            token_budget = result.get('generation_metadata', {}).get('token_budget')
+            if token_budget:
+                token_budgets.append(dict(token_budget, batch_index=batch_index))
+
+        if len(failed_batches) == len(batches):
+            logger.error(f"所有批次测试用例生成均失败 | 业务类型: {business_type}")
+            return None
+
+        merged_result = {
+            'test_cases': merged_cases,
+            'generation_metadata': {
+                'business_type': business_type,
+                'generation_stage': 'test_case',
+                'source_test_points_count': len(test_points),
+                'generated_test_cases_count': len(merged_cases),
+                'batch_count': len(batches),
+                'batch_sizes': [len(b) for b in batches],
+                'failed_batches': failed_batches,
+                'token_budgets': token_budgets,
+                'timestamp': time.time()
+            }
+        }
+
+        logger.info(f"分批生成测试用例完成 | 业务类型: {business_type} | 测试用例数量: {len(merged_cases)} | "
+                    f"失败批次: {len(failed_batches)}/{len(batches)}")
+
+        if save_to_db:
+            await asyncio.to_thread(
+                self.save_to_database, merged_result, business_type, project_id, test_point_ids, ai_logger
+            )
+
+        return merged_result
+
+    async def _aregenerate_lost_cases(self, business_type: str,
+                                      result: Optional[Dict[str, Any]],
+                                      test_points: List[Dict[str, Any]],
+                                      additional_context: Optional[Dict[str, Any]] = None,
+                                      project_id: Optional[int] = None,
+                                      ai_logger=None,
+                                      use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Regenerate only the test cases missing from a partially salvaged response.
+
+        响应被截断或部分元素无法解析时，恢复出的测试用例按其在数组中的位置对应到测试点；
+        没有对应测试用例的测试点单独再请求一次（不再递归），结果按测试点顺序合并。
+
+        Returns:
+            Optional[Dict[str, Any]]: The result with regenerated test cases merged in
+        """
+        metadata = result.get('generation_metadata', {}) if result else {}
+        salvage = metadata.get('salvage')
+        point_ids = [tp.get('id') for tp in test_points]
+        if not salvage or 'regenerated_test_point_ids' in salvage or None in point_ids:
+            return result
+
+        cases = [case for case in result.get('test_cases', []) if isinstance(case, dict)]
+        positions = salvage.get('positions', {}).get('test_cases', [])
+        for case_data, position in zip(cases, positions):
+            if position < len(point_ids) and not case_data.get('test_point_id') and not case_data.get('id'):
+                case_data['test_point_id'] = point_ids[position]
+        covered = {case.get('test_point_id') or case.get('id') for case in cases}
+        missing = [tp for tp in test_points if tp['id'] not in covered]
+        salvage['regenerated_test_point_ids'] = [tp['id'] for tp in missing]
+        if not missing:
+            return result
+
+        missing_ids = [tp['id'] for tp in missing]
+        logger.warning(f"响应只恢复了部分测试用例，重新生成缺失的 {len(missing)} 个 | 业务类型: {business_type} | "
+                       f"测试点: {missing_ids}")
+        retry = await self.agenerate_test_cases_from_external_points(
+            business_type, {'test_points': missing}, additional_context, False,
+            project_id, missing_ids, ai_logger, None, use_cache
+        )
+        retry_cases = retry.get('test_cases', []) if retry else []
+        if isinstance(retry_cases, list):
+            self._assign_batch_test_point_ids(retry_cases, missing_ids)
+            cases.extend(case for case in retry_cases if isinstance(case, dict))
+
+        order = {point_id: index for index, point_id in enumerate(point_ids)}
+        cases.sort(key=lambda case: order.get(case.get('test_point_id') or case.get('id'), len(order)))
+        result['test_cases'] = cases
+        metadata['generated_test_cases_count'] = len(cases)
+        return result
+
+    @staticmethod
+    async def _aresume_batch_plan(checkpoints: JobCheckpoints,
+                                  test_points: List[Dict[str, Any]],
+                                  batches: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+        """
+        Reuse the batch split saved by a previous run of the job, or save the current one.
+
+        批次检查点按批次序号保存，重新执行时必须使用相同的批次划分；测试点集合与上次
+        不一致时（测试点被修改或删除）使用新的划分并覆盖保存。
+        """
+        points_by_id = {tp.get('id'): tp for tp in test_points}
+        if None in points_by_id:
+            return batches
+
+        plan = await checkpoints.aload(STAGE_BATCHES)
+        if plan and sorted(i for ids in plan for i in ids) == sorted(points_by_id):
+            return [[points_by_id[i] for i in ids] for ids in plan]
+
+        if plan:
+            logger.warning(f"测试点与检查点中的批次划分不一致，重新生成全部批次 | task: {checkpoints.task_id}")
+            await asyncio.to_thread(checkpoints.clear)
+        await checkpoints.asave(STAGE_BATCHES, [[tp['id'] for tp in batch] for batch in batches])
+        return batches
+
+    @staticmethod
+    def split_test_point_batches(test_points: List[Dict[str, Any]],
+                                 max_batch_size: int,
+                                 token_budget: int) -> List[List[Dict[str, Any]]]:
+        """
+        Split test points into batches bounded by size and estimated output tokens.
+
+        每个测试点的输出token按固定开销加上测试点自身的序列化长度估算；
+        单个测试点超出预算时独占一个批次。
+
+        Args:
+            test_points (List[Dict[str, Any]]): Test points to split
+            max_batch_size (int): Maximum test points per batch
+            token_budget (int): Estimated output token budget per batch
+
+        Returns:
+            List[List[Dict[str, Any]]]: Batches in original order
+        """
+        batches: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_tokens = 0
+        max_batch_size = max(1, max_batch_size)
+
+        for test_point in test_points:
+            tokens = TestCaseGenerator._estimate_case_output_tokens(test_point)
+            if current and (len(current) >= max_batch_size or current_tokens + tokens > token_budget):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(test_point)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _estimate_case_output_tokens(test_point: Dict[str, Any]) -> int:
+        """Estimate output tokens of the test case generated for one test point."""
+        # 步骤、前置条件、预期结果等固定结构约300 tokens，另加测试点描述本身的长度
+        return 300 + len(json.dumps(test_point, ensure_ascii=False, default=str))
+
+    @staticmethod
+    def _assign_batch_test_point_ids(test_cases: List[Dict[str, Any]], batch_ids: List[int]) -> None:
+        """Fill missing test_point_id of a batch's cases by position within that batch."""
+        if len(test_cases) > len(batch_ids):
+            return
+        for case_data, test_point_id in zip(test_cases, batch_ids):
+            if isinstance(case_data, dict) and not case_data.get('test_point_id') and not case_data.get('id'):
+                case_data['test_point_id'] = test_point_id
+
+    def _prepare_external_points_prompts(self, business_type: str,
+                                         test_points_data: Dict[str, Any],
+                                         additional_context: Optional[Dict[str, Any]] = None,
+                                         project_id: Optional[int] = None,
+                                         test_point_ids: Optional[List[int]] = None,
+                                         ai_logger=None) -> Tuple[str, str, str, Dict[str, Any]]:
+        """
+        Build and resolve the second stage prompts for test case generation.
+
+        Returns:
+            Tuple[str, str, str, Dict[str, Any]]: (system prompt template, resolved system prompt,
+                resolved user prompt, token budget breakdown)
+
+        Raises:
+            TokenBudgetError: When the prompts cannot fit the model context window
+        """
+        # Validate business type using new dynamic system
+        if not self.validate_business_type(business_type):
+            raise ValueError(f"Invalid or inactive business type: {business_type}")
+
+        # Get both system and user prompts from prompt combination
+        # Fix: Handle both string and dictionary types for additional_context
+        if isinstance(additional_context, dict):
+            context_with_points = additional_context.copy()
+        else:
+            # If additional_context is a string, wrap it in a dictionary
+            context_with_points = {'user_input': additional_context} if additional_context else {}
+        context_with_points['test_points_data'] = test_points_data
+
+        system_prompt, user_prompt = self.prompt_builder.get_two_stage_prompts(
+            business_type, 'test_case'
+        )
+        if system_prompt is None or user_prompt is None:
+            raise RuntimeError(f"无法为 {business_type} 获取测试用例生成提示词组合")
+        user_template = user_prompt
+        variables: Dict[str, Any] = {}
+
+        # Apply template variables to both system and user prompts
+        # Fix: Include test_point_ids for template variable resolution
+        endpoint_params = {
+            'test_point_ids': test_point_ids,  # ✅ Add test_point_ids for template resolution
+            'test_points_data': test_points_data,  # Keep existing data structure
+            'additional_context': additional_context,
+            'generation_stage': 'test_case',
+            'project_id': project_id
+        }
+        # Both prompts share one render context so each variable is resolved once per request
+        render_context = self.prompt_builder.create_render_context(business_type, project_id, endpoint_params)
+        resolved_system_prompt = self.prompt_builder._apply_template_variables(
+            content=system_prompt,
+            additional_context=additional_context,
+            business_type=business_type,
+            project_id=project_id,
+            endpoint_params=endpoint_params,
+            resolved_variables=variables,
+            render_context=render_context
+        )
+
+        user_prompt = self.prompt_builder._apply_template_variables(
+            content=user_prompt,
+            additional_context=additional_context,
+            business_type=business_type,
+            project_id=project_id,
+            endpoint_params=endpoint_params,
+            resolved_variables=variables,
+            render_context=render_context
+        )
+
+        # 测试点是本阶段的输入，只允许裁剪已有测试用例等参考数据
+        resolved_system_prompt, user_prompt, token_budget = self.fit_prompt_budget(
+            system_prompt, user_template, resolved_system_prompt, user_prompt,
+            variables, trimmable=('test_cases',), ai_logger=ai_logger
+        )
+
+        logger.info(f"开始从测试点生成测试用例 | 业务类型: {business_type} | "
+                   f"测试点数量: {len(test_points_data.get('test_points', []))}")
+
+        # 记录模板变量替换结果到AI日志
+        if ai_logger:
+            try:
+                ai_logger.log_template_variables(render_context.summary())
+                ai_logger.log_resolved_prompts(resolved_system_prompt, user_prompt)
+                ai_logger.log_template_replacement_info(
+                    system_prompt, resolved_system_prompt,
+                    user_prompt, user_prompt
+                )
+            except Exception as log_error:
+                logger.warning(f"Failed to log resolved prompts for test case generation: {log_error}")
+
+        return system_prompt, resolved_system_prompt, user_prompt, token_budget
+
+    def fit_prompt_budget(self, system_template: str, user_template: str,
+                          resolved_system_prompt: str, resolved_user_prompt: str,
+                          variables: Dict[str, Any], trimmable: Tuple[str, ...] = (),
+                          ai_logger=None) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Fit resolved prompts into the model context window and report the token budget.
+
+        Args:
+            system_template (str): System prompt template
+            user_template (str): User prompt template
+            resolved_system_prompt (str): Resolved system prompt
+            resolved_user_prompt (str): Resolved user prompt
+            variables (Dict[str, Any]): Resolved variables used by the templates
+            trimmable (Tuple[str, ...]): Reference data variables that may be trimmed
+            ai_logger: AI logger instance for logging
+
+        Returns:
+            Tuple[str, str, Dict[str, Any]]: Final system prompt, user prompt and budget breakdown
+
+        Raises:
+            TokenBudgetError: When the prompts cannot fit the model context window
+        """
+        def render(values: Dict[str, Any]) -> Tuple[str, str]:
+            return (
+                self.prompt_builder._apply_template_variables_with_variables(system_template, values),
+                self.prompt_builder._apply_template_variables_with_variables(user_template, values)
+            )
+
+        try:
+            system_prompt, user_prompt, budget = self.llm_client.token_budgeter.fit_prompts(
+                system_template, user_template,
+                resolved_system_prompt, resolved_user_prompt,
+                variables, render, trimmable
+            )
+        except TokenBudgetError as e:
+            if ai_logger:
+                ai_logger.log_token_budget(e.budget)
+            raise
+
+        budget_data = budget.to_dict()
+        logger.info(
+            f"提示词token预算 | 提示词: {budget_data['prompt_tokens']} | 上下文窗口: {budget_data['context_window']} | "
+            f"max_tokens: {budget_data['max_output_tokens']} | 变量: {budget_data['variables']}"
+        )
+        if ai_logger:
+            ai_logger.log_token_budget(budget_data)
+        return system_prompt, user_prompt, budget_data
+
+    def _finalize_external_points_response(self, response: Optional[str],
+                                           business_type: str,
+                                           test_points_data: Dict[str, Any],
+                                           system_prompt: str,
+                                           user_prompt: str,
+                                           test_point_ids: Optional[List[int]] = None,
+                                           token_budget: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Extract, validate and annotate the test cases JSON from an LLM response.
+
+        Returns:
+            Dict[str, Any]: Test cases JSON with generation metadata
+        """
+        if response is None:
+            # Enhanced error handling for template variable issues
+            logger.error(f"LLM call failed for business_type: {business_type}")
+            logger.error(f"Template variables status: test_point_ids={test_point_ids}, template_resolution_completed=True")
+            logger.error(f"Prompt length: system={len(system_prompt)}, user={len(user_prompt)}")
+            logger.error(f"LLM client info: {self.llm_client.get_model_info()}")
+            raise RuntimeError(f"LLM call failed for {business_type} - check template variable resolution and LLM connectivity")
+
+        # Extract JSON from response
+        json_result = self.json_extractor.extract_json_from_response(response)
+        if json_result is None:
+            logger.error("测试用例JSON提取失败")
+            self._analyze_failed_response(response)
+            raise RuntimeError("JSON extraction failed - no valid JSON found in LLM response")
+
+        # Validate JSON structure
+        if not self.json_extractor.validate_json_structure(json_result):
+            logger.error("测试用例JSON结构验证失败")
+            raise RuntimeError("Test cases JSON structure validation failed")
+
+        # Add metadata
+        test_cases = json_result.get('test_cases', [])
+        test_cases_count = len(test_cases) if isinstance(test_cases, list) else 0
+        salvage = json_result.pop('salvage', None)
+
+        json_result['generation_metadata'] = {
+            'business_type': business_type,
+            'generation_stage': 'test_case',
+            'source_test_points_count': len(test_points_data.get('test_points', [])),
+            'generated_test_cases_count': test_cases_count,
+            'timestamp': time.time()
+        }
+        if token_budget:
+            json_result['generation_metadata']['token_budget'] = token_budget
+        if salvage:
+            # 响应被截断或部分元素无法解析，只恢复了部分测试用例
+            json_result['generation_metadata']['salvage'] = salvage
+
+        logger.info(f"从测试点生成测试用例成功 | 业务类型: {business_type} | "
+                   f"测试用例数量: {test_cases_count}")
+
+        return json_result
+
     def save_to_database(self, test_cases_data: Dict[str, Any], business_type: str, project_id: Optional[int] = None, test_point_ids: Optional[List[int]] = None, ai_logger=None) -> bool:
         """
         Update existing test point records with generated test case details.
@@ -454,11 +963,21 @@ class TestCaseGenerator:
                         "mapping_details": []
                     }
 
+                    # 测试用例带有 test_point_id 时按ID对应（分批生成时失败批次的测试点没有对应用例），
+                    # 否则按位置对应
+                    cases_by_point_id = {
+                        case.get('test_point_id'): case for case in test_cases_list
+                        if isinstance(case, dict) and case.get('test_point_id')
+                    }
+
                     # Update each test point record with generated test case details
                     updated_count = 0
                     for i, test_point in enumerate(existing_test_points):
-                        if i < len(test_cases_list):
-                            test_case = test_cases_list[i]
+                        if cases_by_point_id:
+                            test_case = cases_by_point_id.get(test_point.id)
+                        else:
+                            test_case = test_cases_list[i] if i < len(test_cases_list) else None
+                        if test_case is not None:
 
                             # 记录映射前的测试点数据
                             test_point_before = {
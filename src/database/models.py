@@ -136,6 +136,7 @@ class JobStatus(enum.Enum):
     RUNNING = "running"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 
@@ -227,7 +228,7 @@ class GenerationJob(Base):
     business_type = Column(String(20), nullable=False, index=True)
     status = Column(Enum(JobStatus), default=JobStatus.PENDING, nullable=False, index=True)
     # 添加generation_mode字段来区分生成模式
-    generation_mode = Column(String(20), nullable=True, index=True, comment="生成模式: test_points_only/test_cases_only")
+    generation_mode = Column(String(20), nullable=True, index=True, comment="生成模式: test_points_only/test_cases_only/points_then_cases")
     error_message = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.now, nullable=False, index=True)
     completed_at = Column(DateTime, nullable=True)
@@ -247,6 +248,16 @@ class GenerationJob(Base):
     test_points_generated = Column(Integer, default=0, nullable=True)  # Number of test points generated
     test_cases_generated = Column(Integer, default=0, nullable=True)   # Number of test cases generated
 
+    # Durable job queue: workers claim pending rows and hold them with a renewable lease
+    job_payload = Column(Text, nullable=True)                         # Job arguments (JSON string)
+    worker_id = Column(String(100), nullable=True, index=True)        # Worker currently holding the job
+    lease_expires_at = Column(DateTime, nullable=True, index=True)    # Re-claimable after this time
+    heartbeat_at = Column(DateTime, nullable=True)                    # Last lease renewal
+    attempts = Column(Integer, default=0, nullable=True)              # Number of times the job was claimed
+    priority = Column(String(20), nullable=True, index=True)          # Scheduling class: interactive / bulk
+    started_at = Column(DateTime, nullable=True)                      # When the current attempt was claimed
+    parent_job_id = Column(String(36), nullable=True, index=True)     # Bulk generation job this job belongs to
+
     # Relationships
     project = relationship("Project", back_populates="generation_jobs")
 
@@ -254,6 +265,25 @@ class GenerationJob(Base):
         return f"<GenerationJob(id={self.id}, business_type={self.business_type}, status={self.status})>"
 
 
+class GenerationCheckpoint(Base):
+    """Per-stage checkpoint of a generation job, used to resume it without repeating finished steps."""
+    __tablename__ = "generation_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String(36), ForeignKey("generation_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    stage = Column(String(20), nullable=False)                  # prompts / llm_response / items / written
+    batch_index = Column(Integer, default=0, nullable=False)    # Test case batch (0 for single-call stages)
+    data = Column(Text(length=4294967295), nullable=False)      # Checkpoint content (JSON string), LONGTEXT on MySQL
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('job_id', 'stage', 'batch_index', name='uq_generation_checkpoint'),
+    )
+
+    def __repr__(self):
+        return f"<GenerationCheckpoint(job_id={self.job_id}, stage={self.stage}, batch_index={self.batch_index})>"
+
+
 class EntityType(enum.Enum):
     """Knowledge graph entity types."""
     # Legacy entity types removed: SCENARIO, BUSINESS, INTERFACE
@@ -81,6 +81,31 @@ class DatabaseOperations:
             self.db.refresh(job)
         return job
 
+    def merge_job_metadata(self, job_id: str, updates: Dict[str, Any]) -> Optional[GenerationJob]:
+        """
+        Merge keys into the JSON generation_metadata of a job.
+
+        Args:
+            job_id (str): Job ID
+            updates (Dict[str, Any]): Keys to add or replace
+
+        Returns:
+            Optional[GenerationJob]: Updated job or None
+        """
+        job = self.db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+        if job:
+            try:
+                metadata = json.loads(job.generation_metadata) if job.generation_metadata else {}
+            except (TypeError, ValueError):
+                metadata = {}
+            if not isinstance(metadata, dict):
+                metadata = {}
+            metadata.update(updates)
+            job.generation_metadata = json.dumps(metadata, ensure_ascii=False)
+            self.db.commit()
+            self.db.refresh(job)
+        return job
+
     def get_generation_job(self, job_id: str) -> Optional[GenerationJob]:
         """
         Get generation job by ID.
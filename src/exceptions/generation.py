@@ -5,6 +5,7 @@
 提供统一的异常类型、错误代码和用户友好的错误信息。
 """
 
+import asyncio
 from enum import Enum
 from typing import Optional, Dict, Any
 import logging
@@ -134,9 +135,10 @@ class LLMError(GenerationError):
         prompt_length: int = None,
         response_length: int = None,
         retry_count: int = 0,
-        max_retries: int = 3
+        max_retries: int = 3,
+        details: Optional[Dict[str, Any]] = None
     ):
-        details = {}
+        details = dict(details or {})
         if model:
             details["model"] = model
         if prompt_length:
@@ -252,36 +254,70 @@ class JSONValidationError(GenerationError):
         self.validation_rules = validation_rules
 
 
+class TokenBudgetError(GenerationError):
+    """提示词超出模型上下文预算。"""
+
+    def __init__(self, message: str, budget: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            message=message,
+            error_code=ErrorCode.PROMPT_ERROR,
+            severity=ErrorSeverity.HIGH,
+            details={"token_budget": budget or {}},
+            recoverable=False
+        )
+        self.budget = budget or {}
+
+
+def _convert_generation_exception(func, error: Exception) -> GenerationError:
+    """将标准异常转换为对应的GenerationError。"""
+    if isinstance(error, GenerationError):
+        # 已经是GenerationError，直接返回
+        return error
+    if isinstance(error, ValueError):
+        return ValidationError(f"数据验证失败: {str(error)}")
+    if isinstance(error, ConnectionError):
+        return LLMError(f"LLM连接错误: {str(error)}", retry_count=0)
+    if isinstance(error, TimeoutError):
+        return GenerationError(
+            f"操作超时: {str(error)}",
+            error_code=ErrorCode.TIMEOUT_ERROR,
+            severity=ErrorSeverity.HIGH,
+            recoverable=True
+        )
+    logger.error(f"未预期的错误在 {func.__name__}: {str(error)}", exc_info=True)
+    return GenerationError(
+        f"内部错误: {str(error)}",
+        error_code=ErrorCode.INTERNAL_ERROR,
+        severity=ErrorSeverity.CRITICAL,
+        details={"function": func.__name__, "original_error": str(error)}
+    )
+
+
 def handle_generation_error(func):
     """
     装饰器：自动处理生成函数中的异常。
 
     将标准异常转换为GenerationError，并记录错误信息。
+    同时支持同步函数和协程函数。
     """
+    if asyncio.iscoroutinefunction(func):
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except GenerationError:
+                raise
+            except Exception as e:
+                raise _convert_generation_exception(func, e)
+
+        return async_wrapper
+
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
         except GenerationError:
             # 已经是GenerationError，直接重新抛出
             raise
-        except ValueError as e:
-            raise ValidationError(f"数据验证失败: {str(e)}")
-        except ConnectionError as e:
-            raise LLMError(f"LLM连接错误: {str(e)}", retry_count=0)
-        except TimeoutError as e:
-            raise GenerationError(
-                f"操作超时: {str(e)}",
-                error_code=ErrorCode.TIMEOUT_ERROR,
-                severity=ErrorSeverity.HIGH,
-                recoverable=True
-            )
         except Exception as e:
-            logger.error(f"未预期的错误在 {func.__name__}: {str(e)}", exc_info=True)
-            raise GenerationError(
-                f"内部错误: {str(e)}",
-                error_code=ErrorCode.INTERNAL_ERROR,
-                severity=ErrorSeverity.CRITICAL,
-                details={"function": func.__name__, "original_error": str(e)}
-            )
-
-    return wrapper
\ No newline at end of file
+            raise _convert_generation_exception(func, e)
+
+    return wrapper
@@ -0,0 +1,138 @@
+"""
+Hedged LLM requests.
+
+少数极慢的补全决定了生成耗时的长尾。对冲模式下，如果第一个请求在近期延迟的
+某个分位数内还没有完成（流式请求为首个token），就再发出一个相同的请求（优先发往
+其他端点），采用先返回的有效结果并取消另一个。这里记录延迟样本和对冲统计。
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from ..utils.config import Config
+
+
+class HedgeTracker:
+    """Rolling latency samples and hedging counters shared by all clients."""
+
+    def __init__(self, percentile: float = 95.0, min_delay: float = 5.0,
+                 default_delay: float = 60.0, min_samples: int = 20, window: int = 200):
+        """
+        Initialize the tracker.
+
+        Args:
+            percentile (float): Latency percentile after which a hedge is sent
+            min_delay (float): Lower bound of the hedge delay in seconds
+            default_delay (float): Hedge delay used until min_samples latencies are known
+            min_samples (int): Samples needed before the percentile is trusted
+            window (int): Number of recent latencies kept per kind
+        """
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {
+            'completion': deque(maxlen=window),
+            'first_token': deque(maxlen=window)
+        }
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.wasted_tokens = 0
+
+    def record_latency(self, kind: str, seconds: float) -> None:
+        """
+        Add a latency sample.
+
+        Args:
+            kind (str): 'completion' for whole responses, 'first_token' for streams
+            seconds (float): Observed latency
+        """
+        with self._lock:
+            self._samples[kind].append(seconds)
+
+    def hedge_delay(self, kind: str) -> float:
+        """
+        Get how long to wait for the first request before hedging.
+
+        Args:
+            kind (str): 'completion' or 'first_token'
+
+        Returns:
+            float: Delay in seconds
+        """
+        with self._lock:
+            samples = sorted(self._samples[kind])
+        if len(samples) < self.min_samples:
+            return max(self.min_delay, self.default_delay)
+        index = max(0, math.ceil(self.percentile / 100.0 * len(samples)) - 1)
+        return max(self.min_delay, samples[index])
+
+    def record_call(self, hedged: bool, hedge_won: bool = False, wasted_tokens: int = 0) -> None:
+        """
+        Count one (possibly hedged) call.
+
+        Args:
+            hedged (bool): Whether a duplicate request was sent
+            hedge_won (bool): Whether the duplicate's result was used
+            wasted_tokens (int): Tokens spent on the discarded request
+        """
+        with self._lock:
+            self.calls += 1
+            if hedged:
+                self.hedged += 1
+            if hedge_won:
+                self.hedge_wins += 1
+            self.wasted_tokens += wasted_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hedging counters and current hedge delays.
+
+        Returns:
+            Dict[str, Any]: Hedge rate, wins, wasted tokens and delays
+        """
+        delays = {kind: round(self.hedge_delay(kind), 3) for kind in self._samples}
+        with self._lock:
+            return {
+                'enabled': True,
+                'percentile': self.percentile,
+                'calls': self.calls,
+                'hedged': self.hedged,
+                'hedge_rate': round(self.hedged / self.calls, 4) if self.calls else 0.0,
+                'hedge_wins': self.hedge_wins,
+                'wasted_tokens': self.wasted_tokens,
+                'samples': {kind: len(samples) for kind, samples in self._samples.items()},
+                'hedge_delay_seconds': delays
+            }
+
+
+_hedge_tracker: Optional[HedgeTracker] = None
+_hedge_tracker_lock = threading.Lock()
+
+
+def get_hedge_tracker(config: Config) -> Optional[HedgeTracker]:
+    """
+    Get the process-wide hedge tracker, or None when hedging is disabled.
+
+    Args:
+        config (Config): Configuration object
+
+    Returns:
+        Optional[HedgeTracker]: Shared tracker instance
+    """
+    global _hedge_tracker
+    if not config.llm_hedging_enabled:
+        return None
+    if _hedge_tracker is None:
+        with _hedge_tracker_lock:
+            if _hedge_tracker is None:
+                _hedge_tracker = HedgeTracker(
+                    percentile=config.llm_hedge_percentile,
+                    min_delay=config.llm_hedge_min_delay_seconds,
+                    default_delay=config.llm_hedge_default_delay_seconds
+                )
+    return _hedge_tracker
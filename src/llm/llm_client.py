@@ -2,16 +2,78 @@
 LLM API client for interacting with language models with enhanced error handling and retry mechanisms.
 """
 
+import asyncio
+import email.utils
+import inspect
 import logging
+import re
 import time
 import random
+import weakref
+import httpx
 import openai
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Awaitable, Callable, Iterable, Optional, Set, Tuple
 from ..utils.config import Config
 from ..exceptions.generation import LLMError, handle_generation_error
+from ..core.incremental_json_parser import IncrementalJSONArrayParser, DEFAULT_ITEM_KEYS
+from .response_cache import get_response_cache
+from .token_budget import MESSAGE_OVERHEAD_TOKENS, TokenBudget, TokenBudgeter
+from .rate_limiter import get_rate_limiter
+from .router import LLMEndpoint, get_llm_router
+from .hedging import get_hedge_tracker
+from .structured_output import (
+    delta_text, is_rejected_request, message_text, structured_output_kwargs, uses_structured_output,
+    without_structured_output
+)
+from ..core.json_extractor import JSONExtractor
 
 logger = logging.getLogger(__name__)
 
+# 响应因 max_tokens 被截断时，续写请求附加的用户消息
+CONTINUATION_PROMPT = (
+    "上一条回复因长度限制被截断。请从截断处继续输出剩余内容，"
+    "不要重复已输出的部分，不要添加任何解释或代码块标记。"
+)
+
+# 拼接续写内容时检查的最小/最大重叠长度（字符）
+_MIN_CONTINUATION_OVERLAP = 20
+_MAX_CONTINUATION_OVERLAP = 400
+
+# 每个事件循环共享一个 httpx.AsyncClient 连接池
+_shared_async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_shared_async_http_client(config: Config) -> httpx.AsyncClient:
+    """
+    Get the pooled httpx.AsyncClient for the running event loop.
+
+    Args:
+        config (Config): Configuration object providing pool limits and timeout
+
+    Returns:
+        httpx.AsyncClient: Shared async HTTP client
+    """
+    loop = asyncio.get_running_loop()
+    http_client = _shared_async_http_clients.get(loop)
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config.llm_max_connections,
+                max_keepalive_connections=config.llm_max_keepalive_connections
+            ),
+            timeout=httpx.Timeout(config.llm_timeout, connect=10.0)
+        )
+        _shared_async_http_clients[loop] = http_client
+    return http_client
+
+
+async def close_shared_async_http_client() -> None:
+    """Close the pooled httpx.AsyncClient of the running event loop, if any."""
+    loop = asyncio.get_running_loop()
+    http_client = _shared_async_http_clients.pop(loop, None)
+    if http_client is not None and not http_client.is_closed:
+        await http_client.aclose()
+
 
 class LLMClient:
     """Enhanced LLM client with comprehensive error handling and retry mechanisms."""
@@ -29,6 +91,26 @@ class LLMClient:
             base_url=config.api_base_url
         )
 
+        # Endpoint pool shared by all clients; each call goes to the healthiest endpoint
+        self.router = get_llm_router(config)
+
+        # Request configuration; max_tokens of each request comes from its token budget
+        self.token_budgeter = TokenBudgeter(config)
+        self.max_output_tokens = self.token_budgeter.max_output_tokens
+        self.request_timeout = config.llm_timeout
+
+        # Optional structured output mode for calls that name an output schema (None when off)
+        self.structured_output = config.llm_structured_output
+
+        # Optional content-addressed response cache (None when disabled)
+        self.response_cache = get_response_cache(config)
+
+        # Optional process-wide RPM/TPM limiter shared by all clients (None when unlimited)
+        self.rate_limiter = get_rate_limiter(config)
+
+        # Optional hedging of slow async calls (None when disabled)
+        self.hedge_tracker = get_hedge_tracker(config)
+
         # Retry configuration
         self.default_max_retries = 3
         self.default_base_delay = 1.0  # seconds
@@ -43,7 +125,9 @@ class LLMClient:
         max_retries: Optional[int] = None,
         ai_logger=None,
         resolved_system_prompt: Optional[str] = None,
-        resolved_requirements_prompt: Optional[str] = None
+        resolved_requirements_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        output_schema: Optional[str] = None
     ) -> Optional[str]:
         """
         Generate test cases using the LLM with enhanced error handling.
@@ -55,6 +139,9 @@ class LLMClient:
             ai_logger: AI logger instance for logging
             resolved_system_prompt (Optional[str]): Resolved system prompt with template variables replaced
             resolved_requirements_prompt (Optional[str]): Resolved requirements prompt with template variables replaced
+            use_cache (bool): Whether the response cache may be used (when enabled)
+            output_schema (Optional[str]): Response schema ('test_points' / 'test_cases') used when
+                LLM_STRUCTURED_OUTPUT is enabled
 
         Returns:
             Optional[str]: LLM response content or None if failed
@@ -64,8 +151,829 @@ class LLMClient:
         """
         max_attempts = max_retries or self.default_max_retries
         start_time = time.time()
-        base_tokens = 80000
 
+        final_system_prompt, final_requirements_prompt, prompt_length, budget = self._prepare_prompts(
+            system_prompt, requirements_prompt, ai_logger,
+            resolved_system_prompt, resolved_requirements_prompt
+        )
+        estimated_tokens = budget.prompt_tokens
+        request_kwargs = self._build_request_kwargs(
+            final_system_prompt, final_requirements_prompt, budget.max_output_tokens, output_schema
+        )
+        request_tokens = estimated_tokens + request_kwargs["max_tokens"]
+
+        last_error = None
+        failed_endpoints = set()
+        looked_up = set()
+
+        for attempt in range(max_attempts + 1):  # +1 for the initial attempt
+            endpoint = self.router.select(exclude=failed_endpoints)
+            try:
+                cached = self._cached_response(request_kwargs, endpoint, use_cache, looked_up,
+                                               prompt_length, ai_logger)
+                if cached is not None:
+                    return cached
+
+                logger.info(f"LLM调用尝试 {attempt + 1}/{max_attempts + 1} - 端点: {endpoint.name} - 模型: {endpoint.model} - 预估tokens: {estimated_tokens}")
+
+                # Back off only when retrying an endpoint that already failed; otherwise fail over at once
+                if attempt > 0 and endpoint.name in failed_endpoints:
+                    delay = self._calculate_retry_delay(attempt, last_error)
+                    logger.info(f"等待 {delay:.2f} 秒后重试...")
+                    time.sleep(delay)
+
+                reserved = self.rate_limiter.acquire_sync(request_tokens) if self.rate_limiter else 0
+                api_start = time.time()
+                response = self._create(endpoint, request_kwargs)
+                self._reconcile_rate_limit(reserved, response)
+
+                content = self._process_response(
+                    response, attempt, max_attempts, start_time, api_start,
+                    prompt_length, estimated_tokens, ai_logger,
+                    max_tokens=request_kwargs["max_tokens"], endpoint=endpoint
+                )
+                self.router.record_success(endpoint, time.time() - api_start)
+                finish_reason = self._finish_reason(response)
+                if finish_reason == 'length':
+                    content, finish_reason = self._continue_truncated(
+                        endpoint, request_kwargs, content, estimated_tokens, ai_logger
+                    )
+                if use_cache:
+                    self._store_in_cache(request_kwargs, endpoint, content, finish_reason)
+                return content
+
+            except Exception as e:
+                last_error = e
+                self._record_endpoint_failure(endpoint, e, failed_endpoints)
+                self._handle_attempt_error(e, attempt, max_attempts)
+            finally:
+                self.router.release_trial(endpoint)
+
+        # This should not be reached, but just in case
+        raise LLMError(
+            f"LLM调用失败，已达到最大重试次数 {max_attempts}",
+            model=self.config.model,
+            retry_count=max_attempts
+        )
+
+    @handle_generation_error
+    async def agenerate_test_cases(
+        self,
+        system_prompt: str,
+        requirements_prompt: str,
+        max_retries: Optional[int] = None,
+        ai_logger=None,
+        resolved_system_prompt: Optional[str] = None,
+        resolved_requirements_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        max_tokens: Optional[int] = None,
+        output_schema: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Asynchronous version of generate_test_cases.
+
+        使用 AsyncOpenAI 和进程内共享的 httpx 连接池发起请求，重试退避使用
+        asyncio.sleep，因此等待LLM响应期间不会阻塞事件循环。
+
+        Args:
+            system_prompt (str): Original system prompt for the LLM (may contain template variables)
+            requirements_prompt (str): Original requirements prompt for the LLM (may contain template variables)
+            max_retries (Optional[int]): Maximum number of retry attempts
+            ai_logger: AI logger instance for logging
+            resolved_system_prompt (Optional[str]): Resolved system prompt with template variables replaced
+            resolved_requirements_prompt (Optional[str]): Resolved requirements prompt with template variables replaced
+            use_cache (bool): Whether the response cache may be used (when enabled)
+            max_tokens (Optional[int]): Upper bound for the output tokens derived from the token budget
+            output_schema (Optional[str]): Response schema ('test_points' / 'test_cases') used when
+                LLM_STRUCTURED_OUTPUT is enabled
+
+        Returns:
+            Optional[str]: LLM response content or None if failed
+
+        Raises:
+            LLMError: When all retry attempts fail
+        """
+        max_attempts = max_retries or self.default_max_retries
+        start_time = time.time()
+
+        final_system_prompt, final_requirements_prompt, prompt_length, budget = self._prepare_prompts(
+            system_prompt, requirements_prompt, ai_logger,
+            resolved_system_prompt, resolved_requirements_prompt
+        )
+        estimated_tokens = budget.prompt_tokens
+        request_kwargs = self._build_request_kwargs(
+            final_system_prompt, final_requirements_prompt,
+            min(budget.max_output_tokens, max_tokens) if max_tokens else budget.max_output_tokens,
+            output_schema
+        )
+        request_tokens = estimated_tokens + request_kwargs["max_tokens"]
+
+        last_error = None
+        failed_endpoints = set()
+        looked_up = set()
+
+        for attempt in range(max_attempts + 1):  # +1 for the initial attempt
+            endpoint = self.router.select(exclude=failed_endpoints)
+            try:
+                cached = await asyncio.to_thread(
+                    self._cached_response, request_kwargs, endpoint, use_cache, looked_up, prompt_length, ai_logger
+                )
+                if cached is not None:
+                    return cached
+
+                logger.info(f"异步LLM调用尝试 {attempt + 1}/{max_attempts + 1} - 端点: {endpoint.name} - 模型: {endpoint.model} - 预估tokens: {estimated_tokens}")
+
+                if attempt > 0 and endpoint.name in failed_endpoints:
+                    delay = self._calculate_retry_delay(attempt, last_error)
+                    logger.info(f"等待 {delay:.2f} 秒后重试...")
+                    await asyncio.sleep(delay)
+
+                api_start = time.time()
+                if self.hedge_tracker:
+                    endpoint, (response, reserved), api_start = await self._ahedged(
+                        endpoint,
+                        lambda target: self._acreate(target, request_kwargs, request_tokens),
+                        'completion', estimated_tokens, failed_endpoints,
+                        is_valid=lambda result: self._is_extractable(result[0])
+                    )
+                else:
+                    response, reserved = await self._acreate(endpoint, request_kwargs, request_tokens)
+                self._reconcile_rate_limit(reserved, response)
+
+                content = self._process_response(
+                    response, attempt, max_attempts, start_time, api_start,
+                    prompt_length, estimated_tokens, ai_logger,
+                    max_tokens=request_kwargs["max_tokens"], endpoint=endpoint
+                )
+                self.router.record_success(endpoint, time.time() - api_start)
+                finish_reason = self._finish_reason(response)
+                if finish_reason == 'length':
+                    content, finish_reason = await self._acontinue_truncated(
+                        endpoint, request_kwargs, content, estimated_tokens, ai_logger
+                    )
+                if use_cache:
+                    await asyncio.to_thread(self._store_in_cache, request_kwargs, endpoint, content, finish_reason)
+                return content
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                last_error = e
+                self._record_endpoint_failure(endpoint, e, failed_endpoints)
+                self._handle_attempt_error(e, attempt, max_attempts)
+            finally:
+                # 取消或未计入健康度的错误不会结束半开试探，在此释放
+                self.router.release_trial(endpoint)
+
+        raise LLMError(
+            f"LLM调用失败，已达到最大重试次数 {max_attempts}",
+            model=self.config.model,
+            retry_count=max_attempts
+        )
+
+    @handle_generation_error
+    async def astream_test_cases(
+        self,
+        system_prompt: str,
+        requirements_prompt: str,
+        on_item: Optional[Callable[[str, int, Dict[str, Any]], Any]] = None,
+        item_keys: Iterable[str] = DEFAULT_ITEM_KEYS,
+        max_retries: Optional[int] = None,
+        ai_logger=None,
+        resolved_system_prompt: Optional[str] = None,
+        resolved_requirements_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        max_tokens: Optional[int] = None,
+        output_schema: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Generate test cases with a streaming completion.
+
+        响应以 stream=True 方式接收，并通过增量解析器识别 item_keys 数组中已闭合的
+        元素，每完成一个元素立即调用 on_item(key, index, item)（可以是协程函数）。
+        返回值与 agenerate_test_cases 相同，为完整的响应文本。
+
+        只有在尚未产出任何元素时才会重试，避免向调用方重复推送同一元素。
+
+        Args:
+            system_prompt (str): Original system prompt for the LLM (may contain template variables)
+            requirements_prompt (str): Original requirements prompt for the LLM (may contain template variables)
+            on_item (Optional[Callable]): Callback for every completed array element
+            item_keys (Iterable[str]): Array keys whose elements should be emitted
+            max_retries (Optional[int]): Maximum number of retry attempts
+            ai_logger: AI logger instance for logging
+            resolved_system_prompt (Optional[str]): Resolved system prompt with template variables replaced
+            resolved_requirements_prompt (Optional[str]): Resolved requirements prompt with template variables replaced
+            use_cache (bool): Whether the response cache may be used (when enabled)
+            max_tokens (Optional[int]): Upper bound for the output tokens derived from the token budget
+            output_schema (Optional[str]): Response schema ('test_points' / 'test_cases') used when
+                LLM_STRUCTURED_OUTPUT is enabled
+
+        Returns:
+            Optional[str]: Full LLM response content
+
+        Raises:
+            LLMError: When all retry attempts fail
+        """
+        max_attempts = max_retries or self.default_max_retries
+        start_time = time.time()
+
+        final_system_prompt, final_requirements_prompt, prompt_length, budget = self._prepare_prompts(
+            system_prompt, requirements_prompt, ai_logger,
+            resolved_system_prompt, resolved_requirements_prompt
+        )
+        estimated_tokens = budget.prompt_tokens
+        request_kwargs = self._build_request_kwargs(
+            final_system_prompt, final_requirements_prompt,
+            min(budget.max_output_tokens, max_tokens) if max_tokens else budget.max_output_tokens,
+            output_schema
+        )
+        request_tokens = estimated_tokens + request_kwargs["max_tokens"]
+        request_kwargs["stream"] = True
+
+        last_error = None
+        failed_endpoints = set()
+        looked_up = set()
+        cached = None
+
+        for attempt in range(max_attempts + 1):  # +1 for the initial attempt
+            parser = IncrementalJSONArrayParser(item_keys)
+            emitted = 0
+            endpoint = self.router.select(exclude=failed_endpoints)
+            try:
+                cached = await asyncio.to_thread(
+                    self._cached_response, request_kwargs, endpoint, use_cache, looked_up, prompt_length, ai_logger
+                )
+                if cached is not None:
+                    break
+
+                logger.info(f"流式LLM调用尝试 {attempt + 1}/{max_attempts + 1} - 端点: {endpoint.name} - 模型: {endpoint.model} - 预估tokens: {estimated_tokens}")
+
+                if attempt > 0 and endpoint.name in failed_endpoints:
+                    delay = self._calculate_retry_delay(attempt, last_error)
+                    logger.info(f"等待 {delay:.2f} 秒后重试...")
+                    await asyncio.sleep(delay)
+
+                api_start = time.time()
+                first_item_time = None
+                finish_reason = None
+                if self.hedge_tracker:
+                    # 流式请求按首个token的延迟对冲，收到首个数据块后不再切换
+                    endpoint, (stream, reserved, first_chunk), api_start = await self._ahedged(
+                        endpoint,
+                        lambda target: self._aopen_stream(target, request_kwargs, request_tokens),
+                        'first_token', estimated_tokens, failed_endpoints
+                    )
+                else:
+                    stream, reserved = await self._acreate(endpoint, request_kwargs, request_tokens)
+                    first_chunk = None
+
+                try:
+                    async for chunk in self._iter_stream(first_chunk, stream):
+                        if not chunk.choices:
+                            continue
+                        choice = chunk.choices[0]
+                        if choice.finish_reason:
+                            finish_reason = choice.finish_reason
+                        delta = delta_text(choice.delta)
+                        if not delta:
+                            continue
+
+                        for key, index, item in parser.feed(delta):
+                            emitted += 1
+                            if first_item_time is None:
+                                first_item_time = time.time() - api_start
+                                logger.info(f"流式生成首个元素耗时: {first_item_time:.2f}s")
+                            if on_item:
+                                result = on_item(key, index, item)
+                                if inspect.isawaitable(result):
+                                    await result
+                except asyncio.CancelledError:
+                    # 任务被取消：关闭流以中止HTTP请求，按已收到的内容结算预留的token
+                    await stream.close()
+                    if self.rate_limiter:
+                        self.rate_limiter.reconcile(
+                            reserved, estimated_tokens + self.token_budgeter.counter.count(parser.text)
+                        )
+                    raise
+
+                content = parser.text
+                api_time = time.time() - api_start
+                self.router.record_success(endpoint, api_time)
+                if self.rate_limiter:
+                    # 流式响应没有usage，按提示词和输出文本估算实际用量
+                    self.rate_limiter.reconcile(
+                        reserved, estimated_tokens + self.token_budgeter.counter.count(content)
+                    )
+
+                if not content:
+                    raise LLMError(
+                        "LLM返回了空响应",
+                        model=self.config.model,
+                        response_length=0,
+                        retry_count=attempt
+                    )
+
+                if finish_reason == 'length':
+                    async def emit(addition: str):
+                        nonlocal emitted
+                        for key, index, item in parser.feed(addition):
+                            emitted += 1
+                            if on_item:
+                                result = on_item(key, index, item)
+                                if inspect.isawaitable(result):
+                                    await result
+
+                    content, finish_reason = await self._acontinue_truncated(
+                        endpoint, request_kwargs, content, estimated_tokens, ai_logger, on_piece=emit
+                    )
+
+                logger.info(
+                    f"流式LLM调用成功 - 尝试次数: {attempt + 1} - "
+                    f"API时间: {api_time:.2f}s - "
+                    f"总时间: {time.time() - start_time:.2f}s - "
+                    f"元素数: {emitted} - 结束原因: {finish_reason}"
+                )
+
+                if ai_logger:
+                    ai_logger.log_ai_response_raw(content)
+                    ai_logger.log_llm_call_details({
+                        "model": endpoint.model,
+                        "endpoint": endpoint.name,
+                        "attempt": attempt + 1,
+                        "max_retries": max_attempts,
+                        "api_time": api_time,
+                        "total_time": time.time() - start_time,
+                        "prompt_length": prompt_length,
+                        "estimated_tokens": estimated_tokens,
+                        "streaming": {
+                            "items_emitted": emitted,
+                            "item_counts": dict(parser.item_counts),
+                            "time_to_first_item": first_item_time,
+                            "finish_reason": finish_reason
+                        },
+                        "parameters": {
+                            "max_tokens": request_kwargs["max_tokens"],
+                            "temperature": 0,
+                            "timeout": self.request_timeout,
+                            "stream": True
+                        }
+                    })
+
+                if use_cache:
+                    await asyncio.to_thread(self._store_in_cache, request_kwargs, endpoint, content, finish_reason)
+                return content
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                last_error = e
+                self._record_endpoint_failure(endpoint, e, failed_endpoints)
+                if emitted:
+                    # 已向调用方推送过元素，重试会导致重复，直接失败
+                    raise LLMError(
+                        f"流式LLM调用在产出 {emitted} 个元素后中断: {str(e)}",
+                        model=self.config.model,
+                        response_length=len(parser.text),
+                        retry_count=attempt,
+                        details={"error_type": "stream_interrupted", "items_emitted": emitted}
+                    )
+                self._handle_attempt_error(e, attempt, max_attempts)
+            finally:
+                self.router.release_trial(endpoint)
+
+        if cached is not None:
+            # 缓存命中时仍按元素回调，保持调用方的推送/保存流程一致
+            if on_item:
+                for key, index, item in IncrementalJSONArrayParser(item_keys).feed(cached):
+                    result = on_item(key, index, item)
+                    if inspect.isawaitable(result):
+                        await result
+            return cached
+
+        raise LLMError(
+            f"LLM调用失败，已达到最大重试次数 {max_attempts}",
+            model=self.config.model,
+            retry_count=max_attempts
+        )
+
+    def _continuation_kwargs(self, request_kwargs: Dict[str, Any], partial: str,
+                             prompt_tokens: int) -> Optional[Dict[str, Any]]:
+        """
+        Build the request that continues a truncated completion.
+
+        截断的输出作为assistant消息附加到原对话之后，再追加一条要求从截断处继续的用户消息。
+        max_tokens 不超过原请求，并受上下文窗口剩余空间限制。续写的是半截JSON文本，
+        因此不带结构化输出参数。
+
+        Returns:
+            Optional[Dict[str, Any]]: Request parameters, or None when the context has too little room left
+        """
+        counter = self.token_budgeter.counter
+        used_tokens = prompt_tokens + counter.count(partial) + counter.count(CONTINUATION_PROMPT) + MESSAGE_OVERHEAD_TOKENS
+        margin = 0 if counter.exact else int(used_tokens * 0.1)
+        max_tokens = min(request_kwargs["max_tokens"], self.token_budgeter.context_window - used_tokens - margin)
+        if max_tokens < self.token_budgeter.min_output_tokens:
+            return None
+        continuation = dict(without_structured_output(request_kwargs), max_tokens=max_tokens, messages=request_kwargs["messages"] + [
+            {"role": "assistant", "content": partial},
+            {"role": "user", "content": CONTINUATION_PROMPT}
+        ])
+        continuation.pop("stream", None)
+        return continuation
+
+    @staticmethod
+    def _stitch_continuation(partial: str, piece: str) -> str:
+        """
+        Return the part of a continuation that should be appended to the partial output.
+
+        去掉续写开头重新打开的代码块标记，以及与已有输出末尾重复的部分。
+        """
+        piece = re.sub(r'^\s*```(?:json)?[ \t]*\n?', '', piece)
+        longest = min(len(partial), len(piece), _MAX_CONTINUATION_OVERLAP)
+        for size in range(longest, _MIN_CONTINUATION_OVERLAP - 1, -1):
+            if partial.endswith(piece[:size]):
+                return piece[size:]
+        return piece
+
+    def _record_continuation(self, round_index: int, addition: str, finish_reason: Optional[str],
+                             content: str, ai_logger=None) -> None:
+        """Log one continuation round."""
+        logger.info(
+            f"截断响应续写 - 第 {round_index + 1} 轮 - 新增长度: {len(addition)} - "
+            f"总长度: {len(content)} - 结束原因: {finish_reason}"
+        )
+        if ai_logger and finish_reason != 'length':
+            ai_logger.log_ai_response_raw(content)
+
+    def _continue_truncated(self, endpoint: LLMEndpoint, request_kwargs: Dict[str, Any], content: str,
+                            prompt_tokens: int, ai_logger=None) -> Tuple[str, Optional[str]]:
+        """
+        Continue a completion cut off by max_tokens (finish_reason == "length").
+
+        截断的输出作为上下文发回模型要求继续，各轮输出拼接后返回，最多 LLM_MAX_CONTINUATIONS 轮。
+        某一轮失败或上下文剩余不足时返回已拼接的内容，由调用方按截断响应处理。
+
+        Returns:
+            Tuple[str, Optional[str]]: (stitched content, finish_reason of the last round)
+        """
+        finish_reason = 'length'
+        for round_index in range(self.config.llm_max_continuations):
+            continuation = self._continuation_kwargs(request_kwargs, content, prompt_tokens)
+            if continuation is None:
+                logger.warning("上下文剩余空间不足，停止续写截断的响应")
+                break
+            request_tokens = prompt_tokens + self.token_budgeter.counter.count(content) + continuation["max_tokens"]
+            try:
+                reserved = self.rate_limiter.acquire_sync(request_tokens) if self.rate_limiter else 0
+                response = endpoint.client.chat.completions.create(**dict(continuation, model=endpoint.model))
+                self._reconcile_rate_limit(reserved, response)
+            except Exception as e:
+                logger.warning(f"续写截断的响应失败（第 {round_index + 1} 轮）: {e}")
+                break
+            piece = message_text(response.choices[0].message) if response.choices else None
+            if not piece:
+                break
+            finish_reason = self._finish_reason(response)
+            addition = self._stitch_continuation(content, piece)
+            content += addition
+            self._record_continuation(round_index, addition, finish_reason, content, ai_logger)
+            if finish_reason != 'length':
+                break
+        return content, finish_reason
+
+    async def _acontinue_truncated(self, endpoint: LLMEndpoint, request_kwargs: Dict[str, Any], content: str,
+                                   prompt_tokens: int, ai_logger=None,
+                                   on_piece: Optional[Callable[[str], Awaitable[Any]]] = None
+                                   ) -> Tuple[str, Optional[str]]:
+        """
+        Asynchronous version of _continue_truncated.
+
+        续写请求不使用流式；每轮拼接的新增内容交给 on_piece（流式调用用它继续解析和推送元素）。
+        """
+        finish_reason = 'length'
+        for round_index in range(self.config.llm_max_continuations):
+            continuation = self._continuation_kwargs(request_kwargs, content, prompt_tokens)
+            if continuation is None:
+                logger.warning("上下文剩余空间不足，停止续写截断的响应")
+                break
+            request_tokens = prompt_tokens + self.token_budgeter.counter.count(content) + continuation["max_tokens"]
+            try:
+                response, reserved = await self._acreate(endpoint, continuation, request_tokens)
+                self._reconcile_rate_limit(reserved, response)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"续写截断的响应失败（第 {round_index + 1} 轮）: {e}")
+                break
+            piece = message_text(response.choices[0].message) if response.choices else None
+            if not piece:
+                break
+            finish_reason = self._finish_reason(response)
+            addition = self._stitch_continuation(content, piece)
+            content += addition
+            self._record_continuation(round_index, addition, finish_reason, content, ai_logger)
+            if on_piece:
+                await on_piece(addition)
+            if finish_reason != 'length':
+                break
+        return content, finish_reason
+
+    def _cache_key(self, request_kwargs: Dict[str, Any], model: str) -> Optional[str]:
+        """
+        Build the response cache key for a request, or None when caching is disabled.
+
+        Args:
+            request_kwargs (Dict[str, Any]): Parameters from _build_request_kwargs
+            model (str): Model of the endpoint serving the request (endpoints may use different models)
+
+        Returns:
+            Optional[str]: Cache key
+        """
+        if self.response_cache is None:
+            return None
+        messages = request_kwargs["messages"]
+        return self.response_cache.make_key(
+            model, messages[0]["content"], messages[1]["content"], request_kwargs["max_tokens"]
+        )
+
+    def _cached_response(self, request_kwargs: Dict[str, Any], endpoint: LLMEndpoint, use_cache: bool,
+                         looked_up: Set[str], prompt_length: int, ai_logger=None) -> Optional[str]:
+        """
+        Look up the cached response for the selected endpoint's model.
+
+        每个键在一次调用中只查询一次，故障转移到同一模型的其他端点时不会重复查询。
+
+        Args:
+            looked_up (Set[str]): Keys already looked up during this call
+
+        Returns:
+            Optional[str]: Cached response content, or None on miss
+        """
+        cache_key = self._cache_key(request_kwargs, endpoint.model) if use_cache else None
+        if not cache_key or cache_key in looked_up:
+            return None
+        looked_up.add(cache_key)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            self._log_cache_hit(cached, cache_key, endpoint.model, prompt_length, ai_logger)
+        return cached
+
+    def _store_in_cache(self, request_kwargs: Dict[str, Any], endpoint: LLMEndpoint, content: str,
+                        finish_reason: Optional[str]) -> bool:
+        """
+        Cache a complete response whose JSON the generators can extract.
+
+        截断的响应和无法提取JSON的响应不写入缓存，否则后续相同请求会一直命中这份坏结果。
+        键和条目中的模型取自实际返回响应的端点。
+
+        Returns:
+            bool: Whether the response was cached
+        """
+        cache_key = self._cache_key(request_kwargs, endpoint.model)
+        if not cache_key or finish_reason == 'length' or not content:
+            return False
+        if JSONExtractor.extract_json_from_response(content) is None:
+            logger.warning(f"LLM响应中无法提取JSON，不写入缓存 - 键: {cache_key[:12]}")
+            return False
+        self.response_cache.set(cache_key, content, endpoint.model)
+        return True
+
+    def _log_cache_hit(self, content: str, cache_key: str, model: str, prompt_length: int, ai_logger=None) -> None:
+        """Log a response served from the cache."""
+        logger.info(f"LLM响应缓存命中 - 模型: {model} - 键: {cache_key[:12]} - 响应长度: {len(content)}")
+        if ai_logger:
+            ai_logger.log_ai_response_raw(content)
+            ai_logger.log_llm_call_details({
+                "model": model,
+                "cache_hit": True,
+                "cache_key": cache_key,
+                "prompt_length": prompt_length,
+                "response_length": len(content)
+            })
+
+    @staticmethod
+    def _finish_reason(response) -> Optional[str]:
+        """Get finish_reason of the first choice of a chat completion."""
+        if not response.choices:
+            return None
+        return getattr(response.choices[0], 'finish_reason', None)
+
+    async def _acreate(self, endpoint: LLMEndpoint, request_kwargs: Dict[str, Any],
+                       request_tokens: int) -> Tuple[Any, int]:
+        """
+        Send one chat completion request to an endpoint after rate limit admission.
+
+        结构化输出被端点拒绝时的回退与 _create 相同。
+
+        Returns:
+            Tuple[Any, int]: (completion or stream, tokens reserved with the rate limiter)
+        """
+        client = self._get_async_client(endpoint)
+        reserved = await self.rate_limiter.acquire(request_tokens) if self.rate_limiter else 0
+        request_kwargs = self._endpoint_kwargs(endpoint, request_kwargs)
+        try:
+            try:
+                response = await client.chat.completions.create(**dict(request_kwargs, model=endpoint.model))
+            except Exception as e:
+                if not (uses_structured_output(request_kwargs) and is_rejected_request(e)):
+                    raise
+                response = await client.chat.completions.create(
+                    **dict(without_structured_output(request_kwargs), model=endpoint.model)
+                )
+                self._disable_structured_output(endpoint, e)
+        except asyncio.CancelledError:
+            # 请求被取消（任务取消或对冲落败）时没有输出，退回为输出预留的token
+            self._refund_output_reservation(reserved, request_kwargs, request_tokens)
+            raise
+        return response, reserved
+
+    async def _aopen_stream(self, endpoint: LLMEndpoint, request_kwargs: Dict[str, Any],
+                            request_tokens: int) -> Tuple[Any, int, Any]:
+        """
+        Open a streaming request and wait for its first chunk.
+
+        Returns:
+            Tuple[Any, int, Any]: (stream, reserved tokens, first chunk or None)
+        """
+        stream, reserved = await self._acreate(endpoint, request_kwargs, request_tokens)
+        try:
+            first_chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            first_chunk = None
+        except BaseException as e:
+            await stream.close()
+            if isinstance(e, asyncio.CancelledError):
+                self._refund_output_reservation(reserved, request_kwargs, request_tokens)
+            raise
+        return stream, reserved, first_chunk
+
+    @staticmethod
+    async def _iter_stream(first_chunk, stream):
+        """Yield an already received first chunk followed by the rest of the stream."""
+        if first_chunk is not None:
+            yield first_chunk
+        async for chunk in stream:
+            yield chunk
+
+    @staticmethod
+    def _is_extractable(response) -> bool:
+        """Whether a completion contains JSON that the generators can extract."""
+        content = message_text(response.choices[0].message) if response.choices else None
+        return bool(content) and JSONExtractor.extract_json_from_response(content) is not None
+
+    async def _ahedged(
+        self,
+        endpoint: LLMEndpoint,
+        launch: Callable[[LLMEndpoint], Awaitable[Any]],
+        kind: str,
+        prompt_tokens: int,
+        failed_endpoints: Set[str],
+        is_valid: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[LLMEndpoint, Any, float]:
+        """
+        Run launch(endpoint) and hedge it with a duplicate request when it is slow.
+
+        若首个请求在近期延迟分位数内未完成，则向另一个端点（仅有一个端点时为同一端点）
+        再发送一次相同请求，采用先返回的有效结果并取消另一个请求。被丢弃请求的token
+        计入 wasted_tokens（已取消的请求按提示词token估算）。
+
+        Args:
+            endpoint (LLMEndpoint): Endpoint of the first request
+            launch (Callable): Sends the request to an endpoint and returns its result
+            kind (str): Latency kind used for the hedge delay ('completion' or 'first_token')
+            prompt_tokens (int): Prompt tokens of the request, counted as wasted for cancelled requests
+            failed_endpoints (Set[str]): Endpoints that already failed this call
+            is_valid (Optional[Callable]): Whether a result may be used; invalid results are only
+                used when no other request succeeds
+
+        Returns:
+            Tuple[LLMEndpoint, Any, float]: (endpoint that served the result, result, its start time)
+
+        Raises:
+            Exception: Error of the first request when every request fails
+        """
+        tracker = self.hedge_tracker
+        delay = tracker.hedge_delay(kind)
+        tasks: Dict[asyncio.Task, Tuple[LLMEndpoint, float]] = {}
+
+        def start(target: LLMEndpoint) -> asyncio.Task:
+            task = asyncio.ensure_future(launch(target))
+            tasks[task] = (target, time.time())
+            return task
+
+        primary = start(endpoint)
+        winner = None
+        fallback = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if not done:
+                hedge_endpoint = self.router.select(exclude=failed_endpoints | {endpoint.name})
+                logger.info(f"LLM请求超过 {delay:.2f}s 未返回，向端点 {hedge_endpoint.name} 发送对冲请求")
+                start(hedge_endpoint)
+
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: tasks[t][1]):
+                    if task.exception() is not None:
+                        continue
+                    if is_valid is None or is_valid(task.result()):
+                        winner = task
+                        break
+                    if fallback is None:
+                        fallback = task
+            winner = winner or fallback
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            if len(tasks) > 1:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            # 未被采用的请求不会记录成功，释放其端点的半开试探（采用的端点由调用方记录结果）
+            winner_target = tasks[winner][0] if winner is not None else None
+            for target, _ in tasks.values():
+                if target is not winner_target:
+                    self.router.release_trial(target)
+
+        hedged = len(tasks) > 1
+        wasted_tokens = 0
+        for task, (target, _) in tasks.items():
+            if task is winner:
+                continue
+            if task.cancelled():
+                wasted_tokens += prompt_tokens
+            elif task.exception() is not None:
+                # The first request's error is raised below and recorded by the caller
+                if winner is not None or task is not primary:
+                    self._record_endpoint_failure(target, task.exception(), failed_endpoints)
+            else:
+                usage = getattr(task.result()[0], 'usage', None)
+                wasted_tokens += getattr(usage, 'total_tokens', None) or prompt_tokens
+                closer = getattr(task.result()[0], 'close', None)
+                if closer:
+                    await closer()
+        tracker.record_call(hedged, hedge_won=winner is not None and winner is not primary,
+                            wasted_tokens=wasted_tokens)
+
+        if winner is None:
+            raise primary.exception()
+
+        target, started_at = tasks[winner]
+        tracker.record_latency(kind, time.time() - started_at)
+        if hedged:
+            logger.info(f"对冲请求完成 - 采用端点: {target.name} - 浪费tokens: {wasted_tokens}")
+        return target, winner.result(), started_at
+
+    def _get_async_client(self, endpoint: Optional[LLMEndpoint] = None) -> "openai.AsyncOpenAI":
+        """
+        Get the AsyncOpenAI client of an endpoint bound to the running event loop.
+
+        同一事件循环内的所有端点共享一个 httpx.AsyncClient 连接池；
+        每个端点在每个事件循环上只创建一次 AsyncOpenAI 包装。
+
+        Args:
+            endpoint (Optional[LLMEndpoint]): Target endpoint, defaults to the primary one
+
+        Returns:
+            openai.AsyncOpenAI: Async client for the current loop
+        """
+        endpoint = endpoint or self.router.primary
+        return endpoint.get_async_client(get_shared_async_http_client(self.config))
+
+    def _record_endpoint_failure(self, endpoint: LLMEndpoint, error: Exception, failed_endpoints: set) -> None:
+        """
+        Count a failed attempt against the endpoint's health when the endpoint is at fault.
+
+        请求本身的错误（如参数错误、认证失败）不计入端点健康度，也不触发切换端点。
+        """
+        if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError,
+                              ConnectionError, TimeoutError)):
+            self.router.record_failure(endpoint)
+            failed_endpoints.add(endpoint.name)
+        elif isinstance(error, LLMError):
+            # Empty responses are raised as LLMError inside the attempt
+            self.router.record_failure(endpoint)
+            failed_endpoints.add(endpoint.name)
+
+    def _prepare_prompts(
+        self,
+        system_prompt: str,
+        requirements_prompt: str,
+        ai_logger=None,
+        resolved_system_prompt: Optional[str] = None,
+        resolved_requirements_prompt: Optional[str] = None
+    ) -> Tuple[str, str, int, TokenBudget]:
+        """
+        Select final prompts, check for unresolved template variables and the token budget, and log them.
+
+        Returns:
+            Tuple[str, str, int, TokenBudget]: (final system prompt, final requirements prompt,
+                prompt length, token budget)
+
+        Raises:
+            TokenBudgetError: When the prompts leave too little room for output
+        """
         # Use resolved prompts if provided, otherwise use original prompts
         final_system_prompt = resolved_system_prompt or system_prompt
         final_requirements_prompt = resolved_requirements_prompt or requirements_prompt
@@ -82,7 +990,6 @@ class LLMClient:
         if system_has_templates or user_has_templates:
             logger.warning(f"检测到提示词中仍包含模板变量！系统提示词: {system_has_templates}, 用户提示词: {user_has_templates}")
             # Show first few template variables found
-            import re
             system_templates = re.findall(r'\{\{[^}]+\}\}', final_system_prompt)
             user_templates = re.findall(r'\{\{[^}]+\}\}', final_requirements_prompt)
             if system_templates:
@@ -92,9 +999,14 @@ class LLMClient:
         else:
             logger.info("✅ 提示词中未检测到模板变量，解析成功")
 
-        # Adjust token count based on final prompt length
         prompt_length = len(final_system_prompt) + len(final_requirements_prompt)
-        estimated_tokens = max(base_tokens, int(prompt_length * 1.5))
+
+        # Count prompt tokens and derive max_tokens before anything is sent
+        budget = self.token_budgeter.check(final_system_prompt, final_requirements_prompt)
+        logger.info(
+            f"提示词token预算 - 分词器: {budget.tokenizer} - 提示词tokens: {budget.prompt_tokens} - "
+            f"上下文窗口: {budget.context_window} - max_tokens: {budget.max_output_tokens}"
+        )
 
         # Log prompts if ai_logger is available
         if ai_logger:
@@ -115,160 +1027,220 @@ class LLMClient:
                 except Exception as log_error:
                     logger.warning(f"Failed to log resolved prompts: {log_error}")
 
-        last_error = None
-
-        for attempt in range(max_attempts + 1):  # +1 for the initial attempt
-            try:
-                logger.info(f"LLM调用尝试 {attempt + 1}/{max_attempts + 1} - 模型: {self.config.model} - 预估tokens: {estimated_tokens}")
+        return final_system_prompt, final_requirements_prompt, prompt_length, budget
 
-                # Calculate delay for this attempt (exponential backoff with jitter)
-                if attempt > 0:
-                    delay = self._calculate_retry_delay(attempt, last_error)
-                    logger.info(f"等待 {delay:.2f} 秒后重试...")
-                    time.sleep(delay)
+    def _build_request_kwargs(
+        self,
+        final_system_prompt: str,
+        final_requirements_prompt: str,
+        max_tokens: Optional[int] = None,
+        output_schema: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Build chat completion request parameters shared by sync and async calls.
 
-                api_start = time.time()
+        结构化输出开启且调用指定了 output_schema 时附带 response_format / tools 参数；
+        不支持的端点在发送前去掉（见 _endpoint_kwargs）。
 
-                # Prepare the request with proper error handling
-                response = self.client.chat.completions.create(
-                    model=self.config.model,
-                    messages=[
-                        {"role": "system", "content": final_system_prompt},
-                        {"role": "user", "content": final_requirements_prompt}
-                    ],
-                    max_tokens=8000,  # Reasonable max token limit
-                    temperature=0,
-                    # top_p=1.0,
-                    # frequency_penalty=0.1,
-                    # presence_penalty=0.1,
-                    timeout=300  # 5 minutes timeout for synchronous generation
-                )
+        Returns:
+            Dict[str, Any]: Keyword arguments for chat.completions.create
+        """
+        request_kwargs = {
+            "model": self.config.model,
+            "messages": [
+                {"role": "system", "content": final_system_prompt},
+                {"role": "user", "content": final_requirements_prompt}
+            ],
+            "max_tokens": max_tokens or self.max_output_tokens,
+            "temperature": 0,
+            "timeout": self.request_timeout
+        }
+        if output_schema and self.structured_output:
+            request_kwargs.update(structured_output_kwargs(output_schema, self.structured_output))
+        return request_kwargs
+
+    @staticmethod
+    def _endpoint_kwargs(endpoint: LLMEndpoint, request_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop structured output parameters for endpoints that do not support them."""
+        if endpoint.structured_output or not uses_structured_output(request_kwargs):
+            return request_kwargs
+        return without_structured_output(request_kwargs)
+
+    @staticmethod
+    def _disable_structured_output(endpoint: LLMEndpoint, error: Exception) -> None:
+        """Remember that an endpoint rejected structured output; later calls use free-form JSON."""
+        if endpoint.structured_output:
+            logger.warning(f"LLM端点 {endpoint.name} 不支持结构化输出，改用自由格式JSON: {error}")
+            endpoint.structured_output = False
+
+    def _create(self, endpoint: LLMEndpoint, request_kwargs: Dict[str, Any]):
+        """
+        Send one synchronous chat completion request to an endpoint.
 
-                api_time = time.time() - api_start
-                total_time = time.time() - start_time
+        带结构化输出参数的请求被端点拒绝（400/422）时，去掉这些参数重发一次；重发成功后
+        该端点不再使用结构化输出。
+        """
+        request_kwargs = self._endpoint_kwargs(endpoint, request_kwargs)
+        try:
+            return endpoint.client.chat.completions.create(**dict(request_kwargs, model=endpoint.model))
+        except Exception as e:
+            if not (uses_structured_output(request_kwargs) and is_rejected_request(e)):
+                raise
+            response = endpoint.client.chat.completions.create(
+                **dict(without_structured_output(request_kwargs), model=endpoint.model)
+            )
+            self._disable_structured_output(endpoint, e)
+            return response
 
-                # Extract and validate response
-                content = response.choices[0].message.content if response.choices else None
+    def _process_response(
+        self,
+        response,
+        attempt: int,
+        max_attempts: int,
+        start_time: float,
+        api_start: float,
+        prompt_length: int,
+        estimated_tokens: int,
+        ai_logger=None,
+        max_tokens: Optional[int] = None,
+        endpoint: Optional[LLMEndpoint] = None
+    ) -> str:
+        """
+        Validate a chat completion response, log usage and return its content.
 
-                if not content:
-                    raise LLMError(
-                        "LLM返回了空响应",
-                        model=self.config.model,
-                        response_length=0,
-                        retry_count=attempt
-                    )
+        Raises:
+            LLMError: When the response is empty
+        """
+        api_time = time.time() - api_start
+        total_time = time.time() - start_time
 
-                # Log success
-                usage = response.usage
-                logger.info(
-                    f"LLM调用成功 - 尝试次数: {attempt + 1} - "
-                    f"API时间: {api_time:.2f}s - "
-                    f"总时间: {total_time:.2f}s - "
-                    f"输入令牌: {usage.prompt_tokens} - "
-                    f"输出令牌: {usage.completion_tokens} - "
-                    f"总令牌: {usage.total_tokens}"
-                )
+        # Extract and validate response (function call arguments in tools mode)
+        content = message_text(response.choices[0].message) if response.choices else None
 
-                # Log AI response and call details if ai_logger is available
-                if ai_logger:
-                    ai_logger.log_ai_response_raw(content)
+        if not content:
+            raise LLMError(
+                "LLM返回了空响应",
+                model=self.config.model,
+                response_length=0,
+                retry_count=attempt
+            )
 
-                    # Log LLM call details
-                    call_details = {
-                        "model": self.config.model,
-                        "attempt": attempt + 1,
-                        "max_retries": max_attempts,
-                        "api_time": api_time,
-                        "total_time": total_time,
-                        "prompt_length": prompt_length,
-                        "estimated_tokens": estimated_tokens,
-                        "usage": {
-                            "prompt_tokens": usage.prompt_tokens,
-                            "completion_tokens": usage.completion_tokens,
-                            "total_tokens": usage.total_tokens
-                        },
-                        "parameters": {
-                            "max_tokens": 8000,
-                            "temperature": 0,
-                            "timeout": 300
-                        }
-                    }
-                    ai_logger.log_llm_call_details(call_details)
+        # Log success
+        usage = response.usage
+        logger.info(
+            f"LLM调用成功 - 尝试次数: {attempt + 1} - "
+            f"API时间: {api_time:.2f}s - "
+            f"总时间: {total_time:.2f}s - "
+            f"输入令牌: {usage.prompt_tokens} - "
+            f"输出令牌: {usage.completion_tokens} - "
+            f"总令牌: {usage.total_tokens}"
+        )
 
-                return content
+        # Log AI response and call details if ai_logger is available
+        if ai_logger:
+            ai_logger.log_ai_response_raw(content)
+
+            # Log LLM call details
+            call_details = {
+                "model": endpoint.model if endpoint else self.config.model,
+                "endpoint": endpoint.name if endpoint else None,
+                "attempt": attempt + 1,
+                "max_retries": max_attempts,
+                "api_time": api_time,
+                "total_time": total_time,
+                "prompt_length": prompt_length,
+                "estimated_tokens": estimated_tokens,
+                "usage": {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                    "total_tokens": usage.total_tokens
+                },
+                "parameters": {
+                    "max_tokens": max_tokens or self.max_output_tokens,
+                    "temperature": 0,
+                    "timeout": self.request_timeout
+                }
+            }
+            ai_logger.log_llm_call_details(call_details)
+
+        return content
+
+    def _handle_attempt_error(self, e: Exception, attempt: int, max_attempts: int) -> None:
+        """
+        Log a failed attempt and raise LLMError when it must not be retried.
 
-            except openai.RateLimitError as e:
-                last_error = e
-                logger.warning(f"速率限制错误: {e} (尝试: {attempt + 1})")
+        Args:
+            e (Exception): Error raised by the attempt
+            attempt (int): Current attempt number (0-based)
+            max_attempts (int): Maximum number of retries
 
-                if attempt >= max_attempts:
-                    raise LLMError(
+        Raises:
+            LLMError: When retries are exhausted or the error is not retryable
+        """
+        if isinstance(e, openai.RateLimitError):
+            logger.warning(f"速率限制错误: {e} (尝试: {attempt + 1})")
+            retry_after = self._retry_after_seconds(e)
+            if self.rate_limiter:
+                # 暂停共享队列，所有调用方按 Retry-After 统一等待
+                self.rate_limiter.penalize(retry_after)
+
+            if attempt >= max_attempts:
+                raise LLMError(
                     f"LLM速率限制: {str(e)}",
                     model=self.config.model,
                     retry_count=attempt,
-                    details={"error_type": "rate_limit", "retry_after": getattr(e, 'retry_after', None)}
+                    details={"error_type": "rate_limit", "retry_after": retry_after}
                 )
 
-            except openai.TimeoutError as e:
-                last_error = e
-                logger.error(f"LLM请求超时: {e} (尝试: {attempt + 1})")
-
-                if attempt >= max_attempts:
-                    raise LLMError(
-                        f"LLM请求超时: {str(e)}",
-                        model=self.config.model,
-                        retry_count=attempt,
-                        details={"error_type": "timeout", "timeout_seconds": 300}
-                    )
+        elif isinstance(e, openai.APITimeoutError):
+            logger.error(f"LLM请求超时: {e} (尝试: {attempt + 1})")
 
-            except openai.APIError as e:
-                last_error = e
-                error_code = getattr(e, 'code', 'unknown')
-                error_message = str(e)
+            if attempt >= max_attempts:
+                raise LLMError(
+                    f"LLM请求超时: {str(e)}",
+                    model=self.config.model,
+                    retry_count=attempt,
+                    details={"error_type": "timeout", "timeout_seconds": self.request_timeout}
+                )
 
-                logger.error(f"LLM API错误 [{error_code}]: {error_message} (尝试: {attempt + 1})")
+        elif isinstance(e, openai.APIError):
+            error_code = getattr(e, 'code', 'unknown')
+            error_message = str(e)
 
-                # Determine if error is retryable
-                is_retryable = self._is_retryable_error(error_code, error_message)
+            logger.error(f"LLM API错误 [{error_code}]: {error_message} (尝试: {attempt + 1})")
 
-                if attempt >= max_attempts or not is_retryable:
-                    raise LLMError(
-                        f"LLM API错误: {error_message}",
-                        model=self.config.model,
-                        retry_count=attempt,
-                        details={"error_code": error_code, "error_type": "api_error", "retryable": is_retryable}
-                    )
+            # Determine if error is retryable
+            is_retryable = self._is_retryable_error(error_code, error_message)
 
-            except ConnectionError as e:
-                last_error = e
-                logger.error(f"网络连接错误: {e} (尝试: {attempt + 1})")
+            if attempt >= max_attempts or not is_retryable:
+                raise LLMError(
+                    f"LLM API错误: {error_message}",
+                    model=self.config.model,
+                    retry_count=attempt,
+                    details={"error_code": error_code, "error_type": "api_error", "retryable": is_retryable}
+                )
 
-                if attempt >= max_attempts:
-                    raise LLMError(
-                        f"网络连接错误: {str(e)}",
-                        model=self.config.model,
-                        retry_count=attempt,
-                        details={"error_type": "connection"}
-                    )
+        elif isinstance(e, ConnectionError):
+            logger.error(f"网络连接错误: {e} (尝试: {attempt + 1})")
 
-            except Exception as e:
-                last_error = e
-                logger.error(f"未预期的LLM错误: {type(e).__name__}: {str(e)} (尝试: {attempt + 1})", exc_info=True)
+            if attempt >= max_attempts:
+                raise LLMError(
+                    f"网络连接错误: {str(e)}",
+                    model=self.config.model,
+                    retry_count=attempt,
+                    details={"error_type": "connection"}
+                )
 
-                if attempt >= max_attempts:
-                    raise LLMError(
-                        f"LLM调用失败: {str(e)}",
-                        model=self.config.model,
-                        retry_count=attempt,
-                        details={"error_type": "unexpected", "exception_type": type(e).__name__}
-                    )
+        else:
+            logger.error(f"未预期的LLM错误: {type(e).__name__}: {str(e)} (尝试: {attempt + 1})", exc_info=True)
 
-        # This should not be reached, but just in case
-        raise LLMError(
-            f"LLM调用失败，已达到最大重试次数 {max_attempts}",
-            model=self.config.model,
-            retry_count=max_attempts
-        )
+            if attempt >= max_attempts:
+                raise LLMError(
+                    f"LLM调用失败: {str(e)}",
+                    model=self.config.model,
+                    retry_count=attempt,
+                    details={"error_type": "unexpected", "exception_type": type(e).__name__}
+                )
 
     def _calculate_retry_delay(self, attempt: int, last_error: Exception) -> float:
         """
@@ -293,12 +1265,65 @@ class LLMClient:
 
         # Adjust delay based on error type
         if isinstance(last_error, openai.RateLimitError):
-            retry_after = getattr(last_error, 'retry_after', None)
+            if self.rate_limiter:
+                # The shared limiter already waits for Retry-After before admitting the call
+                return 0.0
+            retry_after = self._retry_after_seconds(last_error)
             if retry_after:
                 final_delay = max(retry_after, final_delay)
 
         return final_delay
 
+    @staticmethod
+    def _retry_after_seconds(error: Exception) -> Optional[float]:
+        """
+        Read the Retry-After delay of a rate limit error.
+
+        Args:
+            error (Exception): Error raised by the API call
+
+        Returns:
+            Optional[float]: Delay in seconds, or None when the response has no usable header
+        """
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if not headers:
+            return None
+
+        retry_after_ms = headers.get('retry-after-ms')
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000.0
+            except ValueError:
+                pass
+
+        retry_after = headers.get('retry-after')
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+
+    def _refund_output_reservation(self, reserved: int, request_kwargs: Dict[str, Any],
+                                   request_tokens: int) -> None:
+        """Return the output part of a reservation whose request was cancelled before answering."""
+        if self.rate_limiter is None:
+            return
+        self.rate_limiter.reconcile(reserved, request_tokens - request_kwargs["max_tokens"])
+
+    def _reconcile_rate_limit(self, reserved: int, response) -> None:
+        """Return unused reserved tokens to the limiter once usage is known."""
+        if self.rate_limiter is None:
+            return
+        usage = getattr(response, 'usage', None)
+        self.rate_limiter.reconcile(reserved, getattr(usage, 'total_tokens', None))
+
     def _is_retryable_error(self, error_code: str, error_message: str) -> bool:
         """
         Determine if an LLM error is retryable.
@@ -344,6 +1369,7 @@ class LLMClient:
         return {
             "model": self.config.model,
             "api_base_url": self.config.api_base_url,
+            "endpoints": self.router.stats()["endpoints"],
             "max_retries": self.default_max_retries,
             "base_delay": self.default_base_delay,
             "max_base_delay": self.max_base_delay
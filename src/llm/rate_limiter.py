@@ -0,0 +1,237 @@
+"""
+Process-wide rate limiter for LLM calls.
+
+所有 LLMClient 共享同一组令牌桶：按每分钟请求数（RPM）和每分钟token数（TPM）
+准入调用，调用方按到达顺序排队等待，而不是各自盲目退避重试。收到429响应时，
+按 Retry-After 暂停整个队列。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+from ..utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            per_minute (float): Capacity and refill amount per minute
+        """
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (requests larger than the capacity wait for a full bucket)."""
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.level -= amount
+
+    def refund(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+class LLMRateLimiter:
+    """
+    Admit LLM calls against RPM and TPM budgets.
+
+    Callers queue in arrival order (one FIFO queue per event loop and one for
+    threads); only the caller at the head of a queue waits on the buckets, so
+    later callers never overtake earlier ones.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_minute (int): Request budget per minute (0 = unlimited)
+            tokens_per_minute (int): Token budget per minute (0 = unlimited)
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._state_lock = threading.Lock()
+        self._sync_queue = threading.Lock()
+        self._async_queues: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+        self._blocked_until = 0.0
+        self._queue_depth = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.total_wait_time = 0.0
+
+    async def acquire(self, tokens: int) -> int:
+        """
+        Wait in line until the call fits both budgets, then reserve it.
+
+        Args:
+            tokens (int): Estimated tokens of the call (prompt tokens + max_tokens)
+
+        Returns:
+            int: Reserved tokens, to pass to reconcile() once usage is known
+        """
+        loop = asyncio.get_running_loop()
+        with self._state_lock:
+            queue = self._async_queues.get(loop)
+            if queue is None:
+                queue = self._async_queues[loop] = asyncio.Lock()
+            self._queue_depth += 1
+        try:
+            async with queue:
+                while True:
+                    wait, reserved = self._try_reserve(tokens)
+                    if wait <= 0:
+                        return reserved
+                    await asyncio.sleep(wait)
+        finally:
+            with self._state_lock:
+                self._queue_depth -= 1
+
+    def acquire_sync(self, tokens: int) -> int:
+        """
+        Blocking version of acquire() for synchronous callers.
+
+        Args:
+            tokens (int): Estimated tokens of the call (prompt tokens + max_tokens)
+
+        Returns:
+            int: Reserved tokens, to pass to reconcile() once usage is known
+        """
+        with self._state_lock:
+            self._queue_depth += 1
+        try:
+            with self._sync_queue:
+                while True:
+                    wait, reserved = self._try_reserve(tokens)
+                    if wait <= 0:
+                        return reserved
+                    time.sleep(wait)
+        finally:
+            with self._state_lock:
+                self._queue_depth -= 1
+
+    def reconcile(self, reserved: int, actual_tokens: Optional[int]) -> None:
+        """
+        Correct the token bucket with the actual usage of a finished call.
+
+        Args:
+            reserved (int): Value returned by acquire()
+            actual_tokens (Optional[int]): Tokens actually used; None keeps the reservation
+        """
+        if self.tokens is None or actual_tokens is None:
+            return
+        with self._state_lock:
+            if actual_tokens < reserved:
+                self.tokens.refund(reserved - actual_tokens)
+            else:
+                self.tokens.consume(actual_tokens - reserved)
+
+    def penalize(self, retry_after: Optional[float]) -> None:
+        """
+        Pause admission after a rate limit response.
+
+        Args:
+            retry_after (Optional[float]): Seconds from the Retry-After header; defaults to one refill second
+        """
+        delay = retry_after if retry_after and retry_after > 0 else 1.0
+        with self._state_lock:
+            self.rate_limited += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        logger.warning(f"LLM速率限制，暂停准入 {delay:.2f} 秒")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get current bucket levels and queue depth.
+
+        Returns:
+            Dict[str, Any]: Limits, bucket levels, queue depth and counters
+        """
+        with self._state_lock:
+            now = time.monotonic()
+            result = {'enabled': True}
+            for name, bucket in (('requests', self.requests), ('tokens', self.tokens)):
+                if bucket is None:
+                    result[name] = None
+                    continue
+                bucket.refill(now)
+                result[name] = {
+                    'per_minute': int(bucket.capacity),
+                    'available': round(bucket.level, 2)
+                }
+            result.update({
+                'queue_depth': self._queue_depth,
+                'blocked_for_seconds': round(max(0.0, self._blocked_until - now), 2),
+                'admitted': self.admitted,
+                'rate_limited': self.rate_limited,
+                'total_wait_seconds': round(self.total_wait_time, 2)
+            })
+            return result
+
+    def _try_reserve(self, tokens: int):
+        """Reserve the call if both buckets allow it, otherwise return the time to wait."""
+        with self._state_lock:
+            now = time.monotonic()
+            wait = self._blocked_until - now
+            if self.requests is not None:
+                wait = max(wait, self.requests.wait_time(1, now))
+            if self.tokens is not None:
+                wait = max(wait, self.tokens.wait_time(tokens, now))
+            if wait > 0:
+                self.total_wait_time += wait
+                return wait, 0
+
+            reserved = 0
+            if self.requests is not None:
+                self.requests.consume(1)
+            if self.tokens is not None:
+                reserved = int(min(tokens, self.tokens.capacity))
+                self.tokens.consume(reserved)
+            self.admitted += 1
+            return 0.0, reserved
+
+
+_rate_limiter: Optional[LLMRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(config: Config) -> Optional[LLMRateLimiter]:
+    """
+    Get the process-wide rate limiter, or None when no limit is configured.
+
+    Args:
+        config (Config): Configuration object
+
+    Returns:
+        Optional[LLMRateLimiter]: Shared limiter instance
+    """
+    global _rate_limiter
+    if config.llm_rate_limit_rpm <= 0 and config.llm_rate_limit_tpm <= 0:
+        return None
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = LLMRateLimiter(
+                    requests_per_minute=config.llm_rate_limit_rpm,
+                    tokens_per_minute=config.llm_rate_limit_tpm
+                )
+    return _rate_limiter
@@ -0,0 +1,225 @@
+"""
+Content-addressed, disk-backed cache for deterministic LLM responses.
+
+LLM调用固定使用 temperature=0，相同的 (模型, 解析后的系统提示词, 解析后的用户提示词,
+max_tokens) 会得到等价的结果。缓存以这些内容的 sha256 作为键，将响应保存到磁盘，
+并按 TTL 和总大小淘汰旧条目。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """Disk-backed LLM response cache with TTL and size-based eviction."""
+
+    def __init__(self, cache_dir: str, ttl_seconds: float, max_bytes: int):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str): Directory storing one JSON file per entry
+            ttl_seconds (float): Entries older than this are treated as misses and removed
+            max_bytes (int): Maximum total size of cached files; least recently used entries are evicted
+        """
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
+        """
+        Build the content hash identifying a request.
+
+        Args:
+            model (str): Model name
+            system_prompt (str): Resolved system prompt
+            user_prompt (str): Resolved user prompt
+            max_tokens (int): Output token limit
+
+        Returns:
+            str: Hex sha256 digest
+        """
+        payload = json.dumps([model, system_prompt, user_prompt, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Cache key from make_key
+
+        Returns:
+            Optional[str]: Cached response content, or None on miss/expiry
+        """
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取LLM缓存失败，忽略该条目: {e}")
+                self._remove(path)
+                self.misses += 1
+                return None
+
+            if time.time() - entry.get('created_at', 0) > self.ttl_seconds:
+                self._remove(path)
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            # Refresh mtime so size eviction removes least recently used entries first
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            self.hits += 1
+            return entry.get('content')
+
+    def set(self, key: str, content: str, model: Optional[str] = None) -> None:
+        """
+        Store a response.
+
+        Args:
+            key (str): Cache key from make_key
+            content (str): Response content
+            model (Optional[str]): Model name, kept for inspection
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        entry = {'created_at': time.time(), 'model': model, 'content': content}
+        with self._lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+                self.writes += 1
+            except OSError as e:
+                logger.warning(f"写入LLM缓存失败: {e}")
+                self._remove(tmp_path)
+                return
+            self._evict_to_size()
+
+    def clear(self) -> int:
+        """
+        Remove every cached entry.
+
+        Returns:
+            int: Number of removed entries
+        """
+        removed = 0
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    self._remove(os.path.join(self.cache_dir, name))
+                    removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters and current size.
+
+        Returns:
+            Dict[str, Any]: Hit/miss/write/eviction counters, hit rate and disk usage
+        """
+        with self._lock:
+            entries, total_bytes = 0, 0
+            for _, size, _ in self._entries():
+                entries += 1
+                total_bytes += size
+            lookups = self.hits + self.misses
+            return {
+                'enabled': True,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': entries,
+                'size_bytes': total_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds
+            }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _entries(self):
+        """Yield (path, size, mtime) for every cache file."""
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+    def _evict_to_size(self) -> None:
+        """Remove least recently used entries until the cache fits max_bytes."""
+        entries = list(self._entries())
+        total_bytes = sum(size for _, size, _ in entries)
+        if total_bytes <= self.max_bytes:
+            return
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            self._remove(path)
+            self.evictions += 1
+            total_bytes -= size
+            if total_bytes <= self.max_bytes:
+                break
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_response_cache: Optional[LLMResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache(config: Config) -> Optional[LLMResponseCache]:
+    """
+    Get the process-wide response cache, or None when caching is disabled.
+
+    Args:
+        config (Config): Configuration object
+
+    Returns:
+        Optional[LLMResponseCache]: Shared cache instance
+    """
+    global _response_cache
+    if not config.llm_cache_enabled:
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = LLMResponseCache(
+                    cache_dir=config.llm_cache_dir,
+                    ttl_seconds=config.llm_cache_ttl_seconds,
+                    max_bytes=config.llm_cache_max_mb * 1024 * 1024
+                )
+    return _response_cache
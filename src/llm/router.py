@@ -0,0 +1,294 @@
+"""
+Multi-endpoint routing for LLM calls.
+
+维护一组 OpenAI 兼容的端点（base_url + model），统计每个端点的滚动延迟和错误率，
+对持续失败的端点打开熔断器，并把每次调用发送到当前最健康的端点。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+import openai
+
+from ..utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+
+class LLMEndpoint:
+    """One OpenAI-compatible endpoint with its clients and rolling health statistics."""
+
+    def __init__(self, name: str, base_url: str, api_key: str, model: str, window: int = 20,
+                 structured_output: bool = True):
+        """
+        Initialize the endpoint.
+
+        Args:
+            name (str): Endpoint name used in logs and stats
+            base_url (str): OpenAI-compatible API base URL
+            api_key (str): API key
+            model (str): Model served by this endpoint
+            window (int): Number of recent calls kept for latency and error rate
+            structured_output (bool): Whether the endpoint accepts response_format / tools; cleared
+                when the endpoint rejects them
+        """
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.structured_output = structured_output
+        self._client: Optional[openai.OpenAI] = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, openai.AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+        # Rolling statistics
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.consecutive_failures = 0
+
+        # Circuit breaker
+        self.state = CIRCUIT_CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    @property
+    def client(self) -> openai.OpenAI:
+        """Get the synchronous client of this endpoint."""
+        if self._client is None:
+            self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._client
+
+    def get_async_client(self, http_client: httpx.AsyncClient) -> openai.AsyncOpenAI:
+        """
+        Get the AsyncOpenAI client of this endpoint for the running event loop.
+
+        重试由 LLMClient 自行控制，因此关闭SDK内置重试。
+
+        Args:
+            http_client (httpx.AsyncClient): Shared connection pool of the running loop
+
+        Returns:
+            openai.AsyncOpenAI: Async client for the current loop
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=http_client,
+                max_retries=0
+            )
+            self._async_clients[loop] = client
+        return client
+
+    @property
+    def average_latency(self) -> Optional[float]:
+        """Mean latency in seconds of recent successful calls, None before the first success."""
+        if not self.latencies:
+            return None
+        return sum(self.latencies) / len(self.latencies)
+
+    @property
+    def error_rate(self) -> float:
+        """Share of failed calls among recent calls."""
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get health statistics of this endpoint."""
+        average_latency = self.average_latency
+        return {
+            'name': self.name,
+            'base_url': self.base_url,
+            'model': self.model,
+            'state': self.state,
+            'structured_output': self.structured_output,
+            'average_latency': round(average_latency, 3) if average_latency is not None else None,
+            'error_rate': round(self.error_rate, 3),
+            'recent_calls': len(self.outcomes),
+            'consecutive_failures': self.consecutive_failures
+        }
+
+
+class LLMRouter:
+    """Route calls to the healthiest endpoint, with per-endpoint circuit breakers."""
+
+    def __init__(self, endpoints: List[LLMEndpoint], failure_threshold: int = 5,
+                 cooldown_seconds: float = 30.0, error_penalty: float = 4.0):
+        """
+        Initialize the router.
+
+        Args:
+            endpoints (List[LLMEndpoint]): Endpoint pool, in order of preference
+            failure_threshold (int): Consecutive failures that open an endpoint's circuit
+            cooldown_seconds (float): Time an open circuit waits before one trial call is allowed
+            error_penalty (float): Weight of the error rate when scoring endpoints
+        """
+        if not endpoints:
+            raise ValueError("LLMRouter requires at least one endpoint")
+        self.endpoints = endpoints
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.error_penalty = error_penalty
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> LLMEndpoint:
+        """Get the first configured endpoint."""
+        return self.endpoints[0]
+
+    def select(self, exclude: Iterable[str] = ()) -> LLMEndpoint:
+        """
+        Pick the healthiest endpoint for the next call.
+
+        Endpoints in exclude (e.g. those that already failed this call) are skipped
+        unless nothing else is left. When every circuit is open, the endpoint that
+        opened first is tried anyway rather than failing without a request.
+
+        Args:
+            exclude (Iterable[str]): Names of endpoints to avoid
+
+        Returns:
+            LLMEndpoint: Selected endpoint
+        """
+        excluded = set(exclude)
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e.name not in excluded] or list(self.endpoints)
+            available = [e for e in candidates if self._is_available(e, now)]
+            if not available:
+                endpoint = min(candidates, key=lambda e: e.opened_at)
+                logger.warning(f"所有LLM端点均已熔断，尝试最早熔断的端点: {endpoint.name}")
+            else:
+                endpoint = min(available, key=lambda e: (self._score(e), self.endpoints.index(e)))
+            if endpoint.state != CIRCUIT_CLOSED:
+                endpoint.state = CIRCUIT_HALF_OPEN
+                endpoint.trial_in_flight = True
+            return endpoint
+
+    def record_success(self, endpoint: LLMEndpoint, latency: float) -> None:
+        """
+        Record a successful call and close the endpoint's circuit.
+
+        Args:
+            endpoint (LLMEndpoint): Endpoint that served the call
+            latency (float): Call latency in seconds
+        """
+        with self._lock:
+            endpoint.latencies.append(latency)
+            endpoint.outcomes.append(True)
+            endpoint.consecutive_failures = 0
+            endpoint.trial_in_flight = False
+            if endpoint.state != CIRCUIT_CLOSED:
+                logger.info(f"LLM端点恢复，关闭熔断器: {endpoint.name}")
+                endpoint.state = CIRCUIT_CLOSED
+
+    def record_failure(self, endpoint: LLMEndpoint) -> None:
+        """
+        Record a failed call; opens the circuit after repeated failures or a failed trial.
+
+        Args:
+            endpoint (LLMEndpoint): Endpoint that failed
+        """
+        with self._lock:
+            endpoint.outcomes.append(False)
+            endpoint.consecutive_failures += 1
+            endpoint.trial_in_flight = False
+            if endpoint.state == CIRCUIT_HALF_OPEN or endpoint.consecutive_failures >= self.failure_threshold:
+                if endpoint.state != CIRCUIT_OPEN:
+                    logger.warning(
+                        f"LLM端点熔断: {endpoint.name} - 连续失败 {endpoint.consecutive_failures} 次，"
+                        f"{self.cooldown_seconds:.0f} 秒后重试"
+                    )
+                endpoint.state = CIRCUIT_OPEN
+                endpoint.opened_at = time.monotonic()
+
+    def release_trial(self, endpoint: LLMEndpoint) -> None:
+        """
+        End a half-open trial that finished without a recorded outcome.
+
+        试探调用被取消（任务取消、对冲落败）或因请求本身的错误（不计入端点健康度）结束时，
+        record_success / record_failure 都不会被调用；释放后下一次 select 可以再次试探该端点。
+        已记录结果的调用再调用本方法不产生影响。
+
+        Args:
+            endpoint (LLMEndpoint): Endpoint returned by select
+        """
+        with self._lock:
+            endpoint.trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get health statistics of every endpoint.
+
+        Returns:
+            Dict[str, Any]: Router settings and per-endpoint statistics
+        """
+        with self._lock:
+            return {
+                'failure_threshold': self.failure_threshold,
+                'cooldown_seconds': self.cooldown_seconds,
+                'endpoints': [endpoint.stats() for endpoint in self.endpoints]
+            }
+
+    def _is_available(self, endpoint: LLMEndpoint, now: float) -> bool:
+        if endpoint.state == CIRCUIT_CLOSED:
+            return True
+        if endpoint.trial_in_flight:
+            return False
+        return now - endpoint.opened_at >= self.cooldown_seconds
+
+    def _score(self, endpoint: LLMEndpoint) -> float:
+        """Lower is healthier; endpoints without samples score 0 so they get explored."""
+        latency = endpoint.average_latency
+        if latency is None:
+            return 0.0
+        return latency * (1 + self.error_penalty * endpoint.error_rate)
+
+
+_llm_router: Optional[LLMRouter] = None
+_llm_router_lock = threading.Lock()
+
+
+def get_llm_router(config: Config) -> LLMRouter:
+    """
+    Get the process-wide router built from LLM_ENDPOINTS (or API_BASE_URL/MODEL).
+
+    Args:
+        config (Config): Configuration object
+
+    Returns:
+        LLMRouter: Shared router instance
+    """
+    global _llm_router
+    if _llm_router is None:
+        with _llm_router_lock:
+            if _llm_router is None:
+                endpoints = [
+                    LLMEndpoint(
+                        name=item['name'],
+                        base_url=item['base_url'],
+                        api_key=item['api_key'],
+                        model=item['model'],
+                        structured_output=item.get('structured_output', True)
+                    )
+                    for item in config.llm_endpoints
+                ]
+                _llm_router = LLMRouter(
+                    endpoints,
+                    failure_threshold=config.llm_circuit_failure_threshold,
+                    cooldown_seconds=config.llm_circuit_cooldown_seconds
+                )
+                logger.info(f"LLM路由已初始化，端点: {[e.name for e in endpoints]}")
+    return _llm_router
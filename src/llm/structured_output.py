@@ -0,0 +1,173 @@
+"""
+Structured output for test point / test case generation calls.
+
+LLM_STRUCTURED_OUTPUT 开启后，测试点/测试用例生成请求附带由本模块中 pydantic 模型
+生成的 JSON Schema（字段与提示词约定的输出格式一致）：json_schema 模式通过 response_format 约束输出，tools 模式强制模型调用
+一个参数即为输出对象的函数。输出本身就是合法JSON，提取时第一次 json.loads 即可成功，
+不再进入修复流程。端点不支持时（LLM_ENDPOINTS 中声明 "structured_output": false，或请求
+被拒绝）回退为原来的自由格式输出。
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import openai
+from pydantic import BaseModel, Field
+
+TEST_POINTS = 'test_points'
+TEST_CASES = 'test_cases'
+
+# 结构化输出使用的请求参数，回退时从请求中移除
+STRUCTURED_OUTPUT_KEYS = ('response_format', 'tools', 'tool_choice')
+
+_DESCRIPTIONS = {
+    TEST_POINTS: '提交生成的测试点列表',
+    TEST_CASES: '提交生成的测试用例列表',
+}
+
+
+class GeneratedTestPoint(BaseModel):
+    """A generated test point, as read by _save_generated_test_point."""
+
+    test_case_id: str = Field(..., description="测试点编号，如 TP001")
+    name: str = Field(..., description="测试点名称")
+    description: str = Field("", description="测试点描述")
+    priority: str = Field("medium", description="优先级：low / medium / high")
+    functional_module: str = Field("", description="功能模块")
+
+
+class GeneratedStep(BaseModel):
+    """One execution step of a generated test case."""
+
+    step: int = Field(..., description="步骤序号")
+    action: str = Field(..., description="操作")
+    expected: str = Field("", description="该步骤的预期结果")
+
+
+class GeneratedTestCase(BaseModel):
+    """A generated test case; test_point_id links it to the test point it was generated from."""
+
+    test_point_id: int = Field(..., description="对应测试点的 id，必须与输入测试点的 id 一致")
+    test_case_id: str = Field(..., description="测试用例编号，如 TC001")
+    name: str = Field(..., description="测试用例名称")
+    description: str = Field("", description="测试用例描述")
+    module: str = Field("", description="所属模块")
+    functional_module: str = Field("", description="功能模块")
+    functional_domain: str = Field("", description="功能域")
+    priority: str = Field("medium", description="优先级：low / medium / high")
+    preconditions: List[str] = Field(default_factory=list, description="前置条件")
+    steps: List[GeneratedStep] = Field(..., description="执行步骤")
+    expected_result: List[str] = Field(..., description="预期结果")
+    remarks: str = Field("", description="备注")
+
+
+class GeneratedTestPoints(BaseModel):
+    """Test point generation response."""
+
+    test_points: List[GeneratedTestPoint]
+
+
+class GeneratedTestCases(BaseModel):
+    """Test case generation response."""
+
+    test_cases: List[GeneratedTestCase]
+
+
+_OUTPUT_MODELS = {
+    TEST_POINTS: GeneratedTestPoints,
+    TEST_CASES: GeneratedTestCases,
+}
+
+
+@lru_cache(maxsize=None)
+def output_schema(kind: str) -> Dict[str, Any]:
+    """
+    Get the JSON schema of a generation response.
+
+    外层为 {"test_points": [...]} / {"test_cases": [...]}，与自由格式输出的提示词约定一致；
+    测试用例的 test_point_id 对应输入测试点的 id。
+
+    Args:
+        kind (str): TEST_POINTS or TEST_CASES
+
+    Returns:
+        Dict[str, Any]: JSON schema of the response object
+
+    Raises:
+        ValueError: When the kind is unknown
+    """
+    if kind not in _OUTPUT_MODELS:
+        raise ValueError(f"未知的结构化输出类型: {kind}")
+    return _OUTPUT_MODELS[kind].model_json_schema()
+
+
+def structured_output_kwargs(kind: str, mode: str) -> Dict[str, Any]:
+    """
+    Build the request parameters that constrain the output to the schema.
+
+    Args:
+        kind (str): TEST_POINTS or TEST_CASES
+        mode (str): 'json_schema' (response_format) or 'tools' (forced function call)
+
+    Returns:
+        Dict[str, Any]: Parameters to merge into chat.completions.create
+    """
+    schema = output_schema(kind)
+    if mode == 'tools':
+        name = f"submit_{kind}"
+        return {
+            "tools": [{
+                "type": "function",
+                "function": {"name": name, "description": _DESCRIPTIONS[kind], "parameters": schema}
+            }],
+            "tool_choice": {"type": "function", "function": {"name": name}}
+        }
+    return {
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": kind, "schema": schema, "strict": False}
+        }
+    }
+
+
+def uses_structured_output(request_kwargs: Dict[str, Any]) -> bool:
+    """Whether a request carries structured output parameters."""
+    return any(key in request_kwargs for key in STRUCTURED_OUTPUT_KEYS)
+
+
+def without_structured_output(request_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of the request parameters without structured output (free-form JSON in the content)."""
+    return {key: value for key, value in request_kwargs.items() if key not in STRUCTURED_OUTPUT_KEYS}
+
+
+def is_rejected_request(error: Exception) -> bool:
+    """
+    Whether an endpoint rejected the request itself (400/422).
+
+    带结构化输出参数的请求被拒绝时，去掉这些参数重发一次；重发成功说明端点不支持
+    结构化输出，之后该端点直接使用自由格式输出。
+    """
+    return isinstance(error, (openai.BadRequestError, openai.UnprocessableEntityError))
+
+
+def message_text(message: Any) -> Optional[str]:
+    """
+    Get the output text of a chat completion message.
+
+    tools 模式下输出位于函数调用的参数中，其余情况为消息内容。
+    """
+    if message is None:
+        return None
+    content = getattr(message, 'content', None)
+    if content:
+        return content
+    for tool_call in getattr(message, 'tool_calls', None) or []:
+        function = getattr(tool_call, 'function', None)
+        if function is not None and function.arguments:
+            return function.arguments
+    return content
+
+
+def delta_text(delta: Any) -> Optional[str]:
+    """Get the output text of a streamed chunk delta (content or function call arguments)."""
+    return message_text(delta)
@@ -0,0 +1,374 @@
+"""
+Token accounting for LLM prompts.
+
+使用BPE分词器（tiktoken，可选依赖）统计系统/用户提示词的token数，根据模型上下文窗口
+计算可用的 max_tokens，并在发送请求前拒绝或裁剪超出预算的提示词。未安装tiktoken时
+使用对中文友好的估算方法。
+"""
+
+import json
+import logging
+import math
+import re
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from ..utils.config import Config
+from ..utils.prompt_template import compile_template
+from ..exceptions.generation import TokenBudgetError
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+# Context window sizes by model name prefix (longest prefix wins)
+MODEL_CONTEXT_WINDOWS = {
+    'qwen3-235b-a22b-instruct-2507': 131072,
+    'qwen3': 131072,
+    'qwen-max': 32768,
+    'qwen-plus': 131072,
+    'qwen-turbo': 131072,
+    'qwen2.5': 131072,
+    'deepseek': 65536,
+    'glm-4': 128000,
+    'gpt-4.1': 1047576,
+    'gpt-4o': 128000,
+    'gpt-4-turbo': 128000,
+    'gpt-4': 8192,
+    'gpt-3.5-turbo': 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 32768
+
+# Chat message framing overhead per request
+MESSAGE_OVERHEAD_TOKENS = 16
+
+_CJK_PATTERN = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+
+
+def get_context_window(model: str, override: int = 0) -> int:
+    """
+    Get the context window of a model.
+
+    Args:
+        model (str): Model name
+        override (int): Explicit window size; used when positive
+
+    Returns:
+        int: Context window in tokens
+    """
+    if override and override > 0:
+        return override
+    model_lower = (model or '').lower()
+    for prefix in sorted(MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if model_lower.startswith(prefix):
+            return MODEL_CONTEXT_WINDOWS[prefix]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+class TokenCounter:
+    """Count tokens with tiktoken when available, otherwise estimate."""
+
+    _encodings: Dict[str, Any] = {}
+
+    def __init__(self, model: str = ''):
+        """
+        Initialize the counter.
+
+        Args:
+            model (str): Model name used to pick the encoding
+        """
+        self.model = model
+        self._encoding = self._load_encoding(model)
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from a real BPE tokenizer."""
+        return self._encoding is not None
+
+    @property
+    def name(self) -> str:
+        """Get tokenizer description for logs."""
+        return f"tiktoken:{self._encoding.name}" if self._encoding is not None else "heuristic"
+
+    def count(self, text: Optional[str]) -> int:
+        """
+        Count tokens of a text.
+
+        Args:
+            text (Optional[str]): Text to count
+
+        Returns:
+            int: Token count
+        """
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return self.estimate(text)
+
+    @staticmethod
+    def estimate(text: str) -> int:
+        """
+        Estimate tokens without a tokenizer.
+
+        中日韩字符按每字1个token计算，其余字符按约4个字符1个token计算。
+        """
+        cjk_chars = len(_CJK_PATTERN.findall(text))
+        other_chars = len(text) - cjk_chars
+        return cjk_chars + math.ceil(other_chars / 4)
+
+    @classmethod
+    def _load_encoding(cls, model: str):
+        if tiktoken is None:
+            return None
+        key = model or ''
+        if key not in cls._encodings:
+            encoding = None
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except Exception:
+                try:
+                    encoding = tiktoken.get_encoding('cl100k_base')
+                except Exception as e:
+                    logger.warning(f"无法加载tiktoken编码，使用估算方式统计token: {e}")
+            cls._encodings[key] = encoding
+        return cls._encodings[key]
+
+
+class TokenBudget:
+    """Token budget of one request."""
+
+    def __init__(self, context_window: int, system_tokens: int, user_tokens: int,
+                 max_output_tokens: int, min_output_tokens: int, tokenizer: str):
+        self.context_window = context_window
+        self.system_tokens = system_tokens
+        self.user_tokens = user_tokens
+        self.max_output_tokens = max_output_tokens
+        self.min_output_tokens = min_output_tokens
+        self.tokenizer = tokenizer
+        self.variables: Dict[str, int] = {}
+        self.trimmed: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self.system_tokens + self.user_tokens + MESSAGE_OVERHEAD_TOKENS
+
+    @property
+    def fits(self) -> bool:
+        return self.max_output_tokens >= self.min_output_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a JSON serializable breakdown."""
+        template_tokens = self.system_tokens + self.user_tokens - sum(self.variables.values())
+        return {
+            "tokenizer": self.tokenizer,
+            "context_window": self.context_window,
+            "prompt_tokens": self.prompt_tokens,
+            "system_tokens": self.system_tokens,
+            "user_tokens": self.user_tokens,
+            "template_tokens": max(0, template_tokens),
+            "variables": dict(self.variables),
+            "max_output_tokens": self.max_output_tokens,
+            "min_output_tokens": self.min_output_tokens,
+            "fits": self.fits,
+            "trimmed": dict(self.trimmed)
+        }
+
+
+class TokenBudgeter:
+    """Plan output budgets and keep prompts inside the model context window."""
+
+    def __init__(self, config: Config):
+        """
+        Initialize the budgeter.
+
+        Args:
+            config (Config): Configuration object
+        """
+        self.config = config
+        self.counter = TokenCounter(config.model)
+        self.context_window = get_context_window(config.model, config.llm_context_window)
+        self.max_output_tokens = config.llm_max_output_tokens
+        self.min_output_tokens = config.llm_min_output_tokens
+        self.policy = config.llm_budget_policy
+
+    def plan(self, system_prompt: str, user_prompt: str) -> TokenBudget:
+        """
+        Count prompt tokens and derive max_tokens for the completion.
+
+        Args:
+            system_prompt (str): Final system prompt
+            user_prompt (str): Final user prompt
+
+        Returns:
+            TokenBudget: Budget with max_output_tokens set
+        """
+        system_tokens = self.counter.count(system_prompt)
+        user_tokens = self.counter.count(user_prompt)
+        prompt_tokens = system_tokens + user_tokens + MESSAGE_OVERHEAD_TOKENS
+        # 估算模式下预留10%误差
+        margin = 0 if self.counter.exact else int(prompt_tokens * 0.1)
+        available = self.context_window - prompt_tokens - margin
+        return TokenBudget(
+            context_window=self.context_window,
+            system_tokens=system_tokens,
+            user_tokens=user_tokens,
+            max_output_tokens=max(0, min(self.max_output_tokens, available)),
+            min_output_tokens=self.min_output_tokens,
+            tokenizer=self.counter.name
+        )
+
+    def check(self, system_prompt: str, user_prompt: str) -> TokenBudget:
+        """
+        Plan the budget and raise when the prompt leaves too little room for output.
+
+        Raises:
+            TokenBudgetError: When the prompt is over budget
+        """
+        budget = self.plan(system_prompt, user_prompt)
+        if not budget.fits:
+            raise TokenBudgetError(
+                f"提示词超出模型上下文预算: 提示词 {budget.prompt_tokens} tokens, "
+                f"上下文窗口 {budget.context_window}, 剩余输出 {budget.max_output_tokens} < {budget.min_output_tokens}",
+                budget=budget.to_dict()
+            )
+        return budget
+
+    def fit_prompts(self, system_template: str, user_template: str,
+                    system_prompt: str, user_prompt: str,
+                    variables: Dict[str, Any],
+                    render: Callable[[Dict[str, Any]], Tuple[str, str]],
+                    trimmable: Iterable[str] = ()) -> Tuple[str, str, TokenBudget]:
+        """
+        Make resolved prompts fit the budget and report per-variable token usage.
+
+        按 LLM_BUDGET_POLICY 处理超预算的提示词：reject 直接拒绝；trim 依次裁剪
+        trimmable 中的参考数据变量（按元素丢弃JSON数组尾部），再重新渲染。
+
+        Args:
+            system_template (str): System prompt template
+            user_template (str): User prompt template
+            system_prompt (str): Resolved system prompt
+            user_prompt (str): Resolved user prompt
+            variables (Dict[str, Any]): Resolved template variables used by the templates
+            render (Callable): Renders (system, user) prompts from variables
+            trimmable (Iterable[str]): Variable names that may be trimmed, in order
+
+        Returns:
+            Tuple[str, str, TokenBudget]: Final system prompt, user prompt and budget
+
+        Raises:
+            TokenBudgetError: When the prompts cannot be made to fit
+        """
+        variables = dict(variables)
+        budget = self._plan_with_variables(system_template, user_template, system_prompt, user_prompt, variables)
+        trimmed: Dict[str, Dict[str, int]] = {}
+
+        if not budget.fits and self.policy == 'trim':
+            for name in trimmable:
+                if budget.fits:
+                    break
+                value = variables.get(name)
+                if not value:
+                    continue
+                occurrences = self._occurrences(name, system_template, user_template) or 1
+                value_tokens = self.counter.count(str(value))
+                target = max(0, value_tokens - math.ceil(self._overflow(budget) / occurrences))
+                new_value, dropped = self._trim_value(str(value), target)
+                variables[name] = new_value
+                trimmed[name] = {
+                    "from_tokens": value_tokens,
+                    "to_tokens": self.counter.count(new_value),
+                    "dropped_items": dropped
+                }
+                logger.warning(f"提示词超出预算，裁剪变量 '{name}': {value_tokens} -> {trimmed[name]['to_tokens']} tokens")
+                system_prompt, user_prompt = render(variables)
+                budget = self._plan_with_variables(system_template, user_template, system_prompt, user_prompt, variables)
+
+        budget.trimmed = trimmed
+        if not budget.fits:
+            raise TokenBudgetError(
+                f"提示词超出模型上下文预算: 提示词 {budget.prompt_tokens} tokens, "
+                f"上下文窗口 {budget.context_window}, 剩余输出 {budget.max_output_tokens} < {budget.min_output_tokens}",
+                budget=budget.to_dict()
+            )
+        return system_prompt, user_prompt, budget
+
+    def _overflow(self, budget: TokenBudget) -> int:
+        """Number of prompt tokens over what still leaves min_output_tokens for output."""
+        allowed = self.context_window - self.min_output_tokens
+        if not self.counter.exact:
+            allowed = int(allowed / 1.1)
+        return max(0, budget.prompt_tokens - allowed)
+
+    def _plan_with_variables(self, system_template: str, user_template: str,
+                             system_prompt: str, user_prompt: str,
+                             variables: Dict[str, Any]) -> TokenBudget:
+        budget = self.plan(system_prompt, user_prompt)
+        for name, value in variables.items():
+            occurrences = self._occurrences(name, system_template, user_template)
+            if occurrences and value is not None:
+                budget.variables[name] = self.counter.count(str(value)) * occurrences
+        return budget
+
+    @staticmethod
+    def _occurrences(name: str, *templates: str) -> int:
+        return sum(compile_template(template).occurrences(name) for template in templates if template)
+
+    def _trim_value(self, value: str, target_tokens: int) -> Tuple[str, int]:
+        """
+        Shrink a variable value to at most target_tokens.
+
+        JSON values wrapping a list (e.g. {"warning": ..., "test_cases": [...]}, or a compact
+        table {"columns": [...], "rows": [...]}) keep whole leading elements in the original
+        (indented or minified) layout; other values are cut and marked as truncated.
+
+        Returns:
+            Tuple[str, int]: New value and number of dropped list elements
+        """
+        try:
+            data = json.loads(value)
+        except (ValueError, TypeError):
+            data = None
+
+        list_key = None
+        is_table = False
+        if isinstance(data, dict):
+            for key, item in data.items():
+                if isinstance(item, list):
+                    list_key = key
+                    break
+                if isinstance(item, dict) and isinstance(item.get('rows'), list):
+                    list_key, is_table = key, True
+                    break
+
+        if list_key is not None:
+            items = data[list_key]['rows'] if is_table else data[list_key]
+            # 紧凑编码（无换行）的值裁剪后保持紧凑
+            minified = '\n' not in value
+
+            def keep(count: int) -> str:
+                kept = dict(data[list_key], rows=items[:count]) if is_table else items[:count]
+                trimmed = dict(data, **{list_key: kept})
+                if count < len(items):
+                    trimmed['truncated'] = f"因上下文长度限制，仅保留前 {count}/{len(items)} 项"
+                if minified:
+                    return json.dumps(trimmed, ensure_ascii=False, separators=(',', ':'))
+                return json.dumps(trimmed, ensure_ascii=False, indent=2)
+
+            # Largest number of leading items that fits the target
+            low, high = 0, len(items)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.counter.count(keep(middle)) <= target_tokens:
+                    low = middle
+                else:
+                    high = middle - 1
+            return keep(low), len(items) - low
+
+        if self.counter.count(value) <= target_tokens:
+            return value, 0
+        ratio = target_tokens / max(1, self.counter.count(value))
+        return value[:int(len(value) * ratio)] + "\n...(因上下文长度限制已截断)", 0
@@ -252,7 +252,7 @@ class ValidationMiddleware(BaseHTTPMiddleware):
 
             # 生成模式验证
             generation_mode = body.get("generation_mode", "")
-            valid_modes = ["test_points_only", "test_cases_only"]
+            valid_modes = ["test_points_only", "test_cases_only", "points_then_cases"]
             if generation_mode not in valid_modes:
                 raise CustomValidationError(
                     f"生成模式必须为: {', '.join(valid_modes)}",
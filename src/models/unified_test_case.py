@@ -202,8 +202,8 @@ class UnifiedTestCaseGenerationRequest(BaseModel):
     project_id: int = Field(..., gt=0, description="项目ID")
     business_type: str = Field(..., description="业务类型")
 
-    # Generation mode: test_points_only or test_cases_only
-    generation_mode: str = Field(..., pattern="^(test_points_only|test_cases_only)$", description="生成模式")
+    # Generation mode: test_points_only, test_cases_only or points_then_cases (pipelined, both stages)
+    generation_mode: str = Field(..., pattern="^(test_points_only|test_cases_only|points_then_cases)$", description="生成模式")
 
     # Test point IDs (required for test_cases_only mode)
     test_point_ids: Optional[List[int]] = Field(None, description="测试点ID列表（仅用于test_cases_only模式）")
@@ -211,6 +211,37 @@ class UnifiedTestCaseGenerationRequest(BaseModel):
     # Additional context as simple string
     additional_context: Optional[str] = Field(None, max_length=2000, description="额外上下文")
 
+    # Skip the LLM response cache and always call the model
+    bypass_cache: bool = Field(False, description="是否跳过LLM响应缓存")
+
+    # Start a new job even if an identical one is running
+    force_new: bool = Field(False, description="是否强制新建任务（不合并到运行中的相同任务）")
+
+    # Scheduling class: interactive jobs are started before bulk ones
+    priority: str = Field("interactive", pattern="^(interactive|bulk)$", description="调度优先级: interactive/bulk")
+
+
+class BulkGenerationRequest(BaseModel):
+    """Project-wide bulk generation request (one child job per active business type)."""
+    project_id: int = Field(..., gt=0, description="项目ID")
+
+    # Generation mode applied to every business type
+    generation_mode: str = Field(..., pattern="^(test_points_only|test_cases_only|points_then_cases)$", description="生成模式")
+
+    # Restrict the bulk job to these business types (default: all active ones in the project)
+    business_types: Optional[List[str]] = Field(None, description="业务类型列表（默认为项目内所有启用的业务类型）")
+
+    # Additional context shared by all business types
+    additional_context: Optional[str] = Field(None, max_length=2000, description="额外上下文")
+
+    # Skip the LLM response cache and always call the model
+    bypass_cache: bool = Field(False, description="是否跳过LLM响应缓存")
+
+
+class BulkGenerationRetryRequest(BaseModel):
+    """Retry failed business types of a bulk generation job."""
+    business_types: Optional[List[str]] = Field(None, description="要重试的业务类型（默认为全部失败的业务类型）")
+
 
 class UnifiedTestCaseGenerationResponse(BaseModel):
     """Unified test case generation response."""
@@ -0,0 +1,304 @@
+"""
+项目级批量生成
+
+一个批量任务（父任务）为项目内每个启用的业务类型创建一个子生成任务，子任务进入
+持久化任务队列，由worker池执行：同一父任务同时运行的子任务数受
+GENERATION_BULK_CONCURRENCY 限制，所有子任务共享worker进程内的数据库连接池、
+LLM客户端和缓存。父任务汇总各业务类型的子任务状态；失败的子任务可以单独重试。
+"""
+
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..database.database import DatabaseManager
+from ..database.models import BusinessTypeConfig, GenerationJob, JobStatus
+from .generation_cancellation import cancellation_registry
+from .job_queue import GenerationJobQueue
+from .job_scheduler import PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+# 父任务的 generation_mode（子任务使用对应的普通生成模式）
+BULK_GENERATION_MODES = {
+    'test_points_only': 'bulk_test_points',
+    'test_cases_only': 'bulk_test_cases',
+    'points_then_cases': 'bulk_pipeline'
+}
+BULK_BUSINESS_TYPE = 'BULK'
+
+_UNFINISHED = (JobStatus.PENDING, JobStatus.RUNNING)
+
+
+class BulkGenerationService:
+    """批量生成任务的创建、进度汇总和失败重试"""
+
+    def __init__(self, db_manager: DatabaseManager):
+        """
+        初始化批量生成服务
+
+        Args:
+            db_manager: 数据库管理器
+        """
+        self.db_manager = db_manager
+
+    @staticmethod
+    def is_bulk_job(job: GenerationJob) -> bool:
+        """是否为批量任务（父任务）"""
+        return job.generation_mode in BULK_GENERATION_MODES.values()
+
+    def create_bulk_job(
+        self,
+        project_id: int,
+        generation_mode: str,
+        business_types: Optional[List[str]] = None,
+        additional_context: Optional[str] = None,
+        use_cache: bool = True,
+        priority: str = PRIORITY_BULK
+    ) -> Dict[str, Any]:
+        """
+        创建批量任务，并为每个业务类型创建排队的子任务
+
+        Args:
+            project_id: 项目ID
+            generation_mode: 子任务的生成模式（test_points_only/test_cases_only/points_then_cases）
+            business_types: 业务类型列表，默认为项目内所有启用的业务类型
+            additional_context: 额外上下文
+            use_cache: 是否使用LLM响应缓存
+            priority: 子任务的调度优先级
+
+        Returns:
+            父任务ID和各业务类型的子任务ID
+
+        Raises:
+            ValueError: 生成模式无效或没有可生成的业务类型
+        """
+        if generation_mode not in BULK_GENERATION_MODES:
+            raise ValueError(f"不支持的生成模式: {generation_mode}")
+
+        parent_id = str(uuid.uuid4())
+        now = datetime.now()
+        with self.db_manager.get_session() as db:
+            query = db.query(BusinessTypeConfig.code).filter(
+                BusinessTypeConfig.project_id == project_id,
+                BusinessTypeConfig.is_active == True
+            )
+            active_codes = [row.code for row in query.order_by(BusinessTypeConfig.code).all()]
+            if business_types:
+                requested = [code.upper() for code in business_types]
+                inactive = sorted(set(requested) - set(active_codes))
+                if inactive:
+                    raise ValueError(f"业务类型不存在或未在项目中启用: {', '.join(inactive)}")
+                active_codes = [code for code in active_codes if code in requested]
+            if not active_codes:
+                raise ValueError("项目中没有启用的业务类型")
+
+            db.add(GenerationJob(
+                id=parent_id,
+                project_id=project_id,
+                business_type=BULK_BUSINESS_TYPE,
+                status=JobStatus.PENDING,
+                generation_mode=BULK_GENERATION_MODES[generation_mode],
+                priority=priority,
+                total_steps=len(active_codes),
+                current_step=0,
+                progress=0,
+                generation_metadata=json.dumps({"business_types": active_codes}, ensure_ascii=False),
+                created_at=now
+            ))
+
+            children = {}
+            for code in active_codes:
+                child_id = str(uuid.uuid4())
+                job_kwargs = {
+                    "business_type": code,
+                    "project_id": project_id,
+                    "additional_context": additional_context,
+                    "use_cache": use_cache
+                }
+                if generation_mode == 'test_cases_only':
+                    # 使用该业务类型下的全部测试点
+                    job_kwargs["test_point_ids"] = None
+                db.add(GenerationJob(
+                    id=child_id,
+                    project_id=project_id,
+                    business_type=code,
+                    status=JobStatus.PENDING,
+                    generation_mode=generation_mode,
+                    job_payload=GenerationJobQueue.build_payload(**job_kwargs),
+                    priority=priority,
+                    parent_job_id=parent_id,
+                    created_at=now
+                ))
+                children[code] = child_id
+            db.commit()
+
+        logger.info(f"批量生成任务已创建: {parent_id}（{len(children)} 个业务类型）")
+        return {"task_id": parent_id, "children": children}
+
+    def progress(self, parent_id: str) -> Optional[Dict[str, Any]]:
+        """
+        汇总批量任务进度
+
+        Args:
+            parent_id: 父任务ID
+
+        Returns:
+            各业务类型的子任务状态和按状态的计数；父任务不存在时返回None
+        """
+        with self.db_manager.get_session() as db:
+            parent = db.query(GenerationJob).filter(GenerationJob.id == parent_id).first()
+            if not parent or not self.is_bulk_job(parent):
+                return None
+            children = db.query(GenerationJob).filter(
+                GenerationJob.parent_job_id == parent_id
+            ).order_by(GenerationJob.business_type).all()
+            return self._summarize(parent_id, children)
+
+    def refresh_parent(self, parent_id: str) -> Optional[Dict[str, Any]]:
+        """
+        根据子任务状态更新父任务的状态、进度和结果
+
+        Args:
+            parent_id: 父任务ID
+
+        Returns:
+            汇总进度；父任务不存在时返回None
+        """
+        with self.db_manager.get_session() as db:
+            parent = db.query(GenerationJob).filter(GenerationJob.id == parent_id).first()
+            if not parent or not self.is_bulk_job(parent):
+                return None
+            children = db.query(GenerationJob).filter(GenerationJob.parent_job_id == parent_id).all()
+            summary = self._summarize(parent_id, children)
+
+            if parent.status != JobStatus.CANCELLED:
+                parent.status = JobStatus(summary["status"])
+            finished = summary["total"] - summary["counts"]["pending"] - summary["counts"]["running"]
+            parent.current_step = finished
+            parent.progress = summary["progress"]
+            parent.step_description = (
+                f"已完成 {summary['counts']['completed']}/{summary['total']} 个业务类型，"
+                f"失败 {summary['counts']['failed']} 个"
+            )
+            parent.test_points_generated = summary["test_points_generated"]
+            parent.test_cases_generated = summary["test_cases_generated"]
+            if parent.status in _UNFINISHED:
+                parent.completed_at = None
+            elif parent.completed_at is None:
+                parent.completed_at = datetime.now()
+            parent.result_data = json.dumps(summary, ensure_ascii=False)
+            db.commit()
+            return summary
+
+    def retry_failed(self, parent_id: str, business_types: Optional[List[str]] = None) -> List[str]:
+        """
+        把失败（或已取消）的子任务重新放回队列
+
+        Args:
+            parent_id: 父任务ID
+            business_types: 只重试这些业务类型，默认重试全部失败的子任务
+
+        Returns:
+            重新排队的子任务ID
+        """
+        with self.db_manager.get_session() as db:
+            query = db.query(GenerationJob).filter(
+                GenerationJob.parent_job_id == parent_id,
+                GenerationJob.status.in_([JobStatus.FAILED, JobStatus.CANCELLED])
+            )
+            if business_types:
+                query = query.filter(GenerationJob.business_type.in_([code.upper() for code in business_types]))
+            children = query.all()
+            for child in children:
+                child.status = JobStatus.PENDING
+                child.error_message = None
+                child.completed_at = None
+                child.worker_id = None
+                child.lease_expires_at = None
+                child.attempts = 0
+                # 排队中被取消的子任务留有取消标记，重新排队前清除
+                cancellation_registry.reset(child.id)
+            parent = db.query(GenerationJob).filter(GenerationJob.id == parent_id).first()
+            if children and parent and parent.status == JobStatus.CANCELLED:
+                parent.status = JobStatus.PENDING
+            db.commit()
+            retried = [child.id for child in children]
+
+        if retried:
+            logger.info(f"批量任务 {parent_id} 重试 {len(retried)} 个子任务")
+            self.refresh_parent(parent_id)
+        return retried
+
+    def cancel_children(self, parent_id: str) -> List[str]:
+        """
+        取消批量任务下未结束的子任务
+
+        Args:
+            parent_id: 父任务ID
+
+        Returns:
+            被取消的子任务ID（调用方负责中止其中正在运行的任务）
+        """
+        with self.db_manager.get_session() as db:
+            children = db.query(GenerationJob).filter(
+                GenerationJob.parent_job_id == parent_id,
+                GenerationJob.status.in_(_UNFINISHED)
+            ).all()
+            now = datetime.now()
+            for child in children:
+                child.status = JobStatus.CANCELLED
+                child.completed_at = now
+            db.commit()
+            return [child.id for child in children]
+
+    @staticmethod
+    def _summarize(parent_id: str, children: List[GenerationJob]) -> Dict[str, Any]:
+        """汇总子任务：各业务类型的状态、按状态计数和总体状态"""
+        counts = {status.value: 0 for status in JobStatus}
+        business_types = {}
+        test_points_generated = 0
+        test_cases_generated = 0
+        for child in children:
+            counts[child.status.value] += 1
+            result = {}
+            if child.result_data:
+                try:
+                    result = json.loads(child.result_data)
+                except ValueError:
+                    result = {}
+            test_points_generated += result.get("test_points_generated", 0) or 0
+            test_cases_generated += result.get("test_cases_generated", 0) or 0
+            business_types[child.business_type] = {
+                "task_id": child.id,
+                "status": child.status.value,
+                "progress": child.progress or 0,
+                "attempts": child.attempts or 0,
+                "error_message": child.error_message
+            }
+
+        total = len(children)
+        if counts["running"]:
+            status = JobStatus.RUNNING
+        elif counts["pending"]:
+            status = JobStatus.RUNNING if total - counts["pending"] else JobStatus.PENDING
+        elif counts["failed"]:
+            status = JobStatus.FAILED
+        elif total and counts["cancelled"] == total:
+            status = JobStatus.CANCELLED
+        else:
+            status = JobStatus.COMPLETED
+
+        finished = total - counts["pending"] - counts["running"]
+        return {
+            "task_id": parent_id,
+            "status": status.value,
+            "total": total,
+            "counts": counts,
+            "progress": int(100 * finished / total) if total else 100,
+            "test_points_generated": test_points_generated,
+            "test_cases_generated": test_cases_generated,
+            "business_types": business_types
+        }
@@ -22,6 +22,7 @@ from src.models.business import (
     ConfigurationStatus
 )
 from src.utils.database_prompt_builder import DatabasePromptBuilder
+from src.utils.prompt_template import compile_template
 
 
 class BusinessService:
@@ -877,9 +878,7 @@ class PromptCombinationService:
             combined_prompt = "\n\n".join(prompt_parts)
 
             # Extract template variables from combined prompt
-            import re
-            template_pattern = r'\{\{([^}]+)\}\}'
-            variables = list(set(re.findall(template_pattern, combined_prompt)))
+            variables = list(compile_template(combined_prompt).variables)
 
             # Validate the combination
             validation_errors = []
@@ -0,0 +1,127 @@
+"""
+生成任务取消登记表
+
+后台生成任务启动时按task_id登记其asyncio任务。取消时除了把GenerationJob标记为
+CANCELLED，还会取消正在运行的asyncio任务：进行中的LLM HTTP请求随之中止，
+批次并发名额和速率限制的预留token被释放，后续的结果保存被跳过。
+生成流程在各阶段之间（提示词解析、LLM调用、结果提取、写库）调用
+raise_if_cancelled()检查取消标记。
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationCancellationRegistry:
+    """进程内的取消登记表：task_id -> 正在运行的asyncio任务"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cancelled: Set[str] = set()
+        self.cancelled_tasks = 0
+
+    def register(self, task_id: str, task: asyncio.Task) -> None:
+        """
+        登记运行中的生成任务
+
+        Args:
+            task_id: 任务ID
+            task: 执行该任务的asyncio任务
+        """
+        with self._lock:
+            self._tasks[task_id] = task
+
+    def unregister(self, task_id: str) -> None:
+        """
+        任务结束后移除登记和取消标记
+
+        Args:
+            task_id: 任务ID
+        """
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            self._cancelled.discard(task_id)
+
+    def reset(self, task_id: str) -> None:
+        """
+        任务重新排队（恢复、重试）时清除取消标记
+
+        Args:
+            task_id: 任务ID
+        """
+        with self._lock:
+            self._cancelled.discard(task_id)
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        标记任务已取消，并取消其正在运行的asyncio任务
+
+        只处理登记在本进程的任务。未登记的任务（仍在排队，或由其他进程的worker执行）
+        不记录标记：排队任务的CANCELLED状态使其不会被领取，其他进程中运行的任务在续约
+        失败时由其worker中止；在此记录的标记既不会被读取，也不会被清除。
+        可以从任意线程调用。
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            是否取消了正在运行的asyncio任务
+        """
+        with self._lock:
+            task: Optional[asyncio.Task] = self._tasks.get(task_id)
+            if task is None:
+                return False
+            self._cancelled.add(task_id)
+            if task.done():
+                return False
+            self.cancelled_tasks += 1
+
+        task.get_loop().call_soon_threadsafe(task.cancel)
+        logger.info(f"已取消运行中的生成任务: {task_id}")
+        return True
+
+    def is_cancelled(self, task_id: Optional[str]) -> bool:
+        """
+        任务是否已被取消
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            是否已取消
+        """
+        if not task_id:
+            return False
+        with self._lock:
+            return task_id in self._cancelled
+
+    def raise_if_cancelled(self, task_id: Optional[str]) -> None:
+        """
+        任务已取消时抛出asyncio.CancelledError，在生成阶段之间调用
+
+        Args:
+            task_id: 任务ID
+
+        Raises:
+            asyncio.CancelledError: 任务已被取消
+        """
+        if self.is_cancelled(task_id):
+            raise asyncio.CancelledError(f"生成任务已取消: {task_id}")
+
+    def stats(self) -> Dict[str, Any]:
+        """获取登记的运行任务数和取消计数"""
+        with self._lock:
+            return {
+                "running_jobs": len(self._tasks),
+                "pending_cancellations": len(self._cancelled),
+                "cancelled_tasks": self.cancelled_tasks
+            }
+
+
+# 全局实例
+cancellation_registry = GenerationCancellationRegistry()
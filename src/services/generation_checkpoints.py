@@ -0,0 +1,140 @@
+"""
+生成任务检查点
+
+生成任务按阶段把中间结果持久化到 generation_checkpoints 表：
+- prompts: 解析后的系统提示词和用户提示词
+- llm_response: LLM原始响应
+- batches: 测试用例的批次划分（各批次的测试点ID）
+- items: 提取出的测试点/测试用例（测试用例按批次保存）
+- partitions: 分区生成测试点时的分区规划（批次0）和各分区的LLM响应（批次1..n）
+- written: 已写入数据库的结果
+
+任务被重新执行时（worker重启后租约过期被重新领取、失败后 resume、批量任务重试），
+已有检查点的步骤直接使用保存的结果，不再重复调用LLM；分批生成测试用例时只重新
+生成没有检查点的批次。任务完成后检查点被删除。
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from ..database.database import DatabaseManager
+from ..database.models import GenerationCheckpoint
+
+logger = logging.getLogger(__name__)
+
+STAGE_PROMPTS = 'prompts'
+STAGE_BATCHES = 'batches'
+STAGE_LLM_RESPONSE = 'llm_response'
+STAGE_ITEMS = 'items'
+STAGE_PARTITIONS = 'partitions'
+STAGE_WRITTEN = 'written'
+
+
+class JobCheckpoints:
+    """单个生成任务的检查点读写"""
+
+    def __init__(self, db_manager: DatabaseManager, task_id: str):
+        """
+        初始化检查点
+
+        Args:
+            db_manager: 数据库管理器
+            task_id: 生成任务ID
+        """
+        self.db_manager = db_manager
+        self.task_id = task_id
+
+    def load(self, stage: str, batch_index: int = 0) -> Optional[Any]:
+        """
+        读取检查点
+
+        Args:
+            stage: 阶段
+            batch_index: 批次序号
+
+        Returns:
+            保存的内容，没有检查点时返回None
+        """
+        with self.db_manager.get_session() as db:
+            checkpoint = db.query(GenerationCheckpoint).filter(
+                GenerationCheckpoint.job_id == self.task_id,
+                GenerationCheckpoint.stage == stage,
+                GenerationCheckpoint.batch_index == batch_index
+            ).first()
+            if checkpoint is None:
+                return None
+            try:
+                return json.loads(checkpoint.data)
+            except ValueError:
+                logger.warning(f"检查点内容无法解析，忽略 (task {self.task_id}, {stage}#{batch_index})")
+                return None
+
+    def save(self, stage: str, data: Any, batch_index: int = 0, db=None) -> None:
+        """
+        保存（覆盖）检查点
+
+        Args:
+            stage: 阶段
+            data: 可JSON序列化的内容
+            batch_index: 批次序号
+            db: 数据库会话；提供时检查点随该会话的事务一起提交，
+                用于与结果写入保持原子性
+        """
+        if db is not None:
+            self._upsert(db, stage, data, batch_index)
+            return
+        with self.db_manager.get_session() as session:
+            self._upsert(session, stage, data, batch_index)
+            session.commit()
+
+    async def aload(self, stage: str, batch_index: int = 0) -> Optional[Any]:
+        """load 的异步版本（数据库访问放到线程池执行）"""
+        return await asyncio.to_thread(self.load, stage, batch_index)
+
+    async def asave(self, stage: str, data: Any, batch_index: int = 0) -> None:
+        """save 的异步版本；保存失败只记录警告，不影响生成"""
+        try:
+            await asyncio.to_thread(self.save, stage, data, batch_index)
+        except Exception as e:
+            logger.warning(f"保存检查点失败 (task {self.task_id}, {stage}#{batch_index}): {e}")
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        获取已保存的检查点
+
+        Returns:
+            阶段 -> 已保存的批次序号列表
+        """
+        with self.db_manager.get_session() as db:
+            rows = db.query(GenerationCheckpoint.stage, GenerationCheckpoint.batch_index).filter(
+                GenerationCheckpoint.job_id == self.task_id
+            ).order_by(GenerationCheckpoint.stage, GenerationCheckpoint.batch_index).all()
+        stages: Dict[str, Any] = {}
+        for stage, batch_index in rows:
+            stages.setdefault(stage, []).append(batch_index)
+        return stages
+
+    def clear(self) -> None:
+        """删除任务的所有检查点"""
+        with self.db_manager.get_session() as db:
+            db.query(GenerationCheckpoint).filter(
+                GenerationCheckpoint.job_id == self.task_id
+            ).delete(synchronize_session=False)
+            db.commit()
+
+    def _upsert(self, db, stage: str, data: Any, batch_index: int) -> None:
+        content = json.dumps(data, ensure_ascii=False, default=str)
+        checkpoint = db.query(GenerationCheckpoint).filter(
+            GenerationCheckpoint.job_id == self.task_id,
+            GenerationCheckpoint.stage == stage,
+            GenerationCheckpoint.batch_index == batch_index
+        ).first()
+        if checkpoint is None:
+            db.add(GenerationCheckpoint(
+                job_id=self.task_id, stage=stage, batch_index=batch_index, data=content
+            ))
+        else:
+            checkpoint.data = content
+        db.flush()
@@ -0,0 +1,102 @@
+"""
+生成请求合并（single-flight）
+
+相同的生成请求（业务类型、项目、生成模式、测试点ID、额外上下文均相同）在已有任务
+运行期间不再创建新任务和新的LLM调用，而是合并到正在运行的任务，返回同一个task_id。
+
+合并表保存在进程内存中，只对由本进程worker执行的任务（GENERATION_WORKER_MODE=inprocess）有效；
+external模式下任务在其他进程结束，登记无法释放，API改为按生成任务记录中的请求键合并。
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationCoalescer:
+    """进程内的生成任务合并表：请求键 -> 正在运行的task_id（仅对本进程执行的任务有效）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running: Dict[str, str] = {}
+        self._attached: Dict[str, int] = {}
+        self.coalesced_requests = 0
+
+    @staticmethod
+    def make_key(business_type: str, project_id: int, generation_mode: str,
+                 test_point_ids: Optional[List[int]] = None,
+                 additional_context: Any = None) -> str:
+        """
+        生成请求键
+
+        Args:
+            business_type: 业务类型
+            project_id: 项目ID
+            generation_mode: 生成模式
+            test_point_ids: 测试点ID列表（顺序无关）
+            additional_context: 额外上下文（按内容哈希）
+
+        Returns:
+            请求键
+        """
+        context_hash = hashlib.sha256(
+            json.dumps(additional_context, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        return json.dumps([
+            business_type.upper(),
+            project_id,
+            generation_mode,
+            sorted(set(test_point_ids or [])),
+            context_hash
+        ])
+
+    def attach_or_register(self, key: str, task_id: str) -> Tuple[str, bool]:
+        """
+        合并到正在运行的相同任务，或把task_id登记为该请求键的运行任务
+
+        Args:
+            key: 请求键
+            task_id: 新任务的ID（没有可合并任务时使用）
+
+        Returns:
+            (实际使用的task_id, 是否合并到已有任务)
+        """
+        with self._lock:
+            running_task_id = self._running.get(key)
+            if running_task_id is not None:
+                self._attached[running_task_id] = self._attached.get(running_task_id, 0) + 1
+                self.coalesced_requests += 1
+                logger.info(f"合并重复生成请求到运行中的任务: {running_task_id}")
+                return running_task_id, True
+            self._running[key] = task_id
+            return task_id, False
+
+    def release(self, key: str, task_id: str) -> None:
+        """
+        任务结束后移除请求键
+
+        Args:
+            key: 请求键
+            task_id: 已结束任务的ID
+        """
+        with self._lock:
+            if self._running.get(key) == task_id:
+                del self._running[key]
+            self._attached.pop(task_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取运行中的任务数和合并计数"""
+        with self._lock:
+            return {
+                "running_jobs": len(self._running),
+                "attached_requests": dict(self._attached),
+                "coalesced_requests": self.coalesced_requests
+            }
+
+
+# 全局实例
+generation_coalescer = GenerationCoalescer()
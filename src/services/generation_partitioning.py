@@ -0,0 +1,205 @@
+"""
+测试点分区生成
+
+用户要求生成大量测试点（如 "生成50个测试点"）时，单次LLM调用的输出很容易被截断或超时。
+达到 TEST_POINT_PARTITION_THRESHOLD 时改为分区生成：
+1. 子区域（功能模块/业务域）取自业务类型配置 additional_config 中的
+   test_point_partitions / functional_modules；未配置时用一次小的规划调用拆分；
+2. 每个子区域并发（TEST_POINT_PARTITION_CONCURRENCY）生成一部分测试点，输出预算为
+   TEST_POINT_PARTITION_TOKEN_BUDGET；
+3. 合并各分区结果，按标题去重并重新编号后交给原有的解析和保存流程。
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+# "50个测试点" / "50条测试点" / "50 test points"
+_COUNT_PATTERN = re.compile(r'(\d+)\s*(?:个|条)?\s*(?:测试点|test[\s_-]*points?)', re.IGNORECASE)
+
+# 业务类型 additional_config 中可以声明分区的键
+PARTITION_CONFIG_KEYS = ('test_point_partitions', 'functional_modules')
+
+PLANNING_SYSTEM_PROMPT = (
+    "你是资深测试架构师。请把下面的测试需求拆分为互不重叠的功能模块或业务域，"
+    "用于分别编写测试点。只输出JSON：{\"partitions\": [\"模块1\", \"模块2\", ...]}"
+)
+
+
+def requested_test_point_count(additional_context: Any) -> Optional[int]:
+    """
+    从用户输入中识别要求生成的测试点数量
+
+    Args:
+        additional_context: 生成请求的附加上下文（字符串或包含 user_input 的字典）
+
+    Returns:
+        要求的测试点数量，未指定时返回None
+    """
+    if isinstance(additional_context, dict):
+        text = additional_context.get('user_input') or ''
+    else:
+        text = additional_context or ''
+    if not isinstance(text, str):
+        return None
+    counts = [int(match) for match in _COUNT_PATTERN.findall(text)]
+    return max(counts) if counts else None
+
+
+def configured_partitions(additional_config: Any) -> List[str]:
+    """
+    读取业务类型配置中声明的分区
+
+    additional_config 中 test_point_partitions / functional_modules 的元素可以是字符串，
+    也可以是包含 name（和可选 description）的对象。
+
+    Args:
+        additional_config: BusinessTypeConfig.additional_config（字典或JSON字符串）
+
+    Returns:
+        分区描述列表
+    """
+    if isinstance(additional_config, str):
+        try:
+            additional_config = json.loads(additional_config)
+        except ValueError:
+            return []
+    if not isinstance(additional_config, dict):
+        return []
+    for key in PARTITION_CONFIG_KEYS:
+        entries = additional_config.get(key)
+        if isinstance(entries, list) and entries:
+            return _normalize_partitions(entries)
+    return []
+
+
+def build_planning_prompt(user_prompt: str, max_partitions: int) -> str:
+    """构建规划调用的用户提示词"""
+    return (
+        f"{user_prompt}\n\n"
+        f"请把以上需求拆分为不超过 {max_partitions} 个功能模块或业务域，"
+        f"只输出JSON：{{\"partitions\": [\"模块名称：简要说明\", ...]}}"
+    )
+
+
+def parse_planned_partitions(response: Optional[str], limit: int) -> List[str]:
+    """
+    解析规划调用返回的分区
+
+    Args:
+        response: LLM响应，{"partitions": [...]} 或直接为数组，允许包含代码块标记
+        limit: 最多保留的分区数
+
+    Returns:
+        分区描述列表，解析失败时为空列表
+    """
+    if not response:
+        return []
+    match = re.search(r'[\[{].*[\]}]', response, re.DOTALL)
+    if not match:
+        return []
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return []
+    if isinstance(data, dict):
+        data = data.get('partitions') or data.get('modules') or []
+    if not isinstance(data, list):
+        return []
+    return _normalize_partitions(data)[:max(1, limit)]
+
+
+def allocate_counts(total: int, partition_count: int) -> List[int]:
+    """把测试点总数平均分配到各分区（余数分给靠前的分区）"""
+    base, remainder = divmod(total, partition_count)
+    return [base + (1 if index < remainder else 0) for index in range(partition_count)]
+
+
+def build_partition_prompt(user_prompt: str, partition: str, count: int, partitions: List[str]) -> str:
+    """
+    在解析后的用户提示词末尾追加分区范围说明
+
+    Args:
+        user_prompt: 解析后的用户提示词
+        partition: 本次生成的分区
+        count: 本分区要生成的测试点数量
+        partitions: 全部分区，用于说明其他分区由别的调用负责
+
+    Returns:
+        分区用户提示词
+    """
+    others = [other for other in partitions if other != partition]
+    scope = (
+        f"\n\n## 本次生成范围\n"
+        f"本次只针对「{partition}」生成 {count} 个测试点，忽略上文中对测试点总数的要求。"
+    )
+    if others:
+        scope += f"以下范围由其他调用负责，不要生成：{'；'.join(others)}。"
+    return user_prompt + scope
+
+
+def point_title_key(test_point: Dict[str, Any]) -> str:
+    """测试点去重键：标题去掉空白和标点后的小写形式"""
+    title = test_point.get('title') or test_point.get('name') or ''
+    return re.sub(r'[\W_]+', '', str(title)).lower()
+
+
+def merge_test_points(partition_points: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    合并各分区的测试点
+
+    按标题去重（保留先出现的），并按合并后的顺序重新编号 test_case_id / id，
+    避免各分区都从 TP001 开始编号。
+
+    Args:
+        partition_points: 各分区的测试点列表，按分区顺序
+
+    Returns:
+        合并后的测试点列表
+    """
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+    for points in partition_points:
+        for point in points or []:
+            if not isinstance(point, dict):
+                continue
+            key = point_title_key(point)
+            if key and key in seen:
+                continue
+            seen.add(key)
+            merged.append(dict(point))
+
+    for index, point in enumerate(merged, start=1):
+        for id_key in ('test_case_id', 'id'):
+            if id_key in point:
+                point[id_key] = f'TP{index:03d}'
+                break
+    return merged
+
+
+def extract_test_points(response: Optional[str]) -> List[Dict[str, Any]]:
+    """从单个分区的LLM响应中提取测试点列表，解析失败时返回空列表"""
+    from ..core.json_extractor import JSONExtractor
+
+    if not response:
+        return []
+    data = JSONExtractor.extract_json_from_response(response)
+    if isinstance(data, dict):
+        points = data.get('test_points')
+    else:
+        points = data
+    return points if isinstance(points, list) else []
+
+
+def _normalize_partitions(entries: List[Any]) -> List[str]:
+    partitions: List[str] = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            name = str(entry.get('name') or '').strip()
+            description = str(entry.get('description') or '').strip()
+            label = f"{name}：{description}" if name and description else name or description
+        else:
+            label = str(entry).strip()
+        if label and label not in partitions:
+            partitions.append(label)
+    return partitions
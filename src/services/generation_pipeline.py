@@ -0,0 +1,94 @@
+"""
+两阶段流水线生成
+
+points_then_cases 模式下，第一阶段以流式方式生成测试点，每个测试点解析并保存后交给
+PointsToCasesPipeline；凑满一个批次（TEST_CASE_BATCH_SIZE）即开始第二阶段的测试用例
+生成，与第一阶段后续测试点的生成重叠进行。第二阶段的并发批次数受
+TEST_CASE_BATCH_CONCURRENCY 限制。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PointsToCasesPipeline:
+    """把第一阶段陆续产出的测试点按批次交给第二阶段并发生成"""
+
+    def __init__(self, run_batch: Callable[[int, List[Dict[str, Any]]], Awaitable[Any]],
+                 batch_size: int, concurrency: int):
+        """
+        初始化流水线
+
+        Args:
+            run_batch: 第二阶段批次处理函数 run_batch(batch_index, test_points)
+            batch_size: 每批测试点数量
+            concurrency: 同时运行的批次数上限
+        """
+        self.run_batch = run_batch
+        self.batch_size = max(1, batch_size)
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._pending: List[Dict[str, Any]] = []
+        self._seen_ids = set()
+        self._tasks: List[asyncio.Task] = []
+        self._started_at = time.time()
+        self.first_batch_seconds: Optional[float] = None
+
+    @property
+    def batch_count(self) -> int:
+        """已提交的批次数"""
+        return len(self._tasks)
+
+    def add(self, test_point: Dict[str, Any]) -> None:
+        """
+        加入一个已保存的测试点；凑满一个批次时立即开始第二阶段生成
+
+        Args:
+            test_point: 测试点数据，包含数据库 "id"；重复的测试点被忽略
+        """
+        if test_point['id'] in self._seen_ids:
+            return
+        self._seen_ids.add(test_point['id'])
+        self._pending.append(test_point)
+        if len(self._pending) >= self.batch_size:
+            self._dispatch()
+
+    async def finish(self) -> List[Any]:
+        """
+        第一阶段结束后提交剩余测试点，等待所有批次完成
+
+        Returns:
+            各批次的结果，按批次顺序；失败的批次为None
+        """
+        if self._pending:
+            self._dispatch()
+        results = await asyncio.gather(*self._tasks, return_exceptions=True)
+        for batch_index, result in enumerate(results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, Exception):
+                logger.error(f"第 {batch_index + 1} 批测试用例生成失败: {result}")
+        return [None if isinstance(result, Exception) else result for result in results]
+
+    async def aclose(self) -> None:
+        """取消尚未完成的批次（第一阶段失败或任务被取消时）"""
+        unfinished = [task for task in self._tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, []
+        batch_index = len(self._tasks)
+        if self.first_batch_seconds is None:
+            self.first_batch_seconds = round(time.time() - self._started_at, 2)
+        logger.info(f"流水线提交第 {batch_index + 1} 批测试用例生成 | 测试点数量: {len(batch)}")
+        self._tasks.append(asyncio.ensure_future(self._run(batch_index, batch)))
+
+    async def _run(self, batch_index: int, batch: List[Dict[str, Any]]) -> Any:
+        async with self._semaphore:
+            return await self.run_batch(batch_index, batch)
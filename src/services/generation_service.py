@@ -6,18 +6,30 @@
 """
 
 import uuid
+import math
 import time
+import json
+import inspect
 import logging
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Callable
 from datetime import datetime
 
 from ..database.database import DatabaseManager
+from ..database.operations import DatabaseOperations
 from ..database.models import (
     UnifiedTestCase, UnifiedTestCaseStage, GenerationJob, JobStatus,
     BusinessTypeConfig, Project
 )
 # TestPointGenerator removed - using unified generation system
 from ..core.test_case_generator import TestCaseGenerator
+from ..llm.structured_output import TEST_POINTS
+from .generation_cancellation import cancellation_registry
+from .generation_checkpoints import JobCheckpoints, STAGE_LLM_RESPONSE, STAGE_PARTITIONS, STAGE_PROMPTS
+from .generation_partitioning import (
+    PLANNING_SYSTEM_PROMPT, allocate_counts, build_partition_prompt, build_planning_prompt,
+    configured_partitions, extract_test_points, merge_test_points, parse_planned_partitions,
+    point_title_key, requested_test_point_count
+)
 from ..utils.config import Config
 from ..models.generation import (
     GenerationStage, GenerationStatus, GenerationProgress,
@@ -26,7 +38,7 @@ from ..models.generation import (
 from ..models.unified_test_case import UnifiedTestCaseStatus
 from ..exceptions.generation import (
     GenerationError, LLMError, BusinessTypeError,
-    ValidationError, handle_generation_error
+    ValidationError, TokenBudgetError, handle_generation_error
 )
 import asyncio
 
@@ -36,16 +48,19 @@ logger = logging.getLogger(__name__)
 class UnifiedGenerationService:
     """统一的生成服务类。"""
 
-    def __init__(self, config: Config = None):
+    def __init__(self, config: Config = None, db_manager: DatabaseManager = None,
+                 test_case_generator: TestCaseGenerator = None):
         """
         初始化生成服务。
 
         Args:
             config: 配置对象
+            db_manager: 数据库管理器（默认按配置创建）
+            test_case_generator: 测试用例生成器（默认按配置创建）
         """
         self.config = config or Config()
-        self.db_manager = DatabaseManager(self.config)
-        self.test_case_generator = TestCaseGenerator(self.config)
+        self.db_manager = db_manager or DatabaseManager(self.config)
+        self.test_case_generator = test_case_generator or TestCaseGenerator(self.config)
         self.active_jobs: Dict[str, Dict[str, Any]] = {}
 
     def validate_business_type(self, business_type: str) -> BusinessTypeConfig:
@@ -74,6 +89,8 @@ class UnifiedGenerationService:
                     is_inactive=True
                 )
 
+            # 会话退出时提交会使实例过期，先脱离会话以便调用方读取配置字段
+            db.expunge(business_config)
             return business_config
 
     def generate_test_points(
@@ -108,232 +125,567 @@ class UnifiedGenerationService:
         start_time = time.time()
 
         try:
-            # 验证业务类型
-            business_config = self.validate_business_type(business_type)
-
-            # 记录业务类型配置到AI日志
-            if ai_logger:
-                try:
-                    business_config_data = {
-                        "business_type": business_type,
-                        "business_config": {
-                            "id": business_config.id if hasattr(business_config, 'id') else None,
-                            "name": getattr(business_config, 'name', None),
-                            "description": getattr(business_config, 'description', None)
-                        }
-                    }
-                    ai_logger.log_business_type_config(business_config_data)
-                except Exception as log_error:
-                    logger.warning(f"Failed to log business type config: {log_error}")
+            system_prompt, resolved_system_prompt, resolved_user_prompt = self._prepare_test_point_prompts(
+                business_type, additional_context, project_id, task_id, ai_logger
+            )
 
-            # 注意：不再在这里创建任务记录，由API端点负责
-            # 这样可以避免重复任务创建的问题
+            # 使用LLM生成测试点数据
+            logger.info(f"开始AI生成测试点 | 业务类型: {business_type}")
+            response = self.test_case_generator.llm_client.generate_test_cases(
+                system_prompt,
+                resolved_user_prompt,
+                ai_logger=ai_logger,
+                resolved_system_prompt=resolved_system_prompt,
+                resolved_requirements_prompt=resolved_user_prompt,
+                output_schema=TEST_POINTS
+            )
 
-              # 获取测试点生成的提示词（ID=87）
-            system_prompt, user_prompt = self.test_case_generator.prompt_builder.get_two_stage_prompts(
-                business_type, 'test_point'
+            return self._finalize_test_points(
+                response, business_type, save_to_database, project_id, task_id, start_time, ai_logger
             )
 
-            if system_prompt is None or user_prompt is None:
-                raise RuntimeError(f"无法为 {business_type} 获取测试点生成提示词组合")
+        except Exception as e:
+            return self._test_points_failure_response(e, task_id, start_time)
 
-            logger.info(f"获取到测试点提示词 | 系统提示词长度: {len(system_prompt)} | 用户提示词长度: {len(user_prompt)}")
+    async def agenerate_test_points(
+        self,
+        business_type: str,
+        additional_context: Optional[Dict[str, Any]] = None,
+        save_to_database: bool = False,
+        project_id: Optional[int] = None,
+        task_id: Optional[str] = None,
+        ai_logger=None,
+        on_item: Optional[Callable] = None,
+        use_cache: bool = True,
+        checkpoints: Optional[JobCheckpoints] = None,
+        complete_job: bool = True
+    ) -> GenerationResponse:
+        """
+        生成测试点（第一阶段）的异步版本。
 
-            # 应用模板变量到系统提示词和用户提示词，确保传递generation_stage='test_point'
-            resolved_system_prompt = self.test_case_generator.prompt_builder._apply_template_variables(
-                content=system_prompt,
-                additional_context=additional_context or {},
-                business_type=business_type,
-                project_id=project_id,
-                endpoint_params={
-                    'generation_stage': 'test_point',
-                    'additional_context': additional_context or {}
-                }
-            )
+        LLM调用通过异步客户端完成；提示词组装、进度更新和数据库保存为同步
+        数据库操作，放到线程池执行，不阻塞事件循环。参数与 generate_test_points 相同。
 
-            resolved_user_prompt = self.test_case_generator.prompt_builder._apply_template_variables(
-                content=user_prompt,
-                additional_context=additional_context or {},
-                business_type=business_type,
-                project_id=project_id,
-                endpoint_params={
-                    'generation_stage': 'test_point',
-                    'additional_context': additional_context or {}
-                }
-            )
+        若提供 on_item，则使用流式生成，每个测试点完成时回调 on_item(key, index, item)。
+        use_cache=False 时跳过LLM响应缓存。
+        若提供 checkpoints，解析后的提示词和LLM原始响应会保存为检查点，任务重新执行时
+        直接使用，不再重复组装提示词和调用LLM。
+        complete_job=False 时不把任务标记为完成，由调用方（排队任务的后台函数）在保存结果
+        或完成第二阶段后设置最终状态；提前标记完成会使续约失败，worker随即中止本地执行。
 
-            logger.info(f"模板变量解析完成 | 解析后系统提示词长度: {len(resolved_system_prompt)} | 解析后用户提示词长度: {len(resolved_user_prompt)}")
+        Returns:
+            生成响应
+        """
+        if not task_id:
+            task_id = str(uuid.uuid4())
 
-            # 记录模板变量和提示词构建过程到AI日志
-            if ai_logger:
-                try:
-                    template_variables = {
-                        "business_type": business_type,
-                        "project_id": project_id,
-                        "generation_stage": "test_point",
-                        "additional_context": additional_context or {},
-                        "endpoint_params": {
-                            'generation_stage': 'test_point',
-                            'additional_context': additional_context or {}
-                        }
-                    }
-                    ai_logger.log_template_variables(template_variables)
-
-                    # 记录提示词构建过程
-                    prompt_building_process = {
-                        "system_prompt_length": len(system_prompt),
-                        "user_prompt_length": len(user_prompt),
-                        "resolved_system_prompt_length": len(resolved_system_prompt),
-                        "resolved_user_prompt_length": len(resolved_user_prompt),
-                        "business_type": business_type,
-                        "generation_stage": "test_point",
-                        "system_prompt_was_modified": len(resolved_system_prompt) != len(system_prompt),
-                        "user_prompt_was_modified": len(resolved_user_prompt) != len(user_prompt)
-                    }
-                    ai_logger.log_prompt_building_process(prompt_building_process)
+        start_time = time.time()
 
-                    # 记录替换后的提示词和模板变量替换信息
-                    ai_logger.log_resolved_prompts(resolved_system_prompt, resolved_user_prompt)
-                    ai_logger.log_template_replacement_info(
-                        system_prompt, resolved_system_prompt,
-                        user_prompt, resolved_user_prompt
-                    )
-                except Exception as log_error:
-                    logger.warning(f"Failed to log template variables and prompt building: {log_error}")
+        try:
+            cancellation_registry.raise_if_cancelled(task_id)
+            response = await checkpoints.aload(STAGE_LLM_RESPONSE) if checkpoints else None
+            if response is not None:
+                logger.info(f"使用检查点中的LLM响应，跳过测试点生成调用 | task: {task_id}")
+            else:
+                response = await self._arequest_test_points(
+                    business_type, additional_context, project_id, task_id, ai_logger,
+                    on_item, use_cache, checkpoints
+                )
 
-            # 更新进度：开始AI调用
-            self._update_job_progress(
-                task_id=task_id,
-                current_step="正在调用AI模型生成测试点...",
-                progress=30
+            cancellation_registry.raise_if_cancelled(task_id)
+            return await asyncio.to_thread(
+                self._finalize_test_points,
+                response, business_type, save_to_database, project_id, task_id, start_time, ai_logger,
+                complete_job
             )
 
-            # 使用LLM生成测试点数据
-            logger.info(f"开始AI生成测试点 | 业务类型: {business_type}")
-            response = self.test_case_generator.llm_client.generate_test_cases(
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return await asyncio.to_thread(self._test_points_failure_response, e, task_id, start_time)
+
+    async def _arequest_test_points(
+        self,
+        business_type: str,
+        additional_context: Optional[Dict[str, Any]],
+        project_id: Optional[int],
+        task_id: str,
+        ai_logger=None,
+        on_item: Optional[Callable] = None,
+        use_cache: bool = True,
+        checkpoints: Optional[JobCheckpoints] = None
+    ) -> Optional[str]:
+        """组装提示词（或使用检查点中的提示词）并调用LLM生成测试点，返回原始响应"""
+        prompts = await checkpoints.aload(STAGE_PROMPTS) if checkpoints else None
+        if prompts:
+            system_prompt, resolved_system_prompt, resolved_user_prompt = prompts
+        else:
+            system_prompt, resolved_system_prompt, resolved_user_prompt = await asyncio.to_thread(
+                self._prepare_test_point_prompts,
+                business_type, additional_context, project_id, task_id, ai_logger
+            )
+            if checkpoints:
+                await checkpoints.asave(STAGE_PROMPTS, [system_prompt, resolved_system_prompt, resolved_user_prompt])
+
+        cancellation_registry.raise_if_cancelled(task_id)
+        plan = await self._aplan_test_point_partitions(
+            business_type, additional_context, resolved_user_prompt, use_cache, checkpoints
+        )
+        if plan:
+            response = await self._arequest_partitioned_test_points(
+                plan, system_prompt, resolved_system_prompt, resolved_user_prompt,
+                task_id, ai_logger, on_item, use_cache, checkpoints
+            )
+            if checkpoints and response:
+                await checkpoints.asave(STAGE_LLM_RESPONSE, response)
+            return response
+
+        logger.info(f"开始AI生成测试点（异步） | 业务类型: {business_type} | 流式: {on_item is not None}")
+        llm_client = self.test_case_generator.llm_client
+        if on_item is not None:
+            response = await llm_client.astream_test_cases(
                 system_prompt,
                 resolved_user_prompt,
+                on_item=on_item,
+                item_keys=('test_points',),
                 ai_logger=ai_logger,
                 resolved_system_prompt=resolved_system_prompt,
-                resolved_requirements_prompt=resolved_user_prompt
-            )
-
-            if response is None:
-                raise RuntimeError("AI调用失败：无法从LLM获取响应")
-
-            # 更新进度：开始处理AI响应
-            self._update_job_progress(
-                task_id=task_id,
-                current_step="正在解析AI生成的测试点数据...",
-                progress=60
+                resolved_requirements_prompt=resolved_user_prompt,
+                use_cache=use_cache,
+                output_schema=TEST_POINTS
             )
-
-            # 使用增强的JSON处理和验证机制
-            from ..utils.data_validator_repairer import DataValidatorRepairer
-            from ..core.json_extractor import JSONExtractor
-
-            # 提取和验证JSON数据
-            logger.info(f"Starting JSON extraction from AI response (response length: {len(response)})")
-            logger.info(f"Response type: {type(response)}")
-            logger.info(f"Response preview: {response[:200]}...")
-
-            json_data, validated_test_points = JSONExtractor.extract_and_validate_json_response(
-                response, validate_and_repair=True, ai_logger=ai_logger
+        else:
+            response = await llm_client.agenerate_test_cases(
+                system_prompt,
+                resolved_user_prompt,
+                ai_logger=ai_logger,
+                resolved_system_prompt=resolved_system_prompt,
+                resolved_requirements_prompt=resolved_user_prompt,
+                use_cache=use_cache,
+                output_schema=TEST_POINTS
             )
 
-            logger.info(f"JSON extraction completed: json_data type={type(json_data)}, test_points_count={len(validated_test_points)}")
+        if checkpoints and response:
+            await checkpoints.asave(STAGE_LLM_RESPONSE, response)
+        return response
 
-            if not validated_test_points:
-                raise RuntimeError("AI响应解析失败：未找到有效的测试点数据")
+    async def _aplan_test_point_partitions(
+        self,
+        business_type: str,
+        additional_context: Optional[Dict[str, Any]],
+        resolved_user_prompt: str,
+        use_cache: bool = True,
+        checkpoints: Optional[JobCheckpoints] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        决定是否分区生成测试点。
 
-            logger.info(f"AI生成测试点成功 | 业务类型: {business_type} | 测试点数量: {len(validated_test_points)}")
+        用户要求的测试点数量达到 TEST_POINT_PARTITION_THRESHOLD 时，分区取自业务类型配置，
+        未配置时通过一次小的规划调用拆分。分区少于2个时不分区。
 
-            # 获取处理总结
-            validator = DataValidatorRepairer()
-            validation_summary = validator.get_processing_summary()
-            logger.info(f"测试点数据验证完成: 成功率 {validation_summary['success_rate']:.1f}%")
+        Returns:
+            [(分区, 测试点数量)]，不分区时为空列表
+        """
+        threshold = self.config.test_point_partition_threshold
+        count = requested_test_point_count(additional_context)
+        if threshold <= 0 or not count or count < threshold:
+            return []
+
+        saved_plan = await checkpoints.aload(STAGE_PARTITIONS) if checkpoints else None
+        if saved_plan:
+            return [(partition, partition_count) for partition, partition_count in saved_plan]
+
+        max_partitions = max(2, math.ceil(count / max(1, self.config.test_point_partition_size)))
+        business_config = await asyncio.to_thread(self.validate_business_type, business_type)
+        partitions = configured_partitions(business_config.additional_config)
+        source = 'config'
+        if not partitions:
+            source = 'planning'
+            try:
+                response = await self.test_case_generator.llm_client.agenerate_test_cases(
+                    PLANNING_SYSTEM_PROMPT,
+                    build_planning_prompt(resolved_user_prompt, max_partitions),
+                    use_cache=use_cache,
+                    max_tokens=self.config.test_point_partition_token_budget
+                )
+                partitions = parse_planned_partitions(response, max_partitions)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"测试点分区规划失败，改为单次生成: {e}")
+                partitions = []
+
+        plan = [
+            (partition, partition_count)
+            for partition, partition_count in zip(partitions, allocate_counts(count, len(partitions) or 1))
+            if partition_count > 0
+        ]
+        if len(plan) < 2:
+            logger.info(f"未得到可用的测试点分区（来源: {source}），改为单次生成 | 要求数量: {count}")
+            return []
+
+        logger.info(f"测试点分区生成 | 要求数量: {count} | 分区来源: {source} | 分区: {[p for p, _ in plan]}")
+        if checkpoints:
+            await checkpoints.asave(STAGE_PARTITIONS, plan)
+        return plan
+
+    async def _arequest_partitioned_test_points(
+        self,
+        plan: List[Tuple[str, int]],
+        system_prompt: str,
+        resolved_system_prompt: str,
+        resolved_user_prompt: str,
+        task_id: str,
+        ai_logger=None,
+        on_item: Optional[Callable] = None,
+        use_cache: bool = True,
+        checkpoints: Optional[JobCheckpoints] = None
+    ) -> Optional[str]:
+        """
+        按分区并发生成测试点，合并去重后返回与单次生成相同格式的响应。
 
-            # 构建标准格式的测试点数据
-            test_points_data = {
-                'test_points': validated_test_points
-            }
+        流式回调按合并后的顺序编号，重复标题的测试点不会回调。已有检查点的分区
+        直接使用保存的响应；全部分区失败时抛出最后一个错误。
+        """
+        llm_client = self.test_case_generator.llm_client
+        semaphore = asyncio.Semaphore(max(1, self.config.test_point_partition_concurrency))
+        partitions = [partition for partition, _ in plan]
+        seen_titles = set()
+        emitted = 0
+
+        async def forward(key: str, index: int, item: Dict[str, Any]):
+            nonlocal emitted
+            title_key = point_title_key(item)
+            if title_key and title_key in seen_titles:
+                return
+            seen_titles.add(title_key)
+            merged_index, emitted = emitted, emitted + 1
+            result = on_item(key, merged_index, item)
+            if inspect.isawaitable(result):
+                await result
+
+        async def run_partition(partition_index: int, partition: str, count: int) -> List[Dict[str, Any]]:
+            saved = await checkpoints.aload(STAGE_PARTITIONS, partition_index) if checkpoints else None
+            if saved is not None:
+                points = extract_test_points(saved)
+                if on_item is not None:
+                    for index, point in enumerate(points):
+                        await forward('test_points', index, point)
+                return points
+
+            partition_prompt = build_partition_prompt(resolved_user_prompt, partition, count, partitions)
+            async with semaphore:
+                cancellation_registry.raise_if_cancelled(task_id)
+                logger.info(f"开始生成第 {partition_index}/{len(plan)} 个分区的测试点 | 分区: {partition} | 数量: {count}")
+                kwargs = dict(
+                    ai_logger=ai_logger,
+                    resolved_system_prompt=resolved_system_prompt,
+                    resolved_requirements_prompt=partition_prompt,
+                    use_cache=use_cache,
+                    max_tokens=self.config.test_point_partition_token_budget,
+                    output_schema=TEST_POINTS
+                )
+                if on_item is not None:
+                    response = await llm_client.astream_test_cases(
+                        system_prompt, partition_prompt, on_item=forward, item_keys=('test_points',), **kwargs
+                    )
+                else:
+                    response = await llm_client.agenerate_test_cases(system_prompt, partition_prompt, **kwargs)
+            if checkpoints and response:
+                await checkpoints.asave(STAGE_PARTITIONS, response, partition_index)
+            return extract_test_points(response)
+
+        results = await asyncio.gather(
+            *(run_partition(index, partition, count) for index, (partition, count) in enumerate(plan, start=1)),
+            return_exceptions=True
+        )
+
+        partition_points = []
+        errors = []
+        for (partition, _), result in zip(plan, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, Exception):
+                logger.error(f"分区测试点生成失败 | 分区: {partition} | 错误: {result}")
+                errors.append(result)
+                continue
+            partition_points.append(result)
+        if not partition_points:
+            raise errors[-1] if errors else RuntimeError("所有分区均未生成测试点")
+
+        merged = merge_test_points(partition_points)
+        logger.info(f"分区测试点合并完成 | 分区: {len(plan)} | 失败分区: {len(errors)} | "
+                    f"合并前: {sum(len(points) for points in partition_points)} | 去重后: {len(merged)}")
+        await asyncio.to_thread(self._merge_job_metadata, task_id, {'test_point_partitions': {
+            'partitions': partitions,
+            'failed_partitions': len(errors),
+            'merged_points': len(merged)
+        }})
+        return json.dumps({'test_points': merged}, ensure_ascii=False)
+
+    def _prepare_test_point_prompts(
+        self,
+        business_type: str,
+        additional_context: Optional[Dict[str, Any]],
+        project_id: Optional[int],
+        task_id: str,
+        ai_logger=None
+    ) -> Tuple[str, str, str]:
+        """
+        组装并解析测试点生成提示词。
 
-            
-            # 更新进度
-            self._update_job_progress(
-                task_id=task_id,
-                current_step="正在验证生成的测试点...",
-                progress=70
-            )
+        Returns:
+            (系统提示词模板, 解析后的系统提示词, 解析后的用户提示词)
+        """
+        # 验证业务类型
+        business_config = self.validate_business_type(business_type)
+
+        # 记录业务类型配置到AI日志
+        if ai_logger:
+            try:
+                business_config_data = {
+                    "business_type": business_type,
+                    "business_config": {
+                        "id": business_config.id if hasattr(business_config, 'id') else None,
+                        "name": getattr(business_config, 'name', None),
+                        "description": getattr(business_config, 'description', None)
+                    }
+                }
+                ai_logger.log_business_type_config(business_config_data)
+            except Exception as log_error:
+                logger.warning(f"Failed to log business type config: {log_error}")
+
+        # 注意：不再在这里创建任务记录，由API端点负责
+        # 这样可以避免重复任务创建的问题
+
+          # 获取测试点生成的提示词（ID=87）
+        system_prompt, user_prompt = self.test_case_generator.prompt_builder.get_two_stage_prompts(
+            business_type, 'test_point'
+        )
+
+        if system_prompt is None or user_prompt is None:
+            raise RuntimeError(f"无法为 {business_type} 获取测试点生成提示词组合")
+
+        logger.info(f"获取到测试点提示词 | 系统提示词长度: {len(system_prompt)} | 用户提示词长度: {len(user_prompt)}")
+
+        # 应用模板变量到系统提示词和用户提示词，确保传递generation_stage='test_point'
+        # 两个提示词共享同一个渲染上下文，每个变量只解析一次
+        prompt_builder = self.test_case_generator.prompt_builder
+        endpoint_params = {
+            'generation_stage': 'test_point',
+            'additional_context': additional_context or {}
+        }
+        render_context = prompt_builder.create_render_context(business_type, project_id, endpoint_params)
+        variables: Dict[str, Any] = {}
+        resolved_system_prompt = prompt_builder._apply_template_variables(
+            content=system_prompt,
+            additional_context=additional_context or {},
+            business_type=business_type,
+            project_id=project_id,
+            endpoint_params=endpoint_params,
+            resolved_variables=variables,
+            render_context=render_context
+        )
+
+        resolved_user_prompt = prompt_builder._apply_template_variables(
+            content=user_prompt,
+            additional_context=additional_context or {},
+            business_type=business_type,
+            project_id=project_id,
+            endpoint_params=endpoint_params,
+            resolved_variables=variables,
+            render_context=render_context
+        )
+
+        logger.info(f"模板变量解析完成 | 解析后系统提示词长度: {len(resolved_system_prompt)} | 解析后用户提示词长度: {len(resolved_user_prompt)}")
+
+        # 统计token预算；超出上下文时只裁剪已有测试点/测试用例等参考数据，不裁剪用户输入
+        resolved_system_prompt, resolved_user_prompt, token_budget = self.test_case_generator.fit_prompt_budget(
+            system_prompt, user_prompt, resolved_system_prompt, resolved_user_prompt,
+            variables, trimmable=('test_cases', 'test_points'), ai_logger=ai_logger
+        )
+        self._merge_job_metadata(task_id, {'token_budget': token_budget})
+
+        # 记录模板变量和提示词构建过程到AI日志
+        if ai_logger:
+            try:
+                template_variables = {
+                    "business_type": business_type,
+                    "project_id": project_id,
+                    "generation_stage": "test_point",
+                    "additional_context": additional_context or {},
+                    "endpoint_params": endpoint_params,
+                    "render_context": render_context.summary()
+                }
+                ai_logger.log_template_variables(template_variables)
+
+                # 记录提示词构建过程
+                prompt_building_process = {
+                    "system_prompt_length": len(system_prompt),
+                    "user_prompt_length": len(user_prompt),
+                    "resolved_system_prompt_length": len(resolved_system_prompt),
+                    "resolved_user_prompt_length": len(resolved_user_prompt),
+                    "business_type": business_type,
+                    "generation_stage": "test_point",
+                    "system_prompt_was_modified": len(resolved_system_prompt) != len(system_prompt),
+                    "user_prompt_was_modified": len(resolved_user_prompt) != len(user_prompt)
+                }
+                ai_logger.log_prompt_building_process(prompt_building_process)
 
-            if not test_points_data or not test_points_data.get('test_points'):
-                raise GenerationError(
-                    "未能生成有效的测试点数据",
-                    details={"business_type": business_type}
+                # 记录替换后的提示词和模板变量替换信息
+                ai_logger.log_resolved_prompts(resolved_system_prompt, resolved_user_prompt)
+                ai_logger.log_template_replacement_info(
+                    system_prompt, resolved_system_prompt,
+                    user_prompt, resolved_user_prompt
                 )
+            except Exception as log_error:
+                logger.warning(f"Failed to log template variables and prompt building: {log_error}")
 
-            # 保存到数据库（如果需要）
-            saved_items = []
-            if save_to_database:
-                
-                saved_items = self._save_test_points_to_database(
-                    test_points_data['test_points'],
-                    business_type,
-                    project_id
-                )
+        # 更新进度：开始AI调用
+        self._update_job_progress(
+            task_id=task_id,
+            current_step="正在调用AI模型生成测试点...",
+            progress=30
+        )
 
-                
-                self._update_job_progress(
-                    task_id=task_id,
-                    current_step="已保存测试点到数据库",
-                    progress=90
-                )
+        return system_prompt, resolved_system_prompt, resolved_user_prompt
 
-            # 创建生成结果
-            result = GenerationResult(
-                task_id=task_id,
-                stage=GenerationStage.TEST_POINT,
-                status=GenerationStatus.COMPLETED,
-                business_type=business_type,
-                project_id=project_id,
-                generated_items=test_points_data['test_points'],
-                summary={
-                    "total_points": len(test_points_data['test_points']),
-                    "saved_to_database": save_to_database,
-                    "saved_items_count": len(saved_items)
-                },
-                metrics={
-                    "generation_time": time.time() - start_time
-                }
+    def _finalize_test_points(
+        self,
+        response: Optional[str],
+        business_type: str,
+        save_to_database: bool,
+        project_id: Optional[int],
+        task_id: str,
+        start_time: float,
+        ai_logger=None,
+        complete_job: bool = True
+    ) -> GenerationResponse:
+        """解析AI响应中的测试点，按需保存并（complete_job 为真时）完成任务。"""
+        if response is None:
+            raise RuntimeError("AI调用失败：无法从LLM获取响应")
+
+        # 更新进度：开始处理AI响应
+        self._update_job_progress(
+            task_id=task_id,
+            current_step="正在解析AI生成的测试点数据...",
+            progress=60
+        )
+
+        # 使用增强的JSON处理和验证机制
+        from ..utils.data_validator_repairer import DataValidatorRepairer
+        from ..core.json_extractor import JSONExtractor
+
+        # 提取和验证JSON数据
+        logger.info(f"Starting JSON extraction from AI response (response length: {len(response)})")
+        logger.info(f"Response type: {type(response)}")
+        logger.info(f"Response preview: {response[:200]}...")
+
+        json_data, validated_test_points = JSONExtractor.extract_and_validate_json_response(
+            response, validate_and_repair=True, ai_logger=ai_logger
+        )
+
+        logger.info(f"JSON extraction completed: json_data type={type(json_data)}, test_points_count={len(validated_test_points)}")
+
+        if not validated_test_points:
+            raise RuntimeError("AI响应解析失败：未找到有效的测试点数据")
+
+        if isinstance(json_data, dict) and json_data.get('salvage'):
+            # 响应被截断或部分测试点无法解析，保留已恢复的测试点并记录丢失的位置
+            self._merge_job_metadata(task_id, {'salvage': json_data['salvage']})
+
+        logger.info(f"AI生成测试点成功 | 业务类型: {business_type} | 测试点数量: {len(validated_test_points)}")
+
+        # 获取处理总结
+        validator = DataValidatorRepairer()
+        validation_summary = validator.get_processing_summary()
+        logger.info(f"测试点数据验证完成: 成功率 {validation_summary['success_rate']:.1f}%")
+
+        # 构建标准格式的测试点数据
+        test_points_data = {
+            'test_points': validated_test_points
+        }
+
+        
+        # 更新进度
+        self._update_job_progress(
+            task_id=task_id,
+            current_step="正在验证生成的测试点...",
+            progress=70
+        )
+
+        if not test_points_data or not test_points_data.get('test_points'):
+            raise GenerationError(
+                "未能生成有效的测试点数据",
+                details={"business_type": business_type}
             )
 
+        # 保存到数据库（如果需要）
+        saved_items = []
+        if save_to_database:
             
-            # 完成任务
-            self._complete_generation_job(task_id, result)
-
-            return GenerationResponse(
-                success=True,
-                task_id=task_id,
-                message=f"成功生成 {len(test_points_data['test_points'])} 个测试点",
-                stage=GenerationStage.TEST_POINT,
-                status=GenerationStatus.COMPLETED,
-                result=result
+            saved_items = self._save_test_points_to_database(
+                test_points_data['test_points'],
+                business_type,
+                project_id
             )
 
-        except Exception as e:
-            # 处理错误并更新任务状态
-            error_info = self._handle_generation_error(e, task_id, start_time)
-            return GenerationResponse(
-                success=False,
+            
+            self._update_job_progress(
                 task_id=task_id,
-                message=f"测试点生成失败: {str(e)}",
-                stage=GenerationStage.TEST_POINT,
-                status=GenerationStatus.FAILED,
-                can_retry=error_info.get('can_retry', False),
-                retry_count=error_info.get('retry_count', 0),
-                max_retries=error_info.get('max_retries', 3)
+                current_step="已保存测试点到数据库",
+                progress=90
             )
 
+        # 创建生成结果
+        result = GenerationResult(
+            task_id=task_id,
+            stage=GenerationStage.TEST_POINT,
+            status=GenerationStatus.COMPLETED,
+            business_type=business_type,
+            project_id=project_id,
+            generated_items=test_points_data['test_points'],
+            summary={
+                "total_points": len(test_points_data['test_points']),
+                "saved_to_database": save_to_database,
+                "saved_items_count": len(saved_items)
+            },
+            metrics={
+                "generation_time": time.time() - start_time
+            }
+        )
+
+        
+        # 完成任务
+        if complete_job:
+            self._complete_generation_job(task_id, result)
+
+        return GenerationResponse(
+            success=True,
+            task_id=task_id,
+            message=f"成功生成 {len(test_points_data['test_points'])} 个测试点",
+            stage=GenerationStage.TEST_POINT,
+            status=GenerationStatus.COMPLETED,
+            result=result
+        )
+
+    def _test_points_failure_response(self, error: Exception, task_id: str, start_time: float) -> GenerationResponse:
+        """处理测试点生成错误并构建失败响应。"""
+        if isinstance(error, TokenBudgetError):
+            self._merge_job_metadata(task_id, {'token_budget': error.budget})
+        # 处理错误并更新任务状态
+        error_info = self._handle_generation_error(error, task_id, start_time)
+        return GenerationResponse(
+            success=False,
+            task_id=task_id,
+            message=f"测试点生成失败: {str(error)}",
+            stage=GenerationStage.TEST_POINT,
+            status=GenerationStatus.FAILED,
+            can_retry=error_info.get('can_retry', False),
+            retry_count=error_info.get('retry_count', 0),
+            max_retries=error_info.get('max_retries', 3)
+        )
+
     def generate_test_cases_from_points(
         self,
         business_type: str,
@@ -341,7 +693,8 @@ class UnifiedGenerationService:
         test_point_ids: Optional[List[int]] = None,
         additional_context: Optional[Dict[str, Any]] = None,
         save_to_database: bool = False,
-        project_id: Optional[int] = None
+        project_id: Optional[int] = None,
+        task_id: Optional[str] = None
     ) -> GenerationResponse:
         """
         从测试点生成测试用例（第二阶段）。
@@ -353,6 +706,7 @@ class UnifiedGenerationService:
             additional_context: 额外上下文
             save_to_database: 是否保存到数据库
             project_id: 项目ID
+            task_id: 任务ID（由API端点传入）
 
         Returns:
             生成响应
@@ -367,21 +721,7 @@ class UnifiedGenerationService:
         start_time = time.time()
 
         try:
-            # 验证业务类型
-            business_config = self.validate_business_type(business_type)
-
-            # 确定测试点数据源
-            if test_point_ids:
-                # 从数据库获取测试点
-                test_points_data = self._get_test_points_from_database(test_point_ids)
-            elif test_points:
-                # 使用外部提供的测试点数据
-                test_points_data = test_points
-            else:
-                raise ValidationError("必须提供 test_points 或 test_point_ids 参数")
-
-            # 注意：不再在这里创建任务记录，由API端点负责
-            # 这样可以避免重复任务创建的问题
+            test_points_data = self._load_source_test_points(business_type, test_points, test_point_ids)
 
             # 生成测试用例
             test_cases_data = self.test_case_generator.generate_test_cases_from_external_points(
@@ -392,78 +732,172 @@ class UnifiedGenerationService:
                 additional_context=additional_context
             )
 
-            # 更新进度
-            self._update_job_progress(
-                task_id=task_id,
-                current_step="正在验证生成的测试用例...",
-                progress=70
+            return self._finalize_test_cases(
+                test_cases_data, test_points_data, business_type, save_to_database,
+                project_id, task_id, start_time
             )
 
-            if not test_cases_data or not test_cases_data.get('test_cases'):
-                raise GenerationError(
-                    "未能生成有效的测试用例数据",
-                    details={"business_type": business_type, "test_points_count": len(test_points_data)}
-                )
+        except Exception as e:
+            return self._test_cases_failure_response(e, task_id, start_time)
 
-            # 保存到数据库（如果需要）
-            saved_items = []
-            if save_to_database:
-                saved_items = self._save_test_cases_to_database(
-                    test_cases_data['test_cases'],
-                    business_type,
-                    project_id
-                )
-                self._update_job_progress(
-                    task_id=task_id,
-                    current_step="已保存测试用例到数据库",
-                    progress=90
-                )
+    async def agenerate_test_cases_from_points(
+        self,
+        business_type: str,
+        test_points: Optional[List[Dict[str, Any]]] = None,
+        test_point_ids: Optional[List[int]] = None,
+        additional_context: Optional[Dict[str, Any]] = None,
+        save_to_database: bool = False,
+        project_id: Optional[int] = None,
+        task_id: Optional[str] = None
+    ) -> GenerationResponse:
+        """
+        从测试点生成测试用例（第二阶段）的异步版本。
 
-            # 创建生成结果
-            result = GenerationResult(
-                task_id=task_id,
-                stage=GenerationStage.TEST_CASE,
-                status=GenerationStatus.COMPLETED,
+        参数与 generate_test_cases_from_points 相同。
+
+        Returns:
+            生成响应
+        """
+        if not task_id:
+            task_id = str(uuid.uuid4())
+
+        start_time = time.time()
+
+        try:
+            cancellation_registry.raise_if_cancelled(task_id)
+            test_points_data = await asyncio.to_thread(
+                self._load_source_test_points, business_type, test_points, test_point_ids
+            )
+
+            cancellation_registry.raise_if_cancelled(task_id)
+            test_cases_data = await self.test_case_generator.agenerate_test_cases_from_external_points(
                 business_type=business_type,
-                project_id=project_id,
-                generated_items=test_cases_data['test_cases'],
-                summary={
-                    "total_cases": len(test_cases_data['test_cases']),
-                    "source_points": len(test_points_data),
-                    "saved_to_database": save_to_database,
-                    "saved_items_count": len(saved_items)
+                test_points_data={
+                    "test_points": test_points_data
                 },
-                metrics={
-                    "generation_time": time.time() - start_time
-                }
+                additional_context=additional_context
             )
 
-            # 完成任务
-            self._complete_generation_job(task_id, result)
-
-            return GenerationResponse(
-                success=True,
-                task_id=task_id,
-                message=f"成功生成 {len(test_cases_data['test_cases'])} 个测试用例",
-                stage=GenerationStage.TEST_CASE,
-                status=GenerationStatus.COMPLETED,
-                result=result
+            cancellation_registry.raise_if_cancelled(task_id)
+            return await asyncio.to_thread(
+                self._finalize_test_cases,
+                test_cases_data, test_points_data, business_type, save_to_database,
+                project_id, task_id, start_time
             )
 
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            # 处理错误并更新任务状态
-            error_info = self._handle_generation_error(e, task_id, start_time)
-            return GenerationResponse(
-                success=False,
+            return await asyncio.to_thread(self._test_cases_failure_response, e, task_id, start_time)
+
+    def _load_source_test_points(
+        self,
+        business_type: str,
+        test_points: Optional[List[Dict[str, Any]]],
+        test_point_ids: Optional[List[int]]
+    ) -> List[Dict[str, Any]]:
+        """验证业务类型并确定测试点数据源。"""
+        # 验证业务类型
+        self.validate_business_type(business_type)
+
+        # 确定测试点数据源
+        if test_point_ids:
+            # 从数据库获取测试点
+            return self._get_test_points_from_database(test_point_ids)
+        elif test_points:
+            # 使用外部提供的测试点数据
+            return test_points
+        else:
+            raise ValidationError("必须提供 test_points 或 test_point_ids 参数")
+
+    def _finalize_test_cases(
+        self,
+        test_cases_data: Optional[Dict[str, Any]],
+        test_points_data: List[Dict[str, Any]],
+        business_type: str,
+        save_to_database: bool,
+        project_id: Optional[int],
+        task_id: str,
+        start_time: float
+    ) -> GenerationResponse:
+        """验证生成的测试用例，按需保存并完成任务。"""
+        # 更新进度
+        self._update_job_progress(
+            task_id=task_id,
+            current_step="正在验证生成的测试用例...",
+            progress=70
+        )
+
+        if not test_cases_data or not test_cases_data.get('test_cases'):
+            raise GenerationError(
+                "未能生成有效的测试用例数据",
+                details={"business_type": business_type, "test_points_count": len(test_points_data)}
+            )
+
+        token_budget = test_cases_data.get('generation_metadata', {}).get('token_budget')
+        if token_budget:
+            self._merge_job_metadata(task_id, {'token_budget': token_budget})
+
+        # 保存到数据库（如果需要）
+        saved_items = []
+        if save_to_database:
+            saved_items = self._save_test_cases_to_database(
+                test_cases_data['test_cases'],
+                business_type,
+                project_id
+            )
+            self._update_job_progress(
                 task_id=task_id,
-                message=f"测试用例生成失败: {str(e)}",
-                stage=GenerationStage.TEST_CASE,
-                status=GenerationStatus.FAILED,
-                can_retry=error_info.get('can_retry', False),
-                retry_count=error_info.get('retry_count', 0),
-                max_retries=error_info.get('max_retries', 3)
+                current_step="已保存测试用例到数据库",
+                progress=90
             )
 
+        # 创建生成结果
+        result = GenerationResult(
+            task_id=task_id,
+            stage=GenerationStage.TEST_CASE,
+            status=GenerationStatus.COMPLETED,
+            business_type=business_type,
+            project_id=project_id,
+            generated_items=test_cases_data['test_cases'],
+            summary={
+                "total_cases": len(test_cases_data['test_cases']),
+                "source_points": len(test_points_data),
+                "saved_to_database": save_to_database,
+                "saved_items_count": len(saved_items)
+            },
+            metrics={
+                "generation_time": time.time() - start_time
+            }
+        )
+
+        # 完成任务
+        self._complete_generation_job(task_id, result)
+
+        return GenerationResponse(
+            success=True,
+            task_id=task_id,
+            message=f"成功生成 {len(test_cases_data['test_cases'])} 个测试用例",
+            stage=GenerationStage.TEST_CASE,
+            status=GenerationStatus.COMPLETED,
+            result=result
+        )
+
+    def _test_cases_failure_response(self, error: Exception, task_id: str, start_time: float) -> GenerationResponse:
+        """处理测试用例生成错误并构建失败响应。"""
+        # 处理错误并更新任务状态
+        error_info = self._handle_generation_error(error, task_id, start_time)
+        return GenerationResponse(
+            success=False,
+            task_id=task_id,
+            message=f"测试用例生成失败: {str(error)}",
+            stage=GenerationStage.TEST_CASE,
+            status=GenerationStatus.FAILED,
+            can_retry=error_info.get('can_retry', False),
+            retry_count=error_info.get('retry_count', 0),
+            max_retries=error_info.get('max_retries', 3)
+        )
+
     def get_task_status(self, task_id: str) -> TaskStatusResponse:
         """
         获取任务状态。
@@ -541,6 +975,9 @@ class UnifiedGenerationService:
         """
         取消任务。
 
+        将任务标记为CANCELLED，并取消正在运行的生成协程（中止进行中的LLM请求，
+        跳过结果保存）。
+
         Args:
             task_id: 任务ID
 
@@ -561,6 +998,8 @@ class UnifiedGenerationService:
                 job.completed_at = datetime.now()
                 db.commit()
 
+                cancellation_registry.cancel(task_id)
+
                 # 从活跃任务列表中移除
                 if task_id in self.active_jobs:
                     del self.active_jobs[task_id]
@@ -626,6 +1065,14 @@ class UnifiedGenerationService:
                 # It only has created_at and completed_at
                 db.commit()
 
+    def _merge_job_metadata(self, task_id: str, updates: Dict[str, Any]):
+        """合并写入任务的 generation_metadata。"""
+        try:
+            with self.db_manager.get_session() as db:
+                DatabaseOperations(db).merge_job_metadata(task_id, updates)
+        except Exception as e:
+            logger.warning(f"Failed to update job metadata for {task_id}: {e}")
+
     def _complete_generation_job(self, task_id: str, result: GenerationResult):
         """完成生成任务。"""
         with self.db_manager.get_session() as db:
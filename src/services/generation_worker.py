@@ -0,0 +1,262 @@
+"""
+生成任务worker池
+
+从持久化任务队列（generation_jobs 表）领取生成任务并发执行，运行期间定期续约。
+可以在API进程内运行（GENERATION_WORKER_MODE=inprocess），也可以作为独立进程运行，
+使生成吞吐量与API副本数相互独立：
+
+    python -m src.services.generation_worker --concurrency 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import threading
+import uuid
+from typing import Any, Dict, Optional
+
+from ..database.database import DatabaseManager
+from ..utils.config import Config
+from .bulk_generation import BulkGenerationService
+from .generation_cancellation import cancellation_registry
+from .job_queue import GenerationJobQueue, create_job_queue
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationWorkerPool:
+    """领取并执行排队生成任务的worker池"""
+
+    def __init__(self, queue: GenerationJobQueue, concurrency: int = 4,
+                 poll_interval: float = 2.0, worker_id: Optional[str] = None):
+        """
+        初始化worker池
+
+        Args:
+            queue: 持久化任务队列
+            concurrency: 同时运行的任务数上限
+            poll_interval: 队列为空时的轮询间隔（秒）
+            worker_id: worker标识，默认由主机名和进程号生成
+        """
+        self.queue = queue
+        self.bulk_service = BulkGenerationService(queue.db_manager)
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.claimed_jobs = 0
+        self.finished_jobs = 0
+        self.lost_leases = 0
+
+    def notify(self) -> None:
+        """有新任务入队时唤醒worker池，跳过剩余的轮询等待；可以从任意线程调用"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self) -> None:
+        """持续领取并执行任务，直到被取消；取消时把运行中的任务放回队列"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        logger.info(f"生成worker池已启动: {self.worker_id}（并发 {self.concurrency}）")
+        try:
+            while True:
+                claimed = None
+                if len(self._running) < self.concurrency:
+                    try:
+                        claimed = await asyncio.to_thread(self.queue.claim, self.worker_id)
+                    except Exception as e:
+                        logger.error(f"领取生成任务失败: {e}")
+
+                if claimed:
+                    self._start(claimed)
+                    continue
+
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self._shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取worker池状态"""
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running_jobs": sorted(self._running),
+            "claimed_jobs": self.claimed_jobs,
+            "finished_jobs": self.finished_jobs,
+            "lost_leases": self.lost_leases
+        }
+
+    def _start(self, claimed: Dict[str, Any]) -> None:
+        """在独立的asyncio任务中执行领取的任务"""
+        task_id = claimed["task_id"]
+        self.claimed_jobs += 1
+        logger.info(f"worker {self.worker_id} 领取任务 {task_id}（第 {claimed['attempt']} 次）")
+        task = asyncio.ensure_future(self._execute(claimed))
+        self._running[task_id] = task
+        task.add_done_callback(lambda _: self._finished(task_id))
+
+    def _finished(self, task_id: str) -> None:
+        self._running.pop(task_id, None)
+        self.finished_jobs += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _execute(self, claimed: Dict[str, Any]) -> None:
+        """执行一个任务，运行期间续约；worker停止时把任务放回队列"""
+        from ..api import unified_test_case_endpoints as endpoints
+
+        task_id = claimed["task_id"]
+        payload = dict(claimed["payload"])
+        coalesce_key = payload.pop("coalesce_key", None)
+        if claimed["generation_mode"] == "test_points_only":
+            job_func = endpoints._generate_test_points_background_unified
+        elif claimed["generation_mode"] == "points_then_cases":
+            job_func = endpoints._generate_points_then_cases_background_unified
+        else:
+            job_func = endpoints._generate_test_cases_background_unified
+
+        parent_job_id = claimed.get("parent_job_id")
+        if parent_job_id:
+            await self._report_bulk_progress(parent_job_id)
+
+        heartbeat = asyncio.ensure_future(self._heartbeat(task_id))
+        try:
+            await endpoints._run_coalesced_job(coalesce_key, job_func, task_id=task_id, **payload)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(self.queue.requeue, task_id, self.worker_id)
+            logger.info(f"worker停止，任务 {task_id} 已放回队列")
+            raise
+        except Exception as e:
+            logger.error(f"生成任务 {task_id} 异常结束: {e}", exc_info=True)
+        finally:
+            heartbeat.cancel()
+
+        try:
+            await asyncio.to_thread(self.queue.release, task_id, self.worker_id)
+        except Exception as e:
+            logger.error(f"释放任务租约失败 (task {task_id}): {e}")
+        if parent_job_id:
+            await self._report_bulk_progress(parent_job_id)
+
+    async def _report_bulk_progress(self, parent_job_id: str) -> None:
+        """子任务开始或结束时更新批量任务的汇总进度并推送给订阅者"""
+        from ..websocket.notifier import notifier
+
+        try:
+            progress = await asyncio.to_thread(self.bulk_service.refresh_parent, parent_job_id)
+            if progress:
+                await notifier.notify_bulk_progress(parent_job_id, progress)
+        except Exception as e:
+            logger.warning(f"更新批量任务进度失败 (task {parent_job_id}): {e}")
+
+    async def _heartbeat(self, task_id: str) -> None:
+        """定期续约；失去租约（任务被取消或被其他worker重新领取）时中止本地执行"""
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                held = await asyncio.to_thread(self.queue.heartbeat, task_id, self.worker_id)
+            except Exception as e:
+                logger.warning(f"任务续约失败 (task {task_id}): {e}")
+                continue
+            if not held:
+                self.lost_leases += 1
+                logger.warning(f"任务 {task_id} 已取消或被重新领取，中止本地执行")
+                cancellation_registry.cancel(task_id)
+                return
+
+    async def _shutdown(self) -> None:
+        """取消运行中的任务（各任务自行放回队列）"""
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"生成worker池已停止: {self.worker_id}")
+
+
+_worker_pool: Optional[GenerationWorkerPool] = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_generation_worker_pool(config: Config, db_manager: Optional[DatabaseManager] = None
+                               ) -> Optional[GenerationWorkerPool]:
+    """
+    获取API进程内的worker池；GENERATION_WORKER_MODE=external 时返回None
+
+    Args:
+        config: 配置对象
+        db_manager: 数据库管理器，首次创建时使用
+
+    Returns:
+        进程内共享的worker池
+    """
+    global _worker_pool
+    if config.generation_worker_mode != 'inprocess':
+        return None
+    if _worker_pool is None:
+        with _worker_pool_lock:
+            if _worker_pool is None:
+                _worker_pool = create_worker_pool(config, db_manager or DatabaseManager(config))
+    return _worker_pool
+
+
+def create_worker_pool(config: Config, db_manager: DatabaseManager,
+                       concurrency: Optional[int] = None) -> GenerationWorkerPool:
+    """
+    按配置创建worker池
+
+    Args:
+        config: 配置对象
+        db_manager: 数据库管理器
+        concurrency: 并发任务数，默认取 GENERATION_WORKER_CONCURRENCY
+
+    Returns:
+        worker池
+    """
+    return GenerationWorkerPool(
+        create_job_queue(config, db_manager),
+        concurrency=concurrency or config.generation_worker_concurrency,
+        poll_interval=config.generation_worker_poll_seconds
+    )
+
+
+async def _run_worker(concurrency: Optional[int]) -> None:
+    from ..llm.llm_client import close_shared_async_http_client
+
+    config = Config()
+    pool = create_worker_pool(config, DatabaseManager(config), concurrency)
+    try:
+        await pool.run()
+    finally:
+        await close_shared_async_http_client()
+
+
+def main() -> None:
+    """独立worker进程入口"""
+    parser = argparse.ArgumentParser(description='Run generation workers that process queued generation jobs')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='Concurrent jobs (default: GENERATION_WORKER_CONCURRENCY)')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    try:
+        asyncio.run(_run_worker(args.concurrency))
+    except KeyboardInterrupt:
+        logger.info("生成worker已停止")
+
+
+if __name__ == "__main__":
+    main()
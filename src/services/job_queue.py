@@ -0,0 +1,348 @@
+"""
+持久化生成任务队列
+
+基于 generation_jobs 表：API创建PENDING任务并写入任务参数（job_payload），
+生成worker领取任务时以行锁（SKIP LOCKED）把任务标记为RUNNING并持有租约，
+运行期间定期续约（心跳）。worker崩溃后租约过期，任务可被其他worker重新领取；
+领取次数达到上限的过期任务标记为FAILED。领取哪个任务由公平调度器决定。
+"""
+
+import json
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+
+from ..database.database import DatabaseManager
+from ..database.models import GenerationJob, JobStatus
+from ..utils.config import Config
+from .job_scheduler import FairShareScheduler, PRIORITY_INTERACTIVE
+
+# 每次调度考虑的最早排队任务数
+SCHEDULING_WINDOW = 500
+# 没有历史耗时数据时假设的任务耗时（秒）
+DEFAULT_JOB_SECONDS = 120
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationJobQueue:
+    """generation_jobs 表上的任务领取、续约和释放"""
+
+    def __init__(self, db_manager: DatabaseManager, lease_seconds: int = 120, max_attempts: int = 3,
+                 scheduler: Optional[FairShareScheduler] = None, capacity: int = 4):
+        """
+        初始化任务队列
+
+        Args:
+            db_manager: 数据库管理器
+            lease_seconds: 租约时长（秒），worker需在到期前续约
+            max_attempts: 任务最多被领取的次数
+            scheduler: 公平调度器，默认所有项目权重相同、不限制业务类型并发
+            capacity: 估算排队时间时假设的同时运行任务数
+        """
+        self.db_manager = db_manager
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.scheduler = scheduler or FairShareScheduler()
+        self.capacity = max(1, capacity)
+
+    @staticmethod
+    def build_payload(**job_kwargs) -> str:
+        """
+        序列化后台任务参数，存入 GenerationJob.job_payload
+
+        Returns:
+            JSON字符串
+        """
+        return json.dumps(job_kwargs, ensure_ascii=False, default=str)
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按调度顺序领取可运行任务：PENDING任务，或租约已过期的RUNNING任务
+
+        Args:
+            worker_id: 领取任务的worker标识
+
+        Returns:
+            任务信息（task_id、generation_mode、attempt、payload、parent_job_id），没有可领取任务时返回None
+        """
+        now = datetime.now()
+        with self.db_manager.get_session() as db:
+            self._fail_exhausted(db, now)
+            candidates, running_by_project, running_by_type, running_by_parent = self._load_schedule_state(db, now)
+
+            job = None
+            for candidate in self.scheduler.order(candidates, running_by_project, running_by_type,
+                                                  running_by_parent=running_by_parent):
+                # 被其他worker锁定或领取的任务跳过，尝试下一个
+                job = self._claimable(db, now).filter(
+                    GenerationJob.id == candidate['id']
+                ).with_for_update(skip_locked=True).first()
+                if job:
+                    break
+
+            if not job:
+                db.commit()
+                return None
+
+            if job.status == JobStatus.RUNNING:
+                logger.warning(f"任务 {job.id} 的租约已过期（worker: {job.worker_id}），重新领取")
+            job.status = JobStatus.RUNNING
+            job.worker_id = worker_id
+            job.started_at = now
+            job.heartbeat_at = now
+            job.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+            job.attempts = (job.attempts or 0) + 1
+            db.commit()
+
+            return {
+                "task_id": job.id,
+                "generation_mode": job.generation_mode,
+                "attempt": job.attempts,
+                "payload": json.loads(job.job_payload),
+                "parent_job_id": job.parent_job_id
+            }
+
+    def heartbeat(self, task_id: str, worker_id: str) -> bool:
+        """
+        续约
+
+        Args:
+            task_id: 任务ID
+            worker_id: 持有任务的worker标识
+
+        Returns:
+            是否仍持有任务；任务已取消、已结束或被其他worker重新领取时返回False
+        """
+        now = datetime.now()
+        with self.db_manager.get_session() as db:
+            updated = db.query(GenerationJob).filter(
+                GenerationJob.id == task_id,
+                GenerationJob.worker_id == worker_id,
+                GenerationJob.status == JobStatus.RUNNING
+            ).update({
+                GenerationJob.heartbeat_at: now,
+                GenerationJob.lease_expires_at: now + timedelta(seconds=self.lease_seconds)
+            }, synchronize_session=False)
+            db.commit()
+            return updated == 1
+
+    def release(self, task_id: str, worker_id: str) -> None:
+        """
+        任务运行结束后释放租约；任务仍为RUNNING（未写入结束状态）时标记为FAILED
+
+        Args:
+            task_id: 任务ID
+            worker_id: 持有任务的worker标识
+        """
+        with self.db_manager.get_session() as db:
+            job = db.query(GenerationJob).filter(
+                GenerationJob.id == task_id,
+                GenerationJob.worker_id == worker_id
+            ).first()
+            if not job:
+                return
+            job.lease_expires_at = None
+            if job.started_at:
+                job.duration_seconds = int((datetime.now() - job.started_at).total_seconds())
+            if job.status == JobStatus.RUNNING:
+                job.status = JobStatus.FAILED
+                job.error_message = job.error_message or "任务运行结束但未写入结果"
+                job.completed_at = datetime.now()
+            db.commit()
+
+    def requeue(self, task_id: str, worker_id: str) -> None:
+        """
+        worker停止时把运行中的任务放回队列，立即可被重新领取
+
+        Args:
+            task_id: 任务ID
+            worker_id: 持有任务的worker标识
+        """
+        with self.db_manager.get_session() as db:
+            db.query(GenerationJob).filter(
+                GenerationJob.id == task_id,
+                GenerationJob.worker_id == worker_id,
+                GenerationJob.status == JobStatus.RUNNING
+            ).update({
+                GenerationJob.status: JobStatus.PENDING,
+                GenerationJob.worker_id: None,
+                GenerationJob.lease_expires_at: None
+            }, synchronize_session=False)
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取队列状态
+
+        Returns:
+            排队、运行中和租约过期的任务数
+        """
+        now = datetime.now()
+        with self.db_manager.get_session() as db:
+            queued = db.query(func.count(GenerationJob.id)).filter(
+                GenerationJob.job_payload.isnot(None),
+                GenerationJob.status == JobStatus.PENDING
+            ).scalar()
+            running = db.query(func.count(GenerationJob.id)).filter(
+                GenerationJob.status == JobStatus.RUNNING,
+                GenerationJob.lease_expires_at >= now
+            ).scalar()
+            expired = db.query(func.count(GenerationJob.id)).filter(
+                GenerationJob.status == JobStatus.RUNNING,
+                GenerationJob.lease_expires_at < now
+            ).scalar()
+        return {
+            "queued": queued,
+            "running": running,
+            "lease_expired": expired,
+            "lease_seconds": self.lease_seconds,
+            "max_attempts": self.max_attempts
+        }
+
+    def admission_estimate(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        估算排队任务的开始时间
+
+        按当前调度顺序模拟排在该任务之前的任务，按同时运行任务数和近期平均耗时估算等待时间。
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            排队位置和预计等待秒数；任务不在排队中时返回None
+        """
+        now = datetime.now()
+        with self.db_manager.get_session() as db:
+            job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
+            if not job or job.status != JobStatus.PENDING or job.job_payload is None:
+                return None
+            generation_mode = job.generation_mode
+            business_type = job.business_type
+            priority = job.priority or PRIORITY_INTERACTIVE
+            candidates, running_by_project, running_by_type, running_by_parent = self._load_schedule_state(db, now)
+            average_seconds = self._average_duration(db, generation_mode)
+
+        ordered = self.scheduler.order(candidates, running_by_project, running_by_type, include_capped=True,
+                                       running_by_parent=running_by_parent)
+        jobs_ahead = next((index for index, candidate in enumerate(ordered) if candidate['id'] == task_id), None)
+        if jobs_ahead is None:
+            # 超出调度窗口的任务排在窗口内所有任务之后
+            jobs_ahead = len(ordered)
+
+        free_slots = max(0, self.capacity - sum(running_by_project.values()))
+        if jobs_ahead < free_slots:
+            waves = 0
+        else:
+            waves = (jobs_ahead - free_slots) // self.capacity + 1
+        estimated_seconds = int(math.ceil(waves * average_seconds))
+
+        return {
+            "priority": priority,
+            "queue_position": jobs_ahead + 1,
+            "jobs_ahead": jobs_ahead,
+            "business_type_at_limit": self.scheduler.is_capped(business_type, running_by_type),
+            "estimated_start_seconds": estimated_seconds,
+            "estimated_start_at": (now + timedelta(seconds=estimated_seconds)).isoformat(),
+            "average_job_seconds": int(average_seconds)
+        }
+
+    def _claimable(self, db, now: datetime):
+        """可领取任务的查询：PENDING，或租约已过期的RUNNING"""
+        return db.query(GenerationJob).filter(
+            GenerationJob.job_payload.isnot(None),
+            or_(
+                GenerationJob.status == JobStatus.PENDING,
+                and_(
+                    GenerationJob.status == JobStatus.RUNNING,
+                    GenerationJob.lease_expires_at < now
+                )
+            )
+        )
+
+    def _load_schedule_state(self, db, now: datetime) -> Tuple[
+            List[Dict[str, Any]], Dict[int, int], Dict[str, int], Dict[str, int]]:
+        """读取最早的可领取任务，以及按项目、业务类型和批量任务统计的运行中任务数"""
+        rows = self._claimable(db, now).with_entities(
+            GenerationJob.id, GenerationJob.project_id, GenerationJob.business_type,
+            GenerationJob.priority, GenerationJob.created_at, GenerationJob.parent_job_id
+        ).order_by(GenerationJob.created_at).limit(SCHEDULING_WINDOW).all()
+        candidates = [{
+            'id': row.id,
+            'project_id': row.project_id,
+            'business_type': row.business_type,
+            'priority': row.priority or PRIORITY_INTERACTIVE,
+            'created_at': row.created_at,
+            'parent_job_id': row.parent_job_id
+        } for row in rows]
+
+        running = db.query(
+            GenerationJob.project_id, GenerationJob.business_type, GenerationJob.parent_job_id,
+            func.count(GenerationJob.id)
+        ).filter(
+            GenerationJob.status == JobStatus.RUNNING,
+            GenerationJob.lease_expires_at >= now
+        ).group_by(GenerationJob.project_id, GenerationJob.business_type, GenerationJob.parent_job_id).all()
+        running_by_project: Dict[int, int] = {}
+        running_by_type: Dict[str, int] = {}
+        running_by_parent: Dict[str, int] = {}
+        for project_id, business_type, parent_job_id, count in running:
+            running_by_project[project_id] = running_by_project.get(project_id, 0) + count
+            running_by_type[business_type] = running_by_type.get(business_type, 0) + count
+            if parent_job_id:
+                running_by_parent[parent_job_id] = running_by_parent.get(parent_job_id, 0) + count
+
+        return candidates, running_by_project, running_by_type, running_by_parent
+
+    @staticmethod
+    def _average_duration(db, generation_mode: Optional[str]) -> float:
+        """同一生成模式最近完成任务的平均耗时（秒）"""
+        durations = [row[0] for row in db.query(GenerationJob.duration_seconds).filter(
+            GenerationJob.generation_mode == generation_mode,
+            GenerationJob.duration_seconds.isnot(None),
+            GenerationJob.status == JobStatus.COMPLETED
+        ).order_by(GenerationJob.completed_at.desc()).limit(50).all()]
+        return sum(durations) / len(durations) if durations else DEFAULT_JOB_SECONDS
+
+    def _fail_exhausted(self, db, now: datetime) -> None:
+        """把租约过期且领取次数已达上限的任务标记为FAILED"""
+        failed = db.query(GenerationJob).filter(
+            GenerationJob.status == JobStatus.RUNNING,
+            GenerationJob.lease_expires_at < now,
+            GenerationJob.attempts >= self.max_attempts
+        ).update({
+            GenerationJob.status: JobStatus.FAILED,
+            GenerationJob.lease_expires_at: None,
+            GenerationJob.completed_at: now,
+            GenerationJob.error_message: f"任务租约过期且已达到最大尝试次数 {self.max_attempts}"
+        }, synchronize_session=False)
+        if failed:
+            logger.error(f"{failed} 个生成任务多次租约过期，已标记为失败")
+
+
+def create_job_queue(config: Config, db_manager: DatabaseManager) -> GenerationJobQueue:
+    """
+    按配置创建任务队列和公平调度器
+
+    Args:
+        config: 配置对象
+        db_manager: 数据库管理器
+
+    Returns:
+        任务队列
+    """
+    scheduler = FairShareScheduler(
+        project_weights=config.generation_project_weights,
+        business_type_limit=config.generation_business_type_concurrency,
+        bulk_limit=config.generation_bulk_concurrency
+    )
+    return GenerationJobQueue(
+        db_manager,
+        lease_seconds=config.generation_job_lease_seconds,
+        max_attempts=config.generation_job_max_attempts,
+        scheduler=scheduler,
+        capacity=config.generation_worker_concurrency
+    )
@@ -0,0 +1,99 @@
+"""
+生成任务公平调度
+
+worker领取任务时不再简单按创建时间先到先得，而是：
+1. 交互任务（interactive）优先于批量任务（bulk）；
+2. 同一优先级内按项目加权公平分配运行名额：运行中任务数/项目权重最小的项目优先，
+   一个项目排入大量任务不会让其他项目的单个任务一直等待；
+3. 同一业务类型同时运行的任务数不超过上限，同一批量任务同时运行的子任务数也不超过上限；
+4. 以上相同时按创建时间先后。
+
+运行中的任务数来自 generation_jobs 表（持有有效租约的RUNNING任务），因此多个worker
+进程共享同一调度状态。
+"""
+
+from typing import Any, Dict, List, Optional
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BULK = 'bulk'
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+
+_PRIORITY_RANK = {PRIORITY_INTERACTIVE: 0, PRIORITY_BULK: 1}
+
+
+class FairShareScheduler:
+    """按优先级、项目权重和业务类型并发上限排序待领取的生成任务"""
+
+    def __init__(self, project_weights: Optional[Dict[int, float]] = None, business_type_limit: int = 0,
+                 bulk_limit: int = 0):
+        """
+        初始化调度器
+
+        Args:
+            project_weights: 项目ID -> 权重，未配置的项目权重为1
+            business_type_limit: 每个业务类型同时运行的任务数上限，0表示不限制
+            bulk_limit: 每个批量任务同时运行的子任务数上限，0表示不限制
+        """
+        self.project_weights = project_weights or {}
+        self.business_type_limit = business_type_limit
+        self.bulk_limit = bulk_limit
+
+    def weight(self, project_id: int) -> float:
+        """获取项目权重"""
+        weight = self.project_weights.get(project_id, 1.0)
+        return weight if weight > 0 else 1.0
+
+    def is_capped(self, business_type: str, running_by_type: Dict[str, int]) -> bool:
+        """业务类型的运行任务数是否已达上限"""
+        return bool(self.business_type_limit) and running_by_type.get(business_type, 0) >= self.business_type_limit
+
+    def _blocked(self, job: Dict[str, Any], running_by_type: Dict[str, int],
+                 running_by_parent: Dict[str, int]) -> bool:
+        """任务所属业务类型或批量任务的运行数是否已达上限"""
+        if self.is_capped(job['business_type'], running_by_type):
+            return True
+        parent_id = job.get('parent_job_id')
+        return bool(parent_id and self.bulk_limit) and running_by_parent.get(parent_id, 0) >= self.bulk_limit
+
+    def order(self, candidates: List[Dict[str, Any]], running_by_project: Dict[int, int],
+              running_by_type: Dict[str, int], include_capped: bool = False,
+              running_by_parent: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """
+        按调度顺序排列待领取任务
+
+        每选出一个任务，即按它开始运行更新项目、业务类型和批量任务的运行数，再选下一个。
+
+        Args:
+            candidates: 待领取任务（id、project_id、business_type、priority、created_at，
+                批量子任务还有 parent_job_id）
+            running_by_project: 项目ID -> 运行中任务数
+            running_by_type: 业务类型 -> 运行中任务数
+            include_capped: 是否包含已达上限的任务（排在最后，用于估算等待时间）
+            running_by_parent: 批量任务ID -> 运行中子任务数
+
+        Returns:
+            排序后的任务列表；include_capped=False 时只包含当前可以开始的任务
+        """
+        by_project = dict(running_by_project)
+        by_type = dict(running_by_type)
+        by_parent = dict(running_by_parent or {})
+        remaining = list(candidates)
+        ordered = []
+
+        while remaining:
+            best = min(remaining, key=lambda job: (
+                self._blocked(job, by_type, by_parent),
+                _PRIORITY_RANK.get(job.get('priority'), 0),
+                by_project.get(job['project_id'], 0) / self.weight(job['project_id']),
+                job['created_at']
+            ))
+            if not include_capped and self._blocked(best, by_type, by_parent):
+                break
+            remaining.remove(best)
+            ordered.append(best)
+            by_project[best['project_id']] = by_project.get(best['project_id'], 0) + 1
+            by_type[best['business_type']] = by_type.get(best['business_type'], 0) + 1
+            if best.get('parent_job_id'):
+                by_parent[best['parent_job_id']] = by_parent.get(best['parent_job_id'], 0) + 1
+
+        return ordered
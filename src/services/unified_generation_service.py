@@ -5,6 +5,7 @@
 提供与前端的统一生成服务兼容的接口，将前端调用转换为后端服务。
 """
 
+import asyncio
 import uuid
 import time
 import logging
@@ -59,19 +60,19 @@ class UnifiedGenerationService(BaseService):
             logger.info(f"Generating test points for business_type: {business_type}, project_id: {project_id}")
 
             # 调用后端生成服务
-            result = await self.backend_service.generate_test_points(
+            result = await self.backend_service.agenerate_test_points(
                 business_type=business_type,
                 project_id=project_id,
                 additional_context=additional_context,
                 save_to_database=request.get('save_to_database', True),
-                async_mode=request.get('async_mode', False)
+                task_id=request.get('task_id')
             )
 
-            # 转换响应格式为前端期望格式
+            # 转换响应格式为前端期望格式（GenerationResponse -> dict）
             return {
-                'success': True,
-                'data': result,
-                'message': f"成功生成 {len(result.get('test_points', []))} 个测试点"
+                'success': result.success,
+                'data': result.dict(),
+                'message': result.message
             }
 
         except Exception as e:
@@ -98,19 +99,20 @@ class UnifiedGenerationService(BaseService):
             logger.info(f"Generating test cases from {len(test_point_ids)} test points for business_type: {business_type}")
 
             # 调用后端生成服务
-            result = await self.backend_service.generate_test_cases_from_points(
+            result = await self.backend_service.agenerate_test_cases_from_points(
                 business_type=business_type,
                 test_points=[],  # 后端会通过test_point_ids获取
                 test_point_ids=test_point_ids,
                 additional_context=additional_context,
                 save_to_database=request.get('save_to_database', True),
-                project_id=project_id
+                project_id=project_id,
+                task_id=request.get('task_id')
             )
 
             return {
-                'success': True,
-                'data': result,
-                'message': f"成功生成 {len(result.get('test_cases', []))} 个测试用例"
+                'success': result.success,
+                'data': result.dict(),
+                'message': result.message
             }
 
         except Exception as e:
@@ -348,12 +350,12 @@ class UnifiedGenerationService(BaseService):
             Dict: 取消结果
         """
         try:
-            # 调用后端服务
-            result = await self.backend_service.cancel_task(task_id)
+            # 调用后端服务（同步数据库操作，放到线程池执行）
+            cancelled = await asyncio.to_thread(self.backend_service.cancel_task, task_id)
 
             return {
-                'success': True,
-                'message': '任务已取消'
+                'success': cancelled,
+                'message': '任务已取消' if cancelled else '任务不存在或已结束'
             }
 
         except Exception as e:
@@ -80,6 +80,11 @@ class AILogger:
         file_path = f"{self.prompts_path}/{self.timestamp}_prompt_building_process.json"
         self._write_file(file_path, process_data, is_json=True)
 
+    def log_token_budget(self, budget_data: Dict[str, Any]) -> None:
+        """记录提示词token预算（按模板变量拆分）"""
+        file_path = f"{self.prompts_path}/{self.timestamp}_token_budget.json"
+        self._write_file(file_path, budget_data, is_json=True)
+
     def log_ai_response_raw(self, response: str) -> None:
         """记录AI原始响应"""
         file_path = f"{self.responses_path}/{self.timestamp}_ai_response_raw.txt"
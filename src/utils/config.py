@@ -2,10 +2,13 @@
 Configuration management utilities.
 """
 
+import json
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 
+from .prompt_encoding import DEFAULT_FIELDS
+
 
 class Config:
     """Configuration class for managing environment variables and settings."""
@@ -32,6 +35,297 @@ class Config:
         """Get model name from environment."""
         return os.getenv('MODEL', '')
 
+    @property
+    def llm_endpoints(self) -> List[Dict[str, Any]]:
+        """
+        Get the LLM endpoint pool used for routing and failover.
+
+        LLM_ENDPOINTS is a JSON list of {"name", "base_url", "api_key", "model"} objects;
+        missing api_key/model fall back to API_KEY/MODEL. Without it the pool is the
+        single endpoint from API_BASE_URL. "structured_output": false marks an endpoint
+        that does not accept response_format / tools.
+        """
+        default = {'name': 'default', 'base_url': self.api_base_url, 'api_key': self.api_key, 'model': self.model}
+        raw = os.getenv('LLM_ENDPOINTS', '').strip()
+        if not raw:
+            return [default]
+        try:
+            items = json.loads(raw)
+        except ValueError:
+            return [default]
+        endpoints = []
+        for index, item in enumerate(items if isinstance(items, list) else []):
+            if not isinstance(item, dict) or not item.get('base_url'):
+                continue
+            endpoint = {
+                'name': item.get('name') or f"endpoint-{index + 1}",
+                'base_url': item['base_url'],
+                'api_key': item.get('api_key') or self.api_key,
+                'model': item.get('model') or self.model
+            }
+            if item.get('structured_output') is False:
+                endpoint['structured_output'] = False
+            endpoints.append(endpoint)
+        return endpoints or [default]
+
+    @property
+    def llm_circuit_failure_threshold(self) -> int:
+        """Get consecutive failures that open an LLM endpoint's circuit breaker."""
+        return self._get_int('LLM_CIRCUIT_FAILURE_THRESHOLD', 5)
+
+    @property
+    def llm_circuit_cooldown_seconds(self) -> float:
+        """Get seconds an open LLM circuit waits before a trial call."""
+        return self._get_float('LLM_CIRCUIT_COOLDOWN_SECONDS', 30.0)
+
+    @property
+    def llm_timeout(self) -> float:
+        """Get LLM request timeout in seconds."""
+        return self._get_float('LLM_TIMEOUT_SECONDS', 300.0)
+
+    @property
+    def llm_max_connections(self) -> int:
+        """Get maximum number of pooled connections shared by async LLM clients."""
+        return self._get_int('LLM_MAX_CONNECTIONS', 100)
+
+    @property
+    def llm_max_keepalive_connections(self) -> int:
+        """Get maximum number of idle keep-alive connections in the async LLM pool."""
+        return self._get_int('LLM_MAX_KEEPALIVE_CONNECTIONS', 20)
+
+    @property
+    def llm_streaming_enabled(self) -> bool:
+        """Whether generation uses streaming completions and pushes items as they complete."""
+        return self._get_bool('LLM_STREAMING_ENABLED', False)
+
+    @property
+    def llm_stream_persist_items(self) -> bool:
+        """Whether streamed test points are saved to the database as soon as they complete."""
+        return self._get_bool('LLM_STREAM_PERSIST_ITEMS', False)
+
+    @property
+    def llm_cache_enabled(self) -> bool:
+        """Whether identical LLM requests are served from the response cache."""
+        return self._get_bool('LLM_CACHE_ENABLED', False)
+
+    @property
+    def llm_cache_dir(self) -> str:
+        """Get directory of the LLM response cache."""
+        return os.getenv('LLM_CACHE_DIR', os.path.join(self.output_dir, 'llm_cache'))
+
+    @property
+    def llm_cache_ttl_seconds(self) -> float:
+        """Get lifetime of cached LLM responses in seconds."""
+        return self._get_float('LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600.0)
+
+    @property
+    def llm_cache_max_mb(self) -> int:
+        """Get maximum disk size of the LLM response cache in MB."""
+        return self._get_int('LLM_CACHE_MAX_MB', 200)
+
+    @property
+    def prompt_cache_enabled(self) -> bool:
+        """Whether assembled two-stage prompts are cached per (business type, stage)."""
+        return self._get_bool('PROMPT_CACHE_ENABLED', False)
+
+    @property
+    def prompt_cache_ttl_seconds(self) -> float:
+        """Get maximum age of a cached assembled prompt in seconds (0 = until invalidated)."""
+        return self._get_float('PROMPT_CACHE_TTL_SECONDS', 300.0)
+
+    @property
+    def reference_selection_enabled(self) -> bool:
+        """Whether {{test_points}}/{{test_cases}} list only the existing items most relevant to the request."""
+        return self._get_bool('REFERENCE_SELECTION_ENABLED', False)
+
+    @property
+    def reference_selection_top_k(self) -> int:
+        """Get maximum number of fully listed existing items per variable."""
+        return max(0, self._get_int('REFERENCE_SELECTION_TOP_K', 30))
+
+    @property
+    def reference_selection_token_budget(self) -> int:
+        """Get maximum tokens of the fully listed existing items per variable."""
+        return max(0, self._get_int('REFERENCE_SELECTION_TOKEN_BUDGET', 6000))
+
+    @property
+    def prompt_reference_encoding(self) -> str:
+        """Get encoding of {{test_points}}/{{test_cases}} data: 'json' (indented), 'minified' or 'table'."""
+        encoding = os.getenv('PROMPT_REFERENCE_ENCODING', 'json').strip().lower()
+        return encoding if encoding in ('json', 'minified', 'table') else 'json'
+
+    def prompt_reference_fields(self, generation_stage: Optional[str]) -> Optional[List[str]]:
+        """
+        Get the reference data fields kept in compact encodings for a generation stage.
+
+        PROMPT_REFERENCE_FIELDS_TEST_POINT / PROMPT_REFERENCE_FIELDS_TEST_CASE 为逗号分隔的字段名，
+        未设置时使用 prompt_encoding.DEFAULT_FIELDS；"*" 表示保留全部字段。
+        """
+        stage = (generation_stage or '').lower()
+        value = os.getenv(f'PROMPT_REFERENCE_FIELDS_{stage.upper()}', '').strip()
+        if value == '*':
+            return None
+        if value:
+            return [field.strip() for field in value.split(',') if field.strip()]
+        fields = DEFAULT_FIELDS.get(stage)
+        return list(fields) if fields else None
+
+    @property
+    def llm_hedging_enabled(self) -> bool:
+        """Whether slow LLM calls are duplicated (hedged) to cut tail latency."""
+        return self._get_bool('LLM_HEDGING_ENABLED', False)
+
+    @property
+    def llm_hedge_percentile(self) -> float:
+        """Get latency percentile after which a hedge request is sent."""
+        return self._get_float('LLM_HEDGE_PERCENTILE', 95.0)
+
+    @property
+    def llm_hedge_min_delay_seconds(self) -> float:
+        """Get minimum wait before sending a hedge request."""
+        return self._get_float('LLM_HEDGE_MIN_DELAY_SECONDS', 5.0)
+
+    @property
+    def llm_hedge_default_delay_seconds(self) -> float:
+        """Get hedge delay used until enough latency samples are collected."""
+        return self._get_float('LLM_HEDGE_DEFAULT_DELAY_SECONDS', 60.0)
+
+    @property
+    def llm_rate_limit_rpm(self) -> int:
+        """Get process-wide LLM requests-per-minute limit (0 = unlimited)."""
+        return self._get_int('LLM_RATE_LIMIT_RPM', 0)
+
+    @property
+    def llm_rate_limit_tpm(self) -> int:
+        """Get process-wide LLM tokens-per-minute limit (0 = unlimited)."""
+        return self._get_int('LLM_RATE_LIMIT_TPM', 0)
+
+    @property
+    def llm_context_window(self) -> int:
+        """Get model context window in tokens (0 = detect from model name)."""
+        return self._get_int('LLM_CONTEXT_WINDOW', 0)
+
+    @property
+    def llm_max_output_tokens(self) -> int:
+        """Get upper limit of max_tokens for LLM completions."""
+        return self._get_int('LLM_MAX_OUTPUT_TOKENS', 8000)
+
+    @property
+    def llm_min_output_tokens(self) -> int:
+        """Get minimum output room a prompt must leave in the context window."""
+        return self._get_int('LLM_MIN_OUTPUT_TOKENS', 1024)
+
+    @property
+    def llm_max_continuations(self) -> int:
+        """Get maximum continuation requests for a completion truncated by max_tokens (0 disables)."""
+        return self._get_int('LLM_MAX_CONTINUATIONS', 3)
+
+    @property
+    def llm_budget_policy(self) -> str:
+        """Get handling of over-budget prompts: 'trim' reference data or 'reject'."""
+        policy = os.getenv('LLM_BUDGET_POLICY', 'trim').strip().lower()
+        return policy if policy in ('trim', 'reject') else 'trim'
+
+    @property
+    def llm_structured_output(self) -> Optional[str]:
+        """Get structured output mode for generation calls: 'json_schema', 'tools' or None (off)."""
+        mode = os.getenv('LLM_STRUCTURED_OUTPUT', 'off').strip().lower()
+        return mode if mode in ('json_schema', 'tools') else None
+
+    @property
+    def test_case_batch_size(self) -> int:
+        """Get maximum number of test points per test case generation batch."""
+        return self._get_int('TEST_CASE_BATCH_SIZE', 15)
+
+    @property
+    def test_case_batch_token_budget(self) -> int:
+        """Get estimated output token budget per test case generation batch."""
+        return self._get_int('TEST_CASE_BATCH_TOKEN_BUDGET', 6000)
+
+    @property
+    def test_case_batch_concurrency(self) -> int:
+        """Get maximum number of test case generation batches running concurrently."""
+        return self._get_int('TEST_CASE_BATCH_CONCURRENCY', 4)
+
+    @property
+    def test_point_partition_threshold(self) -> int:
+        """Get requested test point count at which test point generation is partitioned (0 disables)."""
+        return self._get_int('TEST_POINT_PARTITION_THRESHOLD', 20)
+
+    @property
+    def test_point_partition_size(self) -> int:
+        """Get target number of test points generated by one partition call."""
+        return self._get_int('TEST_POINT_PARTITION_SIZE', 10)
+
+    @property
+    def test_point_partition_token_budget(self) -> int:
+        """Get maximum output tokens of one partition call."""
+        return self._get_int('TEST_POINT_PARTITION_TOKEN_BUDGET', 4000)
+
+    @property
+    def test_point_partition_concurrency(self) -> int:
+        """Get maximum number of partition calls running concurrently."""
+        return self._get_int('TEST_POINT_PARTITION_CONCURRENCY', 4)
+
+    @property
+    def generation_worker_mode(self) -> str:
+        """Get where queued generation jobs run: 'inprocess' (API process) or 'external' workers."""
+        mode = os.getenv('GENERATION_WORKER_MODE', 'inprocess').strip().lower()
+        return mode if mode in ('inprocess', 'external') else 'inprocess'
+
+    @property
+    def generation_worker_concurrency(self) -> int:
+        """Get maximum number of generation jobs one worker pool runs concurrently."""
+        return self._get_int('GENERATION_WORKER_CONCURRENCY', 4)
+
+    @property
+    def generation_worker_poll_seconds(self) -> float:
+        """Get how often an idle worker pool polls the job queue."""
+        return self._get_float('GENERATION_WORKER_POLL_SECONDS', 2.0)
+
+    @property
+    def generation_job_lease_seconds(self) -> int:
+        """Get lease duration of a claimed generation job; expired jobs are re-claimed."""
+        return self._get_int('GENERATION_JOB_LEASE_SECONDS', 120)
+
+    @property
+    def generation_job_max_attempts(self) -> int:
+        """Get maximum number of times a generation job is claimed before it fails."""
+        return self._get_int('GENERATION_JOB_MAX_ATTEMPTS', 3)
+
+    @property
+    def generation_project_weights(self) -> Dict[int, float]:
+        """
+        Get fair-share weights of projects for scheduling generation jobs.
+
+        GENERATION_PROJECT_WEIGHTS is a JSON object of {"project_id": weight};
+        projects not listed (and invalid entries) have weight 1.
+        """
+        raw = os.getenv('GENERATION_PROJECT_WEIGHTS', '').strip()
+        if not raw:
+            return {}
+        try:
+            items = json.loads(raw)
+        except ValueError:
+            return {}
+        weights = {}
+        for project_id, weight in (items.items() if isinstance(items, dict) else []):
+            try:
+                weights[int(project_id)] = float(weight)
+            except (TypeError, ValueError):
+                continue
+        return weights
+
+    @property
+    def generation_business_type_concurrency(self) -> int:
+        """Get maximum running generation jobs per business type (0 = unlimited)."""
+        return self._get_int('GENERATION_BUSINESS_TYPE_CONCURRENCY', 2)
+
+    @property
+    def generation_bulk_concurrency(self) -> int:
+        """Get maximum running child jobs per bulk generation job (0 = unlimited)."""
+        return self._get_int('GENERATION_BULK_CONCURRENCY', 4)
+
     @property
     def system_prompt_path(self) -> str:
         """Get system prompt file path from environment."""
@@ -109,4 +403,31 @@ class Config:
 
     def validate_interface_config(self) -> bool:
         """Validate that interface test configuration is present."""
-        return bool(self.json_file_path)
\ No newline at end of file
+        return bool(self.json_file_path)
+
+    def _get_int(self, key: str, default: int) -> int:
+        """Read an integer environment variable, falling back to default on bad input."""
+        value = os.getenv(key)
+        if value is None or value.strip() == '':
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            return default
+
+    def _get_float(self, key: str, default: float) -> float:
+        """Read a float environment variable, falling back to default on bad input."""
+        value = os.getenv(key)
+        if value is None or value.strip() == '':
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            return default
+
+    def _get_bool(self, key: str, default: bool = False) -> bool:
+        """Read a boolean environment variable (true/1/yes/on)."""
+        value = os.getenv(key)
+        if value is None or value.strip() == '':
+            return default
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
@@ -90,6 +90,9 @@ class DataValidatorRepairer:
         }
     }
 
+    # Identifier fields kept as-is: they link a generated test case to its test point
+    PRESERVED_FIELDS = ('id', 'test_point_id')
+
     def __init__(self):
         self.processing_logs = []
 
@@ -180,6 +183,11 @@ class DataValidatorRepairer:
 
         repaired_case['remarks'] = ' | '.join(remarks_list) if remarks_list else ""
 
+        # 保留对应测试点的标识，写库时按 test_point_id 匹配而不是按位置
+        for field_name in self.PRESERVED_FIELDS:
+            if test_case_data.get(field_name) is not None:
+                repaired_case[field_name] = test_case_data[field_name]
+
         # Log the processing result
         self.processing_logs.append({
             'test_case_id': repaired_case['test_case_id'],
@@ -15,33 +15,43 @@ from ..database.models import (
     Prompt, PromptType, PromptStatus, BusinessType,
     BusinessTypeConfig, PromptCombination, PromptCombinationItem
 )
-from .template_variable_resolver import TemplateVariableResolver
+from .template_variable_resolver import TemplateRenderContext, TemplateVariableResolver
+from .prompt_cache import CompiledPrompt, CompiledPromptCache, get_prompt_cache
+from .prompt_template import compile_template
 
 
 class DatabasePromptBuilder:
     """Database-driven builder class for assembling prompts from stored components."""
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, db_manager: Optional[DatabaseManager] = None,
+                 variable_resolver: Optional[TemplateVariableResolver] = None,
+                 prompt_cache: Optional[CompiledPromptCache] = None):
         """
         Initialize the database prompt builder.
 
         Args:
             config (Config): Configuration object
+            db_manager (Optional[DatabaseManager]): Database manager, created from config when omitted
+            variable_resolver (Optional[TemplateVariableResolver]): Template variable resolver
+            prompt_cache (Optional[CompiledPromptCache]): Prompt cache, defaults to the process-wide one
         """
         self.config = config
-        self.db_manager = DatabaseManager(config)
-        self.variable_resolver = TemplateVariableResolver(self.db_manager)
+        self.db_manager = db_manager or DatabaseManager(config)
+        self.variable_resolver = variable_resolver or TemplateVariableResolver(self.db_manager)
 
-        # Cache for frequently accessed combinations
-        self._combination_cache: Optional[Dict[str, str]] = None
+        # Process-wide cache of assembled two-stage prompts (None when disabled)
+        self.prompt_cache = prompt_cache if prompt_cache is not None else get_prompt_cache(config)
 
     def _clear_cache(self):
         """Clear all cached data."""
-        self._combination_cache = None
+        if self.prompt_cache:
+            self.prompt_cache.clear()
 
     def _apply_template_variables(self, content: str, additional_context: Optional[Dict[str, Any]] = None,
                                 business_type: Optional[str] = None, project_id: Optional[int] = None,
-                                endpoint_params: Optional[Dict[str, Any]] = None) -> str:
+                                endpoint_params: Optional[Dict[str, Any]] = None,
+                                resolved_variables: Optional[Dict[str, Any]] = None,
+                                render_context: Optional[TemplateRenderContext] = None) -> str:
         """
         Apply template variables to content using the new 3-variable TemplateVariableResolver.
 
@@ -51,6 +61,10 @@ class DatabasePromptBuilder:
             business_type (Optional[str]): Business type for variable resolution
             project_id (Optional[int]): Project ID for database queries
             endpoint_params (Optional[Dict[str, Any]]): Parameters from AI generation endpoints
+            resolved_variables (Optional[Dict[str, Any]]): When given, receives the values of the
+                variables used in the content (for token budgeting and re-rendering)
+            render_context (Optional[TemplateRenderContext]): Request-scoped context shared with the
+                other prompt of the request; created from the other arguments when omitted
 
         Returns:
             str: Content with template variables resolved
@@ -61,8 +75,9 @@ class DatabasePromptBuilder:
                 logger.debug(f"Content contains no template variables, returning original content")
                 return content
 
-            # Extract actual variable names used in the content
-            used_variables = self._extract_used_variables(content)
+            # Compiled once per distinct template; referenced variables come from the compiled form
+            template = compile_template(content)
+            used_variables = list(template.variables)
             if not used_variables:
                 logger.debug(f"No valid template variables found in content")
                 return content
@@ -70,49 +85,27 @@ class DatabasePromptBuilder:
             logger.info(f"在内容中发现 {len(used_variables)} 个模板变量: {used_variables}")
             logger.debug(f"原始内容长度: {len(content)} | 包含模板变量: {len(used_variables) > 0}")
 
-            # Resolve variables using the new 3-variable system with generation stage
-            generation_stage = endpoint_params.get('generation_stage') if endpoint_params else None
-            variables = self.variable_resolver.resolve_variables(
-                business_type=business_type or '',
-                project_id=project_id,
-                endpoint_params=endpoint_params or {},
-                generation_stage=generation_stage
-            )
-
-            # Only replace variables that are actually present in the content
-            resolved_content = content
-            replacement_count = 0
-
-            logger.debug(f"开始变量替换 | 检测到的变量: {used_variables}")
-            logger.debug(f"可用变量值: {list(variables.keys())}")
+            # Only the variables used in the content are resolved, each at most once per render context
+            if render_context is None:
+                render_context = self.create_render_context(business_type, project_id, endpoint_params)
 
+            values: Dict[str, Any] = {}
             for variable_name in used_variables:
-                variable_value = variables.get(variable_name)
-                logger.debug(f"处理变量 '{variable_name}' | 值存在: {variable_value is not None}")
-
-                if variable_value is not None:
-                    value_str = str(variable_value)
-                    logger.debug(f"变量 '{variable_name}' 的值长度: {len(value_str)} | 值预览: {value_str[:100]}...")
-
-                    # Support both {{variable_name}} and {{ variable_name }} formats
-                    patterns = [
-                        f'{{{{{variable_name}}}}}',
-                        f'{{{{ {variable_name} }}}}'
-                    ]
-
-                    for pattern in patterns:
-                        pattern_count = resolved_content.count(pattern)
-                        if pattern_count > 0:
-                            logger.debug(f"在内容中找到模式 '{pattern}' 出现 {pattern_count} 次")
-                            resolved_content = resolved_content.replace(pattern, value_str)
-                            replacement_count += pattern_count
-                            logger.debug(f"成功替换变量 '{variable_name}' | 模式 '{pattern}' | 替换次数: {pattern_count}")
-                        else:
-                            logger.debug(f"模式 '{pattern}' 在内容中未找到")
-                else:
+                variable_value = render_context.get(variable_name)
+                if variable_value is None:
                     logger.debug(f"变量 '{variable_name}' 的值为 None，跳过替换")
+                    continue
+                value_str = str(variable_value)
+                values[variable_name] = value_str
+                if resolved_variables is not None:
+                    resolved_variables[variable_name] = value_str
+                logger.debug(f"变量 '{variable_name}' 的值长度: {len(value_str)} | "
+                             f"出现次数: {template.occurrences(variable_name)} | 值预览: {value_str[:100]}...")
+
+            # Single pass over the literal/variable segments
+            resolved_content = template.render(values)
+            replacement_count = sum(template.occurrences(name) for name in values)
 
-            
             logger.info(f"模板变量替换完成 | 替换数量: {replacement_count} | 原始长度: {len(content)} | 替换后长度: {len(resolved_content)}")
 
             # 记录详细的替换结果摘要
@@ -129,6 +122,27 @@ class DatabasePromptBuilder:
             # Return original content if variable resolution fails
             return content
 
+    def create_render_context(self, business_type: Optional[str] = None, project_id: Optional[int] = None,
+                              endpoint_params: Optional[Dict[str, Any]] = None) -> TemplateRenderContext:
+        """
+        Create the render context of one generation request.
+
+        同一请求的系统提示词和用户提示词传入同一个上下文，变量只解析一次。
+
+        Args:
+            business_type (Optional[str]): Business type for variable resolution
+            project_id (Optional[int]): Project ID for database queries
+            endpoint_params (Optional[Dict[str, Any]]): Parameters from AI generation endpoints
+
+        Returns:
+            TemplateRenderContext: Lazily resolving variable context
+        """
+        return self.variable_resolver.create_context(
+            business_type=business_type or '',
+            project_id=project_id,
+            endpoint_params=endpoint_params or {}
+        )
+
     def _apply_template_variables_with_variables(self, content: str, variables: Dict[str, Any]) -> str:
         """
         Apply pre-resolved variables to content (helper method for backward compatibility).
@@ -145,25 +159,7 @@ class DatabasePromptBuilder:
             if not content or '{{' not in content:
                 return content
 
-            # Extract actual variable names used in the content
-            used_variables = self._extract_used_variables(content)
-            if not used_variables:
-                return content
-
-            # Replace variables
-            resolved_content = content
-            for variable_name in used_variables:
-                variable_value = variables.get(variable_name)
-                if variable_value is not None:
-                    patterns = [
-                        f'{{{{{variable_name}}}}}',
-                        f'{{{{ {variable_name} }}}}'
-                    ]
-                    for pattern in patterns:
-                        if pattern in resolved_content:
-                            resolved_content = resolved_content.replace(pattern, str(variable_value))
-
-            return resolved_content
+            return compile_template(content).render(variables)
 
         except Exception as e:
             logger.error(f"Error applying template variables with pre-resolved variables: {e}")
@@ -179,22 +175,7 @@ class DatabasePromptBuilder:
         Returns:
             List[str]: List of variable names found in the content
         """
-        try:
-            import re
-            # Find all {{variable_name}} patterns (with optional whitespace)
-            pattern = r'\{\{\s*(\w+)\s*\}\}'
-            matches = re.findall(pattern, content)
-            # Remove duplicates and preserve order
-            seen = set()
-            unique_variables = []
-            for var in matches:
-                if var not in seen:
-                    seen.add(var)
-                    unique_variables.append(var)
-            return unique_variables
-        except Exception as e:
-            logger.error(f"Error extracting variables from content: {e}")
-            return []
+        return list(compile_template(content).variables)
 
     def get_active_prompt_by_name(self, name: str, prompt_type: Optional[PromptType] = None) -> Optional[Prompt]:
         """
@@ -362,6 +343,58 @@ class DatabasePromptBuilder:
         Returns:
             tuple: (system_prompt, user_prompt) or (None, None) if failed
         """
+        compiled = self.get_compiled_prompt(business_type, stage)
+        if compiled is None:
+            return None, None
+        return compiled.system_prompt, compiled.user_prompt
+
+    def get_compiled_prompt(self, business_type: str, stage: str) -> Optional[CompiledPrompt]:
+        """
+        Get the assembled two-stage prompt templates with their content hash.
+
+        启用 PROMPT_CACHE_ENABLED 时优先使用进程内缓存；未命中时查询数据库组装并写入缓存。
+
+        Args:
+            business_type (str): Business type (e.g., RCC, RFD, ZAB, ZBA)
+            stage (str): Generation stage ('test_point' or 'test_case')
+
+        Returns:
+            Optional[CompiledPrompt]: Assembled prompts, or None if the configuration is incomplete
+        """
+        generation = 0
+        if self.prompt_cache:
+            cached = self.prompt_cache.get(business_type, stage)
+            if cached is not None:
+                return cached
+            generation = self.prompt_cache.generation
+
+        compiled = self._assemble_two_stage_prompts(business_type, stage)
+        if compiled is not None and self.prompt_cache:
+            self.prompt_cache.put(compiled, generation)
+        return compiled
+
+    def warm_prompt_cache(self) -> int:
+        """
+        Assemble and cache the prompts of every active business type for both stages.
+
+        Returns:
+            int: Number of cached (business type, stage) entries
+        """
+        if not self.prompt_cache:
+            return 0
+        with self.db_manager.get_session() as db:
+            codes = [row[0] for row in db.query(BusinessTypeConfig.code).filter(
+                BusinessTypeConfig.is_active == True
+            ).all()]
+        warmed = 0
+        for code in codes:
+            for stage in ('test_point', 'test_case'):
+                if self.get_compiled_prompt(code, stage) is not None:
+                    warmed += 1
+        return warmed
+
+    def _assemble_two_stage_prompts(self, business_type: str, stage: str) -> Optional[CompiledPrompt]:
+        """Query the business type's prompt combination and join its prompts."""
         try:
             with self.db_manager.get_session() as db:
                 # Get business type configuration
@@ -372,7 +405,7 @@ class DatabasePromptBuilder:
 
                 if not business_config:
                     print(f"No active business config found for {business_type}")
-                    return None, None
+                    return None
 
                 # Determine which combination ID to use based on stage
                 if stage == 'test_point':
@@ -381,11 +414,11 @@ class DatabasePromptBuilder:
                     combination_id = business_config.test_case_combination_id
                 else:
                     print(f"Invalid stage: {stage}. Must be 'test_point' or 'test_case'")
-                    return None, None
+                    return None
 
                 if not combination_id:
                     print(f"No combination ID configured for {business_type} stage {stage}")
-                    return None, None
+                    return None
 
                 # Get the prompt combination
                 combination = db.query(PromptCombination).filter(
@@ -396,7 +429,7 @@ class DatabasePromptBuilder:
 
                 if not combination:
                     print(f"No valid combination found with ID {combination_id}")
-                    return None, None
+                    return None
 
                 # Get all items in the combination, ordered by sequence
                 prompt_items = db.query(PromptCombinationItem).filter(
@@ -405,7 +438,7 @@ class DatabasePromptBuilder:
 
                 if not prompt_items:
                     print(f"No items found in combination {combination_id}")
-                    return None, None
+                    return None
 
                 # Get all the prompts referenced in the combination
                 prompt_ids = [item.prompt_id for item in prompt_items]
@@ -437,10 +470,15 @@ class DatabasePromptBuilder:
                 system_prompt = "\n\n".join(system_prompt_parts) if system_prompt_parts else None
                 user_prompt = "\n\n".join(user_prompt_parts) if user_prompt_parts else None
 
-                return system_prompt, user_prompt
+                return CompiledPrompt(
+                    business_type, stage, system_prompt, user_prompt,
+                    business_config_id=business_config.id,
+                    combination_id=combination.id,
+                    prompt_ids=prompt_ids
+                )
 
         except Exception as e:
-            return None, None
+            return None
 
     def get_prompt_by_file_path(self, file_path: str) -> Optional[Prompt]:
         """
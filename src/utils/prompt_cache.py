@@ -0,0 +1,211 @@
+"""
+Process-wide cache of assembled two-stage prompts.
+
+DatabasePromptBuilder.get_two_stage_prompts 每次生成都要查询 BusinessTypeConfig、PromptCombination、
+PromptCombinationItem、Prompt 四张表并重新拼接相同的字符串。缓存以 (业务类型, 阶段) 为键，
+保存拼接好的系统/用户提示词模板和内容哈希，以及组装时用到的业务类型配置、组合和提示词ID。
+
+通过 prompt_endpoints / business_endpoints 修改提示词、组合（含组合项）或业务类型配置时，
+invalidate_prompt_cache 只删除引用了这些记录的条目。其他进程（如独立运行的生成worker）
+看不到这些失效通知，由 PROMPT_CACHE_TTL_SECONDS 限定条目的最长使用时间。
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledPrompt:
+    """Assembled system/user prompt templates of one business type and stage."""
+
+    __slots__ = ('business_type', 'stage', 'system_prompt', 'user_prompt', 'content_hash',
+                 'business_config_id', 'combination_id', 'prompt_ids', 'created_at')
+
+    def __init__(self, business_type: str, stage: str, system_prompt: Optional[str], user_prompt: Optional[str],
+                 business_config_id: Optional[int] = None, combination_id: Optional[int] = None,
+                 prompt_ids: Iterable[int] = ()):
+        """
+        Initialize the entry.
+
+        Args:
+            business_type (str): Business type code
+            stage (str): Generation stage ('test_point' or 'test_case')
+            system_prompt (Optional[str]): Assembled system prompt template
+            user_prompt (Optional[str]): Assembled user prompt template
+            business_config_id (Optional[int]): BusinessTypeConfig the prompts were assembled for
+            combination_id (Optional[int]): PromptCombination used for the stage
+            prompt_ids (Iterable[int]): Prompts referenced by the combination items (active or not)
+        """
+        self.business_type = business_type
+        self.stage = stage
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self.content_hash = self.make_hash(system_prompt, user_prompt)
+        self.business_config_id = business_config_id
+        self.combination_id = combination_id
+        self.prompt_ids: FrozenSet[int] = frozenset(prompt_ids)
+        self.created_at = time.monotonic()
+
+    @staticmethod
+    def make_hash(system_prompt: Optional[str], user_prompt: Optional[str]) -> str:
+        """Hex sha256 of the assembled templates."""
+        digest = hashlib.sha256()
+        for part in (system_prompt, user_prompt):
+            digest.update((part or '').encode('utf-8'))
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+
+class CompiledPromptCache:
+    """In-memory (business_type, stage) -> CompiledPrompt cache with precise invalidation."""
+
+    def __init__(self, ttl_seconds: float = 0):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_seconds (float): Maximum age of an entry in seconds (0 = no expiry)
+        """
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, str], CompiledPrompt] = {}
+        self._lock = threading.Lock()
+        # 每次失效递增；组装期间发生过失效的结果不写入缓存
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """Invalidation counter; pass the value read before assembling to put()."""
+        return self._generation
+
+    def get(self, business_type: str, stage: str) -> Optional[CompiledPrompt]:
+        """
+        Look up the assembled prompts of a business type and stage.
+
+        Returns:
+            Optional[CompiledPrompt]: Cached entry, or None on miss/expiry
+        """
+        key = (business_type, stage)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.monotonic() - entry.created_at > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, entry: CompiledPrompt, generation: int) -> bool:
+        """
+        Store an assembled entry unless the cache was invalidated while it was being assembled.
+
+        Args:
+            entry (CompiledPrompt): Assembled prompts
+            generation (int): Value of generation read before the database queries
+
+        Returns:
+            bool: Whether the entry was stored
+        """
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._entries[(entry.business_type, entry.stage)] = entry
+            return True
+
+    def invalidate(self, prompt_ids: Iterable[int] = (), combination_ids: Iterable[int] = (),
+                   business_config_ids: Iterable[int] = (), business_types: Iterable[str] = ()) -> int:
+        """
+        Drop the entries assembled from any of the given records.
+
+        Args:
+            prompt_ids (Iterable[int]): Changed prompts
+            combination_ids (Iterable[int]): Changed prompt combinations (including their items)
+            business_config_ids (Iterable[int]): Changed business type configs
+            business_types (Iterable[str]): Business type codes (e.g. of a newly created config)
+
+        Returns:
+            int: Number of dropped entries
+        """
+        prompt_ids, combination_ids = set(prompt_ids), set(combination_ids)
+        business_config_ids, business_types = set(business_config_ids), set(business_types)
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry.prompt_ids & prompt_ids
+                or entry.combination_id in combination_ids
+                or entry.business_config_id in business_config_ids
+                or entry.business_type in business_types
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        if stale:
+            logger.info(f"提示词缓存失效: {sorted(stale)}")
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'ttl_seconds': self.ttl_seconds
+            }
+
+
+_prompt_cache: Optional[CompiledPromptCache] = None
+_prompt_cache_lock = threading.Lock()
+
+
+def get_prompt_cache(config: Config) -> Optional[CompiledPromptCache]:
+    """
+    Get the process-wide prompt cache, or None when it is disabled.
+
+    Args:
+        config (Config): Configuration object
+
+    Returns:
+        Optional[CompiledPromptCache]: Shared cache instance
+    """
+    global _prompt_cache
+    if not config.prompt_cache_enabled:
+        return None
+    if _prompt_cache is None:
+        with _prompt_cache_lock:
+            if _prompt_cache is None:
+                _prompt_cache = CompiledPromptCache(ttl_seconds=config.prompt_cache_ttl_seconds)
+    return _prompt_cache
+
+
+def invalidate_prompt_cache(prompt_ids: Iterable[int] = (), combination_ids: Iterable[int] = (),
+                            business_config_ids: Iterable[int] = (), business_types: Iterable[str] = ()) -> int:
+    """
+    Invalidate the process-wide prompt cache after prompts, combinations or business types changed.
+
+    缓存未启用（尚未创建）时不做任何事。
+
+    Returns:
+        int: Number of dropped entries
+    """
+    if _prompt_cache is None:
+        return 0
+    return _prompt_cache.invalidate(prompt_ids, combination_ids, business_config_ids, business_types)
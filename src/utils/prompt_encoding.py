@@ -0,0 +1,121 @@
+"""
+Compact prompt encoding of reference data ({{test_points}} / {{test_cases}}).
+
+参考数据原来以 json.dumps(..., indent=2) 注入提示词，并带有模型不需要的字段（created_at、
+updated_at、project_id、business_type 每行重复）。PROMPT_REFERENCE_ENCODING 为 minified 或 table 时：
+
+- 每条数据只保留当前生成阶段配置的字段（PROMPT_REFERENCE_FIELDS_TEST_POINT / _TEST_CASE）；
+- 所有条目取值相同的字段提到 shared 中，全部为空的字段直接去掉；
+- minified 输出无缩进无空格的JSON；table 把条目列表写成 {"columns": [...], "rows": [[...], ...]}。
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+JSON = 'json'
+MINIFIED = 'minified'
+TABLE = 'table'
+ENCODINGS = (JSON, MINIFIED, TABLE)
+
+# 各生成阶段默认保留的字段；测试用例阶段的测试点需要 id 与生成的 test_point_id 对应
+DEFAULT_FIELDS = {
+    'test_point': ('test_point_id', 'title', 'description', 'functional_module'),
+    'test_case': ('id', 'test_point_id', 'test_case_id', 'title', 'name', 'description', 'module',
+                  'functional_module', 'functional_domain', 'priority', 'preconditions', 'steps',
+                  'expected_result'),
+}
+
+_SCALARS = (str, int, float, bool)
+
+
+def project_items(items: List[Any], fields: Optional[Sequence[str]]) -> List[Any]:
+    """
+    Keep only the given fields of each item (in the configured order).
+
+    Args:
+        items (List[Any]): Reference items
+        fields (Optional[Sequence[str]]): Fields to keep; None keeps every field
+
+    Returns:
+        List[Any]: Projected items (non-dict items are kept unchanged)
+    """
+    if not fields:
+        return list(items)
+    return [
+        {field: item[field] for field in fields if field in item} if isinstance(item, dict) else item
+        for item in items
+    ]
+
+
+def hoist_constants(items: List[Any]) -> Tuple[Dict[str, Any], List[Any]]:
+    """
+    Move fields with the same scalar value in every item into a shared dict.
+
+    所有条目都为空（None/空字符串/空列表）的字段直接去掉。少于两条时不做处理。
+
+    Args:
+        items (List[Any]): Projected items
+
+    Returns:
+        Tuple[Dict[str, Any], List[Any]]: (shared fields, items without them)
+    """
+    rows = [item for item in items if isinstance(item, dict)]
+    if len(items) < 2 or len(rows) != len(items):
+        return {}, items
+
+    shared: Dict[str, Any] = {}
+    dropped = set()
+    for field in {key: None for row in rows for key in row}:
+        values = [row.get(field) for row in rows]
+        if all(value in (None, '', [], {}) for value in values):
+            dropped.add(field)
+        elif all(field in row for row in rows) and isinstance(values[0], _SCALARS) \
+                and all(type(value) is type(values[0]) and value == values[0] for value in values):
+            shared[field] = values[0]
+    removed = dropped | set(shared)
+    return shared, [{key: value for key, value in row.items() if key not in removed} for row in rows]
+
+
+def to_table(items: List[Any]) -> Any:
+    """Write dict items as {"columns": [...], "rows": [[...], ...]} (other lists are returned unchanged)."""
+    if not items or not all(isinstance(item, dict) for item in items):
+        return items
+    columns = list({key: None for item in items for key in item})
+    return {"columns": columns, "rows": [[item.get(column) for column in columns] for item in items]}
+
+
+def encode_reference(data: Dict[str, Any], list_key: str, encoding: str,
+                     fields: Optional[Sequence[str]] = None) -> str:
+    """
+    Serialize a reference data wrapper (e.g. {"warning": ..., "test_points": [...]}) for a prompt.
+
+    Args:
+        data (Dict[str, Any]): Wrapper object; data[list_key] is the item list
+        list_key (str): Key of the item list
+        encoding (str): 'json' (indented, unchanged), 'minified' or 'table'
+        fields (Optional[Sequence[str]]): Item fields to keep (None keeps every field)
+
+    Returns:
+        str: Encoded text
+    """
+    if encoding not in (MINIFIED, TABLE):
+        return json.dumps(data, ensure_ascii=False, indent=2)
+
+    items = data.get(list_key)
+    compact = dict(data)
+    if isinstance(items, list):
+        shared, rows = hoist_constants(project_items(items, fields))
+        encoded: Dict[str, Any] = {}
+        for key, value in data.items():
+            if key != list_key:
+                encoded[key] = value
+                continue
+            if shared:
+                encoded[f"{list_key}_shared"] = shared
+            if encoding == TABLE:
+                encoded["format"] = f"{list_key}为表格：columns为字段名，rows每行一条，与columns按位置对应"
+                encoded[key] = to_table(rows)
+            else:
+                encoded[key] = rows
+        compact = encoded
+    return json.dumps(compact, ensure_ascii=False, separators=(',', ':'))
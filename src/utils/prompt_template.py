@@ -0,0 +1,135 @@
+"""
+Compiled prompt templates.
+
+提示词模板只解析一次：按 {{name}} / {{ name }}（变量名两侧允许任意空白）拆分为字面量片段和
+变量片段，编译结果按内容哈希缓存。渲染时每个变量取值一次，所有片段一次 join 拼接，
+不再对整段提示词逐个变量 str.replace；引用的变量及出现次数在编译时得到，无需正则扫描。
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Union
+
+# 编译结果缓存的最大条目数（提示词组合数量有限，解析后的提示词不进入缓存）
+MAX_COMPILED_TEMPLATES = 256
+
+Values = Union[Mapping[str, Any], Callable[[str], Any]]
+
+
+def _is_variable_name(name: str) -> bool:
+    """Whether a placeholder body is a variable name (letters, digits and underscores)."""
+    return bool(name) and all(char.isalnum() or char == '_' for char in name)
+
+
+class CompiledTemplate:
+    """A prompt template split into literal and variable segments."""
+
+    __slots__ = ('content_hash', 'literals', 'names', 'placeholders', 'variables', '_counts')
+
+    def __init__(self, source: str, content_hash: Optional[str] = None):
+        """
+        Parse a template.
+
+        Args:
+            source (str): Template text
+            content_hash (Optional[str]): Precomputed content hash of the source
+        """
+        literals = []
+        names = []
+        placeholders = []
+        position = 0
+        search_from = 0
+        # 单次线性扫描：定位 "{{"，取到最近的 "}}"，中间去掉空白后为合法变量名才算占位符
+        while True:
+            start = source.find('{{', search_from)
+            if start < 0:
+                break
+            end = source.find('}}', start + 2)
+            if end < 0:
+                break
+            name = source[start + 2:end].strip()
+            if not _is_variable_name(name):
+                search_from = start + 1
+                continue
+            literals.append(source[position:start])
+            names.append(name)
+            placeholders.append(source[start:end + 2])
+            position = search_from = end + 2
+        literals.append(source[position:])
+
+        self.content_hash = content_hash or template_hash(source)
+        # literals 比 names 多一个：literals[0] names[0] literals[1] ... names[n-1] literals[n]
+        self.literals: Tuple[str, ...] = tuple(literals)
+        self.names: Tuple[str, ...] = tuple(names)
+        self.placeholders: Tuple[str, ...] = tuple(placeholders)
+        self._counts: Dict[str, int] = {}
+        for name in names:
+            self._counts[name] = self._counts.get(name, 0) + 1
+        # 按首次出现顺序去重的变量名
+        self.variables: Tuple[str, ...] = tuple(self._counts)
+
+    def occurrences(self, name: str) -> int:
+        """Number of placeholders of a variable in the template."""
+        return self._counts.get(name, 0)
+
+    def render(self, values: Values) -> str:
+        """
+        Render the template in one pass.
+
+        Args:
+            values: Mapping of variable values, or a lookup function called once per variable.
+                Variables whose value is None keep their placeholder.
+
+        Returns:
+            str: Rendered text
+        """
+        if not self.names:
+            return self.literals[0]
+        lookup = values if callable(values) else values.get
+        resolved = {name: lookup(name) for name in self.variables}
+        parts = [self.literals[0]]
+        for index, name in enumerate(self.names):
+            value = resolved[name]
+            parts.append(self.placeholders[index] if value is None else str(value))
+            parts.append(self.literals[index + 1])
+        return ''.join(parts)
+
+
+def template_hash(source: str) -> str:
+    """Hex sha256 of a template text."""
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+_compiled: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def compile_template(source: Optional[str]) -> CompiledTemplate:
+    """
+    Get the compiled form of a template, parsing it only on first use.
+
+    Args:
+        source (Optional[str]): Template text
+
+    Returns:
+        CompiledTemplate: Cached compiled template
+    """
+    source = source or ''
+    key = template_hash(source)
+    with _compiled_lock:
+        compiled = _compiled.get(key)
+        if compiled is not None:
+            _compiled.move_to_end(key)
+            return compiled
+    compiled = CompiledTemplate(source, key)
+    with _compiled_lock:
+        _compiled[key] = compiled
+        while len(_compiled) > MAX_COMPILED_TEMPLATES:
+            _compiled.popitem(last=False)
+    return compiled
+
+
+def render_template(source: Optional[str], values: Values) -> str:
+    """Compile (cached) and render a template."""
+    return compile_template(source).render(values)
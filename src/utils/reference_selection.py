@@ -0,0 +1,143 @@
+"""
+Relevance-bounded selection of existing test points / test cases for prompts.
+
+{{test_points}}（测试点阶段）和 {{test_cases}}（测试用例阶段）用于去重，原来放入该业务类型的
+全部已有条目，提示词长度随数据量线性增长。开启 REFERENCE_SELECTION_ENABLED 后，条目按与本次
+请求（用户输入、待扩充的测试点）的相似度排序——标题和描述的字符 n-gram TF-IDF 余弦相似度，
+中文不需要分词——只保留前 top-k 条且总 token 不超过预算的完整条目，其余条目只列出标题。
+"""
+
+import json
+import math
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+# 字符 n-gram 长度
+NGRAM_SIZES = (2, 3)
+
+# 只列标题的条目上限，超出部分只给出数量
+MAX_REMAINING_TITLES = 200
+
+
+def char_ngrams(text: str) -> Counter:
+    """
+    Count the character n-grams of a text (lowercased, whitespace collapsed).
+
+    Args:
+        text (str): Text to split
+
+    Returns:
+        Counter: n-gram -> occurrences
+    """
+    normalized = ' '.join((text or '').lower().split())
+    grams: Counter = Counter()
+    for size in NGRAM_SIZES:
+        for start in range(len(normalized) - size + 1):
+            grams[normalized[start:start + size]] += 1
+    return grams
+
+
+def rank_by_relevance(query: str, documents: Sequence[str]) -> List[Tuple[int, float]]:
+    """
+    Rank documents by TF-IDF cosine similarity of character n-grams to a query.
+
+    Args:
+        query (str): Text of the current request
+        documents (Sequence[str]): Texts of the candidate items
+
+    Returns:
+        List[Tuple[int, float]]: (document index, score), most relevant first; ties keep the input order
+    """
+    document_grams = [char_ngrams(document) for document in documents]
+    document_frequency: Counter = Counter()
+    for grams in document_grams:
+        document_frequency.update(grams.keys())
+    total = len(documents)
+
+    def idf(gram: str) -> float:
+        return math.log((1 + total) / (1 + document_frequency[gram])) + 1
+
+    query_vector = {gram: count * idf(gram) for gram, count in char_ngrams(query).items()}
+    query_norm = math.sqrt(sum(weight * weight for weight in query_vector.values()))
+
+    scores = []
+    for index, grams in enumerate(document_grams):
+        score = 0.0
+        if query_norm and grams:
+            dot = 0.0
+            norm = 0.0
+            for gram, count in grams.items():
+                weight = count * idf(gram)
+                norm += weight * weight
+                if gram in query_vector:
+                    dot += weight * query_vector[gram]
+            score = dot / (query_norm * math.sqrt(norm)) if norm else 0.0
+        scores.append((index, score))
+    scores.sort(key=lambda item: -item[1])
+    return scores
+
+
+class ReferenceSelection:
+    """Items selected for a prompt and the titles of the remaining ones."""
+
+    __slots__ = ('selected', 'remaining_titles', 'omitted', 'total', 'selected_tokens')
+
+    def __init__(self, selected: List[Dict[str, Any]], remaining_titles: List[str], omitted: int,
+                 total: int, selected_tokens: int):
+        self.selected = selected
+        self.remaining_titles = remaining_titles
+        self.omitted = omitted
+        self.total = total
+        self.selected_tokens = selected_tokens
+
+    @property
+    def truncated(self) -> bool:
+        """Whether some items were left out of the full listing."""
+        return len(self.selected) < self.total
+
+
+def select_reference_items(items: List[Dict[str, Any]], query: str, text_fields: Iterable[str], title_field: str,
+                           top_k: int, token_budget: int,
+                           count_tokens: Callable[[str], int]) -> ReferenceSelection:
+    """
+    Select the items most relevant to the request within a count and token budget.
+
+    Args:
+        items (List[Dict[str, Any]]): Existing test points or test cases
+        query (str): Text of the current request
+        text_fields (Iterable[str]): Item fields compared with the query (e.g. title and description)
+        title_field (str): Item field listed for the items that are not selected
+        top_k (int): Maximum number of fully listed items
+        token_budget (int): Maximum tokens of the fully listed items (serialized as JSON)
+        count_tokens (Callable[[str], int]): Token counter
+
+    Returns:
+        ReferenceSelection: Selected items (most relevant first) and the remaining titles
+    """
+    text_fields = tuple(text_fields)
+    documents = [
+        ' '.join(str(item.get(field) or '') for field in text_fields) if isinstance(item, dict) else str(item)
+        for item in items
+    ]
+    ranking = rank_by_relevance(query, documents)
+
+    selected: List[Dict[str, Any]] = []
+    remaining: List[Any] = []
+    used_tokens = 0
+    for index, _ in ranking:
+        item = items[index]
+        if len(selected) < top_k:
+            cost = count_tokens(json.dumps(item, ensure_ascii=False))
+            # 超出预算的条目跳过，继续尝试更短的条目
+            if used_tokens + cost <= token_budget:
+                selected.append(item)
+                used_tokens += cost
+                continue
+        remaining.append(item)
+
+    titles = [
+        str(item.get(title_field) or item.get('id', '')) if isinstance(item, dict) else str(item)
+        for item in remaining[:MAX_REMAINING_TITLES]
+    ]
+    return ReferenceSelection(selected, titles, max(0, len(remaining) - MAX_REMAINING_TITLES),
+                              len(items), used_tokens)
@@ -7,14 +7,20 @@ used in prompt generation for test cases and test points.
 
 import logging
 import json
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List
 
 from ..database.database import DatabaseManager
 from ..database.models import UnifiedTestCase, BusinessType
 from ..utils.config import Config
+from ..llm.token_budget import TokenCounter
+from ..utils.prompt_encoding import JSON, encode_reference
+from ..utils.reference_selection import ReferenceSelection, select_reference_items
 
 logger = logging.getLogger(__name__)
 
+# 支持的模板变量
+VARIABLE_NAMES = ('user_input', 'test_points', 'test_cases')
+
 
 class TemplateVariableResolver:
     """
@@ -26,8 +32,26 @@ class TemplateVariableResolver:
     - test_cases: Test cases data from database based on business_type and project_id
     """
 
+    _config: Optional[Config] = None
+    _token_counter: Optional[TokenCounter] = None
+
     def __init__(self, db_manager: Optional[DatabaseManager] = None):
-        self.db_manager = db_manager or DatabaseManager(Config())
+        self._config = Config()
+        self.db_manager = db_manager or DatabaseManager(self._config)
+
+    @property
+    def config(self) -> Config:
+        """Get the configuration (settings are read from the environment on access)."""
+        if self._config is None:
+            self._config = Config()
+        return self._config
+
+    @property
+    def token_counter(self) -> TokenCounter:
+        """Get the token counter shared by reference selection and encoding, created on first use."""
+        if self._token_counter is None:
+            self._token_counter = TokenCounter(self.config.model)
+        return self._token_counter
 
     def resolve_variables(self, business_type: str, project_id: Optional[int] = None,
                          endpoint_params: Optional[Dict[str, Any]] = None,
@@ -48,19 +72,79 @@ class TemplateVariableResolver:
         logger.info(f"开始解析模板变量 | 业务类型: {business_type} | 生成阶段: {generation_stage} | 项目ID: {project_id}")
         logger.debug(f"端点参数详情: {endpoint_params}")
 
-        variables = {}
+        variables = {
+            name: self.resolve_variable(name, business_type, project_id, endpoint_params, generation_stage)
+            for name in VARIABLE_NAMES
+        }
+
+        # 记录最终解析结果摘要
+        for var_name, var_value in variables.items():
+            value_length = len(var_value) if var_value else 0
+            has_template_vars = "{{" in var_value and "}}" in var_value
+            logger.debug(f"变量解析结果 | {var_name}: 长度={value_length}, 包含模板变量={has_template_vars}")
+
+        logger.info(f"模板变量解析完成 | 业务类型: {business_type} | 生成阶段: {generation_stage} | 变量数量: {len(variables)}")
+        return variables
+
+    def create_context(self, business_type: str, project_id: Optional[int] = None,
+                       endpoint_params: Optional[Dict[str, Any]] = None,
+                       generation_stage: Optional[str] = None) -> 'TemplateRenderContext':
+        """
+        Create a request-scoped render context whose variables are resolved lazily.
+
+        Args:
+            business_type: The business type to resolve variables for
+            project_id: Project ID from endpoint (optional)
+            endpoint_params: Parameters from AI generation endpoints
+            generation_stage: Generation stage ('test_point' or 'test_case') (optional)
+
+        Returns:
+            TemplateRenderContext: Context shared by the system prompt, the user prompt and the AI log
+        """
+        return TemplateRenderContext(self, business_type, project_id, endpoint_params, generation_stage)
+
+    def resolve_variable(self, name: str, business_type: str, project_id: Optional[int] = None,
+                         endpoint_params: Optional[Dict[str, Any]] = None,
+                         generation_stage: Optional[str] = None,
+                         cache: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Resolve a single template variable.
+
+        Args:
+            name: Variable name (user_input, test_points or test_cases)
+            business_type: The business type to resolve variables for
+            project_id: Project ID from endpoint (optional)
+            endpoint_params: Parameters from AI generation endpoints
+            generation_stage: Generation stage ('test_point' or 'test_case') (optional)
+            cache: Request-scoped data shared between variables (e.g. the test points passed by the endpoint)
 
-        # 1. user_input - from endpoint additional_context
+        Returns:
+            Resolved value, or None for unknown variables
+        """
+        if name == 'user_input':
+            return self._resolve_user_input(endpoint_params)
+        if name == 'test_points':
+            return self._resolve_test_points(business_type, project_id, endpoint_params, generation_stage, cache)
+        if name == 'test_cases':
+            return self._resolve_test_cases(business_type, project_id, generation_stage, endpoint_params, cache)
+        return None
+
+    def _resolve_user_input(self, endpoint_params: Optional[Dict[str, Any]]) -> str:
+        """Resolve {{user_input}} from the endpoint additional_context."""
         additional_context = endpoint_params.get('additional_context') if endpoint_params else None
         logger.debug(f"提取用户输入 | additional_context: {additional_context}")
 
         user_input = self._extract_user_input(additional_context)
-        variables['user_input'] = user_input
         logger.info(f"用户输入解析完成 | 长度: {len(user_input) if user_input else 0}")
+        return user_input
 
-        # 2. test_points - based on endpoint parameters with intelligent processing
+    def _resolve_test_points(self, business_type: str, project_id: Optional[int],
+                             endpoint_params: Optional[Dict[str, Any]],
+                             generation_stage: Optional[str],
+                             cache: Optional[Dict[str, Any]] = None) -> str:
+        """Resolve {{test_points}} with the stage specific wrapping."""
         logger.debug("开始解析测试点数据...")
-        test_points_data = self._get_test_points_from_endpoint(business_type, project_id, endpoint_params)
+        test_points_data = self._get_test_points_from_endpoint(business_type, project_id, endpoint_params, cache)
 
         if test_points_data:
             logger.info(f"找到测试点数据 | 数量: {len(test_points_data) if isinstance(test_points_data, list) else 1}")
@@ -72,8 +156,14 @@ class TemplateVariableResolver:
                     "warning": "目前已有这些测试点，不要跟这些测试点内容重复。",
                     "test_points": test_points_data
                 }
-                variables['test_points'] = json.dumps(test_points_with_warning, ensure_ascii=False, indent=2)
+                selection = self._select_references(
+                    test_points_data, ('title', 'description'), 'title',
+                    lambda: self._selection_query(business_type, endpoint_params, generation_stage, cache)
+                )
+                if selection is not None:
+                    test_points_with_warning.update(self._selection_fields(selection, 'test_points', '测试点'))
                 logger.debug("测试点生成阶段：添加防重复警告")
+                return self._encode_reference(test_points_with_warning, 'test_points', generation_stage)
             elif generation_stage == 'test_case':
                 # For test case generation: add explicit count constraint and correspondence requirement
                 test_points_count = len(test_points_data)
@@ -104,16 +194,20 @@ class TemplateVariableResolver:
                     "test_points_count": test_points_count,
                     "test_points": test_points_data
                 }
-                variables['test_points'] = json.dumps(test_points_with_correspondence, ensure_ascii=False, indent=2)
                 logger.debug(f"测试用例生成阶段：添加对应关系要求 (预期生成{test_points_count}个测试用例)")
+                return self._encode_reference(test_points_with_correspondence, 'test_points', generation_stage)
             else:
-                variables['test_points'] = json.dumps(test_points_data, ensure_ascii=False, indent=2)
                 logger.debug("通用处理：原始测试点数据")
-        else:
-            variables['test_points'] = ""
-            logger.info("未找到测试点数据，设置为空字符串")
+                return json.dumps(test_points_data, ensure_ascii=False, indent=2)
 
-        # 3. test_cases - from database with intelligent processing (only for test_case generation stage)
+        logger.info("未找到测试点数据，设置为空字符串")
+        return ""
+
+    def _resolve_test_cases(self, business_type: str, project_id: Optional[int],
+                            generation_stage: Optional[str],
+                            endpoint_params: Optional[Dict[str, Any]] = None,
+                            cache: Optional[Dict[str, Any]] = None) -> str:
+        """Resolve {{test_cases}} (existing test cases, only in the test_case stage)."""
         logger.debug("开始解析测试用例数据...")
         test_cases_data = self._get_test_cases_from_database(business_type, project_id, generation_stage)
 
@@ -125,24 +219,110 @@ class TemplateVariableResolver:
                 "warning": "目前已有这些测试用例，不要跟这些测试用例内容重复。",
                 "test_cases": test_cases_data
             }
-            variables['test_cases'] = json.dumps(test_cases_with_warning, ensure_ascii=False, indent=2)
+            selection = self._select_references(
+                test_cases_data, ('name', 'description'), 'name',
+                lambda: self._selection_query(business_type, endpoint_params, generation_stage, cache)
+            )
+            if selection is not None:
+                test_cases_with_warning.update(self._selection_fields(selection, 'test_cases', '测试用例'))
             logger.debug("测试用例生成阶段：添加防重复警告")
+            return self._encode_reference(test_cases_with_warning, 'test_cases', generation_stage)
+
+        # For test_point generation or no data: return empty
+        if generation_stage != 'test_case':
+            logger.info("测试点生成阶段：测试用例变量设置为空")
         else:
-            # For test_point generation or no data: return empty
-            variables['test_cases'] = ""
-            if generation_stage != 'test_case':
-                logger.info("测试点生成阶段：测试用例变量设置为空")
-            else:
-                logger.info("未找到已有测试用例，设置为空字符串")
+            logger.info("未找到已有测试用例，设置为空字符串")
+        return ""
 
-        # 记录最终解析结果摘要
-        for var_name, var_value in variables.items():
-            value_length = len(var_value) if var_value else 0
-            has_template_vars = "{{" in var_value and "}}" in var_value
-            logger.debug(f"变量解析结果 | {var_name}: 长度={value_length}, 包含模板变量={has_template_vars}")
+    def _encode_reference(self, data: Dict[str, Any], list_key: str, generation_stage: Optional[str]) -> str:
+        """
+        Serialize reference data with the configured encoding (PROMPT_REFERENCE_ENCODING).
 
-        logger.info(f"模板变量解析完成 | 业务类型: {business_type} | 生成阶段: {generation_stage} | 变量数量: {len(variables)}")
-        return variables
+        紧凑编码时记录相对原缩进JSON节省的token数。
+
+        Args:
+            data: Wrapper object of the reference data
+            list_key: Key of the item list ('test_points' or 'test_cases')
+            generation_stage: Generation stage selecting the kept fields
+
+        Returns:
+            Text injected into the prompt
+        """
+        encoding = self.config.prompt_reference_encoding
+        if encoding == JSON:
+            return json.dumps(data, ensure_ascii=False, indent=2)
+
+        encoded = encode_reference(data, list_key, encoding, self.config.prompt_reference_fields(generation_stage))
+        counter = self.token_counter
+        original_tokens = counter.count(json.dumps(data, ensure_ascii=False, indent=2))
+        encoded_tokens = counter.count(encoded)
+        saved = original_tokens - encoded_tokens
+        logger.info(f"参考数据紧凑编码 | 变量: {list_key} | 阶段: {generation_stage} | 编码: {encoding} | "
+                    f"tokens: {original_tokens} -> {encoded_tokens} | "
+                    f"节省: {saved} ({saved / max(original_tokens, 1):.0%}) | 计数方式: {counter.name}")
+        return encoded
+
+    def _select_references(self, items: Any, text_fields: tuple, title_field: str,
+                           query: Callable[[], str]) -> Optional[ReferenceSelection]:
+        """
+        Keep only the existing items most relevant to the request (REFERENCE_SELECTION_ENABLED).
+
+        Args:
+            items: Existing test points or test cases
+            text_fields: Item fields compared with the request
+            title_field: Item field listed for the items that are not selected
+            query: Builds the text of the current request; only called when selection runs
+
+        Returns:
+            Selection, or None when disabled or when every item fits
+        """
+        config = self.config
+        if not config.reference_selection_enabled or not isinstance(items, list):
+            return None
+        selection = select_reference_items(
+            items, query(), text_fields, title_field,
+            top_k=config.reference_selection_top_k,
+            token_budget=config.reference_selection_token_budget,
+            count_tokens=self.token_counter.count
+        )
+        if not selection.truncated:
+            return None
+        logger.info(f"已有条目按相关度筛选 | 总数: {selection.total} | 完整列出: {len(selection.selected)} "
+                    f"({selection.selected_tokens} tokens) | 仅列标题: {len(selection.remaining_titles)} "
+                    f"| 省略: {selection.omitted}")
+        return selection
+
+    @staticmethod
+    def _selection_fields(selection: ReferenceSelection, key: str, label: str) -> Dict[str, Any]:
+        """Build the prompt fields of a selection (selected items replace the full list)."""
+        fields: Dict[str, Any] = {
+            "note": (f"共有{selection.total}条已有{label}，{key}中按与本次需求的相关度列出{len(selection.selected)}条完整内容，"
+                     f"其余只在other_{key}中列出标题，同样不要重复。"),
+            key: selection.selected,
+            f"other_{key}": selection.remaining_titles
+        }
+        if selection.omitted:
+            fields[f"other_{key}_omitted"] = selection.omitted
+        return fields
+
+    def _selection_query(self, business_type: str, endpoint_params: Optional[Dict[str, Any]],
+                         generation_stage: Optional[str], cache: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the text the existing items are compared with.
+
+        用户输入；测试用例阶段再加上待扩充测试点的标题和描述（只取端点传入的测试点，不查询全部测试点；
+        {{test_points}} 已解析时直接复用缓存的测试点）。
+        """
+        endpoint_params = endpoint_params or {}
+        parts = [self._extract_user_input(endpoint_params.get('additional_context'))]
+        if generation_stage == 'test_case':
+            test_points = self._get_provided_test_points(business_type, endpoint_params, cache)
+            for test_point in test_points if isinstance(test_points, list) else []:
+                if isinstance(test_point, dict):
+                    parts.append(str(test_point.get('title') or test_point.get('name') or ''))
+                    parts.append(str(test_point.get('description') or ''))
+        return '\n'.join(part for part in parts if part)
 
     def _extract_user_input(self, additional_context: Optional[Dict[str, Any]]) -> str:
         """
@@ -188,7 +368,8 @@ class TemplateVariableResolver:
         return str(additional_context) if additional_context else ""
 
     def _get_test_points_from_endpoint(self, business_type: str, project_id: Optional[int],
-                                     endpoint_params: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+                                     endpoint_params: Optional[Dict[str, Any]],
+                                     cache: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Get test points data based on endpoint parameters.
 
@@ -196,6 +377,7 @@ class TemplateVariableResolver:
             business_type: The business type
             project_id: Project ID (optional)
             endpoint_params: Parameters from AI generation endpoints
+            cache: Request-scoped cache of the test points passed by the endpoint (optional)
 
         Returns:
             List of test point dictionaries
@@ -207,6 +389,43 @@ class TemplateVariableResolver:
             logger.debug("端点参数为空，返回空列表")
             return []
 
+        test_points = self._get_provided_test_points(business_type, endpoint_params, cache)
+        if test_points is not None:
+            return test_points
+
+        # Scenario 4: get from current business data if project_id is available
+        if project_id:
+            logger.debug(f"场景4：从数据库获取业务测试点数据")
+            test_points = self._get_business_test_points(business_type, project_id)
+            logger.debug(f"从数据库获取到测试点数量: {len(test_points)}")
+            return test_points
+
+        logger.debug("所有场景都无法获取测试点，返回空列表")
+        return []
+
+    def _get_provided_test_points(self, business_type: str, endpoint_params: Optional[Dict[str, Any]],
+                                  cache: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the test points passed by the endpoint (by ID, directly or nested), cached per request.
+
+        Args:
+            business_type: The business type
+            endpoint_params: Parameters from AI generation endpoints
+            cache: Request-scoped cache; test_point_ids are queried at most once per request
+
+        Returns:
+            Test points, or None when the endpoint passed none
+        """
+        if cache is not None and 'provided_test_points' in cache:
+            return cache['provided_test_points']
+        test_points = self._load_provided_test_points(business_type, endpoint_params or {})
+        if cache is not None:
+            cache['provided_test_points'] = test_points
+        return test_points
+
+    def _load_provided_test_points(self, business_type: str,
+                                   endpoint_params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Read the test points of endpoint scenarios 1-3 (None when none apply)."""
         # Scenario 1: test_point_ids → database query
         if 'test_point_ids' in endpoint_params and endpoint_params['test_point_ids']:
             test_point_ids = endpoint_params['test_point_ids']
@@ -240,15 +459,7 @@ class TemplateVariableResolver:
                     logger.debug(f"从test_points_data中提取到测试点数量: 1")
                     return test_points
 
-        # Scenario 4: get from current business data if project_id is available
-        if project_id:
-            logger.debug(f"场景4：从数据库获取业务测试点数据")
-            test_points = self._get_business_test_points(business_type, project_id)
-            logger.debug(f"从数据库获取到测试点数量: {len(test_points)}")
-            return test_points
-
-        logger.debug("所有场景都无法获取测试点，返回空列表")
-        return []
+        return None
 
     def _get_test_cases_from_database(self, business_type: str, project_id: Optional[int],
                                  generation_stage: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -463,3 +674,60 @@ class TemplateVariableResolver:
             return []
       
 
+
+class TemplateRenderContext:
+    """
+    Request-scoped template variables, resolved lazily and at most once.
+
+    一次生成请求的系统提示词、用户提示词和AI日志共享同一个上下文：只有模板中实际引用的
+    变量才会被解析（查询数据库、序列化JSON），每个变量最多解析一次。
+    """
+
+    def __init__(self, resolver: TemplateVariableResolver, business_type: str, project_id: Optional[int] = None,
+                 endpoint_params: Optional[Dict[str, Any]] = None, generation_stage: Optional[str] = None):
+        """
+        Initialize the context.
+
+        Args:
+            resolver: Resolver that computes the variable values
+            business_type: The business type to resolve variables for
+            project_id: Project ID from endpoint (optional)
+            endpoint_params: Parameters from AI generation endpoints
+            generation_stage: Generation stage; defaults to endpoint_params['generation_stage']
+        """
+        self.resolver = resolver
+        self.business_type = business_type or ''
+        self.project_id = project_id
+        self.endpoint_params = endpoint_params or {}
+        self.generation_stage = generation_stage or self.endpoint_params.get('generation_stage')
+        self.values: Dict[str, Optional[str]] = {}
+        # 变量之间共享的请求级数据（如端点传入的测试点）
+        self.cache: Dict[str, Any] = {}
+
+    def get(self, name: str) -> Optional[str]:
+        """
+        Get the value of a variable, resolving it on first use.
+
+        Args:
+            name: Variable name
+
+        Returns:
+            Resolved value, or None for unknown variables
+        """
+        if name not in self.values:
+            self.values[name] = self.resolver.resolve_variable(
+                name, self.business_type, self.project_id, self.endpoint_params, self.generation_stage,
+                cache=self.cache
+            )
+        return self.values[name]
+
+    def summary(self) -> Dict[str, Any]:
+        """Get the resolved variables and their lengths for the AI log."""
+        return {
+            "business_type": self.business_type,
+            "project_id": self.project_id,
+            "generation_stage": self.generation_stage,
+            "resolved_variables": {
+                name: len(value) if value else 0 for name, value in self.values.items()
+            }
+        }
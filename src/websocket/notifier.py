@@ -139,6 +139,47 @@ class WebSocketNotifier:
             }
         })
 
+    async def notify_item_generated(
+        self,
+        task_id: str,
+        stage: str,
+        item_index: int,
+        item: Dict[str, Any]
+    ):
+        """
+        通知流式生成中单个测试点/测试用例已生成。
+
+        Args:
+            task_id (str): 任务ID
+            stage (str): 生成阶段
+            item_index (int): 元素在响应数组中的索引
+            item (Dict[str, Any]): 已生成的元素
+        """
+        await self.manager.send_task_update(task_id, {
+            "status": GenerationStatus.RUNNING,
+            "stage": stage,
+            "message": f"已生成第{item_index + 1}项",
+            "event": "item_generated",
+            "item_index": item_index,
+            "item": item
+        })
+
+    async def notify_bulk_progress(self, task_id: str, progress: Dict[str, Any]):
+        """
+        通知批量生成任务的汇总进度。
+
+        Args:
+            task_id (str): 批量任务（父任务）ID
+            progress (Dict[str, Any]): 汇总进度（各业务类型的子任务状态和计数）
+        """
+        await self.manager.send_task_update(task_id, {
+            "status": progress["status"],
+            "progress": progress["progress"],
+            "message": f"批量生成: 已完成 {progress['counts']['completed']}/{progress['total']} 个业务类型",
+            "event": "bulk_progress",
+            "bulk": progress
+        })
+
     async def notify_generation_success(
         self,
         task_id: str,
@@ -7,11 +7,14 @@ import pytest
 import asyncio
 import sys
 import os
+import tempfile
+import weakref
+from datetime import datetime, timedelta
 from typing import Generator, AsyncGenerator
 from unittest.mock import Mock, AsyncMock
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -146,6 +149,93 @@ def test_db_session(test_db_engine) -> Generator[Session, None, None]:
         session.close()
 
 
+class SQLiteDatabaseManager:
+    """使用临时SQLite文件的数据库管理器（每个线程使用独立连接，与MySQL连接池行为一致）。"""
+
+    def __init__(self):
+        from src.database.database import DatabaseSession
+
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        engine = create_engine(
+            f"sqlite:///{path}", poolclass=NullPool, connect_args={"check_same_thread": False, "timeout": 10}
+        )
+        Base.metadata.create_all(bind=engine)
+        self.engine = engine
+        self._session_class = DatabaseSession
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        weakref.finalize(self, _remove_sqlite_database, engine, path)
+
+    def create_tables(self):
+        Base.metadata.create_all(bind=self.engine)
+
+    def get_session(self):
+        return self._session_class(self.SessionLocal)
+
+
+def _remove_sqlite_database(engine, path):
+    engine.dispose()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+@pytest.fixture
+def db_manager():
+    """临时SQLite数据库管理器fixture（表结构与生产模型一致）"""
+    return SQLiteDatabaseManager()
+
+
+@pytest.fixture
+def enqueue_job(db_manager):
+    """向 db_manager 添加待执行生成任务的函数"""
+    from src.database.models import GenerationJob, JobStatus
+    from src.services.job_queue import GenerationJobQueue
+
+    def enqueue(task_id, created_offset=0, mode="test_points_only", **payload):
+        with db_manager.get_session() as db:
+            db.add(GenerationJob(
+                id=task_id,
+                project_id=1,
+                business_type="RCC",
+                status=JobStatus.PENDING,
+                generation_mode=mode,
+                job_payload=GenerationJobQueue.build_payload(business_type="RCC", project_id=1, **payload),
+                created_at=datetime.now() + timedelta(seconds=created_offset)
+            ))
+            db.commit()
+    return enqueue
+
+
+@pytest.fixture
+def load_job(db_manager):
+    """从 db_manager 读取生成任务（已脱离会话）的函数"""
+    from src.database.models import GenerationJob
+
+    def load(task_id):
+        with db_manager.get_session() as db:
+            job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
+            db.expunge(job)
+            return job
+    return load
+
+
+@pytest.fixture
+def prompt_builder(db_manager):
+    """使用临时数据库和独立提示词缓存的提示词构建器"""
+    from src.utils.config import Config
+    from src.utils.database_prompt_builder import DatabasePromptBuilder
+    from src.utils.prompt_cache import CompiledPromptCache
+    return DatabasePromptBuilder(Config(), db_manager=db_manager, prompt_cache=CompiledPromptCache())
+
+
+@pytest.fixture
+def test_case_generator(db_manager, prompt_builder):
+    """使用临时数据库的测试用例生成器（LLM客户端为Mock，需要时由测试替换生成方法）"""
+    from src.core.test_case_generator import TestCaseGenerator
+    from src.utils.config import Config
+    return TestCaseGenerator(Config(), llm_client=Mock(), prompt_builder=prompt_builder, db_manager=db_manager)
+
+
 @pytest.fixture
 def mock_generation_service():
     """模拟生成服务"""
@@ -0,0 +1,112 @@
+"""
+项目级批量生成测试。
+"""
+
+import json
+
+import pytest
+
+from src.database.models import BusinessTypeConfig, GenerationJob, JobStatus
+from src.services.bulk_generation import BulkGenerationService
+from src.services.generation_cancellation import cancellation_registry
+from src.services.job_queue import GenerationJobQueue
+from src.services.job_scheduler import FairShareScheduler
+
+
+@pytest.fixture
+def db_manager(db_manager):
+    with db_manager.get_session() as db:
+        for code, active in (("RCC", True), ("RFD", True), ("ZAB", True), ("OLD", False)):
+            db.add(BusinessTypeConfig(code=code, name=code, project_id=1, is_active=active))
+        db.add(BusinessTypeConfig(code="OTH", name="OTH", project_id=2, is_active=True))
+        db.commit()
+    return db_manager
+
+
+def _finish(db_manager, task_id, status, **fields):
+    with db_manager.get_session() as db:
+        job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
+        job.status = status
+        for name, value in fields.items():
+            setattr(job, name, value)
+        db.commit()
+
+
+class TestBulkGenerationService:
+    """批量生成服务测试类。"""
+
+    def test_fans_out_to_active_business_types(self, db_manager, load_job):
+        """测试为项目内每个启用的业务类型创建一个排队的子任务。"""
+        service = BulkGenerationService(db_manager)
+        created = service.create_bulk_job(project_id=1, generation_mode="test_cases_only", use_cache=False)
+
+        assert sorted(created["children"]) == ["RCC", "RFD", "ZAB"]
+        child = load_job(created["children"]["RFD"])
+        assert child.parent_job_id == created["task_id"]
+        assert child.priority == "bulk"
+        assert json.loads(child.job_payload) == {
+            "business_type": "RFD", "project_id": 1, "additional_context": None,
+            "use_cache": False, "test_point_ids": None
+        }
+        # 父任务只汇总进度，不会被worker领取
+        parent = load_job(created["task_id"])
+        assert parent.generation_mode == "bulk_test_cases" and parent.job_payload is None
+
+        with pytest.raises(ValueError):
+            service.create_bulk_job(project_id=1, generation_mode="test_points_only", business_types=["OLD"])
+
+    def test_progress_and_retry_failed(self, db_manager, load_job):
+        """测试按业务类型汇总进度，失败的业务类型可以单独重试。"""
+        service = BulkGenerationService(db_manager)
+        created = service.create_bulk_job(project_id=1, generation_mode="test_points_only")
+        children = created["children"]
+        _finish(db_manager, children["RCC"], JobStatus.COMPLETED,
+                result_data=json.dumps({"test_points_generated": 5}))
+        _finish(db_manager, children["RFD"], JobStatus.FAILED, error_message="LLM超时", attempts=3)
+
+        progress = service.refresh_parent(created["task_id"])
+        assert progress["status"] == "running"
+        assert progress["counts"]["completed"] == 1 and progress["counts"]["failed"] == 1
+        assert progress["progress"] == 66
+        assert progress["test_points_generated"] == 5
+        assert progress["business_types"]["RFD"]["error_message"] == "LLM超时"
+
+        _finish(db_manager, children["ZAB"], JobStatus.COMPLETED)
+        assert service.refresh_parent(created["task_id"])["status"] == "failed"
+        assert load_job(created["task_id"]).status == JobStatus.FAILED
+
+        assert service.retry_failed(created["task_id"]) == [children["RFD"]]
+        retried = load_job(children["RFD"])
+        assert retried.status == JobStatus.PENDING and retried.attempts == 0 and retried.error_message is None
+        assert load_job(created["task_id"]).status == JobStatus.RUNNING
+        assert load_job(children["RCC"]).status == JobStatus.COMPLETED
+
+    def test_children_run_with_bounded_parallelism(self, db_manager):
+        """测试同一批量任务同时运行的子任务数受上限限制。"""
+        service = BulkGenerationService(db_manager)
+        created = service.create_bulk_job(project_id=1, generation_mode="test_points_only")
+        queue = GenerationJobQueue(db_manager, scheduler=FairShareScheduler(bulk_limit=2))
+
+        first = queue.claim("w")
+        assert first["parent_job_id"] == created["task_id"]
+        assert queue.claim("w") is not None
+        assert queue.claim("w") is None
+
+        queue.release(first["task_id"], "w")
+        assert queue.claim("w") is not None
+
+    def test_cancel_children(self, db_manager):
+        """测试取消批量任务时取消未结束的子任务。"""
+        service = BulkGenerationService(db_manager)
+        created = service.create_bulk_job(project_id=1, generation_mode="test_points_only")
+        _finish(db_manager, created["children"]["RCC"], JobStatus.COMPLETED)
+
+        cancelled = service.cancel_children(created["task_id"])
+        assert sorted(cancelled) == sorted([created["children"]["RFD"], created["children"]["ZAB"]])
+        assert service.progress(created["task_id"])["counts"]["cancelled"] == 2
+
+        # 排队中被取消的子任务重试时清除取消标记
+        for child_id in cancelled:
+            cancellation_registry.cancel(child_id)
+        assert sorted(service.retry_failed(created["task_id"])) == sorted(cancelled)
+        assert not any(cancellation_registry.is_cancelled(child_id) for child_id in cancelled)
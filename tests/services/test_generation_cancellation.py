@@ -0,0 +1,139 @@
+"""
+生成任务取消测试。
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from src.llm.rate_limiter import LLMRateLimiter
+from src.services.generation_cancellation import GenerationCancellationRegistry
+from tests.test_llm_client import _make_client, _completion_body
+
+
+class TestGenerationCancellation:
+    """生成任务取消测试类。"""
+
+    def test_cancel_unregistered_task_records_nothing(self):
+        """测试取消未登记在本进程的任务（排队中或由其他进程执行）时不留下取消标记。"""
+        registry = GenerationCancellationRegistry()
+
+        assert registry.cancel("task-1") is False
+        assert not registry.is_cancelled("task-1")
+        registry.raise_if_cancelled("task-1")
+        assert registry.stats()["pending_cancellations"] == 0
+
+    def test_cancel_aborts_running_task(self):
+        """测试取消正在运行的任务。"""
+        registry = GenerationCancellationRegistry()
+
+        async def run():
+            task = asyncio.ensure_future(asyncio.sleep(10))
+            registry.register("task-1", task)
+            await asyncio.sleep(0)
+            assert registry.cancel("task-1") is True
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            registry.unregister("task-1")
+
+        asyncio.run(run())
+        assert registry.stats() == {"running_jobs": 0, "pending_cancellations": 0, "cancelled_tasks": 1}
+
+    def test_background_wrapper_skips_persistence_on_cancel(self):
+        """测试后台任务被取消时不再执行后续写库，并释放请求合并键。"""
+        from src.api import unified_test_case_endpoints as endpoints
+
+        coalescer = endpoints.generation_coalescer
+        registry = endpoints.cancellation_registry
+        key = coalescer.make_key("ZZZ", 99, "test_points_only", None, "cancel-test")
+        coalescer.attach_or_register(key, "task-c")
+        persisted = []
+
+        async def slow_job(task_id):
+            await asyncio.sleep(10)
+            persisted.append(task_id)
+
+        async def run():
+            wrapper = asyncio.ensure_future(endpoints._run_coalesced_job(key, slow_job, task_id="task-c"))
+            await asyncio.sleep(0.05)
+            assert registry.cancel("task-c") is True
+            await asyncio.wait_for(wrapper, timeout=1)
+
+        asyncio.run(run())
+        assert persisted == []
+        assert not registry.is_cancelled("task-c")
+        assert coalescer.attach_or_register(key, "task-d") == ("task-d", False)
+        coalescer.release(key, "task-d")
+
+    def test_cancel_aborts_llm_request_and_refunds_reservation(self):
+        """测试取消时中止进行中的LLM请求，并退回为输出预留的token。"""
+        state = {"started": 0, "finished": 0}
+
+        async def handler(request):
+            state["started"] += 1
+            await asyncio.sleep(10)
+            state["finished"] += 1
+            return httpx.Response(200, json=_completion_body('{"test_cases": []}'))
+
+        llm_client, bind = _make_client(handler)
+        llm_client.rate_limiter = LLMRateLimiter(requests_per_minute=1000, tokens_per_minute=60000)
+
+        async def run():
+            bind()
+            task = asyncio.ensure_future(llm_client.agenerate_test_cases("system", "user"))
+            while not state["started"]:
+                await asyncio.sleep(0.01)
+            reserved_level = llm_client.rate_limiter.stats()["tokens"]["available"]
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return reserved_level
+
+        reserved_level = asyncio.run(run())
+        assert state == {"started": 1, "finished": 0}
+        assert reserved_level < 55000
+        assert llm_client.rate_limiter.stats()["tokens"]["available"] > 59000
+
+
+class TestCancelPendingThenResume:
+    """排队中取消后恢复的测试类。"""
+
+    def test_resumed_job_is_not_aborted_by_stale_cancel_flag(self, db_manager, enqueue_job, load_job, monkeypatch):
+        """测试排队中被取消的任务恢复后能正常运行完成。"""
+        from src.api import dependencies, unified_test_case_endpoints as endpoints
+        from src.database.models import GenerationJob, JobStatus
+        from src.services.generation_worker import GenerationWorkerPool
+        from src.services.job_queue import GenerationJobQueue
+
+        enqueue_job("job-resume")
+        registry = endpoints.cancellation_registry
+        monkeypatch.setattr(dependencies, "get_database_manager", lambda: db_manager)
+        monkeypatch.setattr(endpoints, "get_generation_worker_pool", lambda *args: None)
+
+        async def job(task_id, business_type, project_id, use_cache=True):
+            registry.raise_if_cancelled(task_id)
+            with db_manager.get_session() as db:
+                db.query(GenerationJob).filter(GenerationJob.id == task_id).update(
+                    {GenerationJob.status: JobStatus.COMPLETED}
+                )
+                db.commit()
+
+        monkeypatch.setattr(endpoints, "_generate_test_points_background_unified", job)
+        pool = GenerationWorkerPool(GenerationJobQueue(db_manager), concurrency=1, poll_interval=0.01)
+
+        async def run():
+            with db_manager.get_session() as db:
+                cancelled = await endpoints.cancel_generation_unified("job-resume", db)
+                assert cancelled["aborted_running_task"] is False
+                await endpoints.resume_generation_unified("job-resume", db)
+            assert not registry.is_cancelled("job-resume")
+
+            worker = asyncio.ensure_future(pool.run())
+            while pool.stats()["finished_jobs"] < 1:
+                await asyncio.sleep(0.01)
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+        asyncio.run(asyncio.wait_for(run(), timeout=10))
+        assert load_job("job-resume").status == JobStatus.COMPLETED
@@ -0,0 +1,122 @@
+"""
+生成任务检查点测试。
+"""
+
+import asyncio
+
+from src.core.test_case_generator import TestCaseGenerator
+from src.services.generation_checkpoints import (
+    JobCheckpoints, STAGE_BATCHES, STAGE_ITEMS, STAGE_LLM_RESPONSE, STAGE_PROMPTS, STAGE_WRITTEN
+)
+from src.utils.config import Config
+from tests.utils import create_test_points
+
+
+class TestJobCheckpoints:
+    """检查点读写测试类。"""
+
+    def test_save_load_and_clear(self, db_manager):
+        """测试检查点按阶段和批次保存、覆盖和清理。"""
+        checkpoints = JobCheckpoints(db_manager, "job-1")
+        assert checkpoints.load(STAGE_LLM_RESPONSE) is None
+
+        checkpoints.save(STAGE_LLM_RESPONSE, "第一次响应")
+        checkpoints.save(STAGE_LLM_RESPONSE, "第二次响应")
+        checkpoints.save(STAGE_ITEMS, {"test_cases": [{"name": "用例"}]}, batch_index=2)
+
+        assert checkpoints.load(STAGE_LLM_RESPONSE) == "第二次响应"
+        assert checkpoints.load(STAGE_ITEMS, 2) == {"test_cases": [{"name": "用例"}]}
+        assert checkpoints.summary() == {STAGE_ITEMS: [2], STAGE_LLM_RESPONSE: [0]}
+
+        checkpoints.clear()
+        assert checkpoints.summary() == {}
+
+    def test_written_checkpoint_follows_transaction(self, db_manager):
+        """测试随结果写入的检查点在事务回滚时不会保存。"""
+        checkpoints = JobCheckpoints(db_manager, "job-1")
+
+        with db_manager.get_session() as db:
+            checkpoints.save(STAGE_WRITTEN, {"test_points_generated": 3}, db=db)
+            db.rollback()
+        assert checkpoints.load(STAGE_WRITTEN) is None
+
+        with db_manager.get_session() as db:
+            checkpoints.save(STAGE_WRITTEN, {"test_points_generated": 3}, db=db)
+            db.commit()
+        assert checkpoints.load(STAGE_WRITTEN) == {"test_points_generated": 3}
+
+
+class TestResumeBatches:
+    """分批生成从检查点恢复的测试类。"""
+
+    def _patch_generate(self, generator, monkeypatch, calls, failing_ids):
+        monkeypatch.setenv('TEST_CASE_BATCH_SIZE', '5')
+
+        async def fake_generate(business_type, test_points_data, additional_context=None, save_to_db=False,
+                                project_id=None, test_point_ids=None, ai_logger=None, on_item=None,
+                                use_cache=True, checkpoints=None, batch_index=0):
+            calls.append(test_point_ids)
+            if test_point_ids == failing_ids:
+                return None
+            return {"test_cases": [{"name": f"用例{i}"} for i in test_point_ids]}
+
+        monkeypatch.setattr(generator, "agenerate_test_cases_from_external_points", fake_generate)
+
+    def test_only_failed_batches_are_rerun(self, db_manager, test_case_generator, monkeypatch):
+        """测试任务重新执行时只重新生成失败的批次。"""
+        checkpoints = JobCheckpoints(db_manager, "job-1")
+        points = {"test_points": create_test_points(12)}
+
+        first_calls = []
+        self._patch_generate(test_case_generator, monkeypatch, first_calls, failing_ids=[6, 7, 8, 9, 10])
+        result = asyncio.run(test_case_generator.agenerate_test_cases_in_batches("RCC", points, checkpoints=checkpoints))
+        assert result["generation_metadata"]["failed_batches"] == [1]
+        assert len(first_calls) == 3
+        assert checkpoints.summary()[STAGE_ITEMS] == [0, 2]
+
+        resumed_calls = []
+        self._patch_generate(test_case_generator, monkeypatch, resumed_calls, failing_ids=None)
+        result = asyncio.run(test_case_generator.agenerate_test_cases_in_batches("RCC", points, checkpoints=checkpoints))
+        assert resumed_calls == [[6, 7, 8, 9, 10]]
+        assert [c["test_point_id"] for c in result["test_cases"]] == list(range(1, 13))
+
+    def test_batch_plan_is_reused(self, db_manager, test_case_generator, monkeypatch):
+        """测试重新执行时沿用上次的批次划分，测试点变化时重新划分。"""
+        checkpoints = JobCheckpoints(db_manager, "job-1")
+        checkpoints.save(STAGE_BATCHES, [[1, 2], [3, 4, 5, 6]])
+        calls = []
+        self._patch_generate(test_case_generator, monkeypatch, calls, failing_ids=None)
+
+        asyncio.run(test_case_generator.agenerate_test_cases_in_batches("RCC", {"test_points": create_test_points(6)}, checkpoints=checkpoints))
+        assert sorted(calls) == [[1, 2], [3, 4, 5, 6]]
+
+        calls.clear()
+        asyncio.run(test_case_generator.agenerate_test_cases_in_batches("RCC", {"test_points": create_test_points(7)}, checkpoints=checkpoints))
+        assert sorted(calls) == [[1, 2, 3, 4, 5], [6, 7]]
+
+    def test_streamed_response_is_checkpointed(self, db_manager, prompt_builder):
+        """测试流式生成的LLM响应也保存为检查点，恢复时不再调用LLM。"""
+        checkpoints = JobCheckpoints(db_manager, "job-1")
+        checkpoints.save(STAGE_PROMPTS, ["系统", "系统", "用户", None], batch_index=1)
+        calls = []
+
+        class _StreamingClient:
+            async def astream_test_cases(self, system_prompt, user_prompt, on_item=None, **kwargs):
+                calls.append(user_prompt)
+                await on_item('test_cases', 0, {"name": "用例1"})
+                return '{"test_cases": [{"name": "用例1"}]}'
+
+        generator = TestCaseGenerator(
+            Config(), llm_client=_StreamingClient(), prompt_builder=prompt_builder, db_manager=db_manager
+        )
+
+        async def on_item(key, index, item):
+            pass
+
+        for _ in range(2):
+            result = asyncio.run(generator.agenerate_test_cases_from_external_points(
+                "RCC", {"test_points": create_test_points(1)}, on_item=on_item, checkpoints=checkpoints, batch_index=1
+            ))
+            assert result["test_cases"] == [{"name": "用例1"}]
+        assert calls == ["用户"]
+        assert checkpoints.load(STAGE_LLM_RESPONSE, 1) == '{"test_cases": [{"name": "用例1"}]}'
@@ -0,0 +1,125 @@
+"""
+生成请求合并测试。
+"""
+
+import asyncio
+
+from src.database.models import BusinessTypeConfig, GenerationJob, JobStatus, Project
+from src.models.unified_test_case import UnifiedTestCaseGenerationRequest
+from src.services.generation_coalescer import GenerationCoalescer
+
+
+class TestGenerationCoalescer:
+    """生成请求合并测试类。"""
+
+    def test_key_ignores_test_point_order_and_duplicates(self):
+        """测试请求键与测试点ID顺序无关。"""
+        key = GenerationCoalescer.make_key("rcc", 1, "test_cases_only", [3, 1, 2], "ctx")
+        assert key == GenerationCoalescer.make_key("RCC", 1, "test_cases_only", [1, 2, 3, 3], "ctx")
+        assert key != GenerationCoalescer.make_key("RCC", 1, "test_cases_only", [1, 2], "ctx")
+        assert key != GenerationCoalescer.make_key("RCC", 2, "test_cases_only", [1, 2, 3], "ctx")
+        assert key != GenerationCoalescer.make_key("RCC", 1, "test_cases_only", [1, 2, 3], "other")
+
+    def test_identical_requests_attach_to_running_job(self):
+        """测试运行期间的相同请求合并到同一个任务。"""
+        coalescer = GenerationCoalescer()
+        key = coalescer.make_key("RCC", 1, "test_points_only")
+
+        assert coalescer.attach_or_register(key, "task-1") == ("task-1", False)
+        assert coalescer.attach_or_register(key, "task-2") == ("task-1", True)
+        assert coalescer.stats()["attached_requests"] == {"task-1": 1}
+
+        coalescer.release(key, "task-1")
+        assert coalescer.attach_or_register(key, "task-3") == ("task-3", False)
+        assert coalescer.coalesced_requests == 1
+
+    def test_release_ignores_other_task(self):
+        """测试释放非当前登记任务时不影响运行中的任务。"""
+        coalescer = GenerationCoalescer()
+        key = coalescer.make_key("RCC", 1, "test_points_only")
+        coalescer.attach_or_register(key, "task-1")
+        coalescer.release(key, "stale-task")
+        assert coalescer.attach_or_register(key, "task-2") == ("task-1", True)
+
+    def test_background_wrapper_releases_key(self):
+        """测试后台任务结束（包括失败）后释放请求键。"""
+        from src.api import unified_test_case_endpoints as endpoints
+
+        coalescer = endpoints.generation_coalescer
+        key = coalescer.make_key("ZZZ", 99, "test_points_only", None, "coalescer-test")
+        coalescer.attach_or_register(key, "task-x")
+
+        async def failing_job(task_id):
+            raise RuntimeError("boom")
+
+        try:
+            asyncio.run(endpoints._run_coalesced_job(key, failing_job, task_id="task-x"))
+        except RuntimeError:
+            pass
+        assert coalescer.attach_or_register(key, "task-y") == ("task-y", False)
+        coalescer.release(key, "task-y")
+
+
+def _generate(db_manager, request):
+    from src.api import unified_test_case_endpoints as endpoints
+
+    with db_manager.get_session() as db:
+        return asyncio.run(endpoints.generate_unified(request, db=db))
+
+
+class TestCoalescedGenerateRequests:
+    """生成接口合并请求测试类。"""
+
+    def _seed_running_job(self, db_manager, enqueue_job, request):
+        with db_manager.get_session() as db:
+            db.add(Project(id=1, name="默认项目"))
+            db.add(BusinessTypeConfig(code="RCC", name="远程控制", project_id=1, is_active=True))
+            db.commit()
+        key = GenerationCoalescer.make_key(
+            request.business_type, request.project_id, request.generation_mode, None, request.additional_context
+        )
+        enqueue_job("running-job", mode="points_then_cases", coalesce_key=key)
+        with db_manager.get_session() as db:
+            db.query(GenerationJob).filter(GenerationJob.id == "running-job").update({
+                GenerationJob.status: JobStatus.RUNNING,
+                GenerationJob.test_points_generated: 7,
+                GenerationJob.test_cases_generated: 3
+            })
+            db.commit()
+        return key
+
+    def test_external_mode_merges_by_job_record(self, db_manager, enqueue_job, monkeypatch):
+        """测试external模式下按任务记录合并，不在进程内登记，并返回运行中任务的当前计数。"""
+        from src.api import unified_test_case_endpoints as endpoints
+
+        monkeypatch.setenv("GENERATION_WORKER_MODE", "external")
+        coalescer = GenerationCoalescer()
+        monkeypatch.setattr(endpoints, "generation_coalescer", coalescer)
+        request = UnifiedTestCaseGenerationRequest(
+            project_id=1, business_type="rcc", generation_mode="points_then_cases", additional_context="ctx"
+        )
+        self._seed_running_job(db_manager, enqueue_job, request)
+
+        result = _generate(db_manager, request)
+        assert result["generation_job_id"] == "running-job"
+        assert result["status"] == JobStatus.RUNNING.value
+        assert (result["test_points_generated"], result["test_cases_generated"]) == (7, 3)
+        assert coalescer.stats()["running_jobs"] == 0
+
+    def test_inprocess_mode_returns_running_job_counts(self, db_manager, enqueue_job, monkeypatch):
+        """测试inprocess模式下合并到登记的任务时返回该任务的当前计数。"""
+        from src.api import unified_test_case_endpoints as endpoints
+
+        monkeypatch.setenv("GENERATION_WORKER_MODE", "inprocess")
+        coalescer = GenerationCoalescer()
+        monkeypatch.setattr(endpoints, "generation_coalescer", coalescer)
+        request = UnifiedTestCaseGenerationRequest(
+            project_id=1, business_type="RCC", generation_mode="points_then_cases", additional_context="ctx"
+        )
+        key = self._seed_running_job(db_manager, enqueue_job, request)
+        coalescer.attach_or_register(key, "running-job")
+
+        result = _generate(db_manager, request)
+        assert result["generation_job_id"] == "running-job"
+        assert (result["test_points_generated"], result["test_cases_generated"]) == (7, 3)
+        assert coalescer.stats()["attached_requests"] == {"running-job": 1}
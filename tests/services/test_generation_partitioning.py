@@ -0,0 +1,134 @@
+"""
+测试点分区生成测试。
+"""
+
+import asyncio
+import json
+import re
+
+from src.core.test_case_generator import TestCaseGenerator
+from src.database.models import BusinessTypeConfig, Project
+from src.services.generation_checkpoints import JobCheckpoints, STAGE_PARTITIONS
+from src.services.generation_partitioning import (
+    allocate_counts, configured_partitions, merge_test_points, parse_planned_partitions,
+    requested_test_point_count
+)
+from src.services.generation_service import UnifiedGenerationService
+from src.utils.config import Config
+
+
+class TestPartitionHelpers:
+    """分区辅助函数测试类。"""
+
+    def test_requested_count(self):
+        """测试从用户输入识别测试点数量。"""
+        assert requested_test_point_count("请生成50个测试点，覆盖登录") == 50
+        assert requested_test_point_count({"user_input": "generate 30 test points"}) == 30
+        assert requested_test_point_count("覆盖登录和注册") is None
+        assert requested_test_point_count(None) is None
+
+    def test_configured_and_planned_partitions(self):
+        """测试读取业务类型配置中的分区和解析规划响应。"""
+        config = {"functional_modules": ["登录", {"name": "支付", "description": "下单和退款"}, "登录"]}
+        assert configured_partitions(config) == ["登录", "支付：下单和退款"]
+        assert configured_partitions(json.dumps({"test_point_partitions": ["A", "B"]})) == ["A", "B"]
+        assert configured_partitions({"file_mapping": {}}) == []
+
+        response = '```json\n{"partitions": ["登录", "注册", "支付", "订单"]}\n```'
+        assert parse_planned_partitions(response, limit=3) == ["登录", "注册", "支付"]
+        assert parse_planned_partitions("无法拆分", limit=3) == []
+
+    def test_allocate_and_merge(self):
+        """测试数量分配和合并去重后重新编号。"""
+        assert allocate_counts(25, 3) == [9, 8, 8]
+
+        merged = merge_test_points([
+            [{"test_case_id": "TP001", "title": "登录成功"}, {"test_case_id": "TP002", "title": "密码错误"}],
+            [{"test_case_id": "TP001", "title": "登录 成功！"}, {"test_case_id": "TP002", "title": "下单成功"}],
+        ])
+        assert [p["title"] for p in merged] == ["登录成功", "密码错误", "下单成功"]
+        assert [p["test_case_id"] for p in merged] == ["TP001", "TP002", "TP003"]
+
+
+class _FakeLLMClient:
+    """按分区返回测试点的假LLM客户端。"""
+
+    def __init__(self, failing=None):
+        self.calls = []
+        self.failing = failing
+
+    async def agenerate_test_cases(self, system_prompt, requirements_prompt, **kwargs):
+        if "只输出JSON" in system_prompt:
+            return json.dumps({"partitions": ["登录", "支付", "订单"]}, ensure_ascii=False)
+        partition = re.search(r"「(.+?)」", requirements_prompt).group(1)
+        self.calls.append((partition, kwargs["max_tokens"]))
+        if partition == self.failing:
+            raise RuntimeError("超时")
+        points = [{"test_case_id": "TP001", "title": f"{partition}正常流程"}, {"test_case_id": "TP002", "title": "通用异常"}]
+        return json.dumps({"test_points": points}, ensure_ascii=False)
+
+
+def _service(monkeypatch, db_manager, prompt_builder, llm_client, additional_config=None):
+    monkeypatch.setenv("TEST_POINT_PARTITION_THRESHOLD", "20")
+    monkeypatch.setenv("TEST_POINT_PARTITION_TOKEN_BUDGET", "3000")
+    with db_manager.get_session() as db:
+        if not db.query(Project).filter(Project.id == 1).first():
+            db.add(Project(id=1, name="默认项目"))
+            db.add(BusinessTypeConfig(code="RCC", name="远程控制", project_id=1, is_active=True))
+        db.query(BusinessTypeConfig).filter(BusinessTypeConfig.code == "RCC").update(
+            {BusinessTypeConfig.additional_config: additional_config or {}}
+        )
+        db.commit()
+    config = Config()
+    generator = TestCaseGenerator(config, llm_client=llm_client, prompt_builder=prompt_builder, db_manager=db_manager)
+    return UnifiedGenerationService(config, db_manager=db_manager, test_case_generator=generator)
+
+
+class TestPartitionedGeneration:
+    """分区生成流程测试类。"""
+
+    def test_small_requests_are_not_partitioned(self, db_manager, prompt_builder, monkeypatch):
+        """测试要求数量低于阈值时不分区。"""
+        service = _service(monkeypatch, db_manager, prompt_builder, _FakeLLMClient())
+        plan = asyncio.run(service._aplan_test_point_partitions("RCC", "生成10个测试点", "提示词"))
+        assert plan == []
+
+    def test_partitions_are_generated_and_merged(self, db_manager, prompt_builder, enqueue_job, monkeypatch):
+        """测试按规划的分区并发生成，合并去重，失败分区不影响其他分区。"""
+        enqueue_job("job-1")
+        llm_client = _FakeLLMClient(failing="订单")
+        service = _service(monkeypatch, db_manager, prompt_builder, llm_client)
+        checkpoints = JobCheckpoints(db_manager, "job-1")
+
+        async def run():
+            plan = await service._aplan_test_point_partitions(
+                "RCC", "生成30个测试点", "提示词", checkpoints=checkpoints
+            )
+            response = await service._arequest_partitioned_test_points(
+                plan, "系统", "系统", "提示词", "job-1", checkpoints=checkpoints
+            )
+            return plan, response
+
+        plan, response = asyncio.run(run())
+        assert plan == [("登录", 10), ("支付", 10), ("订单", 10)]
+        assert sorted(llm_client.calls) == [("支付", 3000), ("登录", 3000), ("订单", 3000)]
+        points = json.loads(response)["test_points"]
+        assert [p["title"] for p in points] == ["登录正常流程", "通用异常", "支付正常流程"]
+        assert [p["test_case_id"] for p in points] == ["TP001", "TP002", "TP003"]
+        assert checkpoints.summary()[STAGE_PARTITIONS] == [0, 1, 2]
+
+        # 重新执行时沿用分区规划，只重新生成失败的分区
+        retry_client = _FakeLLMClient()
+        service = _service(monkeypatch, db_manager, prompt_builder, retry_client, {"functional_modules": ["其他"]})
+
+        async def resume():
+            plan = await service._aplan_test_point_partitions(
+                "RCC", "生成30个测试点", "提示词", checkpoints=checkpoints
+            )
+            return await service._arequest_partitioned_test_points(
+                plan, "系统", "系统", "提示词", "job-1", checkpoints=checkpoints
+            )
+
+        points = json.loads(asyncio.run(resume()))["test_points"]
+        assert retry_client.calls == [("订单", 3000)]
+        assert [p["title"] for p in points][-1] == "订单正常流程"
@@ -0,0 +1,204 @@
+"""
+两阶段流水线生成测试。
+"""
+
+import asyncio
+import json
+
+from src.llm.token_budget import TokenBudgeter
+from src.services.generation_pipeline import PointsToCasesPipeline
+
+
+def _point(point_id):
+    return {"id": point_id, "title": f"测试点{point_id}"}
+
+
+class TestPointsToCasesPipeline:
+    """流水线批次调度测试类。"""
+
+    def test_batches_start_while_stage_one_is_running(self):
+        """测试凑满一个批次即开始第二阶段，与第一阶段重叠。"""
+        events = []
+
+        async def run_batch(batch_index, batch):
+            events.append(("start", batch_index, [tp["id"] for tp in batch]))
+            await asyncio.sleep(0)
+            return len(batch)
+
+        async def scenario():
+            pipeline = PointsToCasesPipeline(run_batch, batch_size=2, concurrency=2)
+            for point_id in range(1, 6):
+                pipeline.add(_point(point_id))
+                await asyncio.sleep(0.01)  # 第一阶段继续生成后续测试点
+                events.append(("point", point_id))
+            return await pipeline.finish()
+
+        results = asyncio.run(scenario())
+        assert results == [2, 2, 1]
+        assert events.index(("start", 0, [1, 2])) < events.index(("point", 3))
+        assert events[-1] == ("start", 2, [5])
+
+    def test_concurrency_duplicates_and_failures(self):
+        """测试批次并发上限、重复测试点忽略和失败批次。"""
+        state = {"running": 0, "peak": 0}
+
+        async def run_batch(batch_index, batch):
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            await asyncio.sleep(0.01)
+            state["running"] -= 1
+            if batch_index == 1:
+                raise RuntimeError("LLM超时")
+            return [tp["id"] for tp in batch]
+
+        async def scenario():
+            pipeline = PointsToCasesPipeline(run_batch, batch_size=1, concurrency=2)
+            for point_id in (1, 2, 2, 3, 4):
+                pipeline.add(_point(point_id))
+            return await pipeline.finish()
+
+        assert asyncio.run(scenario()) == [[1], None, [3], [4]]
+        assert state["peak"] == 2
+
+    def test_aclose_cancels_running_batches(self):
+        """测试第一阶段失败时取消尚未完成的批次。"""
+        cancelled = []
+
+        async def run_batch(batch_index, batch):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(batch_index)
+                raise
+
+        async def scenario():
+            pipeline = PointsToCasesPipeline(run_batch, batch_size=1, concurrency=4)
+            pipeline.add(_point(1))
+            pipeline.add(_point(2))
+            await asyncio.sleep(0.01)
+            await pipeline.aclose()
+
+        asyncio.run(scenario())
+        assert sorted(cancelled) == [0, 1]
+
+
+class _PipelineLLMClient:
+    """第一阶段流式返回测试点、第二阶段耗时超过一次续约间隔的假LLM客户端。"""
+
+    def __init__(self, config):
+        self.token_budgeter = TokenBudgeter(config)
+
+    async def astream_test_cases(self, system_prompt, user_prompt, on_item=None, **kwargs):
+        points = [
+            {"test_case_id": "TP001", "name": "远程解锁车门", "description": "下发解锁指令"},
+            {"test_case_id": "TP002", "name": "远程锁车", "description": "下发锁车指令"}
+        ]
+        for index, point in enumerate(points):
+            await on_item("test_points", index, point)
+        return json.dumps({"test_points": points}, ensure_ascii=False)
+
+    async def agenerate_test_cases(self, system_prompt, user_prompt, **kwargs):
+        await asyncio.sleep(1.5)
+        return json.dumps({"test_cases": [{
+            "name": "远程解锁车门", "description": "验证远程解锁", "preconditions": ["车辆在线"],
+            "steps": ["发送解锁指令"], "expected_result": ["车门解锁"]
+        }]}, ensure_ascii=False)
+
+
+def _seed_prompts(db_manager):
+    """为RCC配置测试点和测试用例两个阶段的提示词组合。"""
+    from src.database.models import (
+        BusinessTypeConfig, Project, Prompt, PromptCombination, PromptCombinationItem, PromptStatus, PromptType
+    )
+
+    with db_manager.get_session() as db:
+        db.add_all([Project(id=1, name="默认项目"), Project(id=2, name="其他项目")])
+        db.add_all([
+            Prompt(id=1, project_id=1, name="系统", content="你是测试专家", type=PromptType.SYSTEM,
+                   status=PromptStatus.ACTIVE),
+            Prompt(id=2, project_id=1, name="测试点", content="生成测试点", type=PromptType.TEMPLATE,
+                   status=PromptStatus.ACTIVE),
+            Prompt(id=3, project_id=1, name="测试用例", content="生成测试用例", type=PromptType.TEMPLATE,
+                   status=PromptStatus.ACTIVE),
+        ])
+        db.add_all([
+            PromptCombination(id=10, project_id=1, name="RCC测试点", is_active=True, is_valid=True),
+            PromptCombination(id=11, project_id=1, name="RCC测试用例", is_active=True, is_valid=True),
+        ])
+        db.add_all([
+            PromptCombinationItem(combination_id=10, prompt_id=1, order=0, item_type="system_prompt"),
+            PromptCombinationItem(combination_id=10, prompt_id=2, order=1, section_title="需求"),
+            PromptCombinationItem(combination_id=11, prompt_id=1, order=0, item_type="system_prompt"),
+            PromptCombinationItem(combination_id=11, prompt_id=3, order=1, section_title="需求"),
+        ])
+        db.add(BusinessTypeConfig(code="RCC", name="远程控制", project_id=1, is_active=True,
+                                  test_point_combination_id=10, test_case_combination_id=11))
+        db.commit()
+
+
+class TestPointsThenCasesJob:
+    """流水线任务状态测试类。"""
+
+    def test_job_stays_running_past_heartbeat_until_stage_two_finishes(self, db_manager, prompt_builder, enqueue_job,
+                                                                         load_job, monkeypatch):
+        """测试第一阶段结束后任务仍为运行中并持续续约，第二阶段完成后才标记完成；只转换本项目的测试点，
+        流式保存过的测试点不再重复保存。"""
+        from unittest.mock import MagicMock
+
+        from src.api import dependencies, unified_test_case_endpoints
+        from src.core.test_case_generator import TestCaseGenerator
+        from src.database.models import JobStatus, UnifiedTestCase, UnifiedTestCaseStatus
+        from src.services.generation_service import UnifiedGenerationService
+        from src.services.generation_worker import GenerationWorkerPool
+        from src.services.job_queue import GenerationJobQueue
+        from src.utils.ai_logger import AILoggerManager
+        from src.utils.config import Config
+
+        _seed_prompts(db_manager)
+        enqueue_job("job-1", mode="points_then_cases")
+        # 其他项目中同名的测试点不能被当作本任务的测试点
+        with db_manager.get_session() as db:
+            db.add(UnifiedTestCase(project_id=2, business_type="RCC", test_case_id="TP900",
+                                   name="远程锁车", description="其他项目", status=UnifiedTestCaseStatus.DRAFT))
+            db.commit()
+
+        generator = TestCaseGenerator(Config(), llm_client=_PipelineLLMClient(Config()), prompt_builder=prompt_builder,
+                                      db_manager=db_manager)
+        service = UnifiedGenerationService(Config(), db_manager=db_manager, test_case_generator=generator)
+        monkeypatch.setattr(dependencies, "get_database_manager", lambda: db_manager)
+        monkeypatch.setattr(dependencies, "get_unified_generation_service", lambda: service)
+        monkeypatch.setattr(dependencies, "get_test_case_generator", lambda: generator)
+        monkeypatch.setattr(dependencies, "get_config", Config)
+        monkeypatch.setattr(AILoggerManager, "create_logger", staticmethod(lambda *args: MagicMock()))
+        saved = []
+        save_generated_test_point = unified_test_case_endpoints._save_generated_test_point
+
+        def counting_save(db, item, *args):
+            saved.append(item["name"])
+            return save_generated_test_point(db, item, *args)
+
+        monkeypatch.setattr(unified_test_case_endpoints, "_save_generated_test_point", counting_save)
+
+        # 租约3秒，每秒续约一次；第二阶段耗时1.5秒
+        pool = GenerationWorkerPool(GenerationJobQueue(db_manager, lease_seconds=3), concurrency=1,
+                                    poll_interval=0.01)
+
+        async def run():
+            worker = asyncio.ensure_future(pool.run())
+            while pool.stats()["finished_jobs"] < 1:
+                await asyncio.sleep(0.05)
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+        asyncio.run(asyncio.wait_for(run(), timeout=20))
+        job = load_job("job-1")
+        assert pool.stats()["lost_leases"] == 0
+        assert job.status == JobStatus.COMPLETED
+        assert json.loads(job.result_data)["test_cases_generated"] == 1
+        # 流式回调已保存全部测试点，第一阶段结束后不再重复保存
+        assert saved == ["远程解锁车门", "远程锁车"]
+        with db_manager.get_session() as db:
+            converted = db.query(UnifiedTestCase).filter(UnifiedTestCase.steps.isnot(None)).all()
+            assert [case.project_id for case in converted] == [1]
+            other = db.query(UnifiedTestCase).filter(UnifiedTestCase.project_id == 2).one()
+            assert other.steps is None and other.description == "其他项目"
@@ -0,0 +1,150 @@
+"""
+持久化生成任务队列和worker池测试。
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from src.database.models import GenerationJob, JobStatus
+from src.services.generation_worker import GenerationWorkerPool
+from src.services.job_queue import GenerationJobQueue
+
+
+class TestGenerationJobQueue:
+    """持久化任务队列测试类。"""
+
+    def test_claim_takes_oldest_pending_job_once(self, db_manager, enqueue_job, load_job):
+        """测试按创建顺序领取任务，同一任务不会被重复领取。"""
+        queue = GenerationJobQueue(db_manager, lease_seconds=60)
+        enqueue_job("job-2", created_offset=1)
+        enqueue_job("job-1", use_cache=False)
+
+        claimed = queue.claim("worker-a")
+        assert claimed == {
+            "task_id": "job-1",
+            "generation_mode": "test_points_only",
+            "attempt": 1,
+            "payload": {"business_type": "RCC", "project_id": 1, "use_cache": False},
+            "parent_job_id": None
+        }
+        assert queue.claim("worker-b")["task_id"] == "job-2"
+        assert queue.claim("worker-c") is None
+
+        job = load_job("job-1")
+        assert job.status == JobStatus.RUNNING and job.worker_id == "worker-a"
+        assert job.lease_expires_at > datetime.now() + timedelta(seconds=50)
+
+    def test_heartbeat_fails_after_cancel(self, db_manager, enqueue_job):
+        """测试任务被取消后续约失败。"""
+        queue = GenerationJobQueue(db_manager)
+        enqueue_job("job-1")
+        queue.claim("worker-a")
+
+        assert queue.heartbeat("job-1", "worker-a") is True
+        assert queue.heartbeat("job-1", "worker-b") is False
+
+        with db_manager.get_session() as db:
+            db.query(GenerationJob).filter(GenerationJob.id == "job-1").update(
+                {GenerationJob.status: JobStatus.CANCELLED}
+            )
+            db.commit()
+        assert queue.heartbeat("job-1", "worker-a") is False
+
+    def test_expired_lease_is_reclaimed_until_max_attempts(self, db_manager, enqueue_job, load_job):
+        """测试崩溃worker的任务租约过期后被重新领取，超过次数上限后标记失败。"""
+        queue = GenerationJobQueue(db_manager, lease_seconds=0, max_attempts=2)
+        enqueue_job("job-1")
+
+        assert queue.claim("worker-a")["attempt"] == 1
+        reclaimed = queue.claim("worker-b")
+        assert reclaimed["task_id"] == "job-1" and reclaimed["attempt"] == 2
+        assert queue.heartbeat("job-1", "worker-a") is False
+
+        assert queue.claim("worker-c") is None
+        job = load_job("job-1")
+        assert job.status == JobStatus.FAILED
+        assert "最大尝试次数" in job.error_message
+
+    def test_requeue_and_release(self, db_manager, enqueue_job, load_job):
+        """测试worker停止时放回队列，结束时释放租约。"""
+        queue = GenerationJobQueue(db_manager)
+        enqueue_job("job-1")
+        queue.claim("worker-a")
+
+        queue.requeue("job-1", "worker-a")
+        assert load_job("job-1").status == JobStatus.PENDING
+        assert queue.stats()["queued"] == 1
+
+        queue.claim("worker-b")
+        queue.release("job-1", "worker-b")
+        job = load_job("job-1")
+        assert job.status == JobStatus.FAILED and job.lease_expires_at is None
+
+
+class TestGenerationWorkerPool:
+    """worker池测试类。"""
+
+    def test_pool_runs_queued_jobs_concurrently(self, db_manager, enqueue_job, load_job, monkeypatch):
+        """测试worker池并发执行排队任务并释放租约。"""
+        from src.api import unified_test_case_endpoints as endpoints
+
+        running = {"now": 0, "max": 0}
+        finished = []
+
+        async def fake_job(task_id, business_type, project_id, use_cache=True):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.05)
+            running["now"] -= 1
+            with db_manager.get_session() as db:
+                job = db.query(GenerationJob).filter(GenerationJob.id == task_id).first()
+                job.status = JobStatus.COMPLETED
+                db.commit()
+            finished.append(task_id)
+
+        monkeypatch.setattr(endpoints, "_generate_test_points_background_unified", fake_job)
+        for index in range(5):
+            enqueue_job(f"job-{index}", created_offset=index)
+        pool = GenerationWorkerPool(GenerationJobQueue(db_manager), concurrency=2, poll_interval=0.01)
+
+        async def run():
+            worker = asyncio.ensure_future(pool.run())
+            while len(finished) < 5:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+        asyncio.run(asyncio.wait_for(run(), timeout=10))
+        assert sorted(finished) == [f"job-{index}" for index in range(5)]
+        assert running["max"] == 2
+        job = load_job("job-4")
+        assert job.status == JobStatus.COMPLETED and job.lease_expires_at is None
+        assert pool.stats()["claimed_jobs"] == 5
+
+    def test_stopping_pool_requeues_running_job(self, db_manager, enqueue_job, load_job, monkeypatch):
+        """测试worker池停止时运行中的任务放回队列。"""
+        from src.api import unified_test_case_endpoints as endpoints
+
+        started = []
+
+        async def slow_job(task_id, business_type, project_id):
+            started.append(task_id)
+            await asyncio.sleep(10)
+
+        monkeypatch.setattr(endpoints, "_generate_test_points_background_unified", slow_job)
+        enqueue_job("job-1")
+        pool = GenerationWorkerPool(GenerationJobQueue(db_manager), concurrency=1, poll_interval=0.01)
+
+        async def run():
+            worker = asyncio.ensure_future(pool.run())
+            while not started:
+                await asyncio.sleep(0.01)
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+        asyncio.run(asyncio.wait_for(run(), timeout=10))
+        job = load_job("job-1")
+        assert job.status == JobStatus.PENDING and job.worker_id is None
+        assert json.loads(job.job_payload)["business_type"] == "RCC"
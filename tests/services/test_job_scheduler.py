@@ -0,0 +1,88 @@
+"""
+生成任务公平调度测试。
+"""
+
+from datetime import datetime, timedelta
+
+from src.database.models import GenerationJob
+from src.services.job_queue import GenerationJobQueue
+from src.services.job_scheduler import FairShareScheduler
+
+
+def _candidate(job_id, project_id, business_type="RCC", priority="interactive", offset=0):
+    return {
+        "id": job_id,
+        "project_id": project_id,
+        "business_type": business_type,
+        "priority": priority,
+        "created_at": datetime(2026, 1, 1) + timedelta(seconds=offset)
+    }
+
+
+class TestFairShareScheduler:
+    """公平调度测试类。"""
+
+    def test_projects_share_slots_fairly(self):
+        """测试大量排队任务的项目不会挡住其他项目的任务。"""
+        scheduler = FairShareScheduler()
+        candidates = [_candidate(f"bulk-{i}", 1, business_type=f"T{i}", offset=i) for i in range(5)]
+        candidates.append(_candidate("single", 2, offset=10))
+
+        ordered = [job["id"] for job in scheduler.order(candidates, {}, {})]
+        assert ordered[:2] == ["bulk-0", "single"]
+
+    def test_weights_and_priorities(self):
+        """测试交互任务优先于批量任务，项目权重决定名额比例。"""
+        scheduler = FairShareScheduler(project_weights={1: 2.0})
+        candidates = [_candidate("bulk", 3, priority="bulk")]
+        candidates += [_candidate(f"p1-{i}", 1, business_type=f"A{i}", offset=i) for i in range(4)]
+        candidates += [_candidate(f"p2-{i}", 2, business_type=f"B{i}", offset=i) for i in range(2)]
+
+        ordered = [job["id"] for job in scheduler.order(candidates, {}, {})]
+        assert ordered[-1] == "bulk"
+        assert ordered[:6] == ["p1-0", "p2-0", "p1-1", "p2-1", "p1-2", "p1-3"]
+
+    def test_business_type_limit(self):
+        """测试业务类型达到并发上限后其任务不再被调度。"""
+        scheduler = FairShareScheduler(business_type_limit=1)
+        candidates = [_candidate("rcc-1", 1), _candidate("rcc-2", 2, offset=1), _candidate("rfd", 1, "RFD", offset=2)]
+
+        assert [job["id"] for job in scheduler.order(candidates, {}, {})] == ["rcc-1", "rfd"]
+        assert [job["id"] for job in scheduler.order(candidates, {}, {"RCC": 1})] == ["rfd"]
+        ordered = scheduler.order(candidates, {}, {"RCC": 1}, include_capped=True)
+        assert [job["id"] for job in ordered] == ["rfd", "rcc-2", "rcc-1"]
+
+
+class TestScheduledJobQueue:
+    """按调度顺序领取任务的测试类。"""
+
+    def test_claim_follows_fair_share_order(self, db_manager, enqueue_job):
+        """测试领取顺序：其他项目的单个任务排在大批量任务之前。"""
+        queue = GenerationJobQueue(db_manager, scheduler=FairShareScheduler(business_type_limit=2))
+        for index in range(4):
+            enqueue_job(f"bulk-{index}", created_offset=index)
+        enqueue_job("other-project", created_offset=10)
+        with db_manager.get_session() as db:
+            db.query(GenerationJob).filter(GenerationJob.id == "other-project").update(
+                {GenerationJob.project_id: 2, GenerationJob.business_type: "RFD"}
+            )
+            db.commit()
+
+        assert queue.claim("w")["task_id"] == "bulk-0"
+        assert queue.claim("w")["task_id"] == "other-project"
+        assert queue.claim("w")["task_id"] == "bulk-1"
+        # RCC已有2个任务运行，达到业务类型并发上限
+        assert queue.claim("w") is None
+
+    def test_admission_estimate(self, db_manager, enqueue_job):
+        """测试排队任务的开始时间估算。"""
+        queue = GenerationJobQueue(db_manager, capacity=1)
+        for index in range(3):
+            enqueue_job(f"job-{index}", created_offset=index)
+        queue.claim("w")
+
+        estimate = queue.admission_estimate("job-2")
+        assert estimate["queue_position"] == 2
+        assert estimate["jobs_ahead"] == 1
+        assert estimate["estimated_start_seconds"] == 2 * estimate["average_job_seconds"]
+        assert queue.admission_estimate("job-0") is None
@@ -0,0 +1,183 @@
+"""
+Test batched test case generation.
+"""
+
+import sys
+import os
+import asyncio
+import json
+
+# Add project root to path for testing
+project_root = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, project_root)
+
+from src.core.test_case_generator import TestCaseGenerator
+from src.database.models import UnifiedTestCase, UnifiedTestCaseStage
+from src.llm.structured_output import TEST_CASES, GeneratedTestCases, output_schema
+from src.llm.token_budget import TokenBudgeter
+from src.services.generation_checkpoints import JobCheckpoints, STAGE_PROMPTS
+from src.utils.config import Config
+from tests.utils import create_test_points
+
+
+def test_split_respects_size_and_token_budget():
+    """Test that batches are bounded by size and estimated tokens and keep order."""
+    points = create_test_points(40)
+    batches = TestCaseGenerator.split_test_point_batches(points, max_batch_size=15, token_budget=100000)
+    assert [len(b) for b in batches] == [15, 15, 10]
+    assert [tp["id"] for b in batches for tp in b] == list(range(1, 41))
+
+    per_point = TestCaseGenerator._estimate_case_output_tokens(points[0])
+    batches = TestCaseGenerator.split_test_point_batches(points, max_batch_size=100, token_budget=per_point * 4)
+    assert all(len(b) <= 4 for b in batches)
+
+
+def test_batches_run_concurrently_and_merge(test_case_generator, monkeypatch):
+    """Test that batches run under the concurrency limit and results are merged in order."""
+    monkeypatch.setenv('TEST_CASE_BATCH_SIZE', '5')
+    monkeypatch.setenv('TEST_CASE_BATCH_CONCURRENCY', '2')
+
+    state = {"running": 0, "peak": 0}
+    progress = []
+
+    async def fake_generate(business_type, test_points_data, additional_context=None, save_to_db=False,
+                            project_id=None, test_point_ids=None, ai_logger=None, on_item=None,
+                            use_cache=True, checkpoints=None, batch_index=0):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(0.01)
+        state["running"] -= 1
+        if test_point_ids == [6, 7, 8, 9, 10]:
+            return None  # simulate a failed batch
+        return {"test_cases": [{"name": f"用例{i}"} for i in test_point_ids]}
+
+    monkeypatch.setattr(test_case_generator, "agenerate_test_cases_from_external_points", fake_generate)
+
+    def on_batch_complete(completed, total, batch_index, cases_count):
+        progress.append((completed, total))
+
+    result = asyncio.run(test_case_generator.agenerate_test_cases_in_batches(
+        "RCC", {"test_points": create_test_points(12)}, on_batch_complete=on_batch_complete
+    ))
+
+    assert state["peak"] == 2
+    assert [c["test_point_id"] for c in result["test_cases"]] == [1, 2, 3, 4, 5, 11, 12]
+    assert result["generation_metadata"]["failed_batches"] == [1]
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_only_lost_cases_are_regenerated(test_case_generator, monkeypatch):
+    """Test that a salvaged batch regenerates only the test points whose cases were lost."""
+    monkeypatch.setenv('TEST_CASE_BATCH_SIZE', '5')
+    calls = []
+
+    async def fake_generate(business_type, test_points_data, additional_context=None, save_to_db=False,
+                            project_id=None, test_point_ids=None, ai_logger=None, on_item=None,
+                            use_cache=True, checkpoints=None, batch_index=0):
+        calls.append(test_point_ids)
+        if test_point_ids == [1, 2, 3, 4, 5]:
+            # 第2个元素无法解析，第5个元素被截断
+            return {
+                "test_cases": [{"name": "用例1"}, {"name": "用例3"}, {"name": "用例4"}],
+                "generation_metadata": {"salvage": {
+                    "positions": {"test_cases": [0, 2, 3]},
+                    "lost_indices": {"test_cases": [1, 4]},
+                    "truncated": True
+                }}
+            }
+        return {"test_cases": [{"name": f"用例{i}"} for i in test_point_ids]}
+
+    monkeypatch.setattr(test_case_generator, "agenerate_test_cases_from_external_points", fake_generate)
+    result = asyncio.run(test_case_generator.agenerate_test_cases_in_batches(
+        "RCC", {"test_points": create_test_points(7)}
+    ))
+
+    assert sorted(calls) == [[1, 2, 3, 4, 5], [2, 5], [6, 7]]
+    assert [c["test_point_id"] for c in result["test_cases"]] == [1, 2, 3, 4, 5, 6, 7]
+    assert [c["name"] for c in result["test_cases"]][:5] == ["用例1", "用例2", "用例3", "用例4", "用例5"]
+
+
+
+def test_failed_batch_points_are_not_overwritten(db_manager, test_case_generator, monkeypatch):
+    """Test that saving merged batches maps cases by test_point_id and leaves a failed batch's points untouched."""
+    monkeypatch.setenv('TEST_CASE_BATCH_SIZE', '5')
+    points = create_test_points(7)
+    _seed_test_points(db_manager, points)
+
+    async def fake_generate(business_type, test_points_data, additional_context=None, save_to_db=False,
+                            project_id=None, test_point_ids=None, ai_logger=None, on_item=None,
+                            use_cache=True, checkpoints=None, batch_index=0):
+        if test_point_ids == [1, 2, 3, 4, 5]:
+            return None
+        return {"test_cases": [{"name": f"用例{i}", "steps": [f"步骤{i}"]} for i in test_point_ids]}
+
+    monkeypatch.setattr(test_case_generator, "agenerate_test_cases_from_external_points", fake_generate)
+    result = asyncio.run(test_case_generator.agenerate_test_cases_in_batches(
+        "RCC", {"test_points": points}, save_to_db=True, project_id=1, test_point_ids=list(range(1, 8))
+    ))
+
+    assert result["generation_metadata"]["failed_batches"] == [0]
+    with db_manager.get_session() as db:
+        rows = {row.id: row for row in db.query(UnifiedTestCase).all()}
+        assert all(rows[i].steps is None and rows[i].stage == UnifiedTestCaseStage.TEST_POINT for i in range(1, 6))
+        assert [rows[i].steps for i in (6, 7)] == ['["步骤6"]', '["步骤7"]']
+        assert all(rows[i].stage == UnifiedTestCaseStage.TEST_CASE for i in (6, 7))
+
+
+
+def _seed_test_points(db_manager, points):
+    with db_manager.get_session() as db:
+        db.add_all([
+            UnifiedTestCase(id=tp["id"], project_id=1, business_type="RCC", test_case_id=f"TP{tp['id']:03d}",
+                            name=tp["title"], description=tp["description"])
+            for tp in points
+        ])
+        db.commit()
+
+
+class _SchemaLLMClient:
+    """Answers with schema-shaped test cases in reverse order of the prompt's test points."""
+
+    def __init__(self, config):
+        self.token_budgeter = TokenBudgeter(config)
+
+    async def agenerate_test_cases(self, system_prompt, user_prompt, output_schema=None, **kwargs):
+        assert output_schema == TEST_CASES
+        response = GeneratedTestCases(test_cases=[{
+            "test_point_id": point_id, "test_case_id": f"TC{point_id:03d}", "name": f"用例{point_id}",
+            "steps": [{"step": 1, "action": f"步骤{point_id}", "expected": "成功"}], "expected_result": ["成功"]
+        } for point_id in reversed(json.loads(user_prompt))])
+        return response.model_dump_json()
+
+
+def test_schema_shaped_cases_map_to_their_test_points(db_manager, prompt_builder, monkeypatch):
+    """Test that structured output cases are matched to test points by test_point_id, not by position."""
+    monkeypatch.setenv('TEST_CASE_BATCH_SIZE', '5')
+    schema = output_schema(TEST_CASES)
+    case_schema = schema["$defs"]["GeneratedTestCase"]
+    assert "test_point_id" in case_schema["required"]
+    assert case_schema["properties"]["test_point_id"]["type"] == "integer"
+
+    points = create_test_points(7)
+    _seed_test_points(db_manager, points)
+    checkpoints = JobCheckpoints(db_manager, "job-1")
+    for batch_index, batch_ids in enumerate([[1, 2, 3, 4, 5], [6, 7]]):
+        checkpoints.save(STAGE_PROMPTS, ["系统", "系统", json.dumps(batch_ids), None], batch_index=batch_index)
+    generator = TestCaseGenerator(Config(), llm_client=_SchemaLLMClient(Config()), prompt_builder=prompt_builder,
+                                  db_manager=db_manager)
+
+    result = asyncio.run(generator.agenerate_test_cases_in_batches(
+        "RCC", {"test_points": points}, save_to_db=True, project_id=1, test_point_ids=list(range(1, 8)),
+        checkpoints=checkpoints
+    ))
+
+    assert sorted(case["test_point_id"] for case in result["test_cases"]) == list(range(1, 8))
+    with db_manager.get_session() as db:
+        for row in db.query(UnifiedTestCase).all():
+            assert row.stage == UnifiedTestCaseStage.TEST_CASE
+            assert json.loads(row.steps)[0]["action"] == f"步骤{row.id}"
+
+
+if __name__ == "__main__":
+    test_split_respects_size_and_token_budget()
+    print("All batched generation tests passed!")
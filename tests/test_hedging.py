@@ -0,0 +1,137 @@
+"""
+Test hedged LLM requests.
+"""
+
+import sys
+import os
+import asyncio
+import json
+import time
+
+import httpx
+
+# Add project root to path for testing
+project_root = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, project_root)
+
+from src.llm.hedging import HedgeTracker
+from tests.test_llm_client import _completion_body
+from tests.test_llm_router import _make_routed_client
+
+
+def _server(content, delay, calls, name):
+    """Fake OpenAI-compatible server answering after delay seconds."""
+    async def handler(request):
+        calls.append(name)
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json=_completion_body(content))
+    return handler
+
+
+def _hedging_client(servers):
+    llm_client, bind = _make_routed_client(servers)
+    llm_client.hedge_tracker = HedgeTracker(min_delay=0.05, default_delay=0.05)
+    return llm_client, bind
+
+
+def test_hedge_delay_uses_percentile_after_enough_samples():
+    """Test the hedge delay falls back to the default until samples exist."""
+    tracker = HedgeTracker(percentile=90, min_delay=0.5, default_delay=30, min_samples=10)
+    assert tracker.hedge_delay('completion') == 30
+    for seconds in range(1, 11):
+        tracker.record_latency('completion', float(seconds))
+    assert tracker.hedge_delay('completion') == 9.0
+    assert tracker.hedge_delay('first_token') == 30
+
+
+def test_slow_request_is_hedged_to_other_endpoint():
+    """Test a slow first request is duplicated and the faster result is used."""
+    calls = []
+    llm_client, bind = _hedging_client([
+        ('slow', _server('{"served_by": "slow"}', 2.0, calls, 'slow')),
+        ('fast', _server('{"served_by": "fast"}', 0.0, calls, 'fast'))
+    ])
+
+    async def run():
+        bind()
+        start = time.monotonic()
+        result = await llm_client.agenerate_test_cases("system", "user")
+        return json.loads(result), time.monotonic() - start
+
+    result, elapsed = asyncio.run(run())
+    assert result == {"served_by": "fast"}
+    assert calls == ['slow', 'fast']
+    assert elapsed < 1.5
+    stats = llm_client.hedge_tracker.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    assert stats["wasted_tokens"] > 0
+
+
+def test_fast_request_is_not_hedged():
+    """Test no duplicate is sent when the first request finishes in time."""
+    calls = []
+    llm_client, bind = _hedging_client([
+        ('primary', _server('{"ok": true}', 0.0, calls, 'primary')),
+        ('backup', _server('{"ok": true}', 0.0, calls, 'backup'))
+    ])
+
+    async def run():
+        bind()
+        return await llm_client.agenerate_test_cases("system", "user")
+
+    assert json.loads(asyncio.run(run())) == {"ok": True}
+    assert calls == ['primary']
+    stats = llm_client.hedge_tracker.stats()
+    assert stats["hedged"] == 0 and stats["samples"]["completion"] == 1
+
+
+def test_invalid_hedge_result_waits_for_valid_one():
+    """Test a faster but non-JSON result does not win over a valid one."""
+    calls = []
+    llm_client, bind = _hedging_client([
+        ('primary', _server('{"served_by": "primary"}', 0.3, calls, 'primary')),
+        ('backup', _server('no json here', 0.0, calls, 'backup'))
+    ])
+
+    async def run():
+        bind()
+        return await llm_client.agenerate_test_cases("system", "user")
+
+    assert json.loads(asyncio.run(run())) == {"served_by": "primary"}
+    assert llm_client.hedge_tracker.stats()["hedge_wins"] == 0
+
+
+def test_stream_is_hedged_on_first_token():
+    """Test a stream without a first chunk in time is raced against a duplicate."""
+    text = json.dumps({"test_points": [{"title": "a"}]})
+
+    def stream_server(delay, calls, name):
+        async def handler(request):
+            calls.append(name)
+            await asyncio.sleep(delay)
+            chunk = {
+                "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": "m",
+                "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": "stop"}]
+            }
+            body = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n"
+            return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+        return handler
+
+    calls = []
+    llm_client, bind = _hedging_client([
+        ('slow', stream_server(2.0, calls, 'slow')),
+        ('fast', stream_server(0.0, calls, 'fast'))
+    ])
+    received = []
+
+    async def run():
+        bind()
+        return await llm_client.astream_test_cases(
+            "system", "user", on_item=lambda key, index, item: received.append(item["title"])
+        )
+
+    start = time.monotonic()
+    assert asyncio.run(run()) == text
+    assert time.monotonic() - start < 1.5
+    assert received == ["a"]
+    assert llm_client.hedge_tracker.stats()["samples"]["first_token"] == 1
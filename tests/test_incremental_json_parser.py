@@ -0,0 +1,66 @@
+"""
+Test incremental JSON array parser for streaming responses.
+"""
+
+import sys
+import os
+import json
+
+# Add project root to path for testing
+project_root = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, project_root)
+
+from src.core.incremental_json_parser import IncrementalJSONArrayParser
+
+
+RESPONSE = '```json\n' + json.dumps({
+    "test_points": [
+        {"test_point_id": "TP001", "title": "打开空调", "description": "包含 \"引号\" 和 {括号}"},
+        {"test_point_id": "TP002", "title": "关闭空调", "steps": [{"step": 1}]}
+    ],
+    "meta": {"test_cases": "not an array"}
+}, ensure_ascii=False) + '\n```'
+
+
+def _feed_in_chunks(parser, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return items
+
+
+def test_emits_each_item_when_it_closes():
+    """Test that every array element is emitted once, regardless of chunk size."""
+    for size in (1, 3, 7, len(RESPONSE)):
+        parser = IncrementalJSONArrayParser()
+        items = _feed_in_chunks(parser, RESPONSE, size)
+        assert [(key, index) for key, index, _ in items] == [("test_points", 0), ("test_points", 1)]
+        assert items[0][2]["description"] == '包含 "引号" 和 {括号}'
+        assert items[1][2]["steps"] == [{"step": 1}]
+        assert parser.text == RESPONSE
+
+
+def test_item_available_before_response_finishes():
+    """Test that the first item is emitted before the array is closed."""
+    parser = IncrementalJSONArrayParser()
+    cut = RESPONSE.index('{"test_point_id": "TP002"')
+    items = parser.feed(RESPONSE[:cut])
+    assert len(items) == 1
+    assert items[0][2]["test_point_id"] == "TP001"
+
+
+def test_ignores_other_arrays():
+    """Test that only the configured array keys are emitted."""
+    parser = IncrementalJSONArrayParser(item_keys=('test_cases',))
+    assert parser.feed(RESPONSE) == []
+
+    parser = IncrementalJSONArrayParser(item_keys=('test_cases',))
+    items = parser.feed('{"test_cases": [{"name": "a", "steps": [{"x": 1}]}]}')
+    assert items == [("test_cases", 0, {"name": "a", "steps": [{"x": 1}]})]
+
+
+if __name__ == "__main__":
+    test_emits_each_item_when_it_closes()
+    test_item_available_before_response_finishes()
+    test_ignores_other_arrays()
+    print("All incremental JSON parser tests passed!")
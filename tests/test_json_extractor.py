@@ -69,6 +69,31 @@ def test_extract_test_cases_from_json():
     print("Test cases extraction test passed")
 
 
+def test_repaired_cases_keep_test_point_id():
+    """Test that validation and repair keep the test point each case belongs to."""
+    json_data = {"test_cases": [{"test_point_id": 7, "name": "Test 7"}, {"name": "Test 8"}]}
+    cases = JSONExtractor.extract_test_cases_from_json(json_data)
+    assert cases[0]["test_point_id"] == 7 and cases[0]["name"] == "Test 7"
+    assert "test_point_id" not in cases[1]
+
+
+def test_salvage_truncated_and_malformed_items():
+    """Test that complete items survive a malformed item and a truncated tail."""
+    items = [{"name": f"case-{i}", "steps": [{"step": 1}]} for i in range(4)]
+    text = "```json\n" + json.dumps({"test_cases": items}, ensure_ascii=False)
+    text = text.replace('"name": "case-1"', '"name": "case-1" "oops": 1')
+    text = text[:text.index('"case-3"') + 4]
+
+    result = JSONExtractor.extract_json_from_response(text)
+    assert [case["name"] for case in result["test_cases"]] == ["case-0", "case-2"]
+    assert result["salvage"] == {
+        "positions": {"test_cases": [0, 2]},
+        "lost_indices": {"test_cases": [1, 3]},
+        "truncated": True
+    }
+
+    assert JSONExtractor.salvage_array_items('{"test_cases": [{"name": ') is None
+
 if __name__ == "__main__":
     test_extract_json_from_response()
     test_validate_json_structure()
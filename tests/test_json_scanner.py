@@ -0,0 +1,56 @@
+"""
+Test the single-pass JSON candidate scanner.
+"""
+
+import sys
+import os
+import json
+import time
+
+# Add project root to path for testing
+project_root = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, project_root)
+
+from src.core.json_scanner import find_json_candidate, load_json_candidate, scan_json_candidates
+
+
+def test_finds_object_behind_prose_and_fences():
+    """Test that prose braces, strings with braces and escaped quotes do not confuse the scanner."""
+    text = '说明 {参数} 如下\n```json\n{"a": "b}\\"{", "c": [1, {"d": 2}]}\n```\n完毕'
+    candidates = scan_json_candidates(text)
+    assert [c.complete for c in candidates] == [True, True]
+    candidate, complete = find_json_candidate(text)
+    assert complete and json.loads(candidate) == {"a": 'b}"{', "c": [1, {"d": 2}]}
+
+
+def test_unpaired_prose_brace_is_reset_at_fence():
+    """Test that an unclosed brace in prose is dropped when a code fence starts."""
+    text = '使用 { 开始\n```json\n{"test_points": []}\n```'
+    data, candidate, complete = load_json_candidate(text)
+    assert data == {"test_points": []}
+    assert complete
+
+
+def test_truncated_object_is_returned_incomplete():
+    """Test that a truncated response yields an incomplete candidate and no data."""
+    text = '```json\n{"test_cases": [{"name": "a"}, {"name": "b'
+    data, candidate, complete = load_json_candidate(text)
+    assert data is None and not complete
+    assert candidate.startswith('{"test_cases"')
+    assert load_json_candidate("没有JSON") == (None, None, False)
+
+
+def test_unbalanced_braces_scan_linearly():
+    """Test that text full of unclosed braces is scanned quickly (the old regexes were quadratic)."""
+    text = "if (ready) { 未闭合 " * 20000
+    started = time.perf_counter()
+    assert load_json_candidate(text)[0] is None
+    assert time.perf_counter() - started < 1.0
+
+
+if __name__ == "__main__":
+    test_finds_object_behind_prose_and_fences()
+    test_unpaired_prose_brace_is_reset_at_fence()
+    test_truncated_object_is_returned_incomplete()
+    test_unbalanced_braces_scan_linearly()
+    print("All JSON scanner tests passed!")
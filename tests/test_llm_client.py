@@ -0,0 +1,374 @@
+"""
+Test async LLM client functionality.
+"""
+
+import sys
+import os
+import asyncio
+import json
+
+import httpx
+import openai
+
+# Add project root to path for testing
+project_root = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, project_root)
+
+from src.utils.config import Config
+from src.llm.llm_client import LLMClient, get_shared_async_http_client
+from src.llm.response_cache import LLMResponseCache
+from src.llm.router import LLMEndpoint, LLMRouter
+
+
+def _completion_body(content, finish_reason="stop"):
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "test-model",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": finish_reason
+        }],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    }
+
+
+def _make_client(handler):
+    """Create an LLMClient whose async client talks to a mock transport."""
+    os.environ.setdefault('API_KEY', 'test-key')
+    llm_client = LLMClient(Config())
+    llm_client.default_base_delay = 0.01
+    endpoint = LLMEndpoint('test', 'http://llm.test/v1', 'test-key', 'test-model')
+    llm_client.router = LLMRouter([endpoint])
+
+    def bind_to_running_loop():
+        loop = asyncio.get_running_loop()
+        endpoint._async_clients[loop] = openai.AsyncOpenAI(
+            api_key='test-key',
+            base_url='http://llm.test/v1',
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            max_retries=0
+        )
+
+    return llm_client, bind_to_running_loop
+
+
+def test_agenerate_test_cases_returns_content():
+    """Test that the async client returns the completion content."""
+    def handler(request):
+        payload = json.loads(request.content)
+        assert payload["messages"][0]["content"] == "resolved system"
+        return httpx.Response(200, json=_completion_body('{"test_cases": []}'))
+
+    llm_client, bind = _make_client(handler)
+
+    async def run():
+        bind()
+        return await llm_client.agenerate_test_cases(
+            "system", "user",
+            resolved_system_prompt="resolved system",
+            resolved_requirements_prompt="resolved user"
+        )
+
+    assert asyncio.run(run()) == '{"test_cases": []}'
+
+
+def test_agenerate_test_cases_retries_server_errors():
+    """Test that retryable errors are retried with async backoff."""
+    calls = {"count": 0}
+
+    def handler(request):
+        calls["count"] += 1
+        if calls["count"] == 1:
+            return httpx.Response(500, json={"error": {"message": "server error"}})
+        return httpx.Response(200, json=_completion_body("ok"))
+
+    llm_client, bind = _make_client(handler)
+
+    async def run():
+        bind()
+        return await llm_client.agenerate_test_cases("system", "user", max_retries=2)
+
+    assert asyncio.run(run()) == "ok"
+    assert calls["count"] == 2
+
+
+def test_concurrent_calls_do_not_block_event_loop():
+    """Test that several in-flight calls overlap instead of running serially."""
+    async def slow_handler(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json=_completion_body("ok"))
+
+    llm_client, bind = _make_client(slow_handler)
+
+    async def run():
+        bind()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await asyncio.gather(*[
+            llm_client.agenerate_test_cases("system", "user") for _ in range(10)
+        ])
+        return results, loop.time() - start
+
+    results, elapsed = asyncio.run(run())
+    assert results == ["ok"] * 10
+    assert elapsed < 1.0
+
+
+def test_shared_http_client_is_reused_within_loop():
+    """Test that the pooled httpx client is shared per event loop."""
+    config = Config()
+
+    async def run():
+        first = get_shared_async_http_client(config)
+        second = get_shared_async_http_client(config)
+        await first.aclose()
+        return first is second
+
+    assert asyncio.run(run())
+
+
+def test_astream_test_cases_emits_items_while_streaming():
+    """Test that streamed array elements are passed to on_item as they complete."""
+    text = json.dumps({"test_points": [{"title": "a"}, {"title": "b"}]})
+    pieces = [text[i:i + 5] for i in range(0, len(text), 5)]
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        lines = []
+        for piece in pieces:
+            chunk = {
+                "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": "test-model",
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+            }
+            lines.append(f"data: {json.dumps(chunk)}\n\n")
+        lines.append("data: [DONE]\n\n")
+        return httpx.Response(200, content="".join(lines).encode(),
+                              headers={"content-type": "text/event-stream"})
+
+    llm_client, bind = _make_client(handler)
+    received = []
+
+    async def on_item(key, index, item):
+        received.append((key, index, item["title"]))
+
+    async def run():
+        bind()
+        return await llm_client.astream_test_cases("system", "user", on_item=on_item)
+
+    assert asyncio.run(run()) == text
+    assert received == [("test_points", 0, "a"), ("test_points", 1, "b")]
+
+
+def test_cached_response_skips_llm_call(tmp_path):
+    """Test that an identical request is served from the cache unless bypassed."""
+    calls = {"count": 0}
+
+    def handler(request):
+        calls["count"] += 1
+        return httpx.Response(200, json=_completion_body(body))
+
+    body = '{"test_cases": []}'
+    llm_client, bind = _make_client(handler)
+    llm_client.response_cache = LLMResponseCache(str(tmp_path), ttl_seconds=60, max_bytes=1024 * 1024)
+
+    async def run():
+        bind()
+        first = await llm_client.agenerate_test_cases("system", "user")
+        second = await llm_client.agenerate_test_cases("system", "user")
+        bypassed = await llm_client.agenerate_test_cases("system", "user", use_cache=False)
+        return first, second, bypassed
+
+    assert asyncio.run(run()) == (body, body, body)
+    assert calls["count"] == 2
+    assert llm_client.response_cache.hits == 1
+
+
+def test_unextractable_response_is_not_cached(tmp_path):
+    """Test that a response without extractable JSON is not cached, so the next identical request calls the LLM."""
+    calls = {"count": 0}
+
+    def handler(request):
+        calls["count"] += 1
+        return httpx.Response(200, json=_completion_body("抱歉，无法生成测试用例"))
+
+    llm_client, bind = _make_client(handler)
+    llm_client.response_cache = LLMResponseCache(str(tmp_path), ttl_seconds=60, max_bytes=1024 * 1024)
+
+    async def run():
+        bind()
+        await llm_client.agenerate_test_cases("system", "user")
+        await llm_client.agenerate_test_cases("system", "user")
+
+    asyncio.run(run())
+    assert calls["count"] == 2
+    assert llm_client.response_cache.stats()["entries"] == 0
+
+
+
+def test_cache_is_keyed_by_the_serving_endpoint_model(tmp_path):
+    """Test that a response cached for one endpoint's model is not served for an endpoint with another model."""
+    models = []
+
+    def handler(request):
+        models.append(json.loads(request.content)["model"])
+        return httpx.Response(200, json=_completion_body('{"test_cases": []}'))
+
+    llm_client, bind = _make_client(handler)
+    llm_client.response_cache = LLMResponseCache(str(tmp_path), ttl_seconds=60, max_bytes=1024 * 1024)
+    other = LLMEndpoint('other', 'http://llm.test/v1', 'test-key', 'other-model')
+
+    async def run():
+        bind()
+        await llm_client.agenerate_test_cases("system", "user")
+        await llm_client.agenerate_test_cases("system", "user")
+        llm_client.router = LLMRouter([other])
+        other._async_clients[asyncio.get_running_loop()] = openai.AsyncOpenAI(
+            api_key='test-key', base_url='http://llm.test/v1',
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), max_retries=0
+        )
+        await llm_client.agenerate_test_cases("system", "user")
+
+    asyncio.run(run())
+    assert models == ["test-model", "other-model"]
+    entries = [json.loads(path.read_text(encoding="utf-8")) for path in tmp_path.glob("*.json")]
+    assert sorted(entry["model"] for entry in entries) == ["other-model", "test-model"]
+
+
+def test_truncated_completion_is_continued():
+    """Test that a completion cut off by max_tokens is continued and stitched together."""
+    text = json.dumps({"test_cases": [{"name": "case-%d" % i} for i in range(6)]})
+    first, second = text[:50], "```json\n" + text[30:]
+    requests = []
+
+    def handler(request):
+        payload = json.loads(request.content)
+        requests.append(payload["messages"])
+        if len(requests) == 1:
+            return httpx.Response(200, json=_completion_body(first, finish_reason="length"))
+        return httpx.Response(200, json=_completion_body(second))
+
+    llm_client, bind = _make_client(handler)
+
+    async def run():
+        bind()
+        return await llm_client.agenerate_test_cases("system", "user")
+
+    assert asyncio.run(run()) == text
+    assert len(requests) == 2
+    assert requests[1][2] == {"role": "assistant", "content": first}
+    assert requests[1][3]["role"] == "user"
+
+
+def test_streamed_truncation_emits_remaining_items():
+    """Test that items completed by a continuation are still passed to on_item."""
+    text = json.dumps({"test_points": [{"title": "a"}, {"title": "b"}, {"title": "c"}]})
+    cut = text.index('{"title": "b"}') + 5
+
+    def handler(request):
+        payload = json.loads(request.content)
+        if not payload.get("stream"):
+            return httpx.Response(200, json=_completion_body(text[cut:]))
+        chunk = {
+            "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": "test-model",
+            "choices": [{"index": 0, "delta": {"content": text[:cut]}, "finish_reason": "length"}]
+        }
+        return httpx.Response(200, content=f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode(),
+                              headers={"content-type": "text/event-stream"})
+
+    llm_client, bind = _make_client(handler)
+    received = []
+
+    async def run():
+        bind()
+        return await llm_client.astream_test_cases(
+            "system", "user", on_item=lambda key, index, item: received.append(item["title"])
+        )
+
+    assert asyncio.run(run()) == text
+    assert received == ["a", "b", "c"]
+
+
+def test_continuation_stops_at_round_limit(monkeypatch):
+    """Test that continuation requests are capped by LLM_MAX_CONTINUATIONS."""
+    monkeypatch.setenv("LLM_MAX_CONTINUATIONS", "2")
+    calls = {"count": 0}
+
+    def handler(request):
+        calls["count"] += 1
+        return httpx.Response(200, json=_completion_body("part-%d;" % calls["count"], finish_reason="length"))
+
+    llm_client, bind = _make_client(handler)
+
+    async def run():
+        bind()
+        return await llm_client.agenerate_test_cases("system", "user")
+
+    assert asyncio.run(run()) == "part-1;part-2;part-3;"
+    assert calls["count"] == 3
+
+if __name__ == "__main__":
+    test_agenerate_test_cases_returns_content()
+    test_agenerate_test_cases_retries_server_errors()
+    test_concurrent_calls_do_not_block_event_loop()
+    test_shared_http_client_is_reused_within_loop()
+    test_astream_test_cases_emits_items_while_streaming()
+    print("All LLM client tests passed!")
+
+
+def test_structured_output_returns_tool_call_arguments(monkeypatch):
+    """Test that tools mode sends the schema as a forced function call and returns its arguments."""
+    monkeypatch.setenv('LLM_STRUCTURED_OUTPUT', 'tools')
+    arguments = json.dumps({"test_points": [{"test_case_id": "TP001", "name": "登录", "description": "登录成功"}]})
+    requests = []
+
+    def handler(request):
+        payload = json.loads(request.content)
+        requests.append(payload)
+        body = _completion_body(None, finish_reason="tool_calls")
+        body["choices"][0]["message"]["tool_calls"] = [{
+            "id": "call-1", "type": "function",
+            "function": {"name": "submit_test_points", "arguments": arguments}
+        }]
+        return httpx.Response(200, json=body)
+
+    llm_client, bind = _make_client(handler)
+
+    async def run():
+        bind()
+        return await llm_client.agenerate_test_cases("system", "user", output_schema="test_points")
+
+    assert asyncio.run(run()) == arguments
+    function = requests[0]["tools"][0]["function"]
+    assert function["name"] == "submit_test_points"
+    assert "test_points" in function["parameters"]["properties"]
+    assert function["parameters"]["$defs"]["GeneratedTestPoint"]["required"] == ["test_case_id", "name"]
+    assert requests[0]["tool_choice"]["function"]["name"] == "submit_test_points"
+
+
+def test_structured_output_falls_back_when_endpoint_rejects_it(monkeypatch):
+    """Test that a rejected response_format is retried as free-form JSON and not sent to that endpoint again."""
+    monkeypatch.setenv('LLM_STRUCTURED_OUTPUT', 'json_schema')
+    requests = []
+
+    def handler(request):
+        payload = json.loads(request.content)
+        requests.append(payload)
+        if "response_format" in payload:
+            return httpx.Response(400, json={"error": {"message": "response_format is not supported"}})
+        return httpx.Response(200, json=_completion_body('{"test_cases": []}'))
+
+    llm_client, bind = _make_client(handler)
+
+    async def run():
+        bind()
+        first = await llm_client.agenerate_test_cases("system", "user", output_schema="test_cases")
+        second = await llm_client.agenerate_test_cases("system", "user 2", output_schema="test_cases")
+        return first, second
+
+    assert asyncio.run(run()) == ('{"test_cases": []}', '{"test_cases": []}')
+    assert requests[0]["response_format"]["json_schema"]["name"] == "test_cases"
+    assert ["response_format" in payload for payload in requests] == [True, False, False]
+    assert llm_client.router.primary.structured_output is False
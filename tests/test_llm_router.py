@@ -0,0 +1,218 @@
+"""
+Test multi-endpoint LLM routing and circuit breakers.
+"""
+
+import sys
+import os
+import asyncio
+import json
+import time
+
+import httpx
+import openai
+
+# Add project root to path for testing
+project_root = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, project_root)
+
+from src.utils.config import Config
+from src.llm.llm_client import LLMClient
+from src.llm.router import LLMEndpoint, LLMRouter, CIRCUIT_OPEN, CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN
+from tests.test_llm_client import _completion_body
+
+
+def _fake_server(status, calls, name):
+    """Local fake OpenAI-compatible server answering every request with status."""
+    def handler(request):
+        calls.append(name)
+        payload = json.loads(request.content)
+        if status != 200:
+            return httpx.Response(status, json={"error": {"message": f"{name} failed"}})
+        return httpx.Response(200, json=_completion_body(f'{{"served_by": "{name}", "model": "{payload["model"]}"}}'))
+    return handler
+
+
+def _make_routed_client(servers, failure_threshold=2, cooldown_seconds=30.0):
+    os.environ.setdefault('API_KEY', 'test-key')
+    llm_client = LLMClient(Config())
+    llm_client.default_base_delay = 0.01
+    endpoints = [LLMEndpoint(name, f'http://{name}.test/v1', 'test-key', f'{name}-model') for name, _ in servers]
+    llm_client.router = LLMRouter(endpoints, failure_threshold=failure_threshold, cooldown_seconds=cooldown_seconds)
+
+    def bind_to_running_loop():
+        loop = asyncio.get_running_loop()
+        for endpoint, (_, handler) in zip(endpoints, servers):
+            endpoint._async_clients[loop] = openai.AsyncOpenAI(
+                api_key='test-key',
+                base_url=endpoint.base_url,
+                http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+                max_retries=0
+            )
+
+    return llm_client, bind_to_running_loop
+
+
+def test_fails_over_to_healthy_endpoint():
+    """Test a failing endpoint is skipped on retry without backoff and its model is used."""
+    calls = []
+    llm_client, bind = _make_routed_client([
+        ('primary', _fake_server(503, calls, 'primary')),
+        ('backup', _fake_server(200, calls, 'backup'))
+    ])
+    llm_client.default_base_delay = 5.0
+
+    async def run():
+        bind()
+        start = time.monotonic()
+        result = await llm_client.agenerate_test_cases("system", "user")
+        return json.loads(result), time.monotonic() - start
+
+    result, elapsed = asyncio.run(run())
+    assert result == {"served_by": "backup", "model": "backup-model"}
+    assert calls == ['primary', 'backup']
+    assert elapsed < 2.0
+    primary = llm_client.router.endpoints[0]
+    assert primary.consecutive_failures == 1 and primary.error_rate == 1.0
+
+
+def test_circuit_opens_and_recovers_after_cooldown():
+    """Test an endpoint is bypassed while its circuit is open and retried after cooldown."""
+    calls = []
+    primary_status = {"value": 503}
+
+    def primary(request):
+        calls.append('primary')
+        if primary_status["value"] != 200:
+            return httpx.Response(primary_status["value"], json={"error": {"message": "down"}})
+        return httpx.Response(200, json=_completion_body('{"served_by": "primary"}'))
+
+    llm_client, bind = _make_routed_client([
+        ('primary', primary),
+        ('backup', _fake_server(200, calls, 'backup'))
+    ], failure_threshold=2, cooldown_seconds=0.2)
+    router = llm_client.router
+    # Make the primary look fastest so only its circuit keeps traffic away
+    router.endpoints[1].latencies.append(1.0)
+    router.endpoints[1].outcomes.append(True)
+
+    async def run():
+        bind()
+        for _ in range(2):
+            await llm_client.agenerate_test_cases("system", "user")
+        assert router.endpoints[0].state == CIRCUIT_OPEN
+
+        calls.clear()
+        await llm_client.agenerate_test_cases("system", "user")
+        assert calls == ['backup']
+
+        await asyncio.sleep(0.25)
+        primary_status["value"] = 200
+        calls.clear()
+        result = await llm_client.agenerate_test_cases("system", "user")
+        return result
+
+    result = asyncio.run(run())
+    assert json.loads(result) == {"served_by": "primary"}
+    assert calls == ['primary']
+    assert router.endpoints[0].state == CIRCUIT_CLOSED
+
+
+def test_client_errors_do_not_count_against_endpoint():
+    """Test request errors (4xx) neither fail over nor open the circuit."""
+    calls = []
+    llm_client, bind = _make_routed_client([
+        ('primary', _fake_server(400, calls, 'primary')),
+        ('backup', _fake_server(200, calls, 'backup'))
+    ])
+
+    async def run():
+        bind()
+        return await llm_client.agenerate_test_cases("system", "user")
+
+    try:
+        asyncio.run(run())
+    except Exception:
+        pass
+    assert set(calls) == {'primary'}
+    assert llm_client.router.endpoints[0].consecutive_failures == 0
+
+
+def test_select_prefers_lower_latency_and_error_rate():
+    """Test scoring by rolling latency weighted by error rate."""
+    fast = LLMEndpoint('fast', 'http://fast', 'k', 'm')
+    slow = LLMEndpoint('slow', 'http://slow', 'k', 'm')
+    router = LLMRouter([slow, fast])
+    router.record_success(slow, 2.0)
+    router.record_success(fast, 0.5)
+    assert router.select() is fast
+
+    for _ in range(3):
+        fast.outcomes.append(False)
+    assert router.select() is slow
+    assert router.select(exclude=['slow']) is fast
+
+
+def test_endpoints_from_config(monkeypatch):
+    """Test LLM_ENDPOINTS parsing with defaults from API_KEY/MODEL."""
+    monkeypatch.setenv('API_KEY', 'default-key')
+    monkeypatch.setenv('MODEL', 'default-model')
+    monkeypatch.setenv('LLM_ENDPOINTS', json.dumps([
+        {"name": "a", "base_url": "http://a/v1"},
+        {"base_url": "http://b/v1", "model": "other", "api_key": "b-key"},
+        {"name": "missing-url"}
+    ]))
+    endpoints = Config().llm_endpoints
+    assert endpoints == [
+        {"name": "a", "base_url": "http://a/v1", "api_key": "default-key", "model": "default-model"},
+        {"name": "endpoint-2", "base_url": "http://b/v1", "api_key": "b-key", "model": "other"}
+    ]
+
+    monkeypatch.setenv('LLM_ENDPOINTS', 'not json')
+    assert [e["name"] for e in Config().llm_endpoints] == ["default"]
+
+
+def test_cancelled_half_open_trial_is_released():
+    """Test a half-open trial that is cancelled or fails with a request error does not block the endpoint."""
+    started = []
+
+    async def hanging(request):
+        started.append('primary')
+        await asyncio.sleep(30)
+
+    llm_client, bind = _make_routed_client([('primary', hanging)], cooldown_seconds=0.0)
+    router = llm_client.router
+    primary = router.endpoints[0]
+    primary.state = CIRCUIT_OPEN
+    primary.opened_at = time.monotonic() - 1
+
+    async def run():
+        bind()
+        task = asyncio.ensure_future(llm_client.agenerate_test_cases("system", "user"))
+        while not started:
+            await asyncio.sleep(0.01)
+        assert primary.state == CIRCUIT_HALF_OPEN and primary.trial_in_flight
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert not primary.trial_in_flight
+    assert router._is_available(primary, time.monotonic())
+
+    calls = []
+    llm_client, bind = _make_routed_client([('primary', _fake_server(400, calls, 'primary'))], cooldown_seconds=0.0)
+    primary = llm_client.router.endpoints[0]
+    primary.state = CIRCUIT_OPEN
+
+    async def request_error():
+        bind()
+        await llm_client.agenerate_test_cases("system", "user")
+
+    try:
+        asyncio.run(request_error())
+    except Exception:
+        pass
+    assert calls and not primary.trial_in_flight
+    assert llm_client.router.select() is primary
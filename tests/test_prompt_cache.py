@@ -0,0 +1,74 @@
+"""
+两阶段提示词缓存测试。
+"""
+
+from src.database.models import (
+    BusinessTypeConfig, Project, Prompt, PromptCombination, PromptCombinationItem, PromptStatus, PromptType
+)
+from src.utils.prompt_cache import CompiledPrompt, CompiledPromptCache
+
+
+def _seed(db_manager):
+    """创建一个业务类型：测试点阶段组合包含一个系统提示词和一个用户提示词。"""
+    with db_manager.get_session() as db:
+        db.add(Project(id=1, name="默认项目"))
+        db.add_all([
+            Prompt(id=1, project_id=1, name="系统", content="你是测试专家", type=PromptType.SYSTEM,
+                   status=PromptStatus.ACTIVE),
+            Prompt(id=2, project_id=1, name="需求", content="生成{{test_points}}", type=PromptType.TEMPLATE,
+                   status=PromptStatus.ACTIVE),
+            Prompt(id=3, project_id=1, name="其他", content="未使用", type=PromptType.TEMPLATE,
+                   status=PromptStatus.ACTIVE),
+        ])
+        db.add(PromptCombination(id=10, project_id=1, name="RCC测试点", is_active=True, is_valid=True))
+        db.add_all([
+            PromptCombinationItem(combination_id=10, prompt_id=1, order=0, item_type="system_prompt"),
+            PromptCombinationItem(combination_id=10, prompt_id=2, order=1, section_title="需求"),
+        ])
+        db.add(BusinessTypeConfig(id=5, code="RCC", name="远程控制", project_id=1, is_active=True,
+                                  test_point_combination_id=10))
+        db.commit()
+
+
+def _set_content(db_manager, prompt_id, content):
+    with db_manager.get_session() as db:
+        db.query(Prompt).filter(Prompt.id == prompt_id).update({Prompt.content: content})
+        db.commit()
+
+
+class TestCompiledPromptCache:
+    """提示词缓存测试类。"""
+
+    def test_cached_prompts_until_referenced_record_changes(self, db_manager, prompt_builder):
+        """测试命中缓存后不再读取数据库，只有引用的记录变更时才失效。"""
+        _seed(db_manager)
+        builder = prompt_builder
+        cache = builder.prompt_cache
+
+        assert builder.get_two_stage_prompts("RCC", "test_point") == ("你是测试专家", "=== 需求 ===\n生成{{test_points}}")
+        compiled = builder.get_compiled_prompt("RCC", "test_point")
+        assert compiled.prompt_ids == {1, 2} and compiled.combination_id == 10
+        assert cache.stats()["hits"] == 1
+
+        # 数据库变更但没有失效通知时继续使用缓存
+        _set_content(db_manager, 2, "生成测试点")
+        assert builder.get_two_stage_prompts("RCC", "test_point")[1].endswith("{{test_points}}")
+
+        # 未被组合引用的提示词、其他组合和业务类型的变更不影响该条目
+        assert cache.invalidate(prompt_ids=[3], combination_ids=[11], business_config_ids=[6]) == 0
+        assert cache.invalidate(prompt_ids=[2]) == 1
+        refreshed = builder.get_compiled_prompt("RCC", "test_point")
+        assert refreshed.user_prompt == "=== 需求 ===\n生成测试点"
+        assert refreshed.content_hash != compiled.content_hash
+
+        assert cache.invalidate(business_config_ids=[5]) == 1
+        assert builder.warm_prompt_cache() == 1
+        assert cache.stats()["entries"] == 1
+
+    def test_result_assembled_during_invalidation_is_not_stored(self):
+        """测试组装期间发生失效时结果不写入缓存，避免缓存旧内容。"""
+        cache = CompiledPromptCache()
+        generation = cache.generation
+        cache.invalidate(prompt_ids=[1])
+        assert cache.put(CompiledPrompt("RCC", "test_case", "系统", "用户", prompt_ids=[1]), generation) is False
+        assert cache.get("RCC", "test_case") is None
@@ -0,0 +1,60 @@
+"""
+参考数据紧凑编码测试。
+"""
+
+import json
+
+from src.llm.token_budget import TokenBudgeter
+from src.utils.config import Config
+from src.utils.prompt_encoding import encode_reference, hoist_constants
+from src.utils.template_variable_resolver import TemplateVariableResolver
+from tests.utils import create_test_points
+
+
+def _points(count=3):
+    """数据库中测试点的字典形式：编号各不相同，模块等字段取值相同或为空。"""
+    return [
+        dict(point, test_point_id=f"TP{point['id']:03d}")
+        for point in create_test_points(count, module=None, functional_module="车门", business_type="RCC",
+                                        project_id=1, created_at="2025-01-01T00:00:00", updated_at=None)
+    ]
+
+
+class TestPromptEncoding:
+    """紧凑编码测试类。"""
+
+    def test_projection_hoisting_and_table(self):
+        """测试字段投影、共同取值上提、全空字段去除和表格编码。"""
+        shared, rows = hoist_constants([{"a": 1, "b": None, "c": "x"}, {"a": 2, "b": "", "c": "x"}])
+        assert shared == {"c": "x"} and rows == [{"a": 1}, {"a": 2}]
+
+        data = {"warning": "不要重复", "test_points": _points()}
+        fields = ["id", "title", "module", "functional_module"]
+        table = json.loads(encode_reference(data, "test_points", "table", fields))
+        assert table["warning"] == "不要重复"
+        assert table["test_points_shared"] == {"functional_module": "车门"}
+        assert table["test_points"] == {"columns": ["id", "title"],
+                                        "rows": [[1, "测试点1"], [2, "测试点2"], [3, "测试点3"]]}
+
+        minified = encode_reference(data, "test_points", "minified", fields)
+        assert "\n" not in minified and json.loads(minified)["test_points"][0] == {"id": 1, "title": "测试点1"}
+        assert encode_reference(data, "test_points", "json") == json.dumps(data, ensure_ascii=False, indent=2)
+
+    def test_resolver_uses_configured_encoding(self, db_manager, monkeypatch):
+        """测试按阶段字段配置编码 {{test_points}}，裁剪时保持表格的紧凑格式。"""
+        resolver = TemplateVariableResolver(db_manager)
+        endpoint_params = {"test_points": _points()}
+        monkeypatch.setenv("PROMPT_REFERENCE_ENCODING", "table")
+        monkeypatch.setenv("PROMPT_REFERENCE_FIELDS_TEST_POINT", "test_point_id,title")
+
+        value = resolver.resolve_variable("test_points", "RCC", None, endpoint_params, "test_point")
+        indented = json.dumps({"warning": "目前已有这些测试点，不要跟这些测试点内容重复。", "test_points": _points()},
+                              ensure_ascii=False, indent=2)
+        assert len(value) < len(indented) // 3
+        assert json.loads(value)["test_points"]["columns"] == ["test_point_id", "title"]
+
+        value = resolver.resolve_variable("test_points", "RCC", None, {"test_points": _points(20)}, "test_point")
+        budgeter = TokenBudgeter(Config())
+        trimmed, dropped = budgeter._trim_value(value, budgeter.counter.count(value) // 2)
+        assert 0 < dropped < 20 and "\n" not in trimmed
+        assert len(json.loads(trimmed)["test_points"]["rows"]) == 20 - dropped
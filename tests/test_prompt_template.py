@@ -0,0 +1,36 @@
+"""
+编译型提示词模板测试。
+"""
+
+from src.utils.prompt_template import CompiledTemplate, compile_template
+
+
+class TestCompiledTemplate:
+    """提示词模板编译与渲染测试类。"""
+
+    def test_compile_once_and_render_in_one_pass(self):
+        """测试两种空白写法的占位符都被识别，值为 None 或缺失的变量保留原占位符。"""
+        source = "需求：{{user_input}}\n测试点：{{ test_points }}\n再次：{{  user_input}} {{未知 变量}} {{{x}}}"
+        template = compile_template(source)
+        assert compile_template(source) is template
+        assert template.variables == ("user_input", "test_points", "x")
+        assert template.occurrences("user_input") == 2 and template.occurrences("test_cases") == 0
+
+        lookups = []
+
+        def lookup(name):
+            lookups.append(name)
+            return {"user_input": "登录", "x": 1}.get(name)
+
+        assert template.render(lookup) == "需求：登录\n测试点：{{ test_points }}\n再次：登录 {{未知 变量}} {1}"
+        assert lookups == ["user_input", "test_points", "x"]
+        assert CompiledTemplate("无变量").render({}) == "无变量"
+
+    def test_builder_uses_compiled_template(self, prompt_builder):
+        """测试提示词构建器的变量提取与预解析变量渲染。"""
+        builder = prompt_builder
+        content = "{{ test_cases }} 与 {{test_points}}"
+        assert builder._extract_used_variables(content) == ["test_cases", "test_points"]
+        assert builder._apply_template_variables_with_variables(
+            content, {"test_cases": "[]", "test_points": None}
+        ) == "[] 与 {{test_points}}"
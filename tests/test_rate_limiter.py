@@ -0,0 +1,107 @@
+"""
+Test the process-wide LLM rate limiter.
+"""
+
+import sys
+import os
+import asyncio
+import json
+import time
+
+import httpx
+
+# Add project root to path for testing
+project_root = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, project_root)
+
+from src.llm.rate_limiter import LLMRateLimiter
+from tests.test_llm_client import _make_client, _completion_body
+
+
+def test_request_bucket_admits_burst_then_waits():
+    """Test the RPM bucket admits its capacity at once and then throttles."""
+    limiter = LLMRateLimiter(requests_per_minute=600)
+
+    async def run():
+        for _ in range(600):
+            await limiter.acquire(0)
+        start = time.monotonic()
+        await limiter.acquire(0)
+        return time.monotonic() - start
+
+    waited = asyncio.run(run())
+    assert 0.05 <= waited < 1.0
+    assert limiter.stats()["admitted"] == 601
+
+
+def test_token_bucket_reconcile_refunds_unused_tokens():
+    """Test reserved tokens are corrected with actual usage."""
+    limiter = LLMRateLimiter(tokens_per_minute=1000)
+    reserved = limiter.acquire_sync(800)
+    assert reserved == 800
+    assert limiter.stats()["tokens"]["available"] < 201
+
+    limiter.reconcile(reserved, 300)
+    assert limiter.stats()["tokens"]["available"] >= 700
+
+
+def test_callers_are_admitted_in_arrival_order():
+    """Test queued callers are admitted FIFO and queue depth is reported."""
+    limiter = LLMRateLimiter(requests_per_minute=1200)
+    order = []
+    depths = []
+
+    async def caller(index):
+        await limiter.acquire(0)
+        order.append(index)
+
+    async def run():
+        limiter.requests.level = 0
+        tasks = [asyncio.create_task(caller(i)) for i in range(5)]
+        await asyncio.sleep(0)
+        depths.append(limiter.stats()["queue_depth"])
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == [0, 1, 2, 3, 4]
+    assert depths[0] == 5
+    assert limiter.stats()["queue_depth"] == 0
+
+
+def test_penalize_blocks_admission():
+    """Test Retry-After pauses the whole queue."""
+    limiter = LLMRateLimiter(requests_per_minute=1000)
+    limiter.penalize(0.1)
+    assert limiter.stats()["blocked_for_seconds"] > 0
+
+    start = time.monotonic()
+    limiter.acquire_sync(0)
+    assert time.monotonic() - start >= 0.09
+
+
+def test_client_honors_retry_after_through_limiter():
+    """Test a 429 response pauses the shared limiter for Retry-After and the call succeeds."""
+    calls = {"count": 0}
+
+    def handler(request):
+        calls["count"] += 1
+        if calls["count"] == 1:
+            return httpx.Response(429, headers={"retry-after-ms": "100"},
+                                  json={"error": {"message": "rate limited"}})
+        return httpx.Response(200, json=_completion_body('{"test_cases": []}'))
+
+    llm_client, bind = _make_client(handler)
+    llm_client.rate_limiter = LLMRateLimiter(requests_per_minute=1000, tokens_per_minute=10 ** 7)
+
+    async def run():
+        bind()
+        start = time.monotonic()
+        result = await llm_client.agenerate_test_cases("system", "user")
+        return result, time.monotonic() - start
+
+    result, elapsed = asyncio.run(run())
+    assert result == '{"test_cases": []}'
+    assert calls["count"] == 2
+    assert elapsed >= 0.09
+    stats = llm_client.rate_limiter.stats()
+    assert stats["rate_limited"] == 1 and stats["admitted"] == 2
@@ -0,0 +1,92 @@
+"""
+已有测试点/测试用例相关度筛选测试。
+"""
+
+import json
+
+from src.database.models import UnifiedTestCase, UnifiedTestCaseStage
+from src.utils.reference_selection import rank_by_relevance, select_reference_items
+from src.utils.template_variable_resolver import TemplateVariableResolver
+
+
+def _points():
+    return [
+        {"id": 1, "title": "车门解锁指令下发", "description": "远程解锁车门后校验车门状态"},
+        {"id": 2, "title": "空调远程开启", "description": "远程开启空调并设置温度"},
+        {"id": 3, "title": "车门上锁指令下发", "description": "远程上锁车门后校验车门状态"},
+        {"id": 4, "title": "座椅加热", "description": "开启主驾座椅加热"},
+    ]
+
+
+class TestReferenceSelection:
+    """相关度筛选测试类。"""
+
+    def test_rank_and_select_within_budget(self):
+        """测试按字符 n-gram 相似度排序，只完整保留 top-k 条，其余只列标题。"""
+        points = _points()
+        ranking = rank_by_relevance("远程解锁车门", [p["title"] + p["description"] for p in points])
+        assert ranking[0][0] == 0 and ranking[1][0] == 2 and ranking[-1][1] == 0.0
+
+        selection = select_reference_items(points, "远程解锁车门", ("title", "description"), "title",
+                                           top_k=2, token_budget=10_000, count_tokens=len)
+        assert [p["id"] for p in selection.selected] == [1, 3]
+        assert selection.remaining_titles == ["空调远程开启", "座椅加热"]
+        assert selection.truncated and selection.omitted == 0
+
+        # token 预算只够一条时，超出预算的条目只列标题
+        cost = len(json.dumps(points[0], ensure_ascii=False))
+        selection = select_reference_items(points, "远程解锁车门", ("title", "description"), "title",
+                                           top_k=3, token_budget=cost, count_tokens=len)
+        assert [p["id"] for p in selection.selected] == [1]
+        assert len(selection.remaining_titles) == 3
+
+    def test_resolver_bounds_test_points_when_enabled(self, db_manager, monkeypatch):
+        """测试开启后 {{test_points}} 只包含最相关的测试点和其余测试点的标题。"""
+        resolver = TemplateVariableResolver(db_manager)
+        endpoint_params = {"additional_context": {"user_input": "远程解锁车门"}, "test_points": _points()}
+
+        monkeypatch.setenv("REFERENCE_SELECTION_ENABLED", "false")
+        full = json.loads(resolver.resolve_variable("test_points", "RCC", None, endpoint_params, "test_point"))
+        assert len(full["test_points"]) == 4 and "other_test_points" not in full
+
+        monkeypatch.setenv("REFERENCE_SELECTION_ENABLED", "true")
+        monkeypatch.setenv("REFERENCE_SELECTION_TOP_K", "1")
+        bounded = json.loads(resolver.resolve_variable("test_points", "RCC", None, endpoint_params, "test_point"))
+        assert [p["id"] for p in bounded["test_points"]] == [1]
+        assert bounded["other_test_points"][0] == "车门上锁指令下发"
+        assert bounded["warning"] == full["warning"]
+
+    def test_selection_query_built_only_when_enabled_and_reuses_test_points(self, db_manager, monkeypatch):
+        """测试关闭时不构建查询文本；测试用例阶段按 test_point_ids 查询的测试点每个请求只查询一次。"""
+        with db_manager.get_session() as db:
+            db.add(UnifiedTestCase(id=1, project_id=1, business_type="RCC", test_case_id="TP001",
+                                   name="远程解锁车门", description="下发解锁指令"))
+            db.add_all([
+                UnifiedTestCase(id=10 + p["id"], project_id=1, business_type="RCC", test_case_id=f"TC{p['id']:03d}",
+                                name=p["title"], description=p["description"], stage=UnifiedTestCaseStage.test_case,
+                                steps='[{"action": "执行"}]')
+                for p in _points()
+            ])
+            db.commit()
+        resolver = TemplateVariableResolver(db_manager)
+        get_test_points_by_ids = resolver._get_test_points_by_ids
+        queries = []
+
+        def counting_get_test_points_by_ids(test_point_ids, business_type):
+            queries.append(test_point_ids)
+            return get_test_points_by_ids(test_point_ids, business_type)
+
+        monkeypatch.setattr(resolver, "_get_test_points_by_ids", counting_get_test_points_by_ids)
+        endpoint_params = {"additional_context": "车门", "test_point_ids": [1]}
+
+        monkeypatch.setenv("REFERENCE_SELECTION_ENABLED", "false")
+        full = json.loads(resolver.resolve_variable("test_cases", "RCC", 1, endpoint_params, "test_case"))
+        assert len(full["test_cases"]) == 4 and queries == []
+
+        monkeypatch.setenv("REFERENCE_SELECTION_ENABLED", "true")
+        monkeypatch.setenv("REFERENCE_SELECTION_TOP_K", "1")
+        context = resolver.create_context("RCC", 1, endpoint_params, "test_case")
+        assert json.loads(context.get("test_points"))["test_points_count"] == 1
+        bounded = json.loads(context.get("test_cases"))
+        assert [c["id"] for c in bounded["test_cases"]] == [11]
+        assert queries == [[1]]
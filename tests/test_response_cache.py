@@ -0,0 +1,66 @@
+"""
+Test LLM response cache functionality.
+"""
+
+import sys
+import os
+import time
+import tempfile
+
+# Add project root to path for testing
+project_root = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, project_root)
+
+from src.llm.response_cache import LLMResponseCache
+
+
+def test_key_depends_on_every_field():
+    """Test that the cache key changes with model, prompts and max_tokens."""
+    base = LLMResponseCache.make_key("m", "sys", "user", 8000)
+    assert base == LLMResponseCache.make_key("m", "sys", "user", 8000)
+    assert base != LLMResponseCache.make_key("m2", "sys", "user", 8000)
+    assert base != LLMResponseCache.make_key("m", "sys2", "user", 8000)
+    assert base != LLMResponseCache.make_key("m", "sys", "user2", 8000)
+    assert base != LLMResponseCache.make_key("m", "sys", "user", 4000)
+
+
+def test_hit_miss_and_ttl():
+    """Test hit/miss counters and TTL expiry."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = LLMResponseCache(cache_dir, ttl_seconds=60, max_bytes=1024 * 1024)
+        key = cache.make_key("m", "s", "u", 10)
+        assert cache.get(key) is None
+        cache.set(key, '{"test_points": []}', "m")
+        assert cache.get(key) == '{"test_points": []}'
+
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+
+        cache.ttl_seconds = -1
+        assert cache.get(key) is None
+        assert cache.stats()["entries"] == 0
+
+
+def test_size_eviction_removes_least_recently_used():
+    """Test that the oldest entries are evicted when max_bytes is exceeded."""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = LLMResponseCache(cache_dir, ttl_seconds=60, max_bytes=600)
+        keys = [cache.make_key("m", "s", str(i), 10) for i in range(3)]
+        for i, key in enumerate(keys[:2]):
+            cache.set(key, "x" * 200)
+            os.utime(cache._path(key), (time.time() - 100 + i, time.time() - 100 + i))
+
+        cache.get(keys[0])  # touch the first entry so the second becomes the oldest
+        cache.set(keys[2], "x" * 200)
+
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None
+        assert cache.get(keys[2]) is not None
+        assert cache.evictions == 1
+
+
+if __name__ == "__main__":
+    test_key_depends_on_every_field()
+    test_hit_miss_and_ttl()
+    test_size_eviction_removes_least_recently_used()
+    print("All response cache tests passed!")
@@ -0,0 +1,61 @@
+"""
+请求级模板变量渲染上下文测试。
+"""
+
+from src.utils.config import Config
+from src.utils.database_prompt_builder import DatabasePromptBuilder
+from src.utils.prompt_cache import CompiledPromptCache
+from src.utils.template_variable_resolver import TemplateVariableResolver
+
+
+class _CountingResolver(TemplateVariableResolver):
+    """记录每个变量被解析次数的解析器。"""
+
+    def __init__(self, db_manager):
+        super().__init__(db_manager)
+        self.calls = []
+
+    def resolve_variable(self, name, business_type, project_id=None, endpoint_params=None, generation_stage=None,
+                         cache=None):
+        self.calls.append(name)
+        if name == 'test_points':
+            return f'[{generation_stage}]'
+        return super().resolve_variable(name, business_type, project_id, endpoint_params, generation_stage, cache)
+
+
+def _builder(resolver):
+    return DatabasePromptBuilder(Config(), db_manager=resolver.db_manager, variable_resolver=resolver,
+                                 prompt_cache=CompiledPromptCache())
+
+
+class TestTemplateRenderContext:
+    """渲染上下文测试类。"""
+
+    def test_variables_resolved_once_and_only_when_referenced(self, db_manager):
+        """测试系统和用户提示词共享上下文时每个被引用的变量只解析一次，未引用的变量不解析。"""
+        resolver = _CountingResolver(db_manager)
+        builder = _builder(resolver)
+        endpoint_params = {'generation_stage': 'test_point', 'additional_context': {'user_input': '登录模块'}}
+        context = builder.create_render_context('RCC', 1, endpoint_params)
+        variables = {}
+
+        system = builder._apply_template_variables(
+            "需求：{{user_input}}", business_type='RCC', project_id=1, endpoint_params=endpoint_params,
+            resolved_variables=variables, render_context=context
+        )
+        user = builder._apply_template_variables(
+            "{{ user_input }} 已有：{{test_points}} {{user_input}}", business_type='RCC', project_id=1,
+            endpoint_params=endpoint_params, resolved_variables=variables, render_context=context
+        )
+
+        assert system == "需求：登录模块"
+        assert user == "登录模块 已有：[test_point] 登录模块"
+        assert resolver.calls == ['user_input', 'test_points']
+        assert variables == {'user_input': '登录模块', 'test_points': '[test_point]'}
+        assert context.summary()['resolved_variables'] == {'user_input': 4, 'test_points': 12}
+
+    def test_resolve_variables_still_returns_all_variables(self, db_manager):
+        """测试 resolve_variables 仍返回全部变量。"""
+        resolver = _CountingResolver(db_manager)
+        variables = resolver.resolve_variables('RCC', endpoint_params={'additional_context': '输入'})
+        assert variables == {'user_input': '输入', 'test_points': '[None]', 'test_cases': ''}
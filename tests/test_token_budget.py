@@ -0,0 +1,98 @@
+"""
+Test prompt token budgeting.
+"""
+
+import sys
+import os
+import json
+import pytest
+
+# Add project root to path for testing
+project_root = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, project_root)
+
+from src.utils.config import Config
+from src.llm.token_budget import TokenBudgeter, TokenCounter, get_context_window
+from src.exceptions.generation import TokenBudgetError
+
+
+def _budgeter(monkeypatch, window=4000, max_output=1000, min_output=500, policy='trim'):
+    monkeypatch.setenv('MODEL', 'qwen-plus')
+    monkeypatch.setenv('LLM_CONTEXT_WINDOW', str(window))
+    monkeypatch.setenv('LLM_MAX_OUTPUT_TOKENS', str(max_output))
+    monkeypatch.setenv('LLM_MIN_OUTPUT_TOKENS', str(min_output))
+    monkeypatch.setenv('LLM_BUDGET_POLICY', policy)
+    return TokenBudgeter(Config())
+
+
+def _render(template):
+    def render(values):
+        return "system", template.replace("{{test_cases}}", values["test_cases"])
+    return render
+
+
+def test_context_window_lookup():
+    """Test model context window detection and override."""
+    assert get_context_window('qwen3-235b-a22b-instruct-2507') == 131072
+    assert get_context_window('gpt-4o-mini') == 128000
+    assert get_context_window('gpt-4') == 8192
+    assert get_context_window('unknown-model') == 32768
+    assert get_context_window('gpt-4', override=1000) == 1000
+
+
+def test_heuristic_counts_cjk_per_character():
+    """Test the fallback estimate counts CJK characters individually."""
+    assert TokenCounter.estimate("测试用例") == 4
+    assert TokenCounter.estimate("abcdefgh") == 2
+    assert TokenCounter('qwen-plus').count("") == 0
+
+
+def test_plan_sets_max_tokens_from_remaining_window(monkeypatch):
+    """Test max_tokens is capped by both the limit and the remaining window."""
+    budgeter = _budgeter(monkeypatch)
+    budget = budgeter.plan("sys", "user")
+    assert budget.max_output_tokens == 1000
+    assert budget.fits
+
+    long_prompt = "x" * 4 * 3500
+    budget = budgeter.plan("sys", long_prompt)
+    assert budget.max_output_tokens < 1000
+    assert not budget.fits
+    with pytest.raises(TokenBudgetError):
+        budgeter.check("sys", long_prompt)
+
+
+def test_fit_prompts_trims_reference_list(monkeypatch):
+    """Test over-budget reference data is trimmed to whole list items."""
+    budgeter = _budgeter(monkeypatch)
+    template = "Input: {{user_input}}\nExisting: {{test_cases}}"
+    cases = {"warning": "w", "test_cases": [{"name": f"case {i}", "steps": "x" * 200} for i in range(200)]}
+    variables = {"user_input": "需求", "test_cases": json.dumps(cases, ensure_ascii=False, indent=2)}
+    system, user = _render(template.replace("{{user_input}}", "需求"))(variables)
+
+    system, user, budget = budgeter.fit_prompts(
+        "system", template, system, user, variables,
+        _render(template.replace("{{user_input}}", "需求")), trimmable=('test_cases',)
+    )
+
+    assert budget.fits
+    assert 'test_cases' in budget.trimmed
+    assert budget.trimmed['test_cases']['dropped_items'] > 0
+    assert budget.variables['test_cases'] < budget.trimmed['test_cases']['from_tokens']
+    kept = json.loads(user.split("Existing: ", 1)[1])
+    assert 0 < len(kept['test_cases']) < 200
+    assert 'truncated' in kept
+
+
+def test_fit_prompts_reject_policy(monkeypatch):
+    """Test the reject policy raises with the budget breakdown."""
+    budgeter = _budgeter(monkeypatch, policy='reject')
+    template = "Existing: {{test_cases}}"
+    value = json.dumps({"test_cases": ["x" * 100] * 200})
+    system, user = _render(template)({"test_cases": value})
+
+    with pytest.raises(TokenBudgetError) as exc_info:
+        budgeter.fit_prompts("system", template, system, user, {"test_cases": value},
+                             _render(template), trimmable=('test_cases',))
+    assert exc_info.value.budget['variables']['test_cases'] > 0
+    assert exc_info.value.budget['fits'] is False
@@ -317,5 +317,13 @@ def create_test_generation_job():
     }
 
 
+def create_test_points(count: int, **fields) -> List[Dict[str, Any]]:
+    """创建 count 个测试点数据（id 从1开始），fields 为每个测试点共同的附加字段"""
+    return [
+        {"id": i, "title": f"测试点{i}", "description": "描述", **fields}
+        for i in range(1, count + 1)
+    ]
+
+
 # 向后兼容的别名 - 避免pytest收集警告
 TestDataManager = _TestDataManager
\ No newline at end of file